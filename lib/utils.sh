@@ -71,6 +71,13 @@ get_script_dir() {
     printf '%s\n' "$dir"
 }
 
+# 通过 modules/cli.py 单一入口运行 Python helper（只加载目标子命令）
+# 用法: saltgoat_py <command> [args...]，子命令列表见 python3 -m modules.cli --help
+saltgoat_py() {
+    local root="${PROJECT_ROOT:-${SCRIPT_DIR}}"
+    PYTHONPATH="${root}${PYTHONPATH:+:${PYTHONPATH}}" python3 -m modules.cli "$@"
+}
+
 # 检查命令是否存在
 command_exists() {
     command -v "$1" >/dev/null 2>&1
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Single entry point for SaltGoat's Python helpers.
+
+``python3 -m modules.cli <command> [args...]`` runs one helper script exactly
+as ``python3 <script> [args...]`` would (``__name__ == "__main__"``, script
+directory on ``sys.path``), but inside one interpreter that has already set up
+the repo path and warning filters. Only the requested helper is loaded, and
+its code comes from the regular ``__pycache__`` bytecode cache.
+
+``--import-only`` executes the helper's module body without its ``__main__``
+block; ``scripts/cli-bench.py`` uses it to measure startup cost.
+"""
+from __future__ import annotations
+
+import importlib.machinery
+import sys
+import types
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# 子命令 -> 相对仓库根目录的脚本路径；新增 helper 时在此登记
+COMMANDS: Dict[str, str] = {
+    "alerts-index": "modules/lib/alerts_index.py",
+    "analyse": "modules/lib/analyse_helper.py",
+    "automation": "modules/lib/automation_helpers.py",
+    "backup-notify": "modules/lib/backup_notify.py",
+    "daily-summary": "modules/monitoring/daily_summary.py",
+    "doctor": "modules/lib/doctor.py",
+    "exporter": "modules/monitoring/exporter.py",
+    "gitops": "modules/lib/gitops.py",
+    "magento-api-watch": "modules/magetools/magento_api_watch.py",
+    "magento-schedule": "modules/magetools/magento-schedule.py",
+    "magento-summary": "modules/magetools/magento_summary.py",
+    "maintenance-pillar": "modules/lib/maintenance_pillar.py",
+    "metrics-history": "modules/lib/metrics_history.py",
+    "monitor-auto-sites": "modules/lib/monitor_auto_sites.py",
+    "monitoring-sites": "modules/lib/monitoring_sites.py",
+    "mysql-salt": "modules/lib/mysql_salt_helper.py",
+    "nginx-context": "modules/lib/nginx_context.py",
+    "nginx-index": "modules/lib/nginx_index.py",
+    "nginx-pillar": "modules/lib/nginx_pillar.py",
+    "php-pool": "modules/lib/php_pool_helper.py",
+    "pillar-snapshot": "modules/lib/pillar_snapshot.py",
+    "pwa": "modules/lib/pwa_helpers.py",
+    "pwa-health": "modules/lib/pwa_health.py",
+    "rabbitmq": "modules/lib/rabbitmq_helper.py",
+    "resource-alert": "modules/monitoring/resource_alert.py",
+    "restic": "modules/lib/restic_helpers.py",
+    "salt-event": "modules/lib/salt_event.py",
+    "swap": "modules/lib/swap_helper.py",
+    "systemd-units": "modules/lib/systemd_units.py",
+}
+
+
+def _configure_warnings() -> None:
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    warnings.filterwarnings("ignore", message=".*datetime.datetime.utcnow.*")
+    warnings.filterwarnings("ignore", message=".*crypt.*")
+    warnings.filterwarnings("ignore", message=".*spwd.*")
+
+
+def run_script(path: Path, argv: Sequence[str], *, run_name: str = "__main__") -> None:
+    """Execute ``path`` in a fresh module namespace, like ``python3 path argv...``."""
+    # SourceFileLoader 会读写 __pycache__，runpy.run_path 则每次重新编译源码
+    loader = importlib.machinery.SourceFileLoader(run_name, str(path))
+    code = loader.get_code(run_name)
+    module = types.ModuleType(run_name)
+    module.__file__ = str(path)
+    module.__loader__ = loader
+    saved_argv = sys.argv[:]
+    saved_module = sys.modules.get(run_name)
+    sys.argv = [str(path), *argv]
+    sys.path.insert(0, str(path.parent))
+    # dataclasses/pickle 通过 sys.modules[__name__] 反查定义所在模块
+    sys.modules[run_name] = module
+    try:
+        exec(code, module.__dict__)
+    finally:
+        sys.argv = saved_argv
+        if saved_module is not None:
+            sys.modules[run_name] = saved_module
+        else:
+            sys.modules.pop(run_name, None)
+
+
+def usage() -> str:
+    names = "\n".join(f"  {name:<20} {COMMANDS[name]}" for name in sorted(COMMANDS))
+    return f"usage: python3 -m modules.cli [--import-only] <command> [args...]\n\ncommands:\n{names}\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    import_only = False
+    if args and args[0] == "--import-only":
+        import_only = True
+        args = args[1:]
+    if not args or args[0] in {"-h", "--help", "help"}:
+        sys.stdout.write(usage())
+        return 0
+    command, rest = args[0], args[1:]
+    target = COMMANDS.get(command)
+    if target is None:
+        sys.stderr.write(f"[ERROR] unknown command: {command}\n{usage()}")
+        return 2
+    _configure_warnings()
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    run_script(REPO_ROOT / target, rest, run_name="__saltgoat_import__" if import_only else "__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
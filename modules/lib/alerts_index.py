@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Incremental, indexed reader for the SaltGoat alerts log.
+
+A sidecar SQLite index (``.<log name>.index.sqlite`` next to the log) stores the
+byte offset, timestamp, label, tag and site of every line. Each refresh only
+parses bytes appended since the last checkpoint, and rotated segments
+(``alerts.log.1``, ``alerts.log.2.gz``, ``alerts.log-20250101.gz`` ...) are
+recognised by a signature of their first line, so renaming or compressing a
+segment does not trigger a re-scan. Queries read just the matching lines back
+from disk, keeping memory flat regardless of log size.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from modules.lib import logging_utils  # type: ignore
+else:
+    from . import logging_utils
+
+SIGNATURE_BYTES = 65536
+PAGE_SIZE = 200
+_LINE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \[([^\]]+)\] tag=(\S+)")
+_ROTATED_RE = re.compile(r"^[.-](\d+|\d{8})(\.gz)?$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    sig TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    gz INTEGER NOT NULL DEFAULT 0,
+    offset INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    seg TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    ts TEXT NOT NULL,
+    label TEXT,
+    tag TEXT,
+    site TEXT
+);
+CREATE INDEX IF NOT EXISTS events_tag_ts ON events (tag, ts);
+CREATE INDEX IF NOT EXISTS events_site_ts ON events (site, ts);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+"""
+
+
+def index_path(log_path: Path) -> Path:
+    return log_path.parent / f".{log_path.name}.index.sqlite"
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse either a reactor logger line or a JSON fallback record."""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        timestamp = str(record.get("timestamp", "")).replace("T", " ").rstrip("Z")
+        payload = record.get("payload")
+        return {
+            "timestamp": timestamp,
+            "label": record.get("label"),
+            "tag": record.get("tag"),
+            "payload": payload,
+            "site": _site_from_payload(payload),
+            "raw": line,
+        }
+    match = _LINE_RE.match(line)
+    if not match:
+        return None
+    payload: Any = None
+    if " payload=" in line:
+        payload_raw = line.split(" payload=", 1)[1]
+        try:
+            payload = json.loads(payload_raw)
+        except json.JSONDecodeError:
+            payload = payload_raw
+    return {
+        "timestamp": match.group(1),
+        "label": match.group(2),
+        "tag": match.group(3),
+        "payload": payload,
+        "site": _site_from_payload(payload),
+        "raw": line,
+    }
+
+
+def _site_from_payload(payload: Any) -> Optional[str]:
+    if not isinstance(payload, dict):
+        return None
+    site = payload.get("site")
+    data = payload.get("data")
+    if not site and isinstance(data, dict):
+        site = data.get("site")
+    return str(site) if site else None
+
+
+def segment_paths(log_path: Path) -> List[Path]:
+    """Return the live log followed by rotated segments, newest first."""
+    paths: List[Path] = []
+    if log_path.exists():
+        paths.append(log_path)
+    rotated = []
+    for candidate in log_path.parent.glob(f"{log_path.name}*"):
+        match = _ROTATED_RE.match(candidate.name[len(log_path.name) :])
+        if match:
+            number = int(match.group(1))
+            # 数字后缀越小越新；日期后缀越大越新
+            rotated.append((number if len(match.group(1)) < 8 else -number, candidate))
+    paths.extend(path for _, path in sorted(rotated))
+    return paths
+
+
+def _open(path: Path, gz: bool) -> IO[bytes]:
+    return gzip.open(path, "rb") if gz else path.open("rb")
+
+
+def _signature(path: Path, gz: bool) -> Optional[str]:
+    """Hash the first complete line, which never changes once written.
+
+    Returns ``None`` while the segment has no complete line yet; read errors
+    (e.g. ``PermissionError``) propagate so callers can report them.
+    """
+    with _open(path, gz) as fh:
+        head = fh.readline(SIGNATURE_BYTES)
+    if not head.endswith(b"\n") and len(head) < SIGNATURE_BYTES:
+        return None
+    return hashlib.sha1(head).hexdigest()
+
+
+def describe_error(exc: BaseException) -> str:
+    if isinstance(exc, PermissionError):
+        return "Permission denied"
+    return getattr(exc, "strerror", None) or str(exc) or type(exc).__name__
+
+
+class AlertsIndex:
+    """Sidecar index over the alerts log and its rotated segments."""
+
+    def __init__(self, log_path: Optional[Path] = None, db_path: Optional[Path] = None) -> None:
+        self.log_path = Path(log_path or logging_utils.alerts_log_path())
+        self.db_path = Path(db_path or index_path(self.log_path))
+        self.conn = sqlite3.connect(str(self.db_path), timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._paths: Dict[str, Dict[str, Any]] = {}
+        # 最近一次 refresh 中无法读取的段：path -> 错误信息
+        self.errors: Dict[str, str] = {}
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "AlertsIndex":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
+
+    def refresh(self) -> int:
+        """Index lines appended since the last checkpoint; returns new events."""
+        added = 0
+        live_sigs = []
+        self.errors = {}
+        with self.conn:
+            for path in segment_paths(self.log_path):
+                gz = path.suffix == ".gz"
+                try:
+                    sig = _signature(path, gz)
+                except (OSError, EOFError) as exc:
+                    self.errors[str(path)] = describe_error(exc)
+                    continue
+                if sig is None:
+                    continue
+                live_sigs.append(sig)
+                row = self.conn.execute(
+                    "SELECT offset, complete FROM segments WHERE sig = ?", (sig,)
+                ).fetchone()
+                if row is None:
+                    self.conn.execute(
+                        "INSERT INTO segments (sig, path, gz) VALUES (?, ?, ?)", (sig, str(path), int(gz))
+                    )
+                    offset, complete = 0, 0
+                else:
+                    offset, complete = row
+                    self.conn.execute(
+                        "UPDATE segments SET path = ?, gz = ? WHERE sig = ?", (str(path), int(gz), sig)
+                    )
+                if complete:
+                    continue
+                if not gz:
+                    size = path.stat().st_size
+                    if size < offset:
+                        # 同签名但文件变短（copytruncate 后重写），重建该段
+                        self.conn.execute("DELETE FROM events WHERE seg = ?", (sig,))
+                        offset = 0
+                    elif size == offset:
+                        continue
+                added += self._index_segment(path, gz, sig, offset)
+            # 有段读取失败时不清理，避免暂时不可读的段被当作已删除
+            if live_sigs and not self.errors:
+                marks = ",".join("?" * len(live_sigs))
+                self.conn.execute(f"DELETE FROM events WHERE seg NOT IN ({marks})", live_sigs)
+                self.conn.execute(f"DELETE FROM segments WHERE sig NOT IN ({marks})", live_sigs)
+        self._paths = {}
+        return added
+
+    def _index_segment(self, path: Path, gz: bool, sig: str, offset: int) -> int:
+        rows = []
+        count = 0
+        position = offset
+        with _open(path, gz) as fh:
+            fh.seek(offset)
+            for raw in fh:
+                if not raw.endswith(b"\n"):
+                    break  # 写入中的半行，留待下次刷新
+                event = parse_line(raw.decode("utf-8", errors="ignore"))
+                if event:
+                    rows.append((sig, position, event["timestamp"], event["label"], event["tag"], event["site"]))
+                    count += 1
+                position += len(raw)
+                if len(rows) >= 1000:
+                    self.conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", rows)
+                    rows = []
+        if rows:
+            self.conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.execute(
+            "UPDATE segments SET offset = ?, complete = ? WHERE sig = ?",
+            (position, int(gz), sig),
+        )
+        return count
+
+    def _segment(self, sig: str) -> Optional[Dict[str, Any]]:
+        info = self._paths.get(sig)
+        if info is None:
+            row = self.conn.execute("SELECT path, gz FROM segments WHERE sig = ?", (sig,)).fetchone()
+            if row is None:
+                return None
+            info = {"path": Path(row[0]), "gz": bool(row[1])}
+            self._paths[sig] = info
+        return info
+
+    def _read_lines(self, rows: List[Any]) -> Dict[Any, str]:
+        """Read the lines at ``(sig, offset)`` rows, one ascending pass per segment.
+
+        Seeking backwards in a ``.gz`` segment restarts decompression from the
+        beginning, so offsets are grouped per segment and read in order from a
+        single handle.
+        """
+        by_segment: Dict[str, List[int]] = {}
+        for sig, offset in rows:
+            by_segment.setdefault(sig, []).append(offset)
+        lines: Dict[Any, str] = {}
+        for sig, offsets in by_segment.items():
+            info = self._segment(sig)
+            if info is None:
+                continue
+            try:
+                with _open(info["path"], info["gz"]) as fh:
+                    for offset in sorted(set(offsets)):
+                        fh.seek(offset)
+                        lines[(sig, offset)] = fh.readline().decode("utf-8", errors="ignore")
+            except (OSError, EOFError):
+                continue
+        return lines
+
+    def iter_events(
+        self,
+        tag: Optional[str] = None,
+        *,
+        prefix: bool = False,
+        label: Optional[str] = None,
+        site: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield matching events newest first, fetching index rows page by page."""
+        clauses = []
+        params: List[Any] = []
+        if tag is not None:
+            if prefix:
+                clauses.append("tag >= ? AND tag < ?")
+                params.extend([tag, tag + "\uffff"])
+            else:
+                clauses.append("tag = ?")
+                params.append(tag)
+        if label is not None:
+            clauses.append("label = ?")
+            params.append(label)
+        if site is not None:
+            clauses.append("site = ?")
+            params.append(site)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT seg, offset FROM events {where} ORDER BY ts DESC, rowid DESC LIMIT ? OFFSET ?"
+        start = 0
+        while True:
+            page = self.conn.execute(query, [*params, PAGE_SIZE, start]).fetchall()
+            lines = self._read_lines(page)
+            for sig, offset in page:
+                line = lines.get((sig, offset))
+                event = parse_line(line) if line else None
+                if event:
+                    yield event
+            if len(page) < PAGE_SIZE:
+                return
+            start += PAGE_SIZE
+
+    def last_events(self, tag: Optional[str] = None, limit: int = 10, **filters: Any) -> List[Dict[str, Any]]:
+        events = []
+        for event in self.iter_events(tag, **filters):
+            events.append(event)
+            if len(events) >= limit:
+                break
+        return events
+
+
+def open_index(log_path: Optional[Path] = None) -> AlertsIndex:
+    """Open and refresh the sidecar index.
+
+    Falls back to a throw-away in-memory index when the sidecar cannot be
+    written (e.g. ``doctor`` running without root).
+    """
+    index: Optional[AlertsIndex] = None
+    try:
+        index = AlertsIndex(log_path)
+        index.refresh()
+        return index
+    except (sqlite3.Error, OSError):
+        if index is not None:
+            index.close()
+    index = AlertsIndex(log_path, Path(":memory:"))
+    index.refresh()
+    return index
+
+
+def last_events(
+    tag: Optional[str] = None,
+    limit: int = 10,
+    log_path: Optional[Path] = None,
+    **filters: Any,
+) -> List[Dict[str, Any]]:
+    """Refresh the index and return the newest ``limit`` matching events."""
+    with open_index(log_path) as index:
+        return index.last_events(tag, limit, **filters)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SaltGoat alerts log index")
+    parser.add_argument("--log", type=Path, help="alerts.log 路径（默认读取 SALTGOAT_ALERT_LOG）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("refresh", help="增量更新索引")
+    query = sub.add_parser("query", help="查询最近的告警事件")
+    query.add_argument("--tag")
+    query.add_argument("--prefix", action="store_true", help="按 tag 前缀匹配")
+    query.add_argument("--label")
+    query.add_argument("--site")
+    query.add_argument("--limit", type=int, default=10)
+    query.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    with open_index(args.log) as index:
+        for path, message in sorted(index.errors.items()):
+            print(f"[{message}] {path}", file=sys.stderr)
+        if args.command == "refresh":
+            total = index.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+            print(f"indexed {total} events")
+            return 0
+        events = index.last_events(args.tag, args.limit, prefix=args.prefix, label=args.label, site=args.site)
+    if args.json:
+        print(json.dumps(events, ensure_ascii=False, indent=2))
+    else:
+        for event in events:
+            print(event["raw"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,6 +16,9 @@ try:
 except Exception:  # pragma: no cover
     Caller = None  # type: ignore
 
+from . import pillar_cache
+from . import pillar_snapshot
+
 _CALLER: Caller | None = None
 _REPO_ROOT = Path(__file__).resolve().parents[2]
 _SECRET_DIR = _REPO_ROOT / "salt" / "pillar" / "secret"
@@ -33,7 +36,16 @@ def _get_caller() -> Caller | None:
     return _CALLER
 
 
+def reset_caller() -> None:
+    """Drop the cached Caller so long-running processes see refreshed pillar."""
+    global _CALLER
+    _CALLER = None
+
+
 def pillar_get(path: str, default: Any = None) -> Any:
+    value = pillar_snapshot.lookup(path, default)
+    if value is not pillar_snapshot.MISSING:
+        return value
     caller = _get_caller()
     if caller is None:
         return default
@@ -65,11 +77,7 @@ def load_secret_file(name: str) -> Dict[str, Any]:
         if not candidate.exists():
             continue
         try:
-            import yaml  # type: ignore
-        except Exception:
-            return {}
-        try:
-            data = yaml.safe_load(candidate.read_text(encoding="utf-8")) or {}
+            data = pillar_cache.load(candidate) or {}
         except Exception:
             continue
         if isinstance(data, dict):
@@ -6,14 +6,23 @@ import json
 import os
 import socket
 import subprocess
+import sys
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Iterable
 
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from modules.lib import alerts_index
 from modules.lib import logging_utils
+from modules.lib import metrics_history
+from modules.lib import monitor_daemon
+from modules.lib import restic_helpers
 
-REPO_ROOT = Path(__file__).resolve().parents[2]
 UNIT_TEST = os.environ.get("SALTGOAT_UNIT_TEST") == "1"
+RECENT_ALERTS = 10
 
 
 def run(cmd: list[str]) -> str:
@@ -23,6 +32,19 @@ def run(cmd: list[str]) -> str:
     return proc.stdout.strip()
 
 
+def resource_snapshot() -> str:
+    """Summarise the resident resource_alert daemon's latest evaluation."""
+    if UNIT_TEST:
+        return "[stub] resource daemon snapshot"
+    snapshot = monitor_daemon.fetch_snapshot()
+    if not snapshot:
+        return ""
+    age = max(0.0, datetime.now(timezone.utc).timestamp() - float(snapshot.get("generated_at", 0)))
+    lines = [f"{snapshot.get('severity', 'INFO')} ({age:.0f}s ago) triggers: {', '.join(snapshot.get('triggers') or []) or '-'}"]
+    lines.extend(str(item) for item in snapshot.get("details") or [] if item)
+    return "\n".join(lines)
+
+
 def gather() -> dict:
     data = {}
     dt = datetime.utcnow()
@@ -35,13 +57,32 @@ def gather() -> dict:
             data["goat_pulse"] = run(["python3", str(REPO_ROOT / "scripts" / "goat_pulse.py"), "--once", "--plain"]).strip()
         except Exception as exc:
             data["goat_pulse"] = f"[ERROR] Goat Pulse failed: {exc}"
+    data["resources"] = resource_snapshot()
+    try:
+        trends = metrics_history.summarize(hours=24)
+    except Exception:
+        trends = {}
+    data["trends"] = "\n".join(metrics_history.format_summary(trends))
     data["disk"] = run(["df", "-h", "/", "/var/lib/mysql"])
+    # 读取 summarize-sites 写入的缓存，doctor 不直接访问 restic 仓库
+    data["restic"] = "\n".join(restic_helpers.describe(repo) for repo in restic_helpers.load_cached_summaries())
     data["ps"] = run(["bash", "-c", "ps -eo pid,comm,%mem,%cpu --sort=-%mem | head -n 6"])
     alerts = logging_utils.alerts_log_path()
     try:
-        data["alerts"] = alerts.read_text()[-2000:] if alerts.exists() else ""
+        if alerts.exists():
+            with alerts_index.open_index(alerts) as index:
+                events = index.last_events(limit=RECENT_ALERTS)
+                errors = dict(index.errors)
+            # 不可读的日志段要显式提示，否则看起来和空日志一样
+            lines = [f"[{message}] {path}" for path, message in sorted(errors.items())]
+            lines.extend(event["raw"] for event in reversed(events))
+            data["alerts"] = "\n".join(lines)
+        else:
+            data["alerts"] = ""
     except PermissionError:
         data["alerts"] = "[Permission denied]"
+    except Exception as exc:
+        data["alerts"] = f"[ERROR] alerts index failed: {exc}"
     return data
 
 
@@ -56,11 +97,14 @@ def main(argv: Iterable[str] | None = None) -> int:
     if fmt == "json":
         print(json.dumps(data, ensure_ascii=False, indent=2))
     elif fmt == "markdown":
-        print(f"# SaltGoat Doctor Snapshot\n\n- **Host**: {data['host']}\n- **Timestamp**: {data['timestamp']}\n\n## Goat Pulse\n```\n{data['goat_pulse']}\n```\n\n## Disk Usage\n```\n{data['disk']}\n```\n\n## Top Memory Processes\n```\n{data['ps']}\n```\n\n## Recent Alerts\n```\n{(data['alerts'] or 'No alerts.')}\n```\n")
+        print(f"# SaltGoat Doctor Snapshot\n\n- **Host**: {data['host']}\n- **Timestamp**: {data['timestamp']}\n\n## Goat Pulse\n```\n{data['goat_pulse']}\n```\n\n## Resource Daemon\n```\n{(data['resources'] or 'Resource daemon not running.')}\n```\n\n## Trends (24h)\n```\n{(data['trends'] or 'No metrics history.')}\n```\n\n## Disk Usage\n```\n{data['disk']}\n```\n\n## Restic Repositories\n```\n{(data['restic'] or 'No cached restic summaries.')}\n```\n\n## Top Memory Processes\n```\n{data['ps']}\n```\n\n## Recent Alerts\n```\n{(data['alerts'] or 'No alerts.')}\n```\n")
     else:
         print(f"SaltGoat Doctor Snapshot @ {data['timestamp']} (Host: {data['host']})")
         print(data["goat_pulse"])
+        print("\nResource Daemon:\n" + (data["resources"] or "Resource daemon not running."))
+        print("\nTrends (24h):\n" + (data["trends"] or "No metrics history."))
         print("\nDisk Usage:\n" + data["disk"])
+        print("\nRestic Repositories:\n" + (data["restic"] or "No cached restic summaries."))
         print("\nTop Memory Processes:\n" + data["ps"])
         print("\nRecent Alerts:\n" + (data["alerts"] or "No alerts."))
     return 0
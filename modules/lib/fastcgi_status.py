@@ -0,0 +1,209 @@
+"""Minimal in-process FastCGI client for PHP-FPM ``pm.status_path`` pages.
+
+PHP-FPM answers its status page directly over the pool's ``listen`` socket,
+so no web server (or ``cgi-fcgi`` binary) is needed to read active/idle
+workers, listen queue backlog and "max children reached" counters.
+"""
+from __future__ import annotations
+
+import json
+import socket
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple, Union
+
+FCGI_VERSION = 1
+FCGI_BEGIN_REQUEST = 1
+FCGI_END_REQUEST = 3
+FCGI_PARAMS = 4
+FCGI_STDIN = 5
+FCGI_STDOUT = 6
+FCGI_STDERR = 7
+FCGI_RESPONDER = 1
+REQUEST_ID = 1
+HEADER = struct.Struct("!BBHHBx")
+MAX_RESPONSE_BYTES = 1024 * 1024
+DEFAULT_STATUS_PATH = "/status"
+DEFAULT_TIMEOUT = 3.0
+
+# PHP-FPM JSON 状态字段 -> 采集结果字段
+STATUS_FIELDS = {
+    "pool": "pool",
+    "process manager": "process_manager",
+    "start since": "start_since",
+    "accepted conn": "accepted_conn",
+    "listen queue": "listen_queue",
+    "max listen queue": "max_listen_queue",
+    "listen queue len": "listen_queue_len",
+    "idle processes": "idle_processes",
+    "active processes": "active_processes",
+    "total processes": "total_processes",
+    "max active processes": "max_active_processes",
+    "max children reached": "max_children_reached",
+    "slow requests": "slow_requests",
+}
+
+Address = Tuple[int, Union[str, Tuple[str, int]]]
+
+
+class FastCGIError(RuntimeError):
+    """Raised when a pool's status page cannot be read."""
+
+
+def parse_listen(listen: str) -> Address:
+    """Translate a pool ``listen`` value into ``(family, address)``."""
+    value = listen.strip()
+    if not value:
+        raise FastCGIError("empty listen address")
+    if value.startswith("/"):
+        return socket.AF_UNIX, value
+    if value.isdigit():
+        return socket.AF_INET, ("127.0.0.1", int(value))
+    host, sep, port = value.rpartition(":")
+    if not sep or not port.isdigit():
+        raise FastCGIError(f"unsupported listen address: {listen}")
+    if host.startswith("[") and host.endswith("]"):
+        return socket.AF_INET6, (host[1:-1], int(port))
+    if host in ("", "*", "0.0.0.0"):
+        host = "127.0.0.1"
+    return socket.AF_INET, (host, int(port))
+
+
+def _record(record_type: int, content: bytes = b"") -> bytes:
+    return HEADER.pack(FCGI_VERSION, record_type, REQUEST_ID, len(content), 0) + content
+
+
+def _encode_length(length: int) -> bytes:
+    if length < 128:
+        return bytes([length])
+    return struct.pack("!I", length | 0x80000000)
+
+
+def _encode_params(params: Dict[str, str]) -> bytes:
+    chunks = []
+    for key, value in params.items():
+        name, data = key.encode("utf-8"), value.encode("utf-8")
+        chunks.append(_encode_length(len(name)) + _encode_length(len(data)) + name + data)
+    return b"".join(chunks)
+
+
+def build_request(status_path: str, query: str = "json") -> bytes:
+    params = {
+        "GATEWAY_INTERFACE": "FastCGI/1.0",
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": status_path,
+        "SCRIPT_FILENAME": status_path,
+        "REQUEST_URI": f"{status_path}?{query}" if query else status_path,
+        "QUERY_STRING": query,
+        "SERVER_SOFTWARE": "saltgoat",
+        "REMOTE_ADDR": "127.0.0.1",
+    }
+    begin = struct.pack("!HB5x", FCGI_RESPONDER, 0)
+    encoded = _encode_params(params)
+    return b"".join(
+        [
+            _record(FCGI_BEGIN_REQUEST, begin),
+            _record(FCGI_PARAMS, encoded),
+            _record(FCGI_PARAMS),
+            _record(FCGI_STDIN),
+        ]
+    )
+
+
+def _read_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise FastCGIError("connection closed mid-record")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def read_response(sock: socket.socket) -> Tuple[bytes, bytes]:
+    """Collect STDOUT/STDERR records until FCGI_END_REQUEST."""
+    stdout = bytearray()
+    stderr = bytearray()
+    while True:
+        version, record_type, _request_id, length, padding = HEADER.unpack(_read_exact(sock, HEADER.size))
+        if version != FCGI_VERSION:
+            raise FastCGIError(f"unexpected FastCGI version {version}")
+        content = _read_exact(sock, length) if length else b""
+        if padding:
+            _read_exact(sock, padding)
+        if record_type == FCGI_STDOUT:
+            stdout.extend(content)
+        elif record_type == FCGI_STDERR:
+            stderr.extend(content)
+        elif record_type == FCGI_END_REQUEST:
+            return bytes(stdout), bytes(stderr)
+        if len(stdout) + len(stderr) > MAX_RESPONSE_BYTES:
+            raise FastCGIError("status response too large")
+
+
+def split_response(raw: bytes) -> Tuple[int, bytes]:
+    """Split the CGI response into ``(status_code, body)``."""
+    head, sep, body = raw.partition(b"\r\n\r\n")
+    if not sep:
+        head, sep, body = raw.partition(b"\n\n")
+    status = 200
+    for line in head.decode("latin-1").splitlines():
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "status":
+            try:
+                status = int(value.strip().split()[0])
+            except (IndexError, ValueError):
+                pass
+    return status, body
+
+
+def parse_status(body: bytes) -> Dict[str, Any]:
+    try:
+        data = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise FastCGIError(f"invalid status JSON: {exc}") from exc
+    if not isinstance(data, dict):
+        raise FastCGIError("invalid status JSON")
+    return {target: data[source] for source, target in STATUS_FIELDS.items() if source in data}
+
+
+def fetch_status(listen: str, status_path: str = DEFAULT_STATUS_PATH, timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+    """Query one pool's status page and return the normalised counters."""
+    family, address = parse_listen(listen)
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            sock.sendall(build_request(status_path or DEFAULT_STATUS_PATH))
+            stdout, stderr = read_response(sock)
+    except OSError as exc:
+        raise FastCGIError(f"{listen}: {exc}") from exc
+    status, body = split_response(stdout)
+    if status != 200:
+        message = stderr.decode("utf-8", "replace").strip() or body.decode("utf-8", "replace").strip()
+        raise FastCGIError(f"{listen}: HTTP {status} {message}".rstrip())
+    return parse_status(body)
+
+
+def fetch_many(
+    pools: Dict[str, Tuple[str, Optional[str]]],
+    timeout: float = DEFAULT_TIMEOUT,
+    workers: int = 8,
+) -> Dict[str, Dict[str, Any]]:
+    """Query ``pool -> (listen, status_path)`` concurrently.
+
+    Pools whose status page cannot be read map to ``{"error": "..."}`` so the
+    caller can fall back to process counting for them.
+    """
+
+    def one(item: Tuple[str, Tuple[str, Optional[str]]]) -> Tuple[str, Dict[str, Any]]:
+        name, (listen, status_path) = item
+        try:
+            return name, fetch_status(listen, status_path or DEFAULT_STATUS_PATH, timeout)
+        except FastCGIError as exc:
+            return name, {"error": str(exc)}
+
+    if not pools:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pools)))) as pool:
+        return dict(pool.map(one, sorted(pools.items())))
@@ -0,0 +1,133 @@
+"""Memory-aware PHP-FPM capacity planning.
+
+Worker memory is measured as PSS from ``/proc/<pid>/smaps_rollup`` (shared
+opcache/library pages are split between the workers instead of being counted
+once per process as RSS does). The budget for PHP is what the workers already
+use plus ``MemAvailable``, minus the growth still reserved for MySQL, Valkey
+and OpenSearch and a safety headroom; it is shared between pools by their
+``magento_optimize`` pool weight.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+PROC_ROOT = Path("/proc")
+SAMPLE_LIMIT = 16
+MIN_CHILDREN = 4
+HEADROOM_RATIO = 0.05
+HEADROOM_MIN_BYTES = 512 * 1024 * 1024
+
+
+def read_pss(pid: int, proc_root: Path = PROC_ROOT) -> Optional[int]:
+    """Return the PSS of one process in bytes (None when it exited or is unreadable)."""
+    try:
+        with (proc_root / str(pid) / "smaps_rollup").open("r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def sample_pools(
+    workers: Dict[str, List[int]],
+    limit: int = SAMPLE_LIMIT,
+    proc_root: Path = PROC_ROOT,
+) -> Dict[str, Dict[str, int]]:
+    """Sample up to ``limit`` workers per pool and summarise their PSS."""
+    samples: Dict[str, Dict[str, int]] = {}
+    for pool, pids in workers.items():
+        values = [pss for pss in (read_pss(pid, proc_root) for pid in pids[:limit]) if pss]
+        if not values:
+            continue
+        average = sum(values) // len(values)
+        samples[pool] = {
+            "workers": len(pids),
+            "sampled": len(values),
+            "avg_pss": average,
+            "max_pss": max(values),
+            "total_pss": average * len(pids),
+        }
+    return samples
+
+
+def reservations(
+    mysql: Optional[Dict[str, Any]] = None,
+    valkey: Optional[Dict[str, Any]] = None,
+    opensearch: Optional[Dict[str, Any]] = None,
+) -> Dict[str, int]:
+    """Memory the services may still grow into (configured ceiling minus current use)."""
+
+    def gap(limit: Any, used: Any) -> int:
+        if not isinstance(limit, int) or limit <= 0:
+            return 0
+        return max(limit - (used if isinstance(used, int) else 0), 0)
+
+    mysql = mysql or {}
+    valkey = valkey or {}
+    opensearch = opensearch or {}
+    return {
+        "mysql": gap(mysql.get("innodb_buffer_pool_size"), mysql.get("innodb_buffer_pool_bytes_data")),
+        "valkey": gap(valkey.get("maxmemory"), valkey.get("used_memory")),
+        "opensearch": gap(opensearch.get("heap_max_in_bytes"), opensearch.get("heap_used_in_bytes")),
+    }
+
+
+def pool_weights(sites: Dict[str, Any]) -> Dict[str, int]:
+    """Map pool names to their ``php_pool.weight`` (pool naming follows core.php-fpm-pools)."""
+    weights: Dict[str, int] = {}
+    if not isinstance(sites, dict):
+        return weights
+    for site_id, site_cfg in sites.items():
+        pool_cfg = site_cfg.get("php_pool") if isinstance(site_cfg, dict) else None
+        if not isinstance(pool_cfg, dict):
+            continue
+        name = pool_cfg.get("name") or pool_cfg.get("pool_name") or f"magento-{site_id}"
+        try:
+            weights[str(name)] = max(1, int(pool_cfg.get("weight") or 1))
+        except (TypeError, ValueError):
+            weights[str(name)] = 1
+    return weights
+
+
+def plan(
+    pools: Iterable[str],
+    samples: Dict[str, Dict[str, int]],
+    weights: Dict[str, int],
+    mem_available: int,
+    mem_total: int,
+    reserved: Dict[str, int],
+    min_children: int = MIN_CHILDREN,
+    max_children: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Compute a memory-safe ``max_children`` for every pool with sampled workers."""
+    names = sorted(set(pools))
+    headroom = max(int(mem_total * HEADROOM_RATIO), HEADROOM_MIN_BYTES)
+    php_in_use = sum(samples.get(name, {}).get("total_pss", 0) for name in names)
+    budget = max(mem_available + php_in_use - sum(reserved.values()) - headroom, 0)
+    total_weight = sum(weights.get(name, 1) for name in names) or 1
+    result: Dict[str, Any] = {
+        "mem_available": mem_available,
+        "php_pss": php_in_use,
+        "reserved": dict(reserved),
+        "headroom": headroom,
+        "budget": budget,
+        "pools": {},
+    }
+    for name in names:
+        weight = weights.get(name, 1)
+        share = budget * weight // total_weight
+        entry: Dict[str, Any] = {"weight": weight, "share": share}
+        sample = samples.get(name)
+        if sample:
+            # 取采样中最大的 worker，避免 PSS 偏小的空闲进程拉低估算
+            per_worker = sample["max_pss"]
+            safe = max(share // per_worker, min_children)
+            if max_children:
+                safe = min(safe, max_children)
+            entry.update(sample)
+            entry["safe_max_children"] = int(safe)
+        result["pools"][name] = entry
+    return result
@@ -0,0 +1,293 @@
+"""In-process HTTP(S) probe engine shared by SaltGoat monitors.
+
+Probes reuse keep-alive connections per origin and capture the TLS certificate
+expiry from the same handshake that serves the HTTP request, so a site costs a
+single connection instead of an HTTP request plus a separate TLS check.
+"""
+from __future__ import annotations
+
+import http.client
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+USER_AGENT = "SaltGoatHealth/1.0"
+BODY_SNIPPET_BYTES = 256
+DRAIN_LIMIT_BYTES = 1024 * 1024
+MAX_REDIRECTS = 10
+MAX_IDLE_PER_ORIGIN = 4
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+DEADLINE_ERROR = "site sweep deadline exceeded"
+
+Origin = Tuple[str, str, int]
+
+
+class ConnectionPool:
+    """Thread-safe pool of idle keep-alive connections keyed by origin."""
+
+    def __init__(self, max_idle: int = MAX_IDLE_PER_ORIGIN) -> None:
+        self._idle: Dict[Origin, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._max_idle = max_idle
+        self._closed = False
+        self._context = ssl.create_default_context()
+
+    def checkout(self, origin: Origin, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return ``(connection, reused)`` for the origin."""
+        with self._lock:
+            bucket = self._idle.get(origin)
+            conn = bucket.pop() if bucket else None
+        if conn is not None and conn.sock is not None:
+            conn.sock.settimeout(timeout)
+            return conn, True
+        scheme, host, port = origin
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self._context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def checkin(self, origin: Origin, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            # 截止时间后被放弃的探测线程可能在 close() 之后才归还连接，此时直接关闭
+            bucket = None if self._closed else self._idle.setdefault(origin, [])
+            if bucket is not None and len(bucket) < self._max_idle:
+                bucket.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            buckets = list(self._idle.values())
+            self._idle = {}
+        for bucket in buckets:
+            for conn in bucket:
+                conn.close()
+
+
+def _origin(parsed: urllib.parse.ParseResult) -> Origin:
+    scheme = parsed.scheme.lower()
+    default_port = 443 if scheme == "https" else 80
+    return scheme, parsed.hostname or "", parsed.port or default_port
+
+
+def _request_target(parsed: urllib.parse.ParseResult) -> str:
+    target = parsed.path or "/"
+    if parsed.query:
+        target += "?" + parsed.query
+    return target
+
+
+def cert_days_remaining(cert: Optional[Dict[str, Any]]) -> Tuple[Optional[float], Optional[str]]:
+    """Convert a ``getpeercert()`` dict into days until expiry."""
+    if not cert or "notAfter" not in cert:
+        return None, "certificate missing expiry"
+    try:
+        expiry = datetime.strptime(cert["notAfter"], "%b %d %H:%M:%S %Y %Z").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None, "unable to parse certificate expiry"
+    return (expiry - datetime.now(timezone.utc)).total_seconds() / 86400, None
+
+
+def _drain(resp: http.client.HTTPResponse) -> bool:
+    """Consume the rest of the body so the connection can be reused."""
+    remaining = DRAIN_LIMIT_BYTES
+    while remaining > 0:
+        chunk = resp.read(min(65536, remaining))
+        if not chunk:
+            return True
+        remaining -= len(chunk)
+    return False
+
+
+def _fetch_once(
+    pool: ConnectionPool,
+    url: str,
+    headers: Dict[str, str],
+    timeout: float,
+    state: Dict[str, Any],
+    follow_redirects: bool = True,
+) -> Dict[str, Any]:
+    """Issue one GET (optionally following redirects) and return status/body/timings."""
+    result: Dict[str, Any] = {"status": None, "body": "", "headers": {}, "timings": {}}
+    start = time.monotonic()
+    current = url
+    for _ in range(MAX_REDIRECTS + 1):
+        parsed = urllib.parse.urlparse(current)
+        origin = _origin(parsed)
+        if origin[0] not in {"http", "https"} or not origin[1]:
+            raise urllib.error.URLError(f"unsupported url {current}")
+        conn, reused = pool.checkout(origin, timeout)
+        try:
+            if conn.sock is None:
+                connect_start = time.monotonic()
+                try:
+                    conn.connect()
+                except (OSError, ssl.SSLError) as exc:
+                    if origin[0] == "https" and current == url:
+                        state["tls_exc"] = exc
+                    raise urllib.error.URLError(exc) from exc
+                result["timings"].setdefault("connect", time.monotonic() - connect_start)
+            if origin[0] == "https" and current == url and "cert" not in state:
+                state["cert"] = conn.sock.getpeercert() if isinstance(conn.sock, ssl.SSLSocket) else None
+            request_start = time.monotonic()
+            try:
+                conn.request("GET", _request_target(parsed), headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # keep-alive 连接已被服务端关闭，换新连接重试一次
+                conn.close()
+                conn.connect()
+                conn.request("GET", _request_target(parsed), headers=headers)
+                resp = conn.getresponse()
+            result["timings"].setdefault("ttfb", time.monotonic() - request_start)
+            status = resp.status
+            location = resp.getheader("Location")
+            if follow_redirects and status in REDIRECT_CODES and location:
+                reusable = _drain(resp) and not resp.will_close
+                current = urllib.parse.urljoin(current, location)
+            else:
+                result["status"] = status
+                result["headers"] = {key.lower(): value for key, value in resp.getheaders()}
+                try:
+                    result["body"] = resp.read(BODY_SNIPPET_BYTES).decode("utf-8", errors="ignore")
+                except Exception:
+                    result["body"] = ""
+                reusable = _drain(resp) and not resp.will_close
+                current = ""
+        except BaseException:
+            conn.close()
+            raise
+        if reusable:
+            pool.checkin(origin, conn)
+        else:
+            conn.close()
+        if not current:
+            result["timings"]["total"] = time.monotonic() - start
+            return result
+    raise urllib.error.URLError("too many redirects")
+
+
+def probe(
+    url: str,
+    *,
+    timeout: float = 5.0,
+    expect: int = 200,
+    retries: int = 1,
+    headers: Optional[Dict[str, str]] = None,
+    deadline: Optional[float] = None,
+    pool: Optional[ConnectionPool] = None,
+    follow_redirects: bool = True,
+) -> Dict[str, Any]:
+    """Probe ``url`` up to ``retries`` times until it returns ``expect``.
+
+    Only transport errors and 5xx responses are retried; any other status is
+    final. ``follow_redirects=False`` reports 3xx responses as-is (like curl
+    without ``-L``). ``deadline`` is an absolute ``time.monotonic()`` value;
+    every attempt and retry sleep is clamped so the probe never outlives it.
+    """
+    owned_pool = pool is None
+    pool = pool or ConnectionPool()
+    request_headers = {"User-Agent": USER_AGENT, **(headers or {})}
+    state: Dict[str, Any] = {}
+    result: Dict[str, Any] = {"url": url, "status": None, "body": "", "error": None, "duration": 0.0}
+    retries = max(1, retries)
+    try:
+        for attempt in range(1, retries + 1):
+            attempt_timeout = timeout
+            if deadline is not None:
+                attempt_timeout = min(timeout, deadline - time.monotonic())
+                if attempt_timeout <= 0:
+                    result.update(status=None, body="", error=DEADLINE_ERROR)
+                    break
+            start = time.monotonic()
+            result.update(status=None, body="", error=None, headers={}, timings={})
+            try:
+                fetched = _fetch_once(pool, url, request_headers, attempt_timeout, state, follow_redirects)
+                result.update(fetched)
+            except Exception as exc:  # noqa: BLE001
+                result["error"] = str(exc)
+            result["duration"] = time.monotonic() - start
+            if result["error"] is None and result["status"] == expect:
+                result["success_attempt"] = attempt
+                break
+            if result["error"] is None and result["status"] < 500:
+                # 4xx/3xx 等确定性响应重试也不会变化，只重试传输错误与 5xx
+                break
+            if attempt < retries:
+                pause = min(2.0, timeout / 2)
+                if deadline is not None:
+                    pause = min(pause, max(0.0, deadline - time.monotonic()))
+                time.sleep(pause)
+    finally:
+        if owned_pool:
+            pool.close()
+    if urllib.parse.urlparse(url).scheme.lower() == "https":
+        if "cert" in state:
+            days, tls_error = cert_days_remaining(state["cert"])
+            result["tls_days"] = days
+            result["tls_error"] = tls_error
+        elif "tls_exc" in state:
+            result["tls_days"] = None
+            result["tls_error"] = f"TLS handshake failed: {state['tls_exc']}"
+    return result
+
+
+def probe_many(
+    targets: Iterable[Dict[str, Any]],
+    *,
+    workers: int = 8,
+    deadline: Optional[float] = None,
+    pool: Optional[ConnectionPool] = None,
+) -> List[Dict[str, Any]]:
+    """Probe targets concurrently and return results in input order.
+
+    Each target is a mapping of :func:`probe` keyword arguments plus ``url``.
+    ``deadline`` caps the whole sweep (seconds from now); targets still running
+    when it expires are reported with ``DEADLINE_ERROR``.
+    """
+    items = list(targets)
+    if not items:
+        return []
+    owned_pool = pool is None
+    pool = pool or ConnectionPool()
+    deadline_at = time.monotonic() + deadline if deadline is not None else None
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(items))))
+    try:
+        futures = [
+            executor.submit(
+                probe,
+                str(item["url"]),
+                timeout=float(item.get("timeout", 5.0)),
+                expect=int(item.get("expect", 200)),
+                retries=int(item.get("retries", 1)),
+                headers=item.get("headers"),
+                deadline=deadline_at,
+                pool=pool,
+                follow_redirects=bool(item.get("follow_redirects", True)),
+            )
+            for item in items
+        ]
+        wait_for = None if deadline_at is None else max(0.0, deadline_at - time.monotonic()) + 1.0
+        wait(futures, timeout=wait_for)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    results: List[Dict[str, Any]] = []
+    for item, future in zip(items, futures):
+        if future.done() and not future.cancelled() and future.exception() is None:
+            results.append(future.result())
+        else:
+            results.append(
+                {"url": str(item["url"]), "status": None, "body": "", "error": DEADLINE_ERROR, "duration": 0.0}
+            )
+    if owned_pool:
+        pool.close()
+    return results
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Bounded local time-series store for SaltGoat monitoring samples.
+
+Samples are flat ``{metric: value}`` mappings written to a SQLite database in
+WAL mode. Raw points are kept for a short window while hourly and daily
+rollups (count/sum/min/max) keep longer trends; everything older than the
+retention windows is pruned so the file stays bounded.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+DEFAULT_DB = Path("/var/lib/saltgoat/metrics/history.sqlite")
+RAW_RETENTION = 2 * 86400
+ROLLUPS = {3600: 30 * 86400, 86400: 400 * 86400}
+PRUNE_INTERVAL = 3600
+SCHEMA_VERSION = 1
+
+_CONNECTIONS: Dict[str, sqlite3.Connection] = {}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_metric_ts ON samples (metric, ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (resolution, metric, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_ROLLUP_COMPACT = """
+INSERT INTO rollups (resolution, bucket, metric, count, sum, min, max)
+SELECT ?, ts - ts % ?, metric, COUNT(*), SUM(value), MIN(value), MAX(value)
+FROM samples WHERE ts >= ? AND ts < ?
+GROUP BY 2, 3
+ON CONFLICT (resolution, metric, bucket) DO UPDATE SET
+    count = count + excluded.count,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max)
+"""
+
+
+def db_path() -> Path:
+    """Return the history database path, honoring SALTGOAT_METRICS_DB."""
+    override = os.environ.get("SALTGOAT_METRICS_DB")
+    return Path(override) if override else DEFAULT_DB
+
+
+def connect(path: Optional[Path] = None) -> sqlite3.Connection:
+    """Return a cached connection for ``path``.
+
+    Connections stay open for the life of the process: closing the last WAL
+    connection forces a checkpoint, which would dominate the per-sample cost.
+    """
+    target = path or db_path()
+    cached = _CONNECTIONS.get(str(target))
+    if cached is not None:
+        return cached
+    target.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(target), timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # WAL 模式持久化在库文件中，只需在建库时设置一次
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    _CONNECTIONS[str(target)] = conn
+    return conn
+
+
+def close_all() -> None:
+    while _CONNECTIONS:
+        _, conn = _CONNECTIONS.popitem()
+        conn.close()
+
+
+def _numeric_items(metrics: Mapping[str, Any]) -> List[tuple]:
+    items = []
+    for key, value in metrics.items():
+        if isinstance(value, bool):
+            value = 1.0 if value else 0.0
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            continue
+        items.append((str(key), float(value)))
+    return items
+
+
+def _meta_int(conn: sqlite3.Connection, key: str) -> Optional[int]:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return int(row[0]) if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: int) -> None:
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def _compact(conn: sqlite3.Connection, now: int) -> None:
+    """Fold completed hours of raw samples into rollups, then prune."""
+    upto = now - now % 3600
+    for resolution in ROLLUPS:
+        key = f"rolled_{resolution}"
+        rolled = _meta_int(conn, key) or 0
+        if upto > rolled:
+            conn.execute(_ROLLUP_COMPACT, (resolution, resolution, rolled, upto))
+            _set_meta(conn, key, upto)
+    conn.execute("DELETE FROM samples WHERE ts < ?", (now - RAW_RETENTION,))
+    for resolution, retention in ROLLUPS.items():
+        conn.execute(
+            "DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+            (resolution, now - retention),
+        )
+    _set_meta(conn, "last_prune", now)
+
+
+def record(metrics: Mapping[str, Any], ts: Optional[float] = None, path: Optional[Path] = None) -> int:
+    """Append one sample; returns the number of metrics stored.
+
+    The hot path is a single batched INSERT; rollups and pruning run at most
+    once per ``PRUNE_INTERVAL``.
+    """
+    items = _numeric_items(metrics)
+    if not items:
+        return 0
+    now = int(ts if ts is not None else time.time())
+    conn = connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO samples (ts, metric, value) VALUES (?, ?, ?)",
+            [(now, key, value) for key, value in items],
+        )
+        last_prune = _meta_int(conn, "last_prune")
+        if last_prune is None or now - last_prune >= PRUNE_INTERVAL:
+            _compact(conn, now)
+    return len(items)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[int(rank)]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def series(metric: str, since: float, path: Optional[Path] = None) -> List[tuple]:
+    """Return raw ``(ts, value)`` points for ``metric`` newer than ``since``."""
+    target = path or db_path()
+    if not target.exists():
+        return []
+    return connect(target).execute(
+        "SELECT ts, value FROM samples WHERE metric = ? AND ts >= ? ORDER BY ts",
+        (metric, int(since)),
+    ).fetchall()
+
+
+def summarize(
+    metrics: Optional[Iterable[str]] = None,
+    hours: float = 24,
+    path: Optional[Path] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Summarise metrics over the last ``hours``.
+
+    Windows within the raw retention report percentiles; longer windows fall
+    back to hourly/daily rollups (count/avg/min/max only).
+    """
+    target = path or db_path()
+    if not target.exists():
+        return {}
+    since = int(time.time() - hours * 3600)
+    wanted = list(metrics) if metrics else None
+    conn = connect(target)
+    result: Dict[str, Dict[str, Any]] = {}
+    if hours * 3600 <= RAW_RETENTION:
+        query = "SELECT metric, ts, value FROM samples WHERE ts >= ?"
+        params: List[Any] = [since]
+        if wanted:
+            query += f" AND metric IN ({','.join('?' * len(wanted))})"
+            params.extend(wanted)
+        grouped: Dict[str, List[float]] = {}
+        last: Dict[str, float] = {}
+        for metric, _ts, value in conn.execute(query + " ORDER BY ts", params):
+            grouped.setdefault(metric, []).append(value)
+            last[metric] = value
+        for metric, values in grouped.items():
+            result[metric] = {
+                "count": len(values),
+                "min": min(values),
+                "max": max(values),
+                "avg": sum(values) / len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "last": last[metric],
+            }
+        return result
+    resolution = 3600 if hours * 3600 <= ROLLUPS[3600] else 86400
+    rolled = _meta_int(conn, f"rolled_{resolution}") or 0
+    filter_sql = f" AND metric IN ({','.join('?' * len(wanted))})" if wanted else ""
+    rollup_query = (
+        "SELECT metric, SUM(count), SUM(sum), MIN(min), MAX(max) FROM rollups "
+        "WHERE resolution = ? AND bucket >= ?" + filter_sql + " GROUP BY metric"
+    )
+    # 尚未折叠进 rollup 的最近样本直接从原始表补齐
+    tail_query = (
+        "SELECT metric, COUNT(*), SUM(value), MIN(value), MAX(value) FROM samples "
+        "WHERE ts >= ?" + filter_sql + " GROUP BY metric"
+    )
+    rows = list(conn.execute(rollup_query, [resolution, since - since % resolution, *(wanted or [])]))
+    rows += list(conn.execute(tail_query, [max(rolled, since), *(wanted or [])]))
+    for metric, count, total, low, high in rows:
+        entry = result.setdefault(metric, {"count": 0, "sum": 0.0, "min": low, "max": high})
+        entry["count"] += count
+        entry["sum"] += total
+        entry["min"] = min(entry["min"], low)
+        entry["max"] = max(entry["max"], high)
+    for entry in result.values():
+        entry["avg"] = entry.pop("sum") / entry["count"] if entry["count"] else None
+    return result
+
+
+def format_summary(summary: Mapping[str, Mapping[str, Any]]) -> List[str]:
+    lines = []
+    for metric in sorted(summary):
+        stats = summary[metric]
+        parts = [f"avg={stats['avg']:.2f}"]
+        if stats.get("p95") is not None:
+            parts.append(f"p95={stats['p95']:.2f}")
+        parts.append(f"max={stats['max']:.2f}")
+        lines.append(f"{metric}: {' '.join(parts)} (n={stats['count']})")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SaltGoat metrics history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_cmd = sub.add_parser("summary", help="显示指标趋势与分位数")
+    summary_cmd.add_argument("--hours", type=float, default=24)
+    summary_cmd.add_argument("--metric", action="append", help="仅显示指定指标，可重复")
+    summary_cmd.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        data = summarize(args.metric, hours=args.hours)
+        if args.json:
+            print(json.dumps(data, ensure_ascii=False, indent=2))
+        elif data:
+            print("\n".join(format_summary(data)))
+        else:
+            print("No metrics history recorded.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
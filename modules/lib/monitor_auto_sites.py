@@ -14,16 +14,13 @@ from collections import OrderedDict
 from pathlib import Path
 from typing import Iterable, List, Tuple
 
-try:
-    import yaml  # type: ignore
-except ImportError as exc:  # pragma: no cover
-    raise SystemExit(f"[monitor_auto_sites] Missing dependency: {exc}")
-
 REPO_ROOT = Path(__file__).resolve().parents[2]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from modules.lib import nginx_context  # type: ignore
+from modules.lib import nginx_index  # type: ignore
+from modules.lib import pillar_cache  # type: ignore
 
 DEFAULT_NGINX_PILLAR = Path(os.environ.get("SALTGOAT_NGINX_PILLAR", "salt/pillar/nginx.sls"))
 
@@ -57,7 +54,7 @@ def load_existing(path: Path, skip_salt_call: bool) -> OrderedDict:
     if not path.exists():
         return OrderedDict()
     try:
-        data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+        data = pillar_cache.load(path) or {}
     except Exception:
         return OrderedDict()
     return to_ordered(data)
@@ -81,33 +78,24 @@ def detect_sites(site_root: Path, nginx_dir: Path, pillar_file: Path = DEFAULT_N
     if not sites:
         return []
 
-    if nginx_dir.exists():
-        for conf in nginx_dir.glob("*"):
-            try:
-                text = conf.read_text(encoding="utf-8")
-            except Exception:
-                continue
-            https = bool(re.search(r"listen\s+[^;]*443", text))
-            server_names: List[str] = []
-            for match in re.findall(r"server_name\s+([^;]+);", text):
-                for token in match.split():
-                    token = token.strip()
-                    if token and token != "_":
-                        server_names.append(token)
-            for site in sites:
-                root = site["root"].rstrip("/")
-                parent = str(Path(root).parent).rstrip("/")
-                if root not in text and parent not in text:
-                    continue
-                if "url" not in site and server_names:
-                    domain = server_names[0].lstrip("*.")
-                    scheme = "https" if https else "http"
-                    site["url"] = f"{scheme}://{domain}/"
+    # 一次扫描 sites-enabled + sites-available，之后按 root / 文件名查表
+    index = nginx_index.load([nginx_dir, nginx_context.SITES_AVAILABLE])
+    enabled_prefix = os.path.join(os.path.abspath(str(nginx_dir)), "")
+    for site in sites:
+        root = site["root"].rstrip("/")
+        for candidate in (root, str(Path(root).parent)):
+            servers = [server for server in index.by_root(candidate) if server["file"].startswith(enabled_prefix)]
+            info = index.site_info(servers)
+            if info["server_names"]:
+                domain = info["server_names"][0].lstrip("*.")
+                scheme = "https" if info["https"] else "http"
+                site["url"] = f"{scheme}://{domain}/"
+                break
     pillar_exists = pillar_file.exists()
     for site in sites:
         if pillar_exists:
             try:
-                meta = nginx_context.get_site_metadata(site["name"], pillar_file)
+                meta = nginx_context.get_site_metadata(site["name"], pillar_file, index)
             except Exception:
                 meta = {}
             else:
@@ -0,0 +1,239 @@
+"""Helpers for SaltGoat's resident monitoring daemons.
+
+``SnapshotServer`` publishes the latest evaluation as JSON over a local Unix
+socket and ``fetch_snapshot`` reads it back, so ``monitor quick-check`` and
+``doctor`` can reuse the daemon's result instead of collecting everything
+again. ``FileWatcher`` waits for configuration changes via inotify (through
+libc, no extra dependency) and falls back to mtime polling elsewhere.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import socket
+import socketserver
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SOCKET_PATH = Path(os.environ.get("SALTGOAT_MONITOR_SOCKET", "/run/saltgoat/resource-alert.sock"))
+WATCH_SUFFIXES = (".sls", ".conf", ".yml", ".yaml", ".json", ".service")
+POLL_INTERVAL = 5.0
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_WATCH_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _SnapshotHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        self.request.sendall(self.server.snapshot_bytes())  # type: ignore[attr-defined]
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, _SnapshotHandler)
+        self._lock = threading.Lock()
+        self._payload = b"{}"
+
+    def snapshot_bytes(self) -> bytes:
+        with self._lock:
+            return self._payload
+
+    def publish(self, payload: bytes) -> None:
+        with self._lock:
+            self._payload = payload
+
+
+class SnapshotServer:
+    """Serve the latest snapshot to every client that connects."""
+
+    def __init__(self, path: Optional[Path] = None, mode: int = 0o660) -> None:
+        self.path = Path(path or SOCKET_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.is_socket():
+            self.path.unlink()
+        self._server = _Server(str(self.path))
+        os.chmod(self.path, mode)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="saltgoat-snapshot", daemon=True)
+
+    def start(self) -> "SnapshotServer":
+        self._thread.start()
+        return self
+
+    def update(self, snapshot: Dict[str, Any]) -> None:
+        self._server.publish(json.dumps(snapshot, ensure_ascii=False, default=str).encode("utf-8"))
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+def fetch_snapshot(
+    path: Optional[Path] = None,
+    timeout: float = 1.0,
+    max_age: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """Return the daemon's latest snapshot, or ``None`` if unavailable/stale."""
+    target = Path(path or SOCKET_PATH)
+    chunks: List[bytes] = []
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(target))
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        snapshot = json.loads(b"".join(chunks) or b"{}")
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or "generated_at" not in snapshot:
+        return None
+    if max_age is not None:
+        try:
+            if time.time() - float(snapshot["generated_at"]) > max_age:
+                return None
+        except (TypeError, ValueError):
+            return None
+    return snapshot
+
+
+def _load_libc() -> Any:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1  # noqa: B018 - 仅确认符号存在
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """Wait for changes below a set of directories (one level of subdirectories)."""
+
+    def __init__(self, paths: Iterable[Path], suffixes: Tuple[str, ...] = WATCH_SUFFIXES) -> None:
+        self.suffixes = suffixes
+        self.dirs: List[Path] = []
+        for path in paths:
+            path = Path(path)
+            if not path.is_dir():
+                continue
+            self.dirs.append(path)
+            try:
+                self.dirs.extend(child for child in sorted(path.iterdir()) if child.is_dir())
+            except OSError:
+                continue
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        self._fd: Optional[int] = None
+        libc = _load_libc()
+        if libc is not None and self.dirs:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                watched = sum(
+                    1 for path in self.dirs if libc.inotify_add_watch(fd, os.fsencode(str(path)), _IN_WATCH_MASK) >= 0
+                )
+                if watched:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        self._signature = None if self._fd is not None else self._scan()
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+    def _scan(self) -> Dict[str, int]:
+        signature: Dict[str, int] = {}
+        for path in self.dirs:
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.endswith(self.suffixes):
+                    try:
+                        signature[entry.path] = entry.stat().st_mtime_ns
+                    except OSError:
+                        continue
+        return signature
+
+    def _drain_inotify(self) -> bool:
+        relevant = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)  # type: ignore[arg-type]
+            except BlockingIOError:
+                return relevant
+            if not data:
+                return relevant
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0").decode("utf-8", errors="ignore")
+                offset += length
+                if name.endswith(self.suffixes):
+                    relevant = True
+
+    def wake(self) -> None:
+        """Interrupt a pending :meth:`wait` (safe to call from signal handlers)."""
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            pass
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds; True when watched files changed."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            fds = [self._wake_r] + ([self._fd] if self._fd is not None else [])
+            # 无 inotify 时每 POLL_INTERVAL 秒扫描一次 mtime
+            ready, _, _ = select.select(fds, [], [], remaining if self._fd is not None else min(remaining, POLL_INTERVAL))
+            if self._wake_r in ready:
+                os.read(self._wake_r, 4096)
+                return False
+            if self._fd is not None:
+                if self._fd in ready and self._drain_inotify():
+                    return True
+                continue
+            current = self._scan()
+            if current != self._signature:
+                self._signature = current
+                return True
+        if self._fd is None:
+            current = self._scan()
+            if current != self._signature:
+                self._signature = current
+                return True
+        return False
+
+    def close(self) -> None:
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._fd = None
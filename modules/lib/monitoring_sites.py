@@ -15,6 +15,12 @@ except ImportError as exc:  # pragma: no cover
     sys.stderr.write(f"[monitoring_sites] Missing dependency: {exc}\n")
     sys.exit(1)
 
+if __package__ in (None, ""):
+    sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2]))
+    from modules.lib import pillar_cache  # type: ignore
+else:
+    from . import pillar_cache
+
 
 @dataclass
 class SiteEntry:
@@ -40,13 +46,7 @@ class SiteEntry:
 
 
 def _load_yaml(path: pathlib.Path) -> dict:
-    if not path.exists():
-        return {}
-    with path.open(encoding="utf-8") as fh:
-        data = yaml.safe_load(fh) or {}
-    if not isinstance(data, dict):
-        return {}
-    return data
+    return pillar_cache.load_dict(path)
 
 
 def _dump_yaml(path: pathlib.Path, data: dict) -> None:
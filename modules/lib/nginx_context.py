@@ -11,24 +11,19 @@ import re
 import sys
 from typing import Dict, Iterable, List
 
-try:
-    import yaml  # type: ignore
-except ImportError as exc:  # pragma: no cover
-    sys.stderr.write(f"[nginx_context] Missing dependency: {exc}\n")
-    sys.exit(1)
+if __package__ in (None, ""):
+    sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2]))
+    from modules.lib import nginx_index  # type: ignore
+    from modules.lib import pillar_cache  # type: ignore
+else:
+    from . import nginx_index, pillar_cache
 
 SITES_AVAILABLE = pathlib.Path(os.environ.get("SALTGOAT_SITES_AVAILABLE", "/etc/nginx/sites-available"))
 PHP_BASE_DIR = pathlib.Path(os.environ.get("SALTGOAT_PHP_BASE", "/etc/php"))
 
 
 def _load_yaml(path: pathlib.Path) -> dict:
-    if not path.exists():
-        return {}
-    with path.open(encoding="utf-8") as fh:
-        data = yaml.safe_load(fh) or {}
-    if not isinstance(data, dict):
-        return {}
-    return data
+    return pillar_cache.load_dict(path)
 
 
 def _server_names_from_config(data: str) -> List[str]:
@@ -118,20 +113,10 @@ def _discover_sites_from_pillar(pillar_path: pathlib.Path, root: str, current_si
 
 
 def _discover_sites_from_configs(root: str, current_site: str) -> List[str]:
-    results: set[str] = set()
     if not SITES_AVAILABLE.exists():
         return []
-    pattern = re.compile(r"set\s+\$MAGE_ROOT\s+([^;]+);", re.IGNORECASE)
-    for entry in SITES_AVAILABLE.iterdir():
-        if not entry.is_file():
-            continue
-        try:
-            data = entry.read_text(encoding="utf-8")
-        except Exception:
-            continue
-        match = pattern.search(data)
-        if match and match.group(1).strip().strip("\"'") == root:
-            results.add(entry.name)
+    index = nginx_index.load([SITES_AVAILABLE])
+    results = {server["name"] for server in index.by_mage_root(root)}
     results.discard(current_site)
     return sorted(results)
 
@@ -196,15 +181,27 @@ def _collect_run_context_from_snippet(snippet_path: pathlib.Path) -> List[str]:
 RUNTIME_POOLS_PATH = pathlib.Path("/etc/saltgoat/runtime/php-fpm-pools.json")
 
 
+_RUNTIME_POOLS_MEMO: Dict[str, tuple] = {}
+
+
 def _load_runtime_pools() -> list[dict]:
+    # 批量获取站点元数据时每个站点都会调用：按 mtime 复用解析结果
+    try:
+        info = RUNTIME_POOLS_PATH.stat()
+    except OSError:
+        return []
+    key = (str(RUNTIME_POOLS_PATH), info.st_mtime_ns, info.st_size)
+    cached = _RUNTIME_POOLS_MEMO.get(key[0])
+    if cached is not None and cached[0] == key:
+        return cached[1]
     try:
         data = json.loads(RUNTIME_POOLS_PATH.read_text(encoding="utf-8"))
     except (FileNotFoundError, json.JSONDecodeError, PermissionError):
         return []
     pools = data.get("pools") if isinstance(data, dict) else None
-    if isinstance(pools, list):
-        return [p for p in pools if isinstance(p, dict)]
-    return []
+    result = [p for p in pools if isinstance(p, dict)] if isinstance(pools, list) else []
+    _RUNTIME_POOLS_MEMO[key[0]] = (key, result)
+    return result
 
 
 def _normalize_fastcgi_socket(value: str) -> str:
@@ -355,17 +352,29 @@ def cmd_ensure_run_context(args: argparse.Namespace) -> None:
         config_path.write_text(new_data, encoding="utf-8")
 
 
-def get_site_metadata(site: str, pillar_path: pathlib.Path) -> dict:
-    path, data = _read_site_config(site)
+def get_site_metadata(site: str, pillar_path: pathlib.Path, index: "nginx_index.NginxIndex | None" = None) -> dict:
+    """Site metadata; pass a prebuilt ``index`` to avoid re-reading the vhost config per site."""
+    servers = index.by_file(site) if index is not None else []
     default_root = f"/var/www/{site}"
-    root = _extract_root(data, default_root)
-    server_names = _server_names_from_config(data)
-    https_enabled = bool(re.search(r"listen\s+[^;]*443", data, re.IGNORECASE)) if data else False
+    if servers:
+        info = index.site_info(servers)
+        path = pathlib.Path(servers[0]["file"])
+        exists = True
+        roots = [server.get("mage_root") or server["roots"][0] for server in servers if server["roots"]]
+        root = roots[0] if roots else default_root
+        server_names = info["server_names"]
+        https_enabled = info["https"]
+    else:
+        path, data = _read_site_config(site)
+        exists = bool(data)
+        root = _extract_root(data, default_root)
+        server_names = _server_names_from_config(data)
+        https_enabled = bool(re.search(r"listen\s+[^;]*443", data, re.IGNORECASE)) if data else False
     snippet = pathlib.Path(f"/etc/nginx/snippets/varnish-frontend-{site}.conf")
     metadata: Dict[str, object] = {
         "site": site,
         "config_path": str(path),
-        "exists": bool(data),
+        "exists": exists,
         "root": root,
         "server_names": server_names,
         "https_enabled": https_enabled,
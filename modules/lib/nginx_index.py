@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Single-pass index of nginx vhost configs.
+
+``load`` scans the given directories once, follows ``include`` directives and
+records every ``server`` block: server_names, listen/https, roots (``root`` and
+``set $MAGE_ROOT``), fastcgi upstream sockets and includes. Lookups by root or
+config file name are then dictionary hits instead of substring scans over all
+config text.
+
+The index is memoised in-process and persisted as JSON; both are keyed by the
+mtimes of the scanned directories plus the stat of every file that was read, so
+validating a cached index costs a handful of ``stat`` calls and no reads.
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import stat
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+INDEX_VERSION = 1
+NGINX_PREFIX = Path(os.environ.get("SALTGOAT_NGINX_PREFIX", "/etc/nginx"))
+DEFAULT_DIRS = (
+    Path(os.environ.get("SALTGOAT_NGINX_DIR", "/etc/nginx/sites-enabled")),
+    Path(os.environ.get("SALTGOAT_SITES_AVAILABLE", "/etc/nginx/sites-available")),
+)
+DEFAULT_CACHE_DIR = Path("/var/cache/saltgoat/nginx")
+MAX_INCLUDE_DEPTH = 8
+
+_STATEMENT_RE = re.compile(r"([^;{}]*)([;{}])")
+_COMMENT_RE = re.compile(r"#[^\n]*")
+_MEMO: Dict[Tuple[str, ...], Tuple[List[List[Any]], "NginxIndex"]] = {}
+_LOCK = threading.Lock()
+
+
+def _normalize_root(value: str) -> str:
+    return value.strip().strip("\"'").rstrip("/") or "/"
+
+
+def _statements(text: str) -> List[Tuple[str, List[str]]]:
+    """``(terminator, tokens)`` for every statement/block in ``text``."""
+    result: List[Tuple[str, List[str]]] = []
+    for match in _STATEMENT_RE.finditer(_COMMENT_RE.sub("", text)):
+        tokens = [token.strip("\"'") for token in match.group(1).split()]
+        result.append((match.group(2), tokens))
+    return result
+
+
+class NginxIndex:
+    """Server blocks found in an nginx config tree, with lookup tables."""
+
+    def __init__(self, servers: List[Dict[str, Any]], upstreams: Dict[str, List[str]]) -> None:
+        self.servers = servers
+        self.upstreams = upstreams
+        self._by_root: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_file: Dict[str, List[Dict[str, Any]]] = {}
+        for server in servers:
+            for root in server["roots"]:
+                self._by_root.setdefault(root, []).append(server)
+            self._by_file.setdefault(server["name"], []).append(server)
+
+    def by_root(self, root: str) -> List[Dict[str, Any]]:
+        return list(self._by_root.get(_normalize_root(root), []))
+
+    def by_file(self, name: str) -> List[Dict[str, Any]]:
+        return list(self._by_file.get(name, []))
+
+    def by_mage_root(self, root: str) -> List[Dict[str, Any]]:
+        wanted = _normalize_root(root)
+        return [server for server in self.by_root(wanted) if server.get("mage_root") == wanted]
+
+    def site_info(self, servers: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge server blocks of one site: names in order, https if any block of its files listens on 443."""
+        names: List[str] = []
+        files = {server["file"] for server in servers}
+        for server in servers:
+            for name in server["server_names"]:
+                if name not in names:
+                    names.append(name)
+        https = any(server["https"] for server in self.servers if server["file"] in files)
+        return {"server_names": names, "https": https}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"servers": self.servers, "upstreams": self.upstreams}
+
+
+class _Builder:
+    def __init__(self) -> None:
+        self.signature: Dict[str, List[Any]] = {}
+        self.parsed: Dict[str, List[Tuple[str, List[str]]]] = {}
+        self.servers: List[Dict[str, Any]] = []
+        self.upstreams: Dict[str, List[str]] = {}
+
+    def _track(self, path: str) -> Optional[os.stat_result]:
+        try:
+            info = os.stat(path)
+        except OSError:
+            self.signature[path] = [path, -1, -1]
+            return None
+        self.signature[path] = [path, info.st_mtime_ns, info.st_size]
+        return info
+
+    def _parse(self, path: str) -> List[Tuple[str, List[str]]]:
+        if path not in self.parsed:
+            info = self._track(path)
+            statements: List[Tuple[str, List[str]]] = []
+            if info is not None and stat.S_ISREG(info.st_mode):
+                try:
+                    with open(path, encoding="utf-8", errors="replace") as fh:
+                        statements = _statements(fh.read())
+                except OSError:
+                    statements = []
+            self.parsed[path] = statements
+        return self.parsed[path]
+
+    def _resolve_include(self, pattern: str, server: Optional[Dict[str, Any]]) -> List[str]:
+        if "$" in pattern and server and server.get("mage_root"):
+            pattern = pattern.replace("$MAGE_ROOT", server["mage_root"])
+        if "$" in pattern:
+            return []
+        if not os.path.isabs(pattern):
+            pattern = str(NGINX_PREFIX / pattern)
+        if glob.has_magic(pattern):
+            # 目录 mtime 变化 = glob 匹配集合可能变化
+            self._track(os.path.dirname(pattern))
+            return sorted(glob.glob(pattern))
+        return [pattern]
+
+    def walk(self, path: str, origin: str, stack: List[Any], depth: int = 0) -> None:
+        """Record server/upstream blocks of ``path``; ``origin`` is the top-level vhost file."""
+        for terminator, tokens in self._parse(path):
+            server = next((item for item in reversed(stack) if isinstance(item, dict)), None)
+            upstream = next((item for item in reversed(stack) if isinstance(item, tuple)), None)
+            if terminator == "{":
+                if tokens[:1] == ["server"] and upstream is None:
+                    server = {
+                        "file": origin,
+                        "name": os.path.basename(origin),
+                        "server_names": [],
+                        "listen": [],
+                        "https": False,
+                        "roots": [],
+                        "mage_root": None,
+                        "fastcgi": [],
+                        "includes": [],
+                    }
+                    self.servers.append(server)
+                    stack.append(server)
+                elif tokens[:1] == ["upstream"] and len(tokens) > 1:
+                    self.upstreams.setdefault(tokens[1], [])
+                    stack.append(("upstream", tokens[1]))
+                else:
+                    stack.append(tokens[0] if tokens else "")
+                continue
+            if terminator == "}":
+                if stack:
+                    stack.pop()
+                continue
+            if not tokens:
+                continue
+            directive, args = tokens[0], tokens[1:]
+            if upstream is not None:
+                if directive == "server" and args:
+                    self.upstreams[upstream[1]].append(args[0])
+            elif directive == "include" and args:
+                if server is not None:
+                    server["includes"].append(args[0])
+                if depth < MAX_INCLUDE_DEPTH:
+                    for target in self._resolve_include(args[0], server):
+                        self.walk(target, origin, stack, depth + 1)
+            elif server is None:
+                continue
+            elif directive == "server_name":
+                for name in args:
+                    if name and name != "_" and name not in server["server_names"]:
+                        server["server_names"].append(name)
+            elif directive == "listen" and args:
+                server["listen"].append(" ".join(args))
+                if "443" in args[0] or "ssl" in args[1:]:
+                    server["https"] = True
+            elif directive == "set" and len(args) > 1 and args[0] == "$MAGE_ROOT":
+                server["mage_root"] = _normalize_root(args[1])
+                self._add_root(server, args[1])
+            elif directive == "root" and args:
+                value = args[0]
+                if server.get("mage_root"):
+                    value = value.replace("$MAGE_ROOT", server["mage_root"])
+                if "$" not in value:
+                    self._add_root(server, value)
+            elif directive == "fastcgi_pass" and args:
+                server["fastcgi"].append(args[0])
+
+    @staticmethod
+    def _add_root(server: Dict[str, Any], value: str) -> None:
+        root = _normalize_root(value)
+        candidates = [root]
+        if root.endswith("/pub"):
+            candidates.append(root[: -len("/pub")])
+        for candidate in candidates:
+            if candidate not in server["roots"]:
+                server["roots"].append(candidate)
+
+    def finish(self) -> NginxIndex:
+        for server in self.servers:
+            resolved: List[str] = []
+            for target in server["fastcgi"]:
+                for member in self.upstreams.get(target, [target]):
+                    if member not in resolved:
+                        resolved.append(member)
+            server["fastcgi"] = resolved
+        return NginxIndex(self.servers, self.upstreams)
+
+
+def build(directories: Iterable[Path] = DEFAULT_DIRS) -> Tuple[NginxIndex, List[List[Any]]]:
+    """Scan ``directories`` (files in name order) and return the index and its stat signature."""
+    builder = _Builder()
+    seen: set = set()
+    for directory in directories:
+        dir_path = str(directory)
+        info = builder._track(dir_path)
+        if info is None or not stat.S_ISDIR(info.st_mode):
+            continue
+        for entry in sorted(os.scandir(dir_path), key=lambda item: item.name):
+            real = os.path.realpath(entry.path)
+            # sites-enabled 通常是指向 sites-available 的符号链接，只索引一次
+            if real in seen or not entry.is_file():
+                continue
+            seen.add(real)
+            builder.walk(entry.path, entry.path, [])
+    return builder.finish(), sorted(builder.signature.values())
+
+
+def _signature_valid(signature: Sequence[Sequence[Any]]) -> bool:
+    for path, mtime, size in signature:
+        try:
+            info = os.stat(path)
+        except OSError:
+            if mtime != -1:
+                return False
+            continue
+        if [info.st_mtime_ns, info.st_size] != [mtime, size]:
+            return False
+    return True
+
+
+def cache_dir() -> Optional[Path]:
+    """Persistent cache directory, or ``None`` when disabled via SALTGOAT_NGINX_INDEX_CACHE=0."""
+    setting = os.environ.get("SALTGOAT_NGINX_INDEX_CACHE", "")
+    if setting in {"0", "false", "False"}:
+        return None
+    if setting:
+        return Path(setting)
+    if os.geteuid() == 0:
+        return DEFAULT_CACHE_DIR
+    try:
+        return Path.home() / ".cache" / "saltgoat" / "nginx"
+    except Exception:
+        return None
+
+
+def _cache_file(key: Tuple[str, ...]) -> Optional[Path]:
+    directory = cache_dir()
+    if directory is None:
+        return None
+    digest = hashlib.sha1("\0".join(key).encode("utf-8")).hexdigest()
+    return directory / f"index-{digest}.json"
+
+
+def _read_cache(key: Tuple[str, ...]) -> Optional[Tuple[List[List[Any]], NginxIndex]]:
+    path = _cache_file(key)
+    if path is None:
+        return None
+    try:
+        info = path.stat()
+        if info.st_uid != os.geteuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION or data.get("key") != list(key):
+        return None
+    signature = data.get("signature") or []
+    if not _signature_valid(signature):
+        return None
+    return signature, NginxIndex(data.get("servers") or [], data.get("upstreams") or {})
+
+
+def _write_cache(key: Tuple[str, ...], signature: List[List[Any]], index: NginxIndex) -> None:
+    path = _cache_file(key)
+    if path is None:
+        return
+    payload = dict(index.to_dict(), version=INDEX_VERSION, key=list(key), signature=signature)
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".index-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(payload, fh, separators=(",", ":"))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except Exception:
+        pass
+
+
+def load(directories: Optional[Iterable[Path]] = None) -> NginxIndex:
+    """Index for ``directories`` (default: sites-enabled + sites-available), rebuilt only when configs change."""
+    key = tuple(os.path.abspath(str(item)) for item in (directories if directories is not None else DEFAULT_DIRS))
+    with _LOCK:
+        cached = _MEMO.get(key)
+    if cached is not None and _signature_valid(cached[0]):
+        return cached[1]
+    cached = _read_cache(key)
+    if cached is None:
+        index, signature = build(Path(item) for item in key)
+        _write_cache(key, signature, index)
+        cached = (signature, index)
+    with _LOCK:
+        _MEMO[key] = cached
+    return cached[1]
+
+
+def clear() -> None:
+    """Drop the in-process memo."""
+    with _LOCK:
+        _MEMO.clear()
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Dump the SaltGoat nginx config index")
+    parser.add_argument("--dir", action="append", type=Path, help="config directory (repeatable)")
+    parser.add_argument("--root", help="only show server blocks serving this root")
+    args = parser.parse_args(list(argv) if argv is not None else None)
+    index = load(args.dir)
+    servers = index.by_root(args.root) if args.root else index.servers
+    json.dump({"servers": servers, "upstreams": index.upstreams}, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
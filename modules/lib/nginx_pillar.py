@@ -20,19 +20,25 @@ try:
 except ImportError:  # pragma: no cover
     Environment = None  # type: ignore
 
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from modules.lib import pillar_cache  # type: ignore
+else:
+    from . import pillar_cache
+
 
 def load_pillar(path: Path) -> Dict:
     if not path.exists():
         return {}
     raw = path.read_text(encoding="utf-8")
-    rendered = raw
     if "{%" in raw or "{{" in raw or raw.lstrip().startswith("#!jinja"):
         if Environment is None:
             raise RuntimeError("pillar 含 Jinja 语法，请先安装 jinja2 (pip install jinja2)")
         env = Environment(loader=FileSystemLoader(str(path.parent)))
         template = env.get_template(path.name)
-        rendered = template.render()
-    data = yaml.safe_load(rendered) or {}
+        data = pillar_cache.safe_load(template.render()) or {}
+    else:
+        data = pillar_cache.load(path) or {}
     if not isinstance(data, dict):
         raise ValueError("pillar 文件必须是 YAML 对象")
     return data
@@ -5,18 +5,15 @@ import json
 import os
 import re
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
 from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-try:
-    import yaml  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
-    yaml = None  # type: ignore
+from . import notification_store
+from . import pillar_cache
+from . import pillar_snapshot
 
 try:
     from salt.client import Caller  # type: ignore
@@ -134,17 +131,10 @@ def _topic_cache_store(chat_id: str, title: str, thread_id: int) -> None:
 
 
 def _load_yaml_dict(path: Path) -> Dict[str, Any]:
-    if yaml is None:
-        return {}
     try:
-        text = path.read_text(encoding="utf-8")
+        return pillar_cache.load_dict(path)
     except Exception:
         return {}
-    try:
-        data = yaml.safe_load(text)
-    except Exception:
-        return {}
-    return data if isinstance(data, dict) else {}
 
 
 def _load_local_file(*relative_paths: str) -> Dict[str, Any]:
@@ -252,6 +242,10 @@ def _create_forum_topic(token: str, chat_id: str, title: str, icon_color: Option
             pass
     if icon_custom_emoji_id not in (None, ""):
         payload["icon_custom_emoji_id"] = str(icon_custom_emoji_id)
+    # urllib.request 会连带导入 http.client/ssl/email，只在真正发请求时加载
+    import urllib.error
+    import urllib.request
+
     data = urllib.parse.urlencode(payload).encode()
     url = f"https://api.telegram.org/bot{token}/createForumTopic"
     req = urllib.request.Request(url, data=data)
@@ -334,6 +328,9 @@ def _get_caller() -> Optional[Caller]:
 def pillar_get(path: str, default: object = None) -> object:
     if SKIP_PILLAR:
         return default
+    value = pillar_snapshot.lookup(path, default)
+    if value is not pillar_snapshot.MISSING:
+        return value
     caller = _get_caller()
     if caller is None:
         return default
@@ -358,9 +355,12 @@ def _normalize_site(site: Optional[str]) -> Optional[str]:
 
 
 def load_config(reload: bool = False) -> Dict[str, object]:
-    global _CACHE
+    global _CACHE, _CALLER
     if _CACHE is not None and not reload:
         return _CACHE
+    if reload:
+        # 常驻进程重载时需要新的 Caller 才能读到刷新后的 Pillar
+        _CALLER = None
 
     sentinel = object()
     data = pillar_get("notifications", sentinel)
@@ -438,7 +438,6 @@ def get_parse_mode() -> str:
 
 def queue_failure(destination: str, tag: str, payload: Dict[str, object], error: str | None = None, context: Optional[Dict[str, object]] = None) -> None:
     try:
-        QUEUE_DIR.mkdir(parents=True, exist_ok=True)
         ctx = dict(context) if isinstance(context, dict) else {}
         record = {
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
@@ -449,8 +448,8 @@ def queue_failure(destination: str, tag: str, payload: Dict[str, object], error:
             "context": ctx,
             "attempts": 0,
         }
-        path = QUEUE_DIR / f"{int(time.time())}_{os.getpid()}.json"
-        path.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+        with notification_store.QueueStore(QUEUE_DIR) as store:
+            store.enqueue(record)
     except Exception:
         pass
 
@@ -566,6 +565,8 @@ def send_webhook_entry(entry: Dict[str, object], body: Dict[str, object], *, que
     url = entry.get("url") if isinstance(entry, dict) else None
     if not url:
         return False
+    import urllib.request
+
     data = json.dumps(body, ensure_ascii=False).encode("utf-8")
     req = urllib.request.Request(str(url), data=data, method="POST")
     headers = entry.get("headers") if isinstance(entry, dict) else None
@@ -6,10 +6,12 @@ import json
 import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from . import notification as notif
+from . import notification_store
 from . import logging_utils
 
 LOGGER_SCRIPT = Path(os.environ.get("SALTGOAT_REACTOR_LOGGER", "/opt/saltgoat-reactor/logger.py"))
@@ -79,25 +81,96 @@ def _retry_telegram(record: Dict[str, object], dry_run: bool) -> Tuple[bool, str
         reactor_common = _load_reactor_common()
     except Exception as exc:  # pragma: no cover - runtime environment issue
         return False, str(exc)
-    profiles = reactor_common.load_telegram_profiles(None, _noop_logger)
+    profiles = _restrict_profiles(reactor_common.load_telegram_profiles(None, _noop_logger), context)
     if not profiles:
         return False, "no_profiles"
     try:
-        reactor_common.broadcast_telegram(
+        failures = reactor_common.broadcast_telegram(
             message,
             profiles,
             _noop_logger,
             tag=tag,
             thread_id=thread_id,
             parse_mode=parse_mode,
+            wait=True,
+            queue_on_failure=False,
         )
     except Exception as exc:  # pragma: no cover
         return False, str(exc)
+    if failures:
+        return False, str(failures[0].get("error") or "send failed")
     return True, "sent"
 
 
+def _restrict_profiles(profiles: List[Dict[str, Any]], context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Limit a replay to the chat that originally failed, when it is recorded."""
+    chat = context.get("chat")
+    if not chat:
+        return profiles
+    wanted_profile = context.get("profile")
+    restricted = []
+    for profile in profiles:
+        if wanted_profile and profile.get("name") != wanted_profile:
+            continue
+        targets = [
+            target
+            for target in profile.get("targets") or []
+            if str(target.get("chat_id") if isinstance(target, dict) else target) == str(chat)
+        ]
+        if targets:
+            restricted.append(dict(profile, targets=targets))
+    return restricted
+
+
 def update_record_metadata(record_path: Path, record: Dict[str, object], error: str) -> None:
     record["attempts"] = int(record.get("attempts", 0)) + 1
     record["last_error"] = error
     record["last_attempt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
     record_path.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def drain_store(
+    store: notification_store.QueueStore,
+    *,
+    destinations: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    workers: int = 4,
+    dry_run: bool = False,
+    on_result: Optional[Callable[[Dict[str, Any], bool, str], None]] = None,
+) -> Tuple[int, int]:
+    """Replay due records from ``store``; each destination gets its own worker pool.
+
+    Sends run in threads while acks/backoff updates stay on the calling thread,
+    because the SQLite connection is not shared across threads.
+    """
+    records = store.due(destinations, limit=limit)
+    lanes: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        lanes.setdefault(str(record.get("destination")), []).append(record)
+    processed = success = 0
+    pools = {name: ThreadPoolExecutor(max_workers=max(1, workers)) for name in lanes}
+    try:
+        futures = {
+            pools[name].submit(retry_record, record, dry_run=dry_run): record
+            for name, lane in lanes.items()
+            for record in lane
+        }
+        for future in as_completed(futures):
+            record = futures[future]
+            try:
+                ok, info = future.result()
+            except Exception as exc:  # pragma: no cover - retry_record 已捕获常见异常
+                ok, info = False, str(exc)
+            processed += 1
+            if ok:
+                success += 1
+                if not dry_run:
+                    store.ack(record["id"])
+            elif not dry_run:
+                record["status"] = store.fail(record["id"], info)
+            if on_result is not None:
+                on_result(record, ok, info)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+    return processed, success
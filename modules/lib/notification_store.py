@@ -0,0 +1,208 @@
+"""SQLite (WAL) backing store for the notification failure queue.
+
+Every failed webhook/Telegram send becomes one row keyed by a random UUID, so
+concurrent writers never collide. Rows carry their own retry schedule: each
+failed replay pushes ``next_attempt`` out exponentially and, after
+``MAX_ATTEMPTS``, moves the row to the ``dead`` state. Status counts come
+straight from the ``(status, destination)`` index instead of re-reading every
+record.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+DB_NAME = "queue.db"
+BACKOFF_BASE = 60
+BACKOFF_MAX = 6 * 3600
+MAX_ATTEMPTS = 12
+PENDING = "pending"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    destination TEXT NOT NULL,
+    tag TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_attempt REAL,
+    last_error TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_status ON records (status, destination, next_attempt);
+"""
+
+
+def backoff(attempts: int) -> float:
+    """Delay before the next replay after ``attempts`` failures."""
+    return float(min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1))))
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+class QueueStore:
+    """Thin wrapper around the queue database inside ``queue_dir``."""
+
+    def __init__(self, queue_dir: Path) -> None:
+        self.queue_dir = Path(queue_dir)
+        self.path = self.queue_dir / DB_NAME
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "QueueStore":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def enqueue(self, record: Dict[str, Any], now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        # 与 uuid4().hex 同样的 32 位随机十六进制，免去导入 uuid（连带 platform）的开销
+        record_id = os.urandom(16).hex()
+        attempts = int(record.get("attempts", 0) or 0)
+        body = {key: value for key, value in record.items() if key not in {"id", "attempts", "status"}}
+        body.setdefault("timestamp", _iso(now))
+        self._conn.execute(
+            "INSERT INTO records (id, created_at, destination, tag, attempts, next_attempt, last_error, body)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                record_id,
+                now,
+                str(record.get("destination") or "unknown"),
+                record.get("tag"),
+                attempts,
+                now,
+                record.get("last_error") or record.get("error"),
+                json.dumps(body, ensure_ascii=False, default=str),
+            ),
+        )
+        return record_id
+
+    def _row_to_record(self, row: sqlite3.Row) -> Dict[str, Any]:
+        try:
+            record = json.loads(row["body"])
+        except ValueError:
+            record = {}
+        record.update(
+            id=row["id"],
+            destination=row["destination"],
+            tag=row["tag"],
+            status=row["status"],
+            attempts=row["attempts"],
+            next_attempt=_iso(row["next_attempt"]),
+            last_attempt=_iso(row["last_attempt"]),
+            last_error=row["last_error"],
+        )
+        return record
+
+    def _select(self, sql: str, params: Iterable[Any]) -> List[Dict[str, Any]]:
+        self._conn.row_factory = sqlite3.Row
+        try:
+            return [self._row_to_record(row) for row in self._conn.execute(sql, tuple(params))]
+        finally:
+            self._conn.row_factory = None
+
+    def due(
+        self,
+        destinations: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Pending records whose backoff has elapsed, oldest first."""
+        now = time.time() if now is None else now
+        sql = "SELECT * FROM records WHERE status = ? AND next_attempt <= ?"
+        params: List[Any] = [PENDING, now]
+        wanted = sorted(set(destinations or []))
+        if wanted:
+            sql += f" AND destination IN ({','.join('?' * len(wanted))})"
+            params.extend(wanted)
+        sql += " ORDER BY created_at"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self._select(sql, params)
+
+    def records(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        if status:
+            return self._select("SELECT * FROM records WHERE status = ? ORDER BY created_at", [status])
+        return self._select("SELECT * FROM records ORDER BY created_at", [])
+
+    def ack(self, record_id: str) -> None:
+        self._conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+
+    def fail(self, record_id: str, error: str, now: Optional[float] = None) -> str:
+        """Record a failed replay; returns the new status (pending/dead)."""
+        now = time.time() if now is None else now
+        row = self._conn.execute("SELECT attempts FROM records WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            return DEAD
+        attempts = int(row[0]) + 1
+        status = DEAD if attempts >= MAX_ATTEMPTS else PENDING
+        self._conn.execute(
+            "UPDATE records SET attempts = ?, status = ?, next_attempt = ?, last_attempt = ?, last_error = ?"
+            " WHERE id = ?",
+            (attempts, status, now + backoff(attempts), now, error, record_id),
+        )
+        return status
+
+    def requeue_dead(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        cursor = self._conn.execute(
+            "UPDATE records SET status = ?, attempts = 0, next_attempt = ? WHERE status = ?",
+            (PENDING, now, DEAD),
+        )
+        return cursor.rowcount
+
+    def counts(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Pending/dead/due totals grouped by destination (index-only scans)."""
+        now = time.time() if now is None else now
+        summary: Dict[str, Any] = {"total": 0, "due": 0, "dead": 0, "by_destination": {}, "dead_by_destination": {}}
+        for status, destination, count in self._conn.execute(
+            "SELECT status, destination, COUNT(*) FROM records GROUP BY status, destination"
+        ):
+            if status == DEAD:
+                summary["dead"] += count
+                summary["dead_by_destination"][destination] = count
+            else:
+                summary["total"] += count
+                summary["by_destination"][destination] = count
+        summary["due"] = self._conn.execute(
+            "SELECT COUNT(*) FROM records WHERE status = ? AND next_attempt <= ?", (PENDING, now)
+        ).fetchone()[0]
+        return summary
+
+    def import_legacy(self) -> int:
+        """Move pre-SQLite ``*.json`` queue files into the database."""
+        imported = 0
+        for path in sorted(self.queue_dir.glob("*.json")):
+            try:
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if not isinstance(record, dict):
+                continue
+            try:
+                created = path.stat().st_mtime
+            except OSError:
+                created = None
+            self.enqueue(record, now=created)
+            path.unlink()
+            imported += 1
+        return imported
@@ -0,0 +1,204 @@
+"""OpenSearch cluster, node and catalog-index statistics for SaltGoat monitors.
+
+All endpoints are read over a single keep-alive HTTP connection. Cumulative
+counters (rejections, GC time, query/index time, cache evictions) are turned
+into per-interval rates by :func:`rates` against a previous sample, so alerts
+reflect what happened since the last check rather than since node start.
+"""
+from __future__ import annotations
+
+import http.client
+import json
+import urllib.parse
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+USER_AGENT = "SaltGoatResource/1.0"
+THREAD_POOLS = ("search", "write", "get", "management")
+CATALOG_INDEX_PATTERN = "*_product_*,*_category_*"
+NODES_STATS_PATH = "/_nodes/stats/jvm,thread_pool,indices?human=false"
+INDEX_STATS_METRICS = "docs,store,search,indexing,query_cache,request_cache"
+
+
+class OpenSearchError(RuntimeError):
+    """Raised when an endpoint cannot be read."""
+
+
+def fetch_json(base_url: str, paths: Iterable[str], timeout: float) -> List[Optional[Dict[str, Any]]]:
+    """GET every path on one connection; a failed path yields ``None``.
+
+    A connection-level failure on the first request raises OpenSearchError so
+    the caller can skip the remaining requests.
+    """
+    parsed = urllib.parse.urlsplit(base_url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    conn_cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parsed.hostname or "127.0.0.1", port, timeout=timeout)
+    prefix = parsed.path.rstrip("/")
+    results: List[Optional[Dict[str, Any]]] = []
+    try:
+        for index, path in enumerate(paths):
+            try:
+                conn.request("GET", prefix + path, headers={"User-Agent": USER_AGENT, "Accept": "application/json"})
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException) as exc:
+                if index == 0:
+                    raise OpenSearchError(str(exc)) from exc
+                results.append(None)
+                # 连接已不可用，后续请求重新建连
+                conn.close()
+                continue
+            if resp.status != 200:
+                results.append(None)
+                continue
+            try:
+                data = json.loads(body.decode("utf-8"))
+            except (UnicodeDecodeError, ValueError):
+                data = None
+            results.append(data if isinstance(data, dict) else None)
+    finally:
+        conn.close()
+    return results
+
+
+def _get(data: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _add(target: Dict[str, Any], key: str, value: Any) -> None:
+    if isinstance(value, (int, float)):
+        target[key] = target.get(key, 0) + value
+
+
+def summarize_nodes(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Sum thread-pool, GC, search/indexing and cache counters over all nodes."""
+    counters: Dict[str, Any] = {}
+    pools: Dict[str, Dict[str, Any]] = {}
+    for node in (stats.get("nodes") or {}).values():
+        for name in THREAD_POOLS:
+            pool = _get(node, "thread_pool", name) or {}
+            entry = pools.setdefault(name, {})
+            for field in ("queue", "active", "rejected", "completed"):
+                _add(entry, field, pool.get(field))
+        for collector, values in (_get(node, "jvm", "gc", "collectors") or {}).items():
+            _add(counters, f"gc_{collector}_time_ms", values.get("collection_time_in_millis"))
+            _add(counters, f"gc_{collector}_count", values.get("collection_count"))
+        indices = node.get("indices") or {}
+        _add(counters, "query_total", _get(indices, "search", "query_total"))
+        _add(counters, "query_time_ms", _get(indices, "search", "query_time_in_millis"))
+        _add(counters, "fetch_total", _get(indices, "search", "fetch_total"))
+        _add(counters, "fetch_time_ms", _get(indices, "search", "fetch_time_in_millis"))
+        _add(counters, "index_total", _get(indices, "indexing", "index_total"))
+        _add(counters, "index_time_ms", _get(indices, "indexing", "index_time_in_millis"))
+        _add(counters, "query_cache_evictions", _get(indices, "query_cache", "evictions"))
+        _add(counters, "fielddata_evictions", _get(indices, "fielddata", "evictions"))
+        _add(counters, "request_cache_evictions", _get(indices, "request_cache", "evictions"))
+    for name, entry in pools.items():
+        if "rejected" in entry:
+            counters[f"{name}_rejected"] = entry["rejected"]
+    return {"thread_pools": pools, "counters": counters}
+
+
+def summarize_indices(stats: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Per-index docs/size plus search and indexing counters (primaries + replicas)."""
+    result: Dict[str, Dict[str, Any]] = {}
+    for name, data in sorted((stats.get("indices") or {}).items()):
+        total = data.get("total") or {}
+        entry: Dict[str, Any] = {}
+        for key, path in (
+            ("docs", ("docs", "count")),
+            ("store_bytes", ("store", "size_in_bytes")),
+            ("query_total", ("search", "query_total")),
+            ("query_time_ms", ("search", "query_time_in_millis")),
+            ("index_total", ("indexing", "index_total")),
+            ("index_time_ms", ("indexing", "index_time_in_millis")),
+            ("query_cache_evictions", ("query_cache", "evictions")),
+            ("request_cache_evictions", ("request_cache", "evictions")),
+        ):
+            value = _get(total, *path)
+            if isinstance(value, (int, float)):
+                entry[key] = value
+        result[name] = entry
+    return result
+
+
+def _latency(current: Dict[str, Any], previous: Dict[str, Any], time_key: str, total_key: str) -> Optional[float]:
+    delta_total = _delta(current, previous, total_key)
+    delta_time = _delta(current, previous, time_key)
+    if not delta_total or delta_time is None:
+        return None
+    return round(delta_time / delta_total, 2)
+
+
+def _delta(current: Dict[str, Any], previous: Dict[str, Any], key: str) -> Optional[float]:
+    now, before = current.get(key), previous.get(key)
+    # 节点重启后计数器归零，负增量直接丢弃
+    if isinstance(now, (int, float)) and isinstance(before, (int, float)) and now >= before:
+        return now - before
+    return None
+
+
+def rates(current: Dict[str, Any], previous: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    """Per-second rates and average latencies between two counter snapshots."""
+    result: Dict[str, Any] = {}
+    if elapsed <= 0 or not previous:
+        return result
+    for key in current:
+        if key.endswith(("_rejected", "_evictions")) or key in ("query_total", "index_total"):
+            delta = _delta(current, previous, key)
+            if delta is not None:
+                result[f"{key}_per_sec"] = round(delta / elapsed, 3)
+        elif key.startswith("gc_") and key.endswith("_time_ms"):
+            delta = _delta(current, previous, key)
+            if delta is not None:
+                # 时间占比：区间内 GC 停顿毫秒数 / 区间毫秒数
+                result[key.replace("_time_ms", "_time_ratio")] = round(delta / (elapsed * 1000), 4)
+    for name, time_key, total_key in (
+        ("search_query_latency_ms", "query_time_ms", "query_total"),
+        ("search_fetch_latency_ms", "fetch_time_ms", "fetch_total"),
+        ("indexing_latency_ms", "index_time_ms", "index_total"),
+    ):
+        value = _latency(current, previous, time_key, total_key)
+        if value is not None:
+            result[name] = value
+    return result
+
+
+def index_rates(
+    current: Dict[str, Dict[str, Any]],
+    previous: Dict[str, Dict[str, Any]],
+    elapsed: float,
+) -> Dict[str, Dict[str, Any]]:
+    result: Dict[str, Dict[str, Any]] = {}
+    for name, entry in current.items():
+        before = previous.get(name) or {}
+        values = {"docs": entry.get("docs"), "store_bytes": entry.get("store_bytes")}
+        if before and elapsed > 0:
+            queries = _delta(entry, before, "query_total")
+            if queries is not None:
+                values["query_per_sec"] = round(queries / elapsed, 3)
+            for key, time_key, total_key in (
+                ("search_query_latency_ms", "query_time_ms", "query_total"),
+                ("indexing_latency_ms", "index_time_ms", "index_total"),
+            ):
+                latency = _latency(entry, before, time_key, total_key)
+                if latency is not None:
+                    values[key] = latency
+        result[name] = {key: value for key, value in values.items() if value is not None}
+    return result
+
+
+def index_stats_path(pattern: str = CATALOG_INDEX_PATTERN) -> str:
+    return f"/{urllib.parse.quote(pattern, safe='*,')}/_stats/{INDEX_STATS_METRICS}?level=indices&human=false"
+
+
+def split_stats_url(url: str) -> Tuple[str, str]:
+    """Split a full stats URL into ``(base_url, path_with_query)``."""
+    parsed = urllib.parse.urlsplit(url)
+    base = urllib.parse.urlunsplit((parsed.scheme, parsed.netloc, "", "", ""))
+    path = parsed.path or "/"
+    return base, path + (f"?{parsed.query}" if parsed.query else "")
@@ -22,6 +22,7 @@ if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 from modules.lib import logging_utils  # type: ignore
 from modules.lib import config_loader  # type: ignore
+from modules.lib import pillar_cache  # type: ignore
 DEFAULT_PILLAR = REPO_ROOT / "salt" / "pillar" / "magento-optimize.sls"
 RUNTIME_DIR = Path(os.environ.get("SALTGOAT_RUNTIME_DIR", "/etc/saltgoat/runtime"))
 TRACK_FILE_NAME = "multisite-pools.json"
@@ -31,13 +32,7 @@ SKIP_SALT_EVENT = os.environ.get("SALTGOAT_SKIP_SALT_EVENT") == "1"
 
 
 def _load_yaml(path: Path) -> Dict[str, object]:
-    if not path.exists():
-        return {}
-    with path.open(encoding="utf-8") as fh:
-        data = yaml.safe_load(fh) or {}
-    if not isinstance(data, dict):
-        return {}
-    return data
+    return pillar_cache.load_dict(path)
 
 
 def _dump_yaml(path: Path, data: Dict[str, object]) -> None:
@@ -0,0 +1,153 @@
+"""Shared, mtime-keyed cache for SaltGoat pillar/YAML files.
+
+``load`` parses a file once per (path, mtime, size) and remembers the result
+in-process; parsed documents are also pickled into a private snapshot
+directory so the next short-lived CLI can skip YAML parsing entirely. Parsing
+uses libyaml's ``CSafeLoader`` when PyYAML was built with it.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = Path("/var/cache/saltgoat/pillar")
+
+_Key = Tuple[int, int]
+_MEMO: Dict[str, Tuple[_Key, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def _yaml() -> Any:
+    # 首次解析时才导入 PyYAML：快照命中时短命 CLI 完全不需要它
+    try:
+        import yaml  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+    return yaml
+
+
+def _loader(yaml: Any) -> Any:
+    return getattr(yaml, "CSafeLoader", None) or yaml.SafeLoader
+
+
+def safe_load(text: str) -> Any:
+    """``yaml.safe_load`` using the C loader when available."""
+    yaml = _yaml()
+    if yaml is None:
+        raise RuntimeError("PyYAML 不可用")
+    return yaml.load(text, Loader=_loader(yaml))  # noqa: S506 - always a SafeLoader
+
+
+def snapshot_dir() -> Optional[Path]:
+    """Snapshot directory, or ``None`` when disabled via SALTGOAT_PILLAR_CACHE=0."""
+    if os.environ.get("SALTGOAT_PILLAR_CACHE", "1") in {"0", "false", "False"}:
+        return None
+    override = os.environ.get("SALTGOAT_PILLAR_CACHE_DIR")
+    if override:
+        return Path(override)
+    if os.geteuid() == 0:
+        return DEFAULT_SNAPSHOT_DIR
+    try:
+        return Path.home() / ".cache" / "saltgoat" / "pillar"
+    except Exception:
+        return None
+
+
+def _snapshot_path(directory: Path, source: str) -> Path:
+    return directory / f"{hashlib.sha1(source.encode('utf-8')).hexdigest()}.pickle"
+
+
+def _trusted(path: Path) -> bool:
+    # 快照含 secret，且 pickle 可执行代码：只信任本用户创建、他人不可写的文件
+    try:
+        info = path.stat()
+    except OSError:
+        return False
+    return info.st_uid == os.geteuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _read_snapshot(source: str, key: _Key) -> Tuple[bool, Any]:
+    directory = snapshot_dir()
+    if directory is None:
+        return False, None
+    path = _snapshot_path(directory, source)
+    if not _trusted(directory) or not _trusted(path):
+        return False, None
+    try:
+        with path.open("rb") as fh:
+            entry = pickle.load(fh)
+    except Exception:
+        return False, None
+    if not isinstance(entry, dict) or entry.get("version") != SNAPSHOT_VERSION:
+        return False, None
+    if entry.get("source") != source or tuple(entry.get("key") or ()) != key:
+        return False, None
+    return True, entry.get("data")
+
+
+def _write_snapshot(source: str, key: _Key, data: Any) -> None:
+    directory = snapshot_dir()
+    if directory is None:
+        return
+    try:
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _trusted(directory):
+            return
+        entry = {"version": SNAPSHOT_VERSION, "source": source, "key": key, "data": data}
+        fd, tmp = tempfile.mkstemp(dir=str(directory), prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, _snapshot_path(directory, source))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except Exception:
+        pass
+
+
+def load(path: Path, *, copy_result: bool = True) -> Any:
+    """Parsed YAML document at ``path`` (``None`` if the file does not exist).
+
+    YAML errors propagate so callers keep their own error handling. Pass
+    ``copy_result=False`` for read-only access to skip the defensive deep copy.
+    """
+    source = os.path.abspath(str(path))
+    try:
+        info = os.stat(source)
+    except OSError:
+        return None
+    key: _Key = (info.st_mtime_ns, info.st_size)
+    with _LOCK:
+        cached = _MEMO.get(source)
+    if cached is not None and cached[0] == key:
+        data = cached[1]
+    else:
+        hit, data = _read_snapshot(source, key)
+        if not hit:
+            with open(source, encoding="utf-8") as fh:
+                data = safe_load(fh.read())
+            _write_snapshot(source, key, data)
+        with _LOCK:
+            _MEMO[source] = (key, data)
+    return copy.deepcopy(data) if copy_result else data
+
+
+def load_dict(path: Path, *, copy_result: bool = True) -> Dict[str, Any]:
+    """Like :func:`load`, but ``{}`` for missing files and non-mapping documents."""
+    data = load(path, copy_result=copy_result)
+    return data if isinstance(data, dict) else {}
+
+
+def clear() -> None:
+    """Drop the in-process memo (snapshots on disk are keyed by mtime and stay valid)."""
+    with _LOCK:
+        _MEMO.clear()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Rendered pillar snapshot for short-lived SaltGoat scripts.
+
+Constructing ``salt.client.Caller`` loads the whole Salt loader and costs
+seconds per invocation. The ``saltgoat.pillar_snapshot`` execution module (run
+by highstate and a minion schedule) writes the pillar subtrees SaltGoat reads
+to a root-only JSON file; ``lookup`` serves ``pillar.get``-style paths from it
+and reports ``MISSING`` whenever the snapshot is absent, stale or does not
+cover the requested key, so callers fall back to ``Caller``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+DEFAULT_PATH = Path("/etc/saltgoat/runtime/pillar-snapshot.json")
+DEFAULT_MAX_AGE = 3600
+# 与 salt/_modules/saltgoat.py 中的 SNAPSHOT_KEYS 保持一致
+EXPORT_KEYS = (
+    "saltgoat",
+    "notifications",
+    "telegram",
+    "telegram_topics",
+    "secrets",
+    "magento_schedule",
+    "monitor_thresholds",
+)
+PILLAR_ROOT = Path(__file__).resolve().parents[2] / "salt" / "pillar"
+
+
+class _Missing:
+    def __repr__(self) -> str:  # pragma: no cover - debugging aid
+        return "MISSING"
+
+
+MISSING: Any = _Missing()
+_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
+def snapshot_path() -> Path:
+    override = os.environ.get("SALTGOAT_PILLAR_SNAPSHOT")
+    return Path(override) if override else DEFAULT_PATH
+
+
+def max_age() -> float:
+    try:
+        return float(os.environ.get("SALTGOAT_PILLAR_SNAPSHOT_MAX_AGE", DEFAULT_MAX_AGE))
+    except ValueError:
+        return float(DEFAULT_MAX_AGE)
+
+
+def _pillar_mtime(root: Optional[Path] = None) -> float:
+    """Newest mtime among pillar source files (top level and one directory down)."""
+    newest = 0.0
+    try:
+        entries = list(os.scandir(root or PILLAR_ROOT))
+    except OSError:
+        return newest
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                newest = max(newest, entry.stat().st_mtime)
+                for child in os.scandir(entry.path):
+                    if child.name.endswith(".sls"):
+                        newest = max(newest, child.stat().st_mtime)
+            elif entry.name.endswith(".sls"):
+                newest = max(newest, entry.stat().st_mtime)
+        except OSError:
+            continue
+    return newest
+
+
+def _trusted(info: os.stat_result) -> bool:
+    # 快照包含 secret：只接受 root/当前用户所有、他人不可写的文件
+    return info.st_uid in {0, os.geteuid()} and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def load(path: Optional[Path] = None, *, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Return the snapshot document, or ``None`` when missing, untrusted or stale."""
+    target = path or snapshot_path()
+    try:
+        info = target.stat()
+    except OSError:
+        return None
+    if not _trusted(info):
+        return None
+    key = (info.st_mtime_ns, info.st_size)
+    cached = _CACHE.get(str(target))
+    if cached is not None and cached[0] == key:
+        data = cached[1]
+    else:
+        try:
+            data = json.loads(target.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+            return None
+        _CACHE[str(target)] = (key, data)
+    generated = float(data.get("generated") or 0)
+    now = time.time() if now is None else now
+    if now - generated > max_age() or _pillar_mtime() > generated:
+        return None
+    return data
+
+
+def lookup(path: str, default: Any = None, *, delimiter: str = ":") -> Any:
+    """``pillar.get`` against the snapshot; ``MISSING`` means "ask Salt instead"."""
+    data = load()
+    if data is None:
+        return MISSING
+    parts = [part for part in str(path).split(delimiter) if part]
+    if not parts or parts[0] not in (data.get("keys") or []):
+        return MISSING
+    node: Any = data.get("pillar") or {}
+    for part in parts:
+        if not isinstance(node, dict) or part not in node:
+            return default
+        node = node[part]
+    return default if node is None else node
+
+
+def build(pillar: Dict[str, Any], keys: Iterable[str] = EXPORT_KEYS, *, now: Optional[float] = None) -> Dict[str, Any]:
+    keys = list(keys)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "generated": time.time() if now is None else now,
+        "keys": keys,
+        "pillar": {key: pillar[key] for key in keys if key in pillar},
+    }
+
+
+def write(pillar: Dict[str, Any], path: Optional[Path] = None, keys: Iterable[str] = EXPORT_KEYS) -> Path:
+    """Atomically write a compact, mode 0600 snapshot of ``pillar``."""
+    target = path or snapshot_path()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps(build(pillar, keys), ensure_ascii=False, separators=(",", ":"), default=str)
+    fd, tmp = tempfile.mkstemp(dir=str(target.parent), prefix=".pillar-snapshot-")
+    try:
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(payload)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _CACHE.pop(str(target), None)
+    return target
+
+
+def _export(path: Path) -> int:
+    try:
+        from salt.client import Caller  # type: ignore
+    except Exception as exc:
+        print(f"[ERROR] salt 不可用: {exc}", file=sys.stderr)
+        return 1
+    pillar = Caller().cmd("pillar.items")
+    if not isinstance(pillar, dict):
+        print("[ERROR] pillar.items 返回异常", file=sys.stderr)
+        return 1
+    target = write(pillar, path)
+    print(f"[INFO] pillar snapshot 已写入 {target}")
+    return 0
+
+
+def _status(path: Path) -> int:
+    fresh = load(path)
+    summary: Dict[str, Any] = {"path": str(path), "exists": path.exists(), "fresh": fresh is not None}
+    if fresh is not None:
+        summary["age"] = round(time.time() - float(fresh.get("generated") or 0), 1)
+        summary["keys"] = sorted((fresh.get("pillar") or {}).keys())
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if fresh is not None else 1
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SaltGoat pillar snapshot helper")
+    parser.add_argument("command", choices=["export", "status"])
+    parser.add_argument("--path", type=Path, default=None, help=f"snapshot file (default: {DEFAULT_PATH})")
+    args = parser.parse_args(list(argv) if argv is not None else None)
+    path = args.path or snapshot_path()
+    if args.command == "export":
+        return _export(path)
+    return _status(path)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,12 +6,30 @@ import argparse
 import datetime as dt
 import json
 import os
+import re
 import secrets
 import string
 import subprocess
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from modules.lib import systemd_units  # type: ignore
+else:
+    from . import systemd_units
+
+DEFAULT_METADATA_DIR = Path("/etc/restic/sites.d")
+DEFAULT_CACHE_DIR = Path("/var/cache/saltgoat/restic")
+DEFAULT_SERVICE = "saltgoat-restic-backup.service"
+DEFAULT_WORKERS = 4
+# 新增快照超过该数量时改用一次 `restic snapshots --json`，否则逐个 `cat snapshot`
+INCREMENTAL_LIMIT = 5
+CACHE_VERSION = 1
 
 
 def cmd_run(cmd: List[str]) -> subprocess.CompletedProcess[str]:
@@ -42,119 +60,228 @@ def _read_env_file(path: Path) -> Dict[str, str]:
     return data
 
 
-def _restic_command(repo: str, env_file: str, cmd: str) -> subprocess.CompletedProcess[str]:
-    script = (
-        f"set -a; source '{env_file}' >/dev/null 2>&1; set +a; "
-        f"export RESTIC_REPOSITORY='{repo}'; {cmd}"
+def _restic_env(env_file: str, repo: str) -> Dict[str, str]:
+    env = os.environ.copy()
+    for key, value in _read_env_file(Path(env_file)).items():
+        key = key[len("export "):].strip() if key.startswith("export ") else key
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        env[key] = value
+    env["RESTIC_REPOSITORY"] = repo
+    return env
+
+
+def _restic(restic_bin: str, env: Dict[str, str], *args: str) -> subprocess.CompletedProcess[str]:
+    # 只读查询不加锁，避免每次在远端仓库写入/删除 lock 对象
+    return subprocess.run([restic_bin, "--no-lock", *args], capture_output=True, text=True, env=env)
+
+
+def cache_dir() -> Path:
+    override = os.environ.get("SALTGOAT_RESTIC_CACHE_DIR")
+    if override:
+        return Path(override)
+    if os.geteuid() == 0:
+        return DEFAULT_CACHE_DIR
+    return Path.home() / ".cache" / "saltgoat" / "restic"
+
+
+def _cache_file(directory: Path, site: str) -> Path:
+    return directory / f"{site.replace('/', '-')}.json"
+
+
+def load_cache(site: str, directory: Optional[Path] = None) -> Dict[str, Any]:
+    try:
+        data = json.loads(_cache_file(directory or cache_dir(), site).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) and data.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(site: str, data: Dict[str, Any], directory: Optional[Path] = None) -> None:
+    target = _cache_file(directory or cache_dir(), site)
+    try:
+        target.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(target.parent), prefix=".restic-")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(dict(data, version=CACHE_VERSION), fh, ensure_ascii=False)
+        os.replace(tmp, target)
+    except OSError:
+        pass
+
+
+def _snapshot_times(restic_bin: str, env: Dict[str, str], ids: List[str], known: Dict[str, str]) -> Dict[str, str]:
+    """id -> time for ``ids``, fetching only snapshots missing from ``known``."""
+    result = {snap_id: known[snap_id] for snap_id in ids if snap_id in known}
+    missing = [snap_id for snap_id in ids if snap_id not in known]
+    if not missing:
+        return result
+    if len(missing) > INCREMENTAL_LIMIT:
+        proc = _restic(restic_bin, env, "snapshots", "--json")
+        if proc.returncode != 0:
+            raise RuntimeError(f"snapshots 失败({proc.returncode})")
+        for item in json.loads(proc.stdout or "[]"):
+            if item.get("id") in missing:
+                result[item["id"]] = item.get("time", "")
+        return result
+    for snap_id in missing:
+        # cat snapshot 只读一个对象，不需要加载仓库索引
+        proc = _restic(restic_bin, env, "cat", "snapshot", snap_id)
+        if proc.returncode == 0:
+            result[snap_id] = json.loads(proc.stdout or "{}").get("time", "")
+    return result
+
+
+def refresh_site(site: str, repo: str, env_file: str, restic_bin: str, directory: Optional[Path] = None) -> Dict[str, Any]:
+    """Update the cached summary of one repository incrementally and return it."""
+    cached = load_cache(site, directory)
+    if cached.get("repo") != repo:
+        cached = {}
+    summary: Dict[str, Any] = dict(cached, site=site, repo=repo, error=None)
+    try:
+        # env 文件不可读（权限等）只记为该站点的错误，不中断整个汇总
+        env = _restic_env(env_file, repo)
+        proc = _restic(restic_bin, env, "list", "snapshots")
+        if proc.returncode != 0:
+            raise RuntimeError(f"错误({proc.returncode})")
+        ids = [line.strip() for line in proc.stdout.splitlines() if line.strip()]
+        snapshots = _snapshot_times(restic_bin, env, ids, cached.get("snapshots") or {})
+        latest_id = max(snapshots, key=lambda snap_id: snapshots[snap_id]) if snapshots else None
+        summary.update(snapshots=snapshots, latest_id=latest_id, latest_time=snapshots.get(latest_id or "", None))
+        if latest_id is None:
+            summary.update(size_bytes=None, stats_id=None)
+        elif latest_id != cached.get("stats_id"):
+            # 只有最新快照变化时才重新计算容量（需要加载索引）
+            stats = _restic(restic_bin, env, "stats", "--json", latest_id)
+            if stats.returncode == 0:
+                summary.update(size_bytes=json.loads(stats.stdout or "{}").get("total_size"), stats_id=latest_id)
+        summary["checked_at"] = time.time()
+    except (RuntimeError, ValueError, OSError) as exc:
+        summary["error"] = str(exc) or exc.__class__.__name__
+        return summary
+    save_cache(site, {key: value for key, value in summary.items() if key != "error"}, directory)
+    return summary
+
+
+def _site_records(metadata_dir: Path) -> List[Tuple[Path, Dict[str, str]]]:
+    return [(file, _read_env_file(file)) for file in sorted(metadata_dir.glob("*.env"))]
+
+
+def collect_summaries(
+    metadata_dir: Path,
+    restic_bin: str = "/usr/bin/restic",
+    *,
+    refresh: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    directory: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """Per-site repository summaries; ``refresh=False`` serves only the local cache."""
+    records = _site_records(metadata_dir)
+
+    def one(record: Tuple[Path, Dict[str, str]]) -> Dict[str, Any]:
+        file, env = record
+        site = env.get("SITE") or file.stem
+        repo = env.get("REPO")
+        base: Dict[str, Any] = {"site": site, "repo": repo, "service": env.get("SERVICE_NAME", DEFAULT_SERVICE)}
+        if not repo:
+            return base
+        if refresh:
+            summary = refresh_site(site, repo, env.get("ENV_FILE", "/etc/restic/restic.env"), restic_bin, directory)
+        else:
+            summary = load_cache(site, directory)
+            summary = summary if summary.get("repo") == repo else {}
+        snapshots = summary.pop("snapshots", None) or {}
+        return dict(base, snapshot_count=len(snapshots), **{k: v for k, v in summary.items() if k not in base})
+
+    if not refresh or len(records) <= 1:
+        return [one(record) for record in records]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(records)))) as pool:
+        return list(pool.map(one, records))
+
+
+def load_cached_summaries(metadata_dir: Path = DEFAULT_METADATA_DIR) -> List[Dict[str, Any]]:
+    """Cached repository summaries for other tools (daily_summary, doctor); never touches the repos."""
+    try:
+        return collect_summaries(metadata_dir, refresh=False)
+    except OSError:
+        return []
+
+
+def _format_time(value: Optional[str]) -> str:
+    if not value:
+        return "n/a"
+    try:
+        return dt.datetime.fromisoformat(value.replace("Z", "+00:00")).strftime("%Y-%m-%d %H:%M")
+    except ValueError:
+        # restic 输出纳秒精度，老版本 Python 无法解析时退回原始字符串前缀
+        return value[:16].replace("T", " ")
+
+
+def _format_unit_timestamp(value: Optional[str]) -> Optional[str]:
+    """``Sat 2026-10-17 17:08:58 UTC`` (systemctl show) -> ``2026-10-17 17:08:58``."""
+    if not value or value == "n/a":
+        return None
+    match = re.search(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", value)
+    return match.group(0) if match else value
+
+
+def _format_size(size_bytes: Optional[int]) -> str:
+    if size_bytes is None:
+        return "n/a"
+    if size_bytes >= 1024**3:
+        return f"{size_bytes / (1024**3):.1f}G"
+    return f"{size_bytes / (1024**2):.1f}M"
+
+
+def describe(summary: Dict[str, Any]) -> str:
+    """One-line text for a cached repository summary (daily summary / doctor)."""
+    if summary.get("latest_time") is None and "checked_at" not in summary:
+        return f"{summary['site']}: 暂无缓存"
+    return (
+        f"{summary['site']}: {summary.get('snapshot_count', 0)} snapshots, "
+        f"latest {_format_time(summary.get('latest_time'))}, size {_format_size(summary.get('size_bytes'))}"
     )
-    return subprocess.run(["bash", "-lc", script], capture_output=True, text=True)
 
 
 def summarize_sites(args: argparse.Namespace) -> None:
     metadata_dir = Path(args.metadata_dir)
-    files = sorted(metadata_dir.glob("*.env"))
-    if not files:
-        print("暂无 Restic 站点记录")
+    if not any(metadata_dir.glob("*.env")):
+        print("[]" if args.json else "暂无 Restic 站点记录")
         return
 
-    rows = []
-    for file in files:
-        env = _read_env_file(file)
-        site = env.get("SITE") or file.stem
-        repo = env.get("REPO")
-        env_file = env.get("ENV_FILE", "/etc/restic/restic.env")
-        service = env.get("SERVICE_NAME", "saltgoat-restic-backup.service")
-
-        snapshot_count = "0"
-        latest_time = "n/a"
-        size_display = "n/a"
-
-        if repo and not args.skip_restic:
-            snap_proc = _restic_command(repo, env_file, f"{args.restic_bin} --json snapshots")
-            if snap_proc.returncode == 0 and snap_proc.stdout.strip():
-                try:
-                    snapshots = json.loads(snap_proc.stdout)
-                    if snapshots:
-                        snapshots.sort(key=lambda item: item.get("time", ""))
-                        snapshot_count = str(len(snapshots))
-                        latest = snapshots[-1].get("time")
-                        if latest:
-                            try:
-                                dt_obj = dt.datetime.fromisoformat(latest.replace("Z", "+00:00"))
-                                latest_time = dt_obj.strftime("%Y-%m-%d %H:%M")
-                            except Exception:
-                                latest_time = latest
-                except json.JSONDecodeError:
-                    latest_time = "解析失败"
-            else:
-                latest_time = f"错误({snap_proc.returncode})"
-
-            stats_proc = _restic_command(repo, env_file, f"{args.restic_bin} stats --json latest")
-            if stats_proc.returncode == 0 and stats_proc.stdout.strip():
-                try:
-                    stats = json.loads(stats_proc.stdout)
-                    size_bytes = stats.get("total_size", 0)
-                    if size_bytes >= 1024**3:
-                        size_display = f"{size_bytes / (1024**3):.1f}G"
-                    else:
-                        size_display = f"{size_bytes / (1024**2):.1f}M"
-                except json.JSONDecodeError:
-                    size_display = "解析失败"
-            elif stats_proc.returncode == 3:
-                size_display = "无快照"
-
-        svc_state = "unknown"
-        svc_status = ""
-        last_run = "n/a"
-
-        svc_proc = cmd_run(
-            [
-                "systemctl",
-                "show",
-                service,
-                "--property=ActiveState,SubState,ExecMainStatus",
-            ]
-        )
-        if svc_proc.returncode == 0:
-            props = dict(line.split("=", 1) for line in svc_proc.stdout.splitlines() if "=" in line)
-            svc_state = f"{props.get('ActiveState', '?')}/{props.get('SubState', '?')}"
-            svc_status = props.get("ExecMainStatus", "")
-
-        journal_proc = cmd_run(
-            ["journalctl", "-u", service, "-n", "1", "--no-pager", "--output=json"]
-        )
-        if journal_proc.returncode == 0 and journal_proc.stdout.strip():
-            try:
-                entry = json.loads(journal_proc.stdout.splitlines()[-1])
-                ts = int(entry.get("__REALTIME_TIMESTAMP", "0"))
-                if ts:
-                    dt_obj = dt.datetime.fromtimestamp(ts / 1_000_000)
-                    last_run = dt_obj.strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                pass
-
-        rows.append(
-            {
-                "site": site,
-                "snapshots": snapshot_count,
-                "latest": latest_time,
-                "size": size_display,
-                "svc_state": svc_state,
-                "svc_status": svc_status,
-                "last_run": last_run,
-            }
-        )
+    summaries = collect_summaries(
+        metadata_dir,
+        args.restic_bin,
+        refresh=not (args.skip_restic or args.cached),
+        workers=args.workers,
+    )
+    unit_states = systemd_units.query(summary["service"] for summary in summaries)
+    for summary in summaries:
+        unit_state = unit_states[summary["service"]]
+        summary["svc_state"] = "unknown"
+        summary["svc_status"] = ""
+        summary["last_run"] = None
+        if unit_state.load_state:
+            summary["svc_state"] = f"{unit_state.active_state or '?'}/{unit_state.sub_state or '?'}"
+            summary["svc_status"] = unit_state.exec_main_status
+            # ExecMainStartTimestamp 即最近一次执行时间，无需再查 journalctl
+            summary["last_run"] = _format_unit_timestamp(unit_state.exec_main_start)
+
+    if args.json:
+        print(json.dumps(sorted(summaries, key=lambda r: r["site"]), ensure_ascii=False, indent=2))
+        return
 
     header = f"{'站点':<12} {'快照数':<6} {'最后备份':<17} {'容量':<8} {'服务状态':<20} {'最后执行':<19}"
     print(header)
     print("-" * len(header))
-    for row in sorted(rows, key=lambda r: r["site"]):
+    for row in sorted(summaries, key=lambda r: r["site"]):
         state = row["svc_state"]
         if row["svc_status"]:
             state = f"{state}({row['svc_status']})"
+        latest = row.get("error") or _format_time(row.get("latest_time"))
+        size = "无快照" if row.get("latest_id") is None and "latest_id" in row else _format_size(row.get("size_bytes"))
         print(
-            f"{row['site']:<12} {row['snapshots']:<6} {row['latest']:<17} "
-            f"{row['size']:<8} {state:<20} {row['last_run']:<19}"
+            f"{row['site']:<12} {row.get('snapshot_count', 0):<6} {latest:<17} "
+            f"{size:<8} {state:<20} {row['last_run'] or 'n/a':<19}"
         )
 
 
@@ -174,6 +301,9 @@ def build_parser() -> argparse.ArgumentParser:
     summarize.add_argument("--metadata-dir", default="/etc/restic/sites.d")
     summarize.add_argument("--restic-bin", default="/usr/bin/restic")
     summarize.add_argument("--skip-restic", action="store_true")
+    summarize.add_argument("--cached", action="store_true", help="只读取本地缓存，不访问仓库")
+    summarize.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="并发站点数")
+    summarize.add_argument("--json", action="store_true", help="输出 JSON")
     summarize.set_defaults(func=summarize_sites)
 
     return parser
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Bulk systemd unit state queries shared by SaltGoat health checks.
+
+All requested units are fetched with a single ``systemctl show`` call and the
+parsed states are cached for the rest of the run, so a full health sweep
+costs one fork instead of one (or two) per unit.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+
+PROPERTIES = [
+    "Id",
+    "LoadState",
+    "ActiveState",
+    "SubState",
+    "MainPID",
+    "NRestarts",
+    "ExecMainStatus",
+    "ExecMainStartTimestamp",
+    "UnitFileState",
+]
+UNIT_SUFFIXES = (
+    ".service",
+    ".socket",
+    ".timer",
+    ".target",
+    ".mount",
+    ".automount",
+    ".path",
+    ".slice",
+    ".scope",
+    ".swap",
+    ".device",
+)
+# systemctl is-enabled 对这些状态返回 0
+ENABLED_STATES = {"enabled", "enabled-runtime", "static", "alias", "indirect", "generated", "transient"}
+QUERY_TIMEOUT = 15
+
+_CACHE: Dict[str, "UnitState"] = {}
+
+
+@dataclass
+class UnitState:
+    name: str
+    load_state: str = ""
+    active_state: str = ""
+    sub_state: str = ""
+    main_pid: int = 0
+    restarts: int = 0
+    exec_main_status: str = ""
+    exec_main_start: str = ""
+    unit_file_state: str = ""
+
+    @property
+    def exists(self) -> bool:
+        return self.load_state not in ("", "not-found")
+
+    @property
+    def active(self) -> bool:
+        return self.active_state in ("active", "reloading")
+
+    @property
+    def enabled(self) -> bool:
+        return self.unit_file_state in ENABLED_STATES
+
+    def to_dict(self) -> Dict[str, object]:
+        data = asdict(self)
+        data.update(exists=self.exists, active=self.active, enabled=self.enabled)
+        return data
+
+
+def unit_name(name: str) -> str:
+    """Append ``.service`` unless the name already carries a unit suffix."""
+    name = name.strip()
+    return name if name.endswith(UNIT_SUFFIXES) else f"{name}.service"
+
+
+def _to_int(value: Optional[str]) -> int:
+    try:
+        return int(value or 0)
+    except ValueError:
+        return 0
+
+
+def _start_time(value: str) -> str:
+    # "Fri 2025-11-07 03:00:01 UTC" -> "2025-11-07 03:00:01"
+    parts = value.split()
+    return " ".join(parts[1:3]) if len(parts) >= 3 else ""
+
+
+def _parse_blocks(output: str) -> List[Dict[str, str]]:
+    blocks: List[Dict[str, str]] = []
+    current: Dict[str, str] = {}
+    for line in output.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append(current)
+                current = {}
+            continue
+        if "=" in line:
+            key, value = line.split("=", 1)
+            current[key] = value
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def _fetch(units: List[str]) -> Dict[str, UnitState]:
+    names = [unit_name(unit) for unit in units]
+    states = {unit: UnitState(name=name) for unit, name in zip(units, names)}
+    try:
+        proc = subprocess.run(
+            ["systemctl", "show", f"--property={','.join(PROPERTIES)}", "--", *names],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=QUERY_TIMEOUT,
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return states
+    blocks = _parse_blocks(proc.stdout)
+    by_id = {block["Id"]: block for block in blocks if block.get("Id")}
+    positional = len(blocks) == len(units)
+    for index, unit in enumerate(units):
+        # 按 Id 对应输出块；别名单元的 Id 是目标单元名，只在块数与请求一致时按顺序兜底
+        block = by_id.get(names[index]) or (blocks[index] if positional else None)
+        if block is None:
+            # 对不上的单元（如单元名非法、systemd 不可用）保持未知，其余照常解析
+            continue
+        states[unit] = UnitState(
+            name=states[unit].name,
+            load_state=block.get("LoadState", ""),
+            active_state=block.get("ActiveState", ""),
+            sub_state=block.get("SubState", ""),
+            main_pid=_to_int(block.get("MainPID")),
+            restarts=_to_int(block.get("NRestarts")),
+            exec_main_status=block.get("ExecMainStatus", ""),
+            exec_main_start=_start_time(block.get("ExecMainStartTimestamp", "")),
+            unit_file_state=block.get("UnitFileState", ""),
+        )
+    return states
+
+
+def query(units: Iterable[str], refresh: bool = False) -> Dict[str, UnitState]:
+    """Return states keyed by the requested names, fetching uncached ones at once."""
+    wanted: List[str] = []
+    for unit in units:
+        if unit and unit not in wanted:
+            wanted.append(unit)
+    missing = wanted if refresh else [unit for unit in wanted if unit not in _CACHE]
+    if missing:
+        _CACHE.update(_fetch(missing))
+    return {unit: _CACHE[unit] for unit in wanted}
+
+
+def unit_state(unit: str) -> UnitState:
+    return query([unit])[unit]
+
+
+def clear_cache() -> None:
+    _CACHE.clear()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query systemd unit states in one call")
+    parser.add_argument("units", nargs="+")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    states = query(args.units)
+    if args.json:
+        print(json.dumps({unit: state.to_dict() for unit, state in states.items()}, ensure_ascii=False, indent=2))
+        return 0
+    for unit, state in states.items():
+        if not state.exists:
+            print(f"{unit:<24} not-found")
+            continue
+        print(
+            f"{unit:<24} {state.active_state}/{state.sub_state} pid={state.main_pid} "
+            f"restarts={state.restarts} status={state.exec_main_status or '-'}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Minimal in-process RESP client for Valkey/Redis monitoring.
+
+Authentication happens over the socket (the password never appears on a
+process command line) and ``AUTH`` + ``INFO all`` are pipelined, so a full
+sample costs one connection and one round trip.
+"""
+from __future__ import annotations
+
+import socket
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_CONFIG = Path("/etc/valkey/valkey.conf")
+DEFAULT_PORT = 6379
+DEFAULT_TIMEOUT = 3.0
+MAX_BULK_BYTES = 16 * 1024 * 1024
+
+Address = Union[str, Tuple[str, int]]
+
+
+class ValkeyError(RuntimeError):
+    """Connection failures and ``-ERR`` replies."""
+
+
+def server_settings(path: Path = DEFAULT_CONFIG) -> Dict[str, Any]:
+    """Read address and ``requirepass`` from valkey.conf (defaults to 127.0.0.1:6379)."""
+    settings: Dict[str, Any] = {"host": "127.0.0.1", "port": DEFAULT_PORT, "unixsocket": None, "password": None}
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except (OSError, UnicodeDecodeError):
+        return settings
+    for raw in lines:
+        parts = raw.strip().split()
+        if len(parts) < 2 or parts[0].startswith("#"):
+            continue
+        key = parts[0].lower()
+        value = parts[1].strip('"')
+        if key == "requirepass":
+            settings["password"] = value
+        elif key == "port" and value.isdigit():
+            settings["port"] = int(value)
+        elif key == "unixsocket":
+            settings["unixsocket"] = value
+        elif key == "bind":
+            # bind 可列出多个地址，取第一个非通配地址
+            host = next((item.lstrip("-") for item in parts[1:] if item.lstrip("-") not in {"*", "0.0.0.0", "::"}), None)
+            settings["host"] = host or "127.0.0.1"
+    return settings
+
+
+def settings_address(settings: Dict[str, Any]) -> Address:
+    # 配置了 unix socket 时优先使用，省去 TCP 握手
+    if settings.get("unixsocket"):
+        return str(settings["unixsocket"])
+    return settings.get("host") or "127.0.0.1", int(settings.get("port") or DEFAULT_PORT)
+
+
+def encode_command(*args: Any) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+class Connection:
+    """One blocking RESP2 connection."""
+
+    def __init__(self, address: Address, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.address = address
+        try:
+            if isinstance(address, str):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(timeout)
+                self.sock.connect(address)
+            else:
+                self.sock = socket.create_connection(address, timeout=timeout)
+        except OSError as exc:
+            raise ValkeyError(f"{address}: {exc}") from exc
+        self._file = self.sock.makefile("rb")
+
+    def close(self) -> None:
+        try:
+            self._file.close()
+        finally:
+            self.sock.close()
+
+    def __enter__(self) -> "Connection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _readline(self) -> bytes:
+        line = self._file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ValkeyError("connection closed")
+        return line[:-2]
+
+    def read_reply(self) -> Any:
+        """Read one reply; ``-ERR`` replies are returned as ValkeyError instances."""
+        line = self._readline()
+        prefix, rest = line[:1], line[1:]
+        if prefix == b"+":
+            return rest.decode("utf-8", "replace")
+        if prefix == b"-":
+            return ValkeyError(rest.decode("utf-8", "replace"))
+        if prefix == b":":
+            return int(rest)
+        if prefix == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            if length > MAX_BULK_BYTES:
+                raise ValkeyError("reply too large")
+            data = self._file.read(length + 2)
+            if len(data) != length + 2:
+                raise ValkeyError("connection closed")
+            return data[:-2].decode("utf-8", "replace")
+        if prefix == b"*":
+            count = int(rest)
+            return None if count < 0 else [self.read_reply() for _ in range(count)]
+        raise ValkeyError(f"unexpected reply {line[:32]!r}")
+
+    def pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Send all commands in one write and read their replies in order."""
+        try:
+            self.sock.sendall(b"".join(encode_command(*command) for command in commands))
+            return [self.read_reply() for _ in commands]
+        except OSError as exc:
+            raise ValkeyError(f"{self.address}: {exc}") from exc
+
+
+def authenticated(commands: Sequence[Sequence[Any]], password: Optional[str]) -> List[Sequence[Any]]:
+    return ([("AUTH", password)] if password else []) + list(commands)
+
+
+def _coerce(value: str) -> Any:
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_info(text: str) -> Dict[str, Any]:
+    """Flatten ``INFO`` output; ``dbN`` keyspace lines become nested dicts."""
+    info: Dict[str, Any] = {}
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#") or ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        if key.startswith("db") and key[2:].isdigit() and "=" in value:
+            info[key] = {
+                name: _coerce(item)
+                for name, _, item in (field.partition("=") for field in value.split(","))
+            }
+        else:
+            info[key] = _coerce(value)
+    return info
+
+
+def fetch_info(address: Address, password: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+    """Authenticate and read ``INFO all`` in a single round trip."""
+    with Connection(address, timeout) as conn:
+        replies = conn.pipeline(authenticated([("INFO", "all")], password))
+    for reply in replies:
+        if isinstance(reply, ValkeyError):
+            raise reply
+    return parse_info(replies[-1] or "")
+
+
+def run_command(address: Address, password: Optional[str], *args: Any, timeout: float = DEFAULT_TIMEOUT) -> Any:
+    with Connection(address, timeout) as conn:
+        replies = conn.pipeline(authenticated([args], password))
+    for reply in replies:
+        if isinstance(reply, ValkeyError):
+            raise reply
+    return replies[-1]
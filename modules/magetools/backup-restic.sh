@@ -843,7 +843,7 @@ summarize_sites() {
         log_warning "未找到任何站点记录，可通过 'saltgoat magetools backup restic install --site <name>' 初始化"
         return
     fi
-    sudo python3 "${SCRIPT_DIR}/modules/lib/restic_helpers.py" summarize-sites --metadata-dir "$SITE_METADATA_DIR"
+    sudo python3 "${SCRIPT_DIR}/modules/lib/restic_helpers.py" summarize-sites --metadata-dir "$SITE_METADATA_DIR" "$@"
 }
 
 run_manual_backup() {
@@ -1110,7 +1110,9 @@ case "$ACTION" in
         fi
         ;;
     summary|status-all|overview)
-        summarize_sites
+        shift || true
+        # 透传 --cached / --json / --workers
+        summarize_sites "$@"
         ;;
     status)
         shift || true
@@ -3,16 +3,18 @@
 Magento 2 schedule automation helper.
 
 Provides list/auto operations for installing Salt Schedule jobs per detected site.
+``auto`` reconciles every site in one ``saltgoat.magento_schedule_reconcile``
+call; ``plan`` (or ``auto --plan``) prints the diff without applying it.
 """
 
 from __future__ import annotations
 
 import json
 import os
-import re
 import shutil
 import subprocess
 import sys
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
@@ -143,25 +145,6 @@ def _job_applies(job: Dict[str, object], site: str) -> bool:
     return True
 
 
-def _command_from_details(details: Dict[str, object]) -> str:
-    args = details.get("args") or details.get("job_args")
-    if isinstance(args, list) and args:
-        return " ".join(str(item) for item in args)
-    if isinstance(args, str):
-        return args
-    return ""
-
-
-def _sites_in_command(command: str) -> Set[str]:
-    sites: Set[str] = set()
-    match = re.search(r"--site\s+([\w\-/]+)", command)
-    if match:
-        sites.add(match.group(1))
-    for path_match in re.findall(r"/var/www/([\w\-]+)", command):
-        sites.add(path_match)
-    return sites
-
-
 def expected_job_names(site: SiteRecord, config: Dict[str, object]) -> Set[str]:
     jobs: Set[str] = set()
     token = site.token
@@ -202,7 +185,7 @@ def expected_job_names(site: SiteRecord, config: Dict[str, object]) -> Set[str]:
             jobs.add(str(name))
             has_watcher = True
     if not has_watcher:
-        jobs.add(f"{label}-api-watch")
+        jobs.add("saltgoat_api_watch_all")
 
     stats_jobs = config.get("stats_jobs")
     has_stats = False
@@ -328,88 +311,81 @@ def show_list(
     return 0
 
 
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000.0, 1)
+
+
+def print_plan(plan: Dict[str, object]) -> None:
+    labels = (("add", "新增"), ("update", "更新"), ("remove", "清理"))
+    for key, label in labels:
+        names = plan.get(key) or []
+        if isinstance(names, list) and names:
+            info(f"{label} {len(names)} 个任务:")
+            for name in names:
+                print(f"    {'+' if key == 'add' else '~' if key == 'update' else '-'} {name}")
+    info(f"保持不变: {plan.get('unchanged', 0)} 个任务")
+
+
+def print_timings(timings: Dict[str, object]) -> None:
+    parts = [f"{key[:-3]}={value}ms" for key, value in timings.items() if key.endswith("_ms")]
+    if parts:
+        info("耗时: " + ", ".join(parts))
+
+
 def run_auto(
     sites: List[SiteRecord],
     config: Dict[str, object],
     schedule_map: Optional[Dict[str, object]] = None,
+    plan_only: bool = False,
+    timings: Optional[Dict[str, float]] = None,
 ) -> int:
-    if shutil.which("salt-call"):
+    timings = dict(timings or {})
+    if not sites:
+        warning("未检测到任何 Magento 站点，自动安装已跳过。")
+        return 0
+    if not plan_only and shutil.which("salt-call"):
+        start = time.perf_counter()
         subprocess.run(
             ["sudo", "salt-call", "--local", "saltutil.sync_modules"],
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
-    if not sites:
-        warning("未检测到任何 Magento 站点，自动安装已跳过。")
+        timings["sync_ms"] = _ms(start)
+
+    # 所有站点一次性对账：一次 schedule.list，内存中增删改后一次 schedule.save
+    site_arg = ",".join(record.site for record in sites)
+    info(f"对账站点: {site_arg}")
+    start = time.perf_counter()
+    _, stdout, stderr, parsed = run_salt(
+        ["saltgoat.magento_schedule_reconcile", f"sites={site_arg}", f"plan={plan_only}"],
+        json_out=True,
+    )
+    timings["reconcile_ms"] = _ms(start)
+    local = parsed.get("local") if isinstance(parsed, dict) else None
+    if not isinstance(local, dict):
+        error(f"调用失败，输出: {stdout or stderr}")
+        return 1
+    plan = local.get("plan") if isinstance(local.get("plan"), dict) else {}
+    print_plan(plan)
+    remote = local.get("timings") if isinstance(local.get("timings"), dict) else {}
+    timings.update({f"salt_{key}": value for key, value in remote.items()})
+    if not local.get("result", False):
+        error(f"对账失败: {local.get('comment', '未知错误')}")
+        print_timings(timings)
+        return 1
+    if plan_only:
+        print_timings(timings)
         return 0
 
-    failures = 0
-    results: List[str] = []
-    topic_sites: Set[str] = set()
-
-    for record in sites:
-        info(f"处理站点: {record.site}")
-        args = [f"saltgoat.magento_schedule_install", f"site={record.site}"]
-        _, stdout, stderr, parsed = run_salt(args, json_out=True)
-        local = parsed.get("local") if isinstance(parsed, dict) else None
-        if not isinstance(local, dict):
-            failures += 1
-            error(f"  调用失败，输出: {stdout or stderr}")
-            continue
-        if not local.get("result", False):
-            failures += 1
-            comment = str(local.get("comment", "未知错误"))
-            error(f"  安装失败: {comment}")
-            continue
-        comment = str(local.get("comment", "")).strip()
-        success("  Salt Schedule 安装/验证完成。")
-
-        if comment:
-            info(f"  备注: {comment}")
-        results.append(record.site)
-        topic_sites.add(base_site_name(record.site))
-
-    print()
-    success(f"已处理站点: {', '.join(results)}")
-    ensure_telegram_topics(topic_sites)
-    refreshed_map = fetch_schedule_jobs()
-
-    existing_tokens = {record.token for record in sites}
-    existing_names = {record.site for record in sites}
-
-    expected_all: Set[str] = set()
-    for record in sites:
-        expected_all.update(expected_job_names(record, config))
-    expected_all.add("saltgoat_schedule_auto")
-    expected_all.add("saltgoat_daily_summary")
-
-    removed_jobs: List[str] = []
-    for job_name, details in list(refreshed_map.items()):
-        if job_name in expected_all:
-            continue
-        command = _command_from_details(details if isinstance(details, dict) else {})
-        sites_in_cmd = _sites_in_command(command)
-        if not sites_in_cmd:
-            if job_name.startswith("magento_"):
-                token_part = job_name.split("_", 2)[1] if "_" in job_name else ""
-                if token_part and token_part not in existing_tokens:
-                    if run_salt(["schedule.delete", job_name])[0] == 0:
-                        removed_jobs.append(job_name)
-            continue
-        orphan = all(site not in existing_names for site in sites_in_cmd)
-        if orphan:
-            if run_salt(["schedule.delete", job_name])[0] == 0:
-                removed_jobs.append(job_name)
-
-    if removed_jobs:
-        warning(
-            "清理遗留 Salt Schedule 任务: " + ", ".join(sorted(set(removed_jobs)))
-        )
-
-    if failures:
-        error(f"{failures} 个站点安装失败，请检查日志后重试。")
-        return 1
+    comment = str(local.get("comment", "")).strip()
+    success("Salt Schedule 对账完成。")
+    if comment:
+        info(f"备注: {comment}")
+    ensure_telegram_topics({base_site_name(record.site) for record in sites})
+    print_timings(timings)
 
+    present = local.get("present") if isinstance(local.get("present"), list) else []
+    refreshed_map: Dict[str, object] = {str(name): {} for name in present}
     info("重新检测 Salt Schedule 配置:")
     print()
     return show_list(sites, config, refreshed_map)
@@ -420,19 +396,28 @@ def ensure_sites_order(sites: Iterable[SiteRecord]) -> List[SiteRecord]:
 
 
 def main(argv: Sequence[str]) -> int:
-    action = argv[1] if len(argv) > 1 else "list"
+    args = list(argv[1:])
+    plan_only = "--plan" in args
+    args = [arg for arg in args if arg != "--plan"]
+    action = args[0] if args else "list"
+    if action == "plan":
+        action, plan_only = "auto", True
     if action not in {"list", "auto"}:
-        error("Usage: saltgoat magetools schedule [list|auto]")
+        error("Usage: saltgoat magetools schedule [list|auto|plan] [--plan]")
         return 1
 
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
     sites = ensure_sites_order(detect_sites())
+    timings["detect_ms"] = _ms(start)
+    start = time.perf_counter()
     config = load_pillar_config()
+    timings["pillar_ms"] = _ms(start)
 
     if action == "list":
         schedule_map = fetch_schedule_jobs()
         return show_list(sites, config, schedule_map)
-    schedule_map = fetch_schedule_jobs()
-    return run_auto(sites, config, schedule_map)
+    return run_auto(sites, config, plan_only=plan_only, timings=timings)
 
 
 if __name__ == "__main__":
@@ -8,18 +8,22 @@ import base64
 import binascii
 import hashlib
 import hmac
+import http.client
 import json
+import math
 import os
 import random
 import string
 import subprocess
 import sys
+import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 import html
 
 SALT_SITE_ENV = os.environ.get("SALTGOAT_SALT_SITEPKG")
@@ -55,11 +59,24 @@ sys.path.insert(0, str(REPO_ROOT))
 from modules.lib import notification as notif  # type: ignore
 from modules.lib import logging_utils
 from modules.lib import config_loader
+from modules.lib import pillar_cache
 
 ALERT_LOG = logging_utils.alerts_log_path()
 
 TEST_MODE = os.environ.get("MAGENTO_WATCHER_TEST_MODE") == "1"
 RECENT_IDS_LIMIT = 256
+REQUEST_TIMEOUT = float(os.environ.get("MAGENTO_WATCHER_TIMEOUT", "15"))
+# 已知 total_count 后并发预取的页数
+PREFETCH_WORKERS = max(1, int(os.environ.get("MAGENTO_WATCHER_WORKERS", "4")))
+# 仅拉取通知所需字段，减少 Magento 序列化与传输开销
+ORDER_FIELDS = (
+    "items[entity_id,increment_id,grand_total,base_currency_code,status,created_at,"
+    "customer_firstname,customer_lastname,customer_email],total_count"
+)
+CUSTOMER_FIELDS = "items[id,firstname,lastname,email,created_at,group_id],total_count"
+# --all-sites 模式下的并发站点数与单站点时间预算（秒）
+SITE_WORKERS = max(1, int(os.environ.get("MAGENTO_WATCHER_SITES", "4")))
+SITE_TIMEOUT = 120.0
 ADMIN_TOKEN_CACHE_FILE = "admin_token.json"
 ADMIN_TOKEN_EXPIRY_BUFFER = 300
 
@@ -295,7 +312,7 @@ def pillar_get(path: str, default: Any = "") -> Any:
     return value if value is not None else default
 
 
-def load_local_secret(site: str) -> Dict[str, Any]:
+def load_local_secrets() -> Dict[str, Any]:
     if yaml is None:
         return {}
     if not SECRET_DIR.exists():
@@ -303,7 +320,7 @@ def load_local_secret(site: str) -> Dict[str, Any]:
     merged: Dict[str, Any] = {}
     for path in sorted(SECRET_DIR.glob("*.sls")):
         try:
-            data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+            data = pillar_cache.load_dict(path, copy_result=False)
         except Exception:
             continue
         secrets = data.get("secrets")
@@ -312,10 +329,33 @@ def load_local_secret(site: str) -> Dict[str, Any]:
         magento_api = secrets.get("magento_api")
         if isinstance(magento_api, dict):
             merged.update(magento_api)
-    entry = merged.get(site)
+    return merged
+
+
+def load_local_secret(site: str) -> Dict[str, Any]:
+    entry = load_local_secrets().get(site)
     return entry if isinstance(entry, dict) else {}
 
 
+def discover_sites() -> List[str]:
+    """Sites with API credentials that are not polled by their own api_watchers job."""
+    sites: Set[str] = set()
+    for source in (pillar_get("secrets:magento_api", {}), load_local_secrets()):
+        if isinstance(source, dict):
+            sites.update(str(name) for name, entry in source.items() if isinstance(entry, dict))
+    watchers = pillar_get("magento_schedule:api_watchers", [])
+    if isinstance(watchers, list):
+        for watcher in watchers:
+            if not isinstance(watcher, dict) or not watcher.get("name"):
+                continue
+            if watcher.get("site"):
+                sites.discard(str(watcher["site"]))
+            job_sites = watcher.get("sites")
+            if isinstance(job_sites, (list, tuple, set)):
+                sites.difference_update(str(item) for item in job_sites)
+    return sorted(sites)
+
+
 def emit_event(tag: str, data: Dict[str, Any]) -> None:
     if not config_loader.fire_event(tag, data):  # pragma: no cover - best-effort
         LOG(f"[WARNING] event.send 失败 ({tag})")
@@ -341,6 +381,19 @@ def log_to_file(label: str, tag: str, payload: Dict[str, Any]) -> None:
         pass
 
 
+_PROFILE_LOCK = threading.Lock()
+_PROFILE_CACHE: Optional[List[Dict[str, Any]]] = None
+
+
+def _telegram_profiles(log: Any) -> List[Dict[str, Any]]:
+    # --all-sites 时所有站点共用一份 profile 与同一个 reactor_common 发送队列
+    global _PROFILE_CACHE
+    with _PROFILE_LOCK:
+        if _PROFILE_CACHE is None:
+            _PROFILE_CACHE = reactor_common.load_telegram_profiles(None, log)
+        return _PROFILE_CACHE
+
+
 def telegram_broadcast(
     tag: str,
     message: str,
@@ -375,7 +428,7 @@ def telegram_broadcast(
     parse_mode = notif.get_parse_mode()
 
     try:
-        profiles = reactor_common.load_telegram_profiles(None, _log)
+        profiles = _telegram_profiles(_log)
     except Exception as exc:  # pragma: no cover
         log_to_file("TELEGRAM", f"{tag} error", {"message": str(exc)})
         notif.queue_failure(
@@ -450,6 +503,52 @@ def build_message(kind: str, site: str, payload: Dict[str, Any]) -> Tuple[str, s
         return format_block(kind.upper(), site_label, fields)
 
 
+def total_pages(payload: Dict[str, Any], page_size: int) -> int:
+    try:
+        total = int(payload.get("total_count", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+    return math.ceil(total / page_size) if total > 0 and page_size > 0 else 0
+
+
+def prefetch_pages(
+    fetch: Callable[[int], Dict[str, Any]],
+    page_size: int,
+    max_pages: Optional[int] = None,
+    workers: int = 0,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(page, payload)`` in order; once page 1 reports total_count the
+    following pages are fetched concurrently. Errors from ``fetch`` propagate."""
+    workers = workers or PREFETCH_WORKERS
+    limit = max_pages or sys.maxsize
+    executor: Optional[ThreadPoolExecutor] = None
+    futures: Dict[int, Future] = {}
+    last_page = 1
+    next_page = 2
+    page = 1
+    try:
+        while page <= limit:
+            payload = futures.pop(page).result() if page in futures else fetch(page)
+            if page == 1 and workers > 1:
+                last_page = min(total_pages(payload, page_size), limit)
+                if last_page > 1:
+                    executor = ThreadPoolExecutor(
+                        max_workers=min(workers, last_page - 1), thread_name_prefix="magento-page"
+                    )
+            if executor is not None:
+                # 滑动窗口：在途页数有上限，内存占用不随总页数增长
+                while next_page <= last_page and len(futures) < workers * 2:
+                    futures[next_page] = executor.submit(fetch, next_page)
+                    next_page += 1
+            yield page, payload
+            page += 1
+    finally:
+        for future in futures.values():
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
 class MagentoWatcher:
     def __init__(
         self,
@@ -461,6 +560,7 @@ class MagentoWatcher:
         auth_mode: str = "bearer",
         oauth_params: Optional[Dict[str, str]] = None,
         max_pages: int = 25,
+        deadline: Optional[float] = None,
     ):
         self.site = site
         self.site_topic = site.replace("/", "-").lower()
@@ -471,6 +571,7 @@ class MagentoWatcher:
         self.auth_mode = auth_mode
         self.oauth_params = oauth_params or {}
         self.max_pages = max_pages
+        self.deadline = deadline
         self.oauth_signer: Optional[OAuth1Signer] = None
         if self.auth_mode == "oauth1":
             consumer_key = self.oauth_params.get("consumer_key") or self.oauth_params.get("client_key")
@@ -507,6 +608,8 @@ class MagentoWatcher:
             )
         self.state_dir = STATE_ROOT / site
         self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._idle_connections: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._connection_lock = threading.Lock()
 
     @staticmethod
     def _normalize_params(params: Dict[str, Any]) -> List[Tuple[str, str]]:
@@ -538,6 +641,31 @@ class MagentoWatcher:
         else:
             raise MagentoAPIError(f"不支持的认证模式: {self.auth_mode}")
 
+    def _acquire_connection(self, key: Tuple[str, str]) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._connection_lock:
+            idle = self._idle_connections.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=REQUEST_TIMEOUT), False
+        return http.client.HTTPConnection(netloc, timeout=REQUEST_TIMEOUT), False
+
+    def _release_connection(self, key: Tuple[str, str], conn: http.client.HTTPConnection) -> None:
+        with self._connection_lock:
+            idle = self._idle_connections.setdefault(key, [])
+            if len(idle) < PREFETCH_WORKERS:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._connection_lock:
+            connections = [conn for idle in self._idle_connections.values() for conn in idle]
+            self._idle_connections.clear()
+        for conn in connections:
+            conn.close()
+
     def _request(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
         query_items = self._normalize_params(params)
         base_url = self._build_url(path)
@@ -545,22 +673,36 @@ class MagentoWatcher:
         url = f"{base_url}?{query_string}" if query_string else base_url
         req = urllib.request.Request(url)
         self._apply_auth(req, "GET", base_url, query_items)
-        try:
-            with urllib.request.urlopen(req, timeout=30) as resp:  # nosec
-                charset = resp.headers.get_content_charset() or "utf-8"
-                data = resp.read().decode(charset, errors="replace")
-        except urllib.error.HTTPError as exc:
-            body = ""
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in {"http", "https"} or not parts.netloc:
+            raise MagentoAPIError(f"URL error: 无效的地址 {base_url}")
+        key = (parts.scheme, parts.netloc)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = dict(req.header_items())
+        headers["Accept"] = "application/json"
+
+        # 复用同站点的 keep-alive 连接；复用连接被服务端关闭时换新连接重试一次
+        for attempt in range(2):
+            conn, reused = self._acquire_connection(key)
             try:
-                body = exc.read().decode("utf-8", errors="ignore")
-            except Exception:
-                pass
-            raise MagentoAPIError(f"HTTP {exc.code} {exc.reason}", body) from exc
-        except urllib.error.URLError as exc:
-            raise MagentoAPIError(f"URL error: {exc.reason}") from exc
-        except Exception as exc:
-            raise MagentoAPIError(f"HTTP request failed: {exc}") from exc
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except (http.client.HTTPException, OSError) as exc:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise MagentoAPIError(f"HTTP request failed: {exc}") from exc
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release_connection(key, conn)
+            break
 
+        if resp.status >= 400:
+            raise MagentoAPIError(f"HTTP {resp.status} {resp.reason}", raw.decode("utf-8", errors="ignore"))
+        charset = resp.headers.get_content_charset() or "utf-8"
+        data = raw.decode(charset, errors="replace")
         try:
             return json.loads(data)
         except json.JSONDecodeError as exc:
@@ -575,6 +717,61 @@ class MagentoWatcher:
             body_suffix = f" Body: {snippet}"
         LOG(f"[ERROR] {self.site} 获取 {kind} 失败: {exc}{body_suffix}")
 
+    def _fetch_pages(
+        self,
+        kind: str,
+        endpoint: str,
+        base_params: Dict[str, Any],
+        max_pages: Optional[int] = None,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield ``(page, payload)`` in order, logging API errors and stopping at the deadline."""
+        max_pages = max_pages or self.max_pages
+
+        def fetch(page: int) -> Dict[str, Any]:
+            params = dict(base_params)
+            params["searchCriteria[current_page]"] = page
+            return self._request(endpoint, params)
+
+        pages = prefetch_pages(fetch, self.page_size, max_pages)
+        first: Dict[str, Any] = {}
+        try:
+            while True:
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    LOG(f"[WARNING] {self.site} {kind} 超出时间预算，剩余记录将在下次运行从检查点继续。")
+                    return
+                try:
+                    item = next(pages)
+                except StopIteration:
+                    break
+                except MagentoAPIError as exc:
+                    self._log_api_error(kind, exc)
+                    return
+                except Exception as exc:  # pragma: no cover
+                    LOG(f"[ERROR] {self.site} 获取 {kind} 失败: {exc}")
+                    return
+                if item[0] == 1:
+                    first = item[1]
+                yield item
+            if max_pages == self.max_pages and self._more_pages_after(first, fetch, max_pages):
+                LOG(
+                    f"[WARNING] {self.site} {kind} 超过 {self.max_pages} 页阈值，本次处理前 "
+                    f"{self.max_pages * self.page_size} 条记录，其余将在下次运行从检查点继续。"
+                )
+        finally:
+            pages.close()
+
+    def _more_pages_after(
+        self, first: Dict[str, Any], fetch: Callable[[int], Dict[str, Any]], max_pages: int
+    ) -> bool:
+        """True when data exists beyond ``max_pages`` (not when it exactly fills them)."""
+        if isinstance(first, dict) and "total_count" in first:
+            return total_pages(first, self.page_size) > max_pages
+        # 响应里没有 total_count 时探测下一页
+        try:
+            return bool(fetch(max_pages + 1).get("items"))
+        except Exception:  # noqa: BLE001
+            return False
+
     def _collect_entities(
         self,
         kind: str,
@@ -582,6 +779,7 @@ class MagentoWatcher:
         id_field: str,
         filter_field: Optional[str] = None,
         sort_field: Optional[str] = None,
+        fields: Optional[str] = None,
     ) -> Dict[str, Any]:
         filter_field = filter_field or id_field
         last_id = self._load_last_id(kind)
@@ -597,10 +795,8 @@ class MagentoWatcher:
                 return {
                     "bootstrap": True,
                     "skip_processing": True,
-                    "items": [],
-                    "max_id": baseline,
+                    "pages": iter(()),
                     "last_id": baseline,
-                    "truncated": False,
                 }
             last_id = 0
         bootstrap = last_id == 0
@@ -614,80 +810,67 @@ class MagentoWatcher:
             "searchCriteria[sortOrders][0][direction]": "ASC",
             "searchCriteria[pageSize]": self.page_size,
         }
-
-        collected: List[Dict[str, Any]] = []
-        seen_ids: set[int] = set()
-        max_id = last_id
-        page = 1
-        truncated = False
-        stalled_rounds = 0
-
-        while True:
-            if page > self.max_pages:
-                truncated = True
-                LOG(
-                    f"[WARNING] {self.site} {kind} 超过 {self.max_pages} 页阈值，仅处理前 {self.max_pages * self.page_size} 条记录。"
-                )
-                break
-
-            params = dict(base_params)
-            params["searchCriteria[current_page]"] = page
-            try:
-                payload = self._request(endpoint, params)
-            except MagentoAPIError as exc:
-                self._log_api_error(kind, exc)
-                break
-            except Exception as exc:  # pragma: no cover
-                LOG(f"[ERROR] {self.site} 获取 {kind} 失败: {exc}")
-                break
-
-            items = payload.get("items", [])
-            if not isinstance(items, list) or not items:
-                break
-
-            page_new: List[Dict[str, Any]] = []
-            for item in items:
-                raw_id = item.get(id_field, item.get("entity_id"))
-                try:
-                    entity_id = int(raw_id)
-                except (TypeError, ValueError):
-                    continue
-                if entity_id in seen_ids:
-                    continue
-                seen_ids.add(entity_id)
-                if entity_id > max_id:
-                    max_id = entity_id
-                if entity_id > last_id:
-                    page_new.append(item)
-
-            collected.extend(page_new)
-
-            if bootstrap:
-                break
-
-            if len(items) < self.page_size:
-                break
-
-            if not page_new:
-                stalled_rounds += 1
-            else:
-                stalled_rounds = 0
-
-            if stalled_rounds >= 2:
-                LOG(f"[WARNING] {self.site} {kind} 连续无新记录，提前结束。")
-                break
-
-            page += 1
+        if fields:
+            base_params["fields"] = fields
 
         return {
             "bootstrap": bootstrap,
             "skip_processing": False,
-            "items": collected,
-            "max_id": max_id,
+            "pages": self._iter_entity_pages(kind, endpoint, id_field, base_params, last_id, bootstrap),
             "last_id": last_id,
-            "truncated": truncated,
         }
 
+    def _iter_entity_pages(
+        self,
+        kind: str,
+        endpoint: str,
+        id_field: str,
+        base_params: Dict[str, Any],
+        last_id: int,
+        bootstrap: bool,
+    ) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+        """Yield ``(new_items, checkpoint_id)`` per page in ascending ID order."""
+        seen_ids: Set[int] = set()
+        max_id = last_id
+        stalled_rounds = 0
+        pages = self._fetch_pages(kind, endpoint, base_params, max_pages=1 if bootstrap else None)
+        try:
+            for _page, payload in pages:
+                items = payload.get("items", [])
+                if not isinstance(items, list) or not items:
+                    return
+
+                page_new: List[Dict[str, Any]] = []
+                for item in items:
+                    raw_id = item.get(id_field, item.get("entity_id"))
+                    try:
+                        entity_id = int(raw_id)
+                    except (TypeError, ValueError):
+                        continue
+                    if entity_id in seen_ids:
+                        continue
+                    seen_ids.add(entity_id)
+                    if entity_id > max_id:
+                        max_id = entity_id
+                    if entity_id > last_id:
+                        page_new.append(item)
+
+                yield page_new, max_id
+
+                if len(items) < self.page_size:
+                    return
+
+                if not page_new:
+                    stalled_rounds += 1
+                else:
+                    stalled_rounds = 0
+
+                if stalled_rounds >= 2:
+                    LOG(f"[WARNING] {self.site} {kind} 连续无新记录，提前结束。")
+                    return
+        finally:
+            pages.close()
+
     def _state_file(self, kind: str) -> Path:
         return self.state_dir / f"last_{kind}.json"
 
@@ -795,6 +978,7 @@ class MagentoWatcher:
             "searchCriteria[sortOrders][0][direction]": "DESC",
             "searchCriteria[pageSize]": 1,
             "searchCriteria[current_page]": 1,
+            "fields": f"items[{id_field}]",
         }
         if filter_field:
             params["searchCriteria[filter_groups][0][filters][0][field]"] = filter_field
@@ -820,97 +1004,86 @@ class MagentoWatcher:
         return latest
 
     def process_orders(self) -> None:
-        result = self._collect_entities("orders", "/rest/V1/orders", "entity_id")
+        result = self._collect_entities("orders", "/rest/V1/orders", "entity_id", fields=ORDER_FIELDS)
         if result["skip_processing"]:
             return
-        bootstrap = result["bootstrap"]
-        max_id = result["max_id"]
         last_id = result["last_id"]
-        items = result["items"]
         state = self._load_state("orders")
 
-        if bootstrap:
+        if result["bootstrap"]:
+            max_id = last_id
+            for _items, checkpoint in result["pages"]:
+                max_id = max(max_id, checkpoint)
             if max_id > last_id:
                 self._save_last_id("orders", max_id, state=state)
                 LOG(f"[INFO] {self.site} 首次运行，记录最新订单 ID={max_id}，不发送通知。")
             return
 
-        if not items:
-            return
-
-        if result["truncated"]:
-            self._save_last_id("orders", max_id, state=state)
-            LOG(
-                f"[WARNING] {self.site} orders 回溯记录超过 {self.max_pages * self.page_size} 条，"
-                "已更新基线并跳过本次通知，避免刷屏。"
-            )
-            return
-
         recent_ids: Set[int] = set()
         for entry in state.get("recent_ids", []):
             try:
                 recent_ids.add(int(entry))
             except (TypeError, ValueError):
                 continue
-        new_ids: List[int] = []
 
-        for item in items:
-            raw_entity_id = item.get("entity_id")
-            entity_id_int: Optional[int] = None
-            try:
-                entity_id_int = int(raw_entity_id)
-            except (TypeError, ValueError):
-                entity_id_int = None
-            if entity_id_int is not None and entity_id_int in recent_ids:
-                continue
-            if entity_id_int is not None:
-                new_ids.append(entity_id_int)
-                recent_ids.add(entity_id_int)
-            entity_id = entity_id_int if entity_id_int is not None else raw_entity_id
-            increment_id = item.get("increment_id") or entity_id
-            total = item.get("grand_total")
-            currency = item.get("base_currency_code") or ""
-            status = item.get("status") or ""
-            created_at = item.get("created_at") or ""
-            customer = (item.get("customer_firstname") or "") + " " + (item.get("customer_lastname") or "")
-            customer = customer.strip() or "Guest"
-            email = item.get("customer_email") or ""
-
-            event_data = {
-                "site": self.site,
-                "site_slug": self.site_topic,
-                "entity_id": entity_id,
-                "increment_id": increment_id,
-                "grand_total": total,
-                "currency": currency,
-                "status": status,
-                "created_at": created_at,
-                "customer": customer,
-                "email": email,
-                "severity": "INFO",
-            }
-            telegram_tag = f"saltgoat/business/order/{self.site_topic}"
-            event_data["tag"] = telegram_tag
-            thread_id = notif.get_thread_id(telegram_tag)
-            if thread_id is not None:
-                event_data["telegram_thread"] = thread_id
-            emit_event("saltgoat/business/order", event_data)
-            plain_block, message = build_message(
-                "order",
-                self.site,
-                {
-                    "order": f"#{increment_id}",
-                    "total": f"{total} {currency}".strip(),
+        # 每页处理完即写检查点，超出页数阈值或中断后下次从此处续传
+        for items, checkpoint in result["pages"]:
+            new_ids: List[int] = []
+            for item in items:
+                raw_entity_id = item.get("entity_id")
+                entity_id_int: Optional[int] = None
+                try:
+                    entity_id_int = int(raw_entity_id)
+                except (TypeError, ValueError):
+                    entity_id_int = None
+                if entity_id_int is not None and entity_id_int in recent_ids:
+                    continue
+                if entity_id_int is not None:
+                    new_ids.append(entity_id_int)
+                    recent_ids.add(entity_id_int)
+                entity_id = entity_id_int if entity_id_int is not None else raw_entity_id
+                increment_id = item.get("increment_id") or entity_id
+                total = item.get("grand_total")
+                currency = item.get("base_currency_code") or ""
+                status = item.get("status") or ""
+                created_at = item.get("created_at") or ""
+                customer = (item.get("customer_firstname") or "") + " " + (item.get("customer_lastname") or "")
+                customer = customer.strip() or "Guest"
+                email = item.get("customer_email") or ""
+
+                event_data = {
+                    "site": self.site,
+                    "site_slug": self.site_topic,
+                    "entity_id": entity_id,
+                    "increment_id": increment_id,
+                    "grand_total": total,
+                    "currency": currency,
                     "status": status,
+                    "created_at": created_at,
                     "customer": customer,
                     "email": email,
-                    "created_at": created_at,
-                },
-            )
-            telegram_broadcast(telegram_tag, message, event_data, plain_block)
-        self._save_last_id("orders", max_id, new_ids, state=state)
-        if result["truncated"]:
-            LOG(f"[WARNING] {self.site} 订单存在超过 {self.max_pages * self.page_size} 条新纪录，已仅推送最近 {len(items)} 条。")
+                    "severity": "INFO",
+                }
+                telegram_tag = f"saltgoat/business/order/{self.site_topic}"
+                event_data["tag"] = telegram_tag
+                thread_id = notif.get_thread_id(telegram_tag)
+                if thread_id is not None:
+                    event_data["telegram_thread"] = thread_id
+                emit_event("saltgoat/business/order", event_data)
+                plain_block, message = build_message(
+                    "order",
+                    self.site,
+                    {
+                        "order": f"#{increment_id}",
+                        "total": f"{total} {currency}".strip(),
+                        "status": status,
+                        "customer": customer,
+                        "email": email,
+                        "created_at": created_at,
+                    },
+                )
+                telegram_broadcast(telegram_tag, message, event_data, plain_block)
+            self._save_last_id("orders", checkpoint, new_ids, state=state)
 
     def process_customers(self) -> None:
         result = self._collect_entities(
@@ -919,125 +1092,136 @@ class MagentoWatcher:
             "id",
             filter_field="entity_id",
             sort_field="entity_id",
+            fields=CUSTOMER_FIELDS,
         )
         if result["skip_processing"]:
             return
-        bootstrap = result["bootstrap"]
-        max_id = result["max_id"]
         last_id = result["last_id"]
-        items = result["items"]
         state = self._load_state("customers")
 
-        if bootstrap:
+        if result["bootstrap"]:
+            max_id = last_id
+            for _items, checkpoint in result["pages"]:
+                max_id = max(max_id, checkpoint)
             if max_id > last_id:
                 self._save_last_id("customers", max_id, state=state)
                 LOG(f"[INFO] {self.site} 首次运行，记录最新用户 ID={max_id}，不发送通知。")
             return
 
-        if not items:
-            return
-
-        if result["truncated"]:
-            self._save_last_id("customers", max_id, state=state)
-            LOG(
-                f"[WARNING] {self.site} customers 回溯记录超过 {self.max_pages * self.page_size} 条，"
-                "已更新基线并跳过本次通知，避免刷屏。"
-            )
-            return
-
         recent_ids: Set[int] = set()
         for entry in state.get("recent_ids", []):
             try:
                 recent_ids.add(int(entry))
             except (TypeError, ValueError):
                 continue
-        new_ids: List[int] = []
 
-        for item in items:
-            raw_entity_id = item.get("id")
-            entity_id_int: Optional[int] = None
-            try:
-                entity_id_int = int(raw_entity_id)
-            except (TypeError, ValueError):
-                entity_id_int = None
-            if entity_id_int is not None and entity_id_int in recent_ids:
-                continue
-            if entity_id_int is not None:
-                new_ids.append(entity_id_int)
-                recent_ids.add(entity_id_int)
-            entity_id = entity_id_int if entity_id_int is not None else raw_entity_id
-            firstname = item.get("firstname") or ""
-            lastname = item.get("lastname") or ""
-            name = (firstname + " " + lastname).strip() or "(未命名)"
-            email = item.get("email") or ""
-            created_at = item.get("created_at") or ""
-            group_id = item.get("group_id")
-
-            event_data = {
-                "site": self.site,
-                "site_slug": self.site_topic,
-                "entity_id": entity_id,
-                "name": name,
-                "email": email,
-                "created_at": created_at,
-                "group_id": group_id,
-                "customer_id": item.get("id"),
-                "severity": "INFO",
-            }
-            telegram_tag = f"saltgoat/business/customer/{self.site_topic}"
-            event_data["tag"] = telegram_tag
-            thread_id = notif.get_thread_id(telegram_tag)
-            if thread_id is not None:
-                event_data["telegram_thread"] = thread_id
-            emit_event("saltgoat/business/customer", event_data)
-            plain_block, message = build_message(
-                "customer",
-                self.site,
-                {
-                    "id": entity_id,
-                    "customer": name,
+        # 每页处理完即写检查点，超出页数阈值或中断后下次从此处续传
+        for items, checkpoint in result["pages"]:
+            new_ids: List[int] = []
+            for item in items:
+                raw_entity_id = item.get("id")
+                entity_id_int: Optional[int] = None
+                try:
+                    entity_id_int = int(raw_entity_id)
+                except (TypeError, ValueError):
+                    entity_id_int = None
+                if entity_id_int is not None and entity_id_int in recent_ids:
+                    continue
+                if entity_id_int is not None:
+                    new_ids.append(entity_id_int)
+                    recent_ids.add(entity_id_int)
+                entity_id = entity_id_int if entity_id_int is not None else raw_entity_id
+                firstname = item.get("firstname") or ""
+                lastname = item.get("lastname") or ""
+                name = (firstname + " " + lastname).strip() or "(未命名)"
+                email = item.get("email") or ""
+                created_at = item.get("created_at") or ""
+                group_id = item.get("group_id")
+
+                event_data = {
+                    "site": self.site,
+                    "site_slug": self.site_topic,
+                    "entity_id": entity_id,
+                    "name": name,
                     "email": email,
                     "created_at": created_at,
-                    "customer_group": group_id,
-                },
-            )
-            telegram_broadcast(telegram_tag, message, event_data, plain_block)
-        self._save_last_id("customers", max_id, new_ids, state=state)
-        if result["truncated"]:
-            LOG(f"[WARNING] {self.site} 用户存在超过 {self.max_pages * self.page_size} 条新纪录，已仅推送最近 {len(items)} 条。")
+                    "group_id": group_id,
+                    "customer_id": item.get("id"),
+                    "severity": "INFO",
+                }
+                telegram_tag = f"saltgoat/business/customer/{self.site_topic}"
+                event_data["tag"] = telegram_tag
+                thread_id = notif.get_thread_id(telegram_tag)
+                if thread_id is not None:
+                    event_data["telegram_thread"] = thread_id
+                emit_event("saltgoat/business/customer", event_data)
+                plain_block, message = build_message(
+                    "customer",
+                    self.site,
+                    {
+                        "id": entity_id,
+                        "customer": name,
+                        "email": email,
+                        "created_at": created_at,
+                        "customer_group": group_id,
+                    },
+                )
+                telegram_broadcast(telegram_tag, message, event_data, plain_block)
+            self._save_last_id("customers", checkpoint, new_ids, state=state)
 
     def run(self) -> None:
-        if "orders" in self.kinds:
-            self.process_orders()
-        if "customers" in self.kinds:
-            self.process_customers()
+        try:
+            if "orders" in self.kinds:
+                self.process_orders()
+            if "customers" in self.kinds:
+                self.process_customers()
+        finally:
+            self.close()
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Magento API watcher")
-    parser.add_argument("--site", required=True, help="站点名称，对应 secrets.magento_api.<site>")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--site", help="站点名称，对应 secrets.magento_api.<site>")
+    target.add_argument(
+        "--all-sites",
+        action="store_true",
+        help="在同一进程内并发轮询 Pillar secrets.magento_api 中的全部站点",
+    )
     parser.add_argument(
         "--kinds",
         default="orders,customers",
         help="监听类型，逗号分隔（orders,customers）",
     )
     parser.add_argument("--page-size", type=int, default=50, help="每次拉取的记录数量（默认 50）")
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        default=25,
+        help="单次运行最多处理的页数（默认 25），超出部分下次运行从检查点继续",
+    )
     parser.add_argument(
         "--auth-mode",
         choices=["auto", "bearer", "oauth1"],
         default="auto",
         help="认证模式：auto 根据配置自动判断，或显式指定 bearer / oauth1",
     )
+    parser.add_argument(
+        "--site-timeout",
+        type=float,
+        default=SITE_TIMEOUT,
+        help=f"--all-sites 时单个站点的时间预算（秒，默认 {SITE_TIMEOUT:.0f}），超时后下次从检查点继续",
+    )
     return parser.parse_args()
 
 
-def main() -> None:
-    args = parse_args()
-    site = args.site.strip()
-    if not site:
-        LOG("[ERROR] 请提供 --site")
-        sys.exit(1)
-
+def build_watcher(
+    site: str,
+    args: argparse.Namespace,
+    kinds: List[str],
+    deadline: Optional[float] = None,
+) -> MagentoWatcher:
+    """Resolve credentials for ``site``; raises ValueError when they are incomplete."""
     base_path = f"secrets:magento_api:{site}"
     base_url = pillar_get(f"{base_path}:base_url", "")
     token = pillar_get(f"{base_path}:token", "") or pillar_get(f"{base_path}:access_token", "")
@@ -1135,32 +1319,22 @@ def main() -> None:
     oauth_params = {k: str(v) for k, v in raw_oauth_params.items() if v not in (None, "")}
 
     if not base_url:
-        LOG(f"[ERROR] 未找到站点 {site} 的 base_url（pillar 路径 {base_path}）")
-        sys.exit(1)
+        raise ValueError(f"未找到站点 {site} 的 base_url（pillar 路径 {base_path}）")
 
     if auth_mode == "bearer" and not token and admin_username and admin_password:
         auth_mode = "admin_login"
 
     if auth_mode == "bearer":
         if not token:
-            LOG(f"[ERROR] 未找到站点 {site} 的 Bearer token，请在 Pillar 或 secret 中配置 token/access_token。")
-            sys.exit(1)
+            raise ValueError(f"未找到站点 {site} 的 Bearer token，请在 Pillar 或 secret 中配置 token/access_token。")
     elif auth_mode == "oauth1":
         if not oauth_params:
-            LOG(f"[ERROR] 站点 {site} 未提供 OAuth1 所需的 consumer/access token 参数。")
-            sys.exit(1)
+            raise ValueError(f"站点 {site} 未提供 OAuth1 所需的 consumer/access token 参数。")
     elif auth_mode == "admin_login":
         if not admin_username or not admin_password:
-            LOG(f"[ERROR] 站点 {site} 未提供 admin 登录凭据（username/password）。")
-            sys.exit(1)
+            raise ValueError(f"站点 {site} 未提供 admin 登录凭据（username/password）。")
     else:
-        LOG(f"[ERROR] 不支持的认证模式: {auth_mode}")
-        sys.exit(1)
-
-    kinds = [k.strip() for k in args.kinds.split(",") if k.strip() in {"orders", "customers"}]
-    if not kinds:
-        LOG("[ERROR] --kinds 至少包含 orders 或 customers")
-        sys.exit(1)
+        raise ValueError(f"不支持的认证模式: {auth_mode}")
 
     init_token = token
     if auth_mode == "oauth1":
@@ -1174,20 +1348,81 @@ def main() -> None:
         try:
             init_token = obtain_admin_token(site, base_url, admin_username, admin_password)
         except MagentoAPIError as exc:
-            LOG(f"[ERROR] {exc}")
-            sys.exit(1)
+            raise ValueError(str(exc)) from exc
         auth_mode = "bearer"
 
+    return MagentoWatcher(
+        site,
+        base_url,
+        init_token,
+        kinds,
+        args.page_size,
+        auth_mode=auth_mode,
+        oauth_params=oauth_params,
+        max_pages=max(1, args.max_pages),
+        deadline=deadline,
+    )
+
+
+def run_watcher(watcher: MagentoWatcher, budget: Optional[float] = None) -> bool:
+    if budget is not None:
+        watcher.deadline = time.monotonic() + budget
     try:
-        watcher = MagentoWatcher(
-            site,
-            base_url,
-            init_token,
-            kinds,
-            args.page_size,
-            auth_mode=auth_mode,
-            oauth_params=oauth_params,
-        )
+        watcher.run()
+    except Exception as exc:  # 单个站点异常不影响其余站点
+        LOG(f"[ERROR] {watcher.site} 轮询失败: {exc}")
+        return False
+    return True
+
+
+def run_all_sites(args: argparse.Namespace, kinds: List[str]) -> int:
+    sites = discover_sites()
+    if not sites:
+        LOG("[INFO] 未在 Pillar secrets.magento_api 中发现需要轮询的站点。")
+        return 0
+    # Pillar/Salt Caller 不保证线程安全，凭据解析在主线程完成，仅 API 轮询并发
+    failed: List[str] = []
+    watchers: List[MagentoWatcher] = []
+    for site in sites:
+        try:
+            watchers.append(build_watcher(site, args, kinds))
+        except ValueError as exc:
+            LOG(f"[ERROR] {exc}")
+            failed.append(site)
+    budget = max(1.0, args.site_timeout)
+    if watchers:
+        with ThreadPoolExecutor(
+            max_workers=min(SITE_WORKERS, len(watchers)), thread_name_prefix="magento-site"
+        ) as pool:
+            results = list(pool.map(lambda watcher: run_watcher(watcher, budget), watchers))
+        failed.extend(watcher.site for watcher, ok in zip(watchers, results) if not ok)
+    if TELEGRAM_AVAILABLE:
+        try:
+            reactor_common.flush_telegram(budget)
+        except Exception as exc:  # pragma: no cover
+            LOG(f"[WARNING] Telegram 队列刷新失败: {exc}")
+    if failed:
+        LOG(f"[WARNING] {len(failed)}/{len(sites)} 个站点轮询失败: {', '.join(sorted(failed))}")
+        return 1
+    return 0
+
+
+def main() -> None:
+    args = parse_args()
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip() in {"orders", "customers"}]
+    if not kinds:
+        LOG("[ERROR] --kinds 至少包含 orders 或 customers")
+        sys.exit(1)
+
+    if args.all_sites:
+        sys.exit(run_all_sites(args, kinds))
+
+    site = args.site.strip()
+    if not site:
+        LOG("[ERROR] 请提供 --site")
+        sys.exit(1)
+    try:
+        watcher = build_watcher(site, args, kinds)
     except ValueError as exc:
         LOG(f"[ERROR] {exc}")
         sys.exit(1)
@@ -6,20 +6,23 @@ from __future__ import annotations
 import argparse
 import datetime as dt
 from collections import defaultdict
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import html
 
+import magento_api_watch
 from magento_api_watch import (
-    CALLER,
     MagentoWatcher,
     load_local_secret,
     pillar_get,
+    prefetch_pages,
     telegram_broadcast,
     log_to_file,
 )
 from modules.lib import notification as notif  # type: ignore
 
 PERIOD_CHOICES = {"daily", "weekly", "monthly"}
+# 汇总只需金额与币种，避免拉取 items/addresses 等完整订单结构
+ORDER_SUMMARY_FIELDS = "items[entity_id,grand_total,order_currency_code],total_count"
 
 
 def parse_args() -> argparse.Namespace:
@@ -93,39 +96,70 @@ def fmt_api_ts(value: dt.datetime) -> str:
     return value.astimezone(dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
 
+def _range_params(id_field: str, start: dt.datetime, end: dt.datetime, page_size: int) -> Dict[str, Any]:
+    return {
+        "searchCriteria[pageSize]": page_size,
+        "searchCriteria[filter_groups][0][filters][0][field]": "created_at",
+        "searchCriteria[filter_groups][0][filters][0][value]": fmt_api_ts(start),
+        "searchCriteria[filter_groups][0][filters][0][condition_type]": "from",
+        "searchCriteria[filter_groups][1][filters][0][field]": "created_at",
+        "searchCriteria[filter_groups][1][filters][0][value]": fmt_api_ts(end),
+        "searchCriteria[filter_groups][1][filters][0][condition_type]": "to",
+        "searchCriteria[sortOrders][0][field]": id_field,
+        "searchCriteria[sortOrders][0][direction]": "ASC",
+    }
+
+
 def fetch_entities(
     watcher: MagentoWatcher,
     endpoint: str,
     id_field: str,
     start: dt.datetime,
     end: dt.datetime,
-) -> Iterable[Dict[str, Any]]:
-    page = 1
-    page_size = watcher.page_size
-    collected: List[Dict[str, Any]] = []
-    while True:
-        params = {
-            "searchCriteria[currentPage]": page,
-            "searchCriteria[pageSize]": page_size,
-            "searchCriteria[filter_groups][0][filters][0][field]": "created_at",
-            "searchCriteria[filter_groups][0][filters][0][value]": fmt_api_ts(start),
-            "searchCriteria[filter_groups][0][filters][0][condition_type]": "from",
-            "searchCriteria[filter_groups][1][filters][0][field]": "created_at",
-            "searchCriteria[filter_groups][1][filters][0][value]": fmt_api_ts(end),
-            "searchCriteria[filter_groups][1][filters][0][condition_type]": "to",
-            "searchCriteria[sortOrders][0][field]": id_field,
-            "searchCriteria[sortOrders][0][direction]": "ASC",
-        }
-        payload = watcher._request(endpoint, params)  # pylint: disable=protected-access
-        items = payload.get("items", []) if isinstance(payload, dict) else []
-        if not items:
-            break
-        collected.extend(items)
-        total = payload.get("total_count") if isinstance(payload, dict) else None
-        if total is None or len(collected) >= int(total):
-            break
-        page += 1
-    return collected
+    fields: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Stream records created in ``[start, end]`` page by page."""
+    base_params = _range_params(id_field, start, end, watcher.page_size)
+    if fields:
+        base_params["fields"] = fields
+
+    def fetch(page: int) -> Dict[str, Any]:
+        params = dict(base_params)
+        params["searchCriteria[currentPage]"] = page
+        return watcher._request(endpoint, params)  # pylint: disable=protected-access
+
+    seen = 0
+    pages = prefetch_pages(fetch, watcher.page_size)
+    try:
+        for _page, payload in pages:
+            items = payload.get("items", []) if isinstance(payload, dict) else []
+            if not items:
+                return
+            seen += len(items)
+            yield from items
+            total = payload.get("total_count") if isinstance(payload, dict) else None
+            if total is None or seen >= int(total):
+                return
+    finally:
+        pages.close()
+
+
+def count_entities(
+    watcher: MagentoWatcher,
+    endpoint: str,
+    id_field: str,
+    start: dt.datetime,
+    end: dt.datetime,
+) -> int:
+    """Count records in range from total_count alone, falling back to streaming IDs."""
+    params = _range_params(id_field, start, end, 1)
+    params["searchCriteria[currentPage]"] = 1
+    params["fields"] = "total_count"
+    payload = watcher._request(endpoint, params)  # pylint: disable=protected-access
+    try:
+        return int(payload["total_count"])
+    except (KeyError, TypeError, ValueError):
+        return sum(1 for _ in fetch_entities(watcher, endpoint, id_field, start, end, fields=f"items[{id_field}],total_count"))
 
 
 def summarise_orders(items: Iterable[Dict[str, Any]]) -> Tuple[int, Dict[str, float]]:
@@ -142,10 +176,6 @@ def summarise_orders(items: Iterable[Dict[str, Any]]) -> Tuple[int, Dict[str, fl
     return count, totals
 
 
-def summarise_customers(items: Iterable[Dict[str, Any]]) -> int:
-    return sum(1 for _ in items)
-
-
 def format_totals(totals: Dict[str, float]) -> str:
     if not totals:
         return "0"
@@ -186,7 +216,7 @@ def load_credentials(site: str) -> Tuple[str, str]:
 
 def emit_event(tag: str, payload: Dict[str, Any]) -> None:
     try:
-        CALLER.cmd("event.send", tag, payload)
+        magento_api_watch.emit_event(tag, payload)
     except Exception:  # pragma: no cover
         pass
 
@@ -205,19 +235,21 @@ def main() -> None:
         site_slug = site.replace("/", "-").lower()
         display_site = site.replace("/", " / ").upper()
 
-        orders = list(fetch_entities(watcher, "/rest/V1/orders", "entity_id", start_local, end_local))
-        customers = list(
-            fetch_entities(
-                watcher,
-                "/rest/V1/customers/search",
-                "id",
-                start_local,
-                end_local,
+        # 边拉取边聚合，内存占用与统计周期长度无关
+        try:
+            order_count, totals = summarise_orders(
+                fetch_entities(
+                    watcher,
+                    "/rest/V1/orders",
+                    "entity_id",
+                    start_local,
+                    end_local,
+                    fields=ORDER_SUMMARY_FIELDS,
+                )
             )
-        )
-
-        order_count, totals = summarise_orders(orders)
-        customer_count = summarise_customers(customers)
+            customer_count = count_entities(watcher, "/rest/V1/customers/search", "id", start_local, end_local)
+        finally:
+            watcher.close()
 
         def format_block(title: str, site_label: str, rows: List[Tuple[str, str]]) -> Tuple[str, str]:
             underline = "=" * 30
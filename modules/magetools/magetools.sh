@@ -173,7 +173,7 @@ magetools_handler() {
                     ;;
                 *)
                     log_error "未知的 API 操作: ${2:-<empty>}"
-                    log_info "支持: api watch --site <name> [--kinds orders,customers] [--auth-mode auto|bearer|oauth1]"
+                    log_info "支持: api watch --site <name>|--all-sites [--kinds orders,customers] [--auth-mode auto|bearer|oauth1]"
                     exit 1
                     ;;
             esac
@@ -200,7 +200,7 @@ magetools_handler() {
             ;;
         "schedule")
             shift
-            "${SCRIPT_DIR}/modules/magetools/magento-schedule.py" "$@"
+            saltgoat_py magento-schedule "$@"
             ;;
         "multisite")
             shift
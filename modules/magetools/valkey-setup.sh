@@ -16,6 +16,8 @@ source "${SCRIPT_DIR}/lib/utils.sh"
 readonly DB_MIN=10
 readonly DB_MAX=99
 readonly VALKEY_CONF="/etc/valkey/valkey.conf"
+# 资源监控常驻进程从这里读取各逻辑库的用途（state.apply 的 inline pillar 对它不可见）
+readonly VALKEY_DB_MAP="/etc/saltgoat/runtime/valkey-databases.json"
 readonly DEFAULT_VALKEY_HOST="127.0.0.1"
 readonly DEFAULT_VALKEY_PORT="6379"
 
@@ -620,6 +622,36 @@ apply_salt_state() {
     fi
 }
 
+record_database_roles() {
+    PILLAR_SITE_NAME="$SITE_NAME" PILLAR_CACHE_DB="$CACHE_DB" PILLAR_PAGE_DB="$PAGE_DB" \
+    PILLAR_SESSION_DB="$SESSION_DB" VALKEY_DB_MAP="$VALKEY_DB_MAP" python3 <<'PY' || log_warning "无法写入 ${VALKEY_DB_MAP}，监控将不会标注该站点的 Valkey 库"
+import json
+import os
+from pathlib import Path
+
+path = Path(os.environ["VALKEY_DB_MAP"])
+site = os.environ["PILLAR_SITE_NAME"]
+try:
+    mapping = json.loads(path.read_text(encoding="utf-8"))
+except (OSError, ValueError):
+    mapping = {}
+if not isinstance(mapping, dict):
+    mapping = {}
+# 先移除该站点旧的分配，再写入本次的库号
+mapping = {db: label for db, label in mapping.items() if not str(label).startswith(f"{site}:")}
+for key, role in (("PILLAR_CACHE_DB", "cache"), ("PILLAR_PAGE_DB", "page_cache"), ("PILLAR_SESSION_DB", "session")):
+    mapping[f"db{int(os.environ[key])}"] = f"{site}:{role}"
+path.parent.mkdir(parents=True, exist_ok=True)
+tmp = path.with_suffix(path.suffix + ".tmp")
+tmp.write_text(json.dumps(dict(sorted(mapping.items())), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+tmp.replace(path)
+PY
+    # 常驻巡检进程缓存了库映射，reload 后重新读取
+    if systemctl is-active --quiet saltgoat-resource-alert 2>/dev/null; then
+        systemctl reload saltgoat-resource-alert >/dev/null 2>&1 || true
+    fi
+}
+
 cleanup_replaced_databases() {
     CLEANED_DB_COUNT=0
     if [[ "$ASSIGNMENTS_CHANGED" != true ]]; then
@@ -701,6 +733,7 @@ main() {
     create_env_backup
     build_pillar_payload
     apply_salt_state
+    record_database_roles
     cleanup_replaced_databases
     print_summary
 }
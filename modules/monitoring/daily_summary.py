@@ -26,8 +26,13 @@ if str(REPO_ROOT) not in sys.path:
 from modules.lib import notification as notif  # type: ignore
 from modules.lib import logging_utils
 from modules.lib import config_loader
+from modules.lib import metrics_history
+from modules.lib import alerts_index
+from modules.lib import systemd_units
+from modules.lib import restic_helpers
 
 ALERT_LOG = logging_utils.alerts_log_path()
+TREND_METRICS = ["load.1m", "memory.percent", "swap.percent", "mysql.utilization", "valkey.utilization"]
 LOGGER_SCRIPT = Path("/opt/saltgoat-reactor/logger.py")
 TELEGRAM_COMMON = Path("/opt/saltgoat-reactor/reactor_common.py")
 
@@ -109,15 +114,7 @@ def disk_summary(paths: Iterable[Path]) -> Dict[str, Tuple[float, str]]:
 
 
 def service_status(services: Iterable[str]) -> Dict[str, bool]:
-    status: Dict[str, bool] = {}
-    for svc in services:
-        ok = subprocess.call(
-            ["systemctl", "is-active", "--quiet", svc],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        ) == 0
-        status[svc] = ok
-    return status
+    return {svc: state.active for svc, state in systemd_units.query(services).items()}
 
 
 def _parse_backup_line(meta: str, payload_raw: Optional[str]) -> Optional[Dict[str, Any]]:
@@ -153,43 +150,46 @@ def collect_backup_events(kind: str, key_field: Optional[str] = None, limit: int
     events: List[Dict[str, Any]] = []
     seen_keys: List[str] = []
     try:
-        with open(ALERT_LOG, "r", encoding="utf-8", errors="ignore") as fh:
-            lines = fh.readlines()
-        needle = f"[BACKUP] tag={tag}"
-        for line in reversed(lines):
-            stripped = line.strip()
-            if " payload=" in stripped:
-                meta, payload_raw = stripped.split(" payload=", 1)
-            else:
-                meta, payload_raw = stripped, None
-            if needle not in meta:
-                continue
-            parsed = _parse_backup_line(meta, payload_raw)
-            if not parsed:
-                continue
-            key_value = None
-            if key_field:
-                data = parsed.get("payload", {}).get("data", {}) if parsed.get("payload") else {}
-                if isinstance(data, dict):
-                    key_value = data.get(key_field)
-                if key_value is None:
-                    key_value = parsed.get(key_field)
-            if key_value is not None:
-                if key_value in seen_keys:
+        with alerts_index.open_index(ALERT_LOG) as index:
+            for event in index.iter_events(tag, label="BACKUP"):
+                stripped = event["raw"]
+                if " payload=" in stripped:
+                    meta, payload_raw = stripped.split(" payload=", 1)
+                else:
+                    meta, payload_raw = stripped, None
+                parsed = _parse_backup_line(meta, payload_raw)
+                if not parsed:
                     continue
-                seen_keys.append(key_value)
-            events.append(parsed)
-            if key_field:
-                if len(seen_keys) >= limit:
-                    break
-            else:
-                if len(events) >= limit:
-                    break
+                key_value = None
+                if key_field:
+                    data = parsed.get("payload", {}).get("data", {}) if parsed.get("payload") else {}
+                    if isinstance(data, dict):
+                        key_value = data.get(key_field)
+                    if key_value is None:
+                        key_value = parsed.get(key_field)
+                if key_value is not None:
+                    if key_value in seen_keys:
+                        continue
+                    seen_keys.append(key_value)
+                events.append(parsed)
+                if key_field:
+                    if len(seen_keys) >= limit:
+                        break
+                else:
+                    if len(events) >= limit:
+                        break
     except Exception:
         return events
     return events
 
 
+def collect_trends(hours: float = 24) -> Dict[str, Dict[str, Any]]:
+    try:
+        return metrics_history.summarize(TREND_METRICS, hours=hours)
+    except Exception:
+        return {}
+
+
 def log_to_file(label: str, tag: str, payload: Dict[str, Any]) -> None:
     if not path_exists(LOGGER_SCRIPT):
         return
@@ -253,6 +253,10 @@ def compile_summary() -> Tuple[str, str, Dict[str, Any]]:
 
     restic_events = collect_backup_events("restic", key_field="repo", limit=5)
     dump_events = collect_backup_events("mysql_dump", key_field="site", limit=10)
+    # 仓库概况来自 summarize-sites 的缓存，日报本身不访问 restic 仓库
+    restic_repos = restic_helpers.load_cached_summaries()
+    restic_rows = [restic_helpers.describe(repo) for repo in restic_repos]
+    trends = collect_trends()
 
     generated_at = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
 
@@ -275,6 +279,11 @@ def compile_summary() -> Tuple[str, str, Dict[str, Any]]:
     else:
         plain_lines.append("Services: all running")
 
+    trend_rows = metrics_history.format_summary(trends) if trends else []
+    if trend_rows:
+        plain_lines.append("Trends (24h):")
+        plain_lines.extend(f"  - {row}" for row in trend_rows)
+
     if restic_events:
         plain_lines.append("Restic backups:")
         for event in restic_events:
@@ -285,6 +294,9 @@ def compile_summary() -> Tuple[str, str, Dict[str, Any]]:
                 details.append(f"repo={repo}")
             detail_str = f" {' '.join(details)}" if details else ""
             plain_lines.append(f"  - {event.get('timestamp', '')}{detail_str}")
+    if restic_rows:
+        plain_lines.append("Restic repositories (cached):")
+        plain_lines.extend(f"  - {row}" for row in restic_rows)
     if dump_events:
         plain_lines.append("MySQL dumps:")
         for event in dump_events:
@@ -327,6 +339,11 @@ def compile_summary() -> Tuple[str, str, Dict[str, Any]]:
         md_lines.append("")
         md_lines.append(f"*Services:* {notif.escape_markdown_v2('all running')}")
 
+    if trend_rows:
+        md_lines.append("")
+        md_lines.append(f"*Trends {notif.escape_markdown_v2('(24h)')}:*")
+        md_lines.append(notif.format_markdown_code_block(trend_rows))
+
     backup_md_lines: List[str] = []
     if restic_events:
         for event in restic_events:
@@ -355,6 +372,10 @@ def compile_summary() -> Tuple[str, str, Dict[str, Any]]:
         md_lines.append("")
         md_lines.append("*Backups*")
         md_lines.extend(backup_md_lines)
+    if restic_rows:
+        md_lines.append("")
+        md_lines.append(f"*Restic Repositories {notif.escape_markdown_v2('(cached)')}:*")
+        md_lines.append(notif.format_markdown_code_block(restic_rows))
 
     payload = {
         "host": HOSTNAME,
@@ -363,7 +384,9 @@ def compile_summary() -> Tuple[str, str, Dict[str, Any]]:
         "memory": {"percent": mem_percent, "summary": mem_summary},
         "disks": disks,
         "services": services,
+        "trends": trends,
         "restic_reference": restic_events,
+        "restic_repos": restic_repos,
         "mysqldump_reference": dump_events,
     }
     plain_text = "\n".join(plain_lines)
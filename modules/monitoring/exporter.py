@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+"""
+SaltGoat Prometheus exporter.
+
+Gathers the resource_alert collectors (host, services, PHP-FPM, MySQL, Valkey,
+OpenSearch, sites) plus autoscale and notification-queue state into one
+registry with HELP/TYPE metadata. Metrics are served on ``/metrics`` and/or
+written atomically to a node_exporter textfile. Every collector caches its
+families for its own TTL and fails in isolation; while the resident
+``resource_alert --daemon`` is running its snapshot is reused instead of
+collecting again.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+from modules.lib import http_probe
+from modules.lib import monitor_daemon
+from modules.lib import notification
+from modules.lib import notification_store
+from modules.monitoring import resource_alert
+
+DEFAULT_LISTEN = os.environ.get("SALTGOAT_EXPORTER_LISTEN", "127.0.0.1:9810")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PROBE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SNAPSHOT_TTL = 5.0
+# 各采集器的缓存时间（秒），与 resource_alert 常驻模式的默认间隔保持一致
+DEFAULT_TTLS: Dict[str, float] = {
+    "host": 15.0,
+    "services": 30.0,
+    "php_fpm": 15.0,
+    "mysql": 30.0,
+    "valkey": 30.0,
+    "opensearch": 60.0,
+    "sites": 60.0,
+    "autoscale": 60.0,
+    "notifications": 60.0,
+}
+AUTOSCALE_FILES = {
+    "php_fpm": resource_alert.PHP_AUTOSCALE_FILE,
+    "mysql": resource_alert.MYSQL_AUTOSCALE_FILE,
+    "valkey": resource_alert.VALKEY_AUTOSCALE_FILE,
+    "opensearch": resource_alert.OPENSEARCH_AUTOSCALE_FILE,
+}
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricFamily:
+    """One metric name with its HELP/TYPE header and samples."""
+
+    def __init__(self, name: str, help_text: str, kind: str = "gauge") -> None:
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.samples: List[Tuple[str, Dict[str, Any], float]] = []
+
+    def add(self, value: Any, suffix: str = "", **labels: Any) -> "MetricFamily":
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)) and not math.isnan(value):
+            self.samples.append((self.name + suffix, labels, float(value)))
+        return self
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples:
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {format_value(value)}" if label_text else f"{name} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram kept for the lifetime of the exporter process."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = PROBE_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(sorted((name, str(val)) for name, val in labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def family(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.help, "histogram")
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(key)
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    family.add(count, "_bucket", **labels, le=format_value(bound))
+                family.add(series["count"], "_bucket", **labels, le="+Inf")
+                family.add(series["sum"], "_sum", **labels)
+                family.add(series["count"], "_count", **labels)
+        return family
+
+
+def render(families: List[MetricFamily]) -> str:
+    lines: List[str] = []
+    for family in families:
+        if family.samples:
+            lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path, text: str) -> None:
+    """Write ``text`` atomically so node_exporter never reads a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+Collector = Callable[["Exporter"], List[MetricFamily]]
+
+
+def collect_host(exporter: "Exporter") -> List[MetricFamily]:
+    payload = exporter.payload()
+    if payload:
+        load = payload.get("load") or {}
+        memory = payload.get("memory")
+        swap = payload.get("swap") or {}
+        disks = payload.get("disks") or {}
+    else:
+        load1, load5, load15 = resource_alert.get_load()
+        load = {"1m": load1, "5m": load5, "15m": load15}
+        meminfo = resource_alert.read_meminfo()
+        memory = resource_alert.memory_usage_percent(meminfo)
+        percent, used_mb, total_mb = resource_alert.swap_usage(meminfo)
+        swap = {"percent": percent, "used_mb": used_mb, "total_mb": total_mb}
+        disks = resource_alert.disk_usage(resource_alert.DISK_PATHS)
+    load_family = MetricFamily("saltgoat_load_average", "System load average.")
+    for window, value in load.items():
+        load_family.add(value, window=window)
+    disk_family = MetricFamily("saltgoat_disk_used_percent", "Filesystem usage percent.")
+    for mount, percent in disks.items():
+        disk_family.add(percent, mount=mount)
+    return [
+        load_family,
+        MetricFamily("saltgoat_memory_used_percent", "Memory usage percent (MemAvailable based).").add(memory),
+        MetricFamily("saltgoat_swap_used_percent", "Swap usage percent.").add(swap.get("percent")),
+        MetricFamily("saltgoat_swap_used_bytes", "Swap in use.").add((swap.get("used_mb") or 0) * 1024 * 1024),
+        MetricFamily("saltgoat_swap_total_bytes", "Swap configured.").add((swap.get("total_mb") or 0) * 1024 * 1024),
+        disk_family,
+    ]
+
+
+def collect_services(exporter: "Exporter") -> List[MetricFamily]:
+    payload = exporter.payload()
+    services = payload.get("services") if payload else None
+    if services is None:
+        services = resource_alert.service_status(resource_alert.CORE_SERVICES, refresh=True)
+    family = MetricFamily("saltgoat_systemd_unit_active", "1 when the systemd unit is active.")
+    for name, active in sorted(services.items()):
+        family.add(bool(active), unit=name)
+    return [family]
+
+
+def collect_php_fpm(exporter: "Exporter") -> List[MetricFamily]:
+    payload = exporter.payload()
+    pools = ((payload.get("php_fpm") or {}).get("pools") if payload else None) or {}
+    if not payload:
+        configs = resource_alert.php_fpm_pool_configs()
+        children = resource_alert.php_fpm_children_by_pool()
+        for name in sorted(set(configs) | set(children)):
+            entry: Dict[str, Any] = {"children": children.get(name, 0)}
+            max_children = configs.get(name, {}).get("max_children")
+            if max_children:
+                entry["max_children"] = max_children
+                entry["utilization"] = round(entry["children"] / max_children, 4)
+            pools[name] = entry
+    children_family = MetricFamily("saltgoat_php_fpm_children", "Running PHP-FPM worker processes per pool.")
+    max_family = MetricFamily("saltgoat_php_fpm_max_children", "Configured pm.max_children per pool.")
+    ratio_family = MetricFamily("saltgoat_php_fpm_utilization_ratio", "Workers in use relative to pm.max_children.")
+    # 以下指标来自 pm.status_path，仅在状态页可读时出现
+    status_families = {
+        "active_processes": MetricFamily("saltgoat_php_fpm_active_processes", "Active workers reported by the status page."),
+        "idle_processes": MetricFamily("saltgoat_php_fpm_idle_processes", "Idle workers reported by the status page."),
+        "listen_queue": MetricFamily("saltgoat_php_fpm_listen_queue", "Requests waiting in the pool's listen queue."),
+        "max_listen_queue": MetricFamily("saltgoat_php_fpm_max_listen_queue", "Largest listen queue since FPM start."),
+        "max_children_reached": MetricFamily(
+            "saltgoat_php_fpm_max_children_reached_total", "Times pm.max_children was reached.", "counter"
+        ),
+        "slow_requests": MetricFamily("saltgoat_php_fpm_slow_requests_total", "Requests slower than request_slowlog_timeout.", "counter"),
+        "safe_max_children": MetricFamily("saltgoat_php_fpm_safe_max_children", "Memory-safe pm.max_children from the PSS capacity planner."),
+        "worker_pss": MetricFamily("saltgoat_php_fpm_worker_pss_bytes", "Largest sampled worker PSS per pool."),
+    }
+    for name, entry in sorted(pools.items()):
+        children_family.add(entry.get("children"), pool=name)
+        max_family.add(entry.get("max_children"), pool=name)
+        ratio_family.add(entry.get("utilization"), pool=name)
+        for key, family in status_families.items():
+            family.add(entry.get(key), pool=name)
+    return [children_family, max_family, ratio_family, *status_families.values()]
+
+
+def collect_mysql(exporter: "Exporter") -> List[MetricFamily]:
+    metrics = exporter.section("mysql", resource_alert.collect_mysql_metrics)
+    up = MetricFamily("saltgoat_mysql_up", "1 when MySQL status could be read.").add(bool(metrics))
+    if not metrics:
+        return [up]
+    max_connections = metrics.get("max_connections") or 0
+    connected = metrics.get("threads_connected") or 0
+    running = metrics.get("threads_running")
+    families = [
+        up,
+        MetricFamily("saltgoat_mysql_threads_connected", "Threads_connected.").add(connected),
+        MetricFamily("saltgoat_mysql_threads_running", "Threads_running.").add(running),
+        MetricFamily("saltgoat_mysql_max_connections", "max_connections.").add(max_connections),
+        MetricFamily("saltgoat_mysql_threads_connected_ratio", "Threads_connected / max_connections.").add(
+            connected / max_connections if max_connections else None
+        ),
+        MetricFamily("saltgoat_mysql_threads_running_ratio", "Threads_running / Threads_connected.").add(
+            running / connected if connected and running is not None else None
+        ),
+        MetricFamily("saltgoat_mysql_buffer_pool_hit_ratio", "InnoDB buffer pool hit ratio.").add(
+            metrics.get("buffer_pool_hit_ratio")
+        ),
+        MetricFamily("saltgoat_mysql_history_list_length", "InnoDB history list length.").add(
+            metrics.get("history_list_length")
+        ),
+        MetricFamily("saltgoat_mysql_row_lock_current_waits", "Innodb_row_lock_current_waits.").add(
+            metrics.get("innodb_row_lock_current_waits")
+        ),
+    ]
+    return families
+
+
+def collect_valkey(exporter: "Exporter") -> List[MetricFamily]:
+    metrics = exporter.section("valkey", resource_alert.collect_valkey_metrics)
+    up = MetricFamily("saltgoat_valkey_up", "1 when Valkey INFO could be read.").add(bool(metrics))
+    if not metrics:
+        return [up]
+    used = metrics.get("used_memory") or 0
+    maxmemory = metrics.get("maxmemory") or 0
+    keys = MetricFamily("saltgoat_valkey_db_keys", "Keys per logical database.")
+    expires = MetricFamily("saltgoat_valkey_db_expires", "Keys with a TTL per logical database.")
+    for db, entry in sorted((metrics.get("databases") or {}).items()):
+        labels = {"db": db, "role": entry.get("role", "")}
+        keys.add(entry.get("keys"), **labels)
+        expires.add(entry.get("expires"), **labels)
+    return [
+        up,
+        MetricFamily("saltgoat_valkey_used_memory_bytes", "used_memory.").add(used),
+        MetricFamily("saltgoat_valkey_maxmemory_bytes", "maxmemory (0 = unlimited).").add(maxmemory),
+        MetricFamily("saltgoat_valkey_memory_utilization_ratio", "used_memory / maxmemory.").add(
+            used / maxmemory if maxmemory else None
+        ),
+        MetricFamily("saltgoat_valkey_fragmentation_ratio", "mem_fragmentation_ratio.").add(
+            metrics.get("mem_fragmentation_ratio")
+        ),
+        MetricFamily("saltgoat_valkey_connected_clients", "connected_clients.").add(metrics.get("connected_clients")),
+        # 原始累计计数器交给 Prometheus rate() 计算；命中率为 resource_alert 两次采样间的增量
+        MetricFamily("saltgoat_valkey_keyspace_hits_total", "keyspace_hits.", "counter").add(metrics.get("keyspace_hits")),
+        MetricFamily("saltgoat_valkey_keyspace_misses_total", "keyspace_misses.", "counter").add(metrics.get("keyspace_misses")),
+        MetricFamily("saltgoat_valkey_evicted_keys_total", "evicted_keys.", "counter").add(metrics.get("evicted_keys")),
+        MetricFamily("saltgoat_valkey_expired_keys_total", "expired_keys.", "counter").add(metrics.get("expired_keys")),
+        MetricFamily("saltgoat_valkey_commands_processed_total", "total_commands_processed.", "counter").add(
+            metrics.get("total_commands_processed")
+        ),
+        MetricFamily("saltgoat_valkey_hit_ratio", "Keyspace hit ratio between the last two samples.").add(metrics.get("hit_ratio")),
+        keys,
+        expires,
+    ]
+
+
+def collect_opensearch(exporter: "Exporter") -> List[MetricFamily]:
+    metrics = exporter.section("opensearch", resource_alert.collect_opensearch_metrics)
+    up = MetricFamily("saltgoat_opensearch_up", "1 when OpenSearch cluster stats could be read.").add(bool(metrics))
+    if not metrics:
+        return [up]
+    return [
+        up,
+        MetricFamily("saltgoat_opensearch_heap_used_percent", "JVM heap used percent.").add(
+            metrics.get("heap_used_percent")
+        ),
+        MetricFamily("saltgoat_opensearch_heap_used_bytes", "JVM heap used.").add(metrics.get("heap_used_in_bytes")),
+        MetricFamily("saltgoat_opensearch_heap_max_bytes", "JVM heap max.").add(metrics.get("heap_max_in_bytes")),
+        MetricFamily("saltgoat_opensearch_fielddata_evictions", "Fielddata cache evictions.", "counter").add(
+            metrics.get("fielddata_evictions")
+        ),
+        MetricFamily("saltgoat_opensearch_query_cache_evictions", "Query cache evictions.", "counter").add(
+            metrics.get("query_cache_evictions")
+        ),
+        *opensearch_detail_families(metrics),
+    ]
+
+
+def opensearch_detail_families(metrics: Dict[str, Any]) -> List[MetricFamily]:
+    queue = MetricFamily("saltgoat_opensearch_thread_pool_queue", "Queued tasks per thread pool.")
+    rejected = MetricFamily("saltgoat_opensearch_thread_pool_rejected_total", "Rejected tasks per thread pool.", "counter")
+    for name, pool in sorted((metrics.get("thread_pools") or {}).items()):
+        queue.add(pool.get("queue"), pool=name)
+        rejected.add(pool.get("rejected"), pool=name)
+    rates = metrics.get("rates") or {}
+    latency = MetricFamily("saltgoat_opensearch_latency_milliseconds", "Average latency over the last sample interval.")
+    for kind, key in (
+        ("query", "search_query_latency_ms"),
+        ("fetch", "search_fetch_latency_ms"),
+        ("indexing", "indexing_latency_ms"),
+    ):
+        latency.add(rates.get(key), operation=kind)
+    gc_ratio = MetricFamily("saltgoat_opensearch_gc_time_ratio", "Share of the last interval spent in GC.")
+    for key, value in sorted(rates.items()):
+        if key.startswith("gc_") and key.endswith("_time_ratio"):
+            gc_ratio.add(value, collector=key[3 : -len("_time_ratio")])
+    docs = MetricFamily("saltgoat_opensearch_index_docs", "Documents per Magento catalog index.")
+    size = MetricFamily("saltgoat_opensearch_index_store_bytes", "Store size per Magento catalog index.")
+    index_latency = MetricFamily(
+        "saltgoat_opensearch_index_query_latency_milliseconds", "Average query latency per catalog index over the last interval."
+    )
+    for name, entry in sorted((metrics.get("catalog_indices") or {}).items()):
+        docs.add(entry.get("docs"), index=name)
+        size.add(entry.get("store_bytes"), index=name)
+        index_latency.add(entry.get("search_query_latency_ms"), index=name)
+    return [queue, rejected, latency, gc_ratio, docs, size, index_latency]
+
+
+def collect_sites(exporter: "Exporter") -> List[MetricFamily]:
+    payload = exporter.payload()
+    if payload:
+        results = list(payload.get("sites") or [])
+        # 同一份快照只计入一次直方图
+        fresh = exporter.observe_snapshot("sites")
+    else:
+        targets = resource_alert.site_probe_targets(resource_alert.load_site_checks())
+        probes = http_probe.probe_many(
+            targets, workers=resource_alert.SITE_PROBE_WORKERS, deadline=resource_alert.SITE_SWEEP_DEADLINE
+        )
+        results = [
+            {
+                "name": str(target["site"].get("name") or target["url"]),
+                "status": probe.get("status"),
+                "expected": target["expect"],
+                "duration": probe.get("duration"),
+                "error": probe.get("error"),
+            }
+            for target, probe in zip(targets, probes)
+        ]
+        fresh = True
+    up = MetricFamily("saltgoat_site_up", "1 when the site returned the expected status.")
+    status = MetricFamily("saltgoat_site_probe_status", "HTTP status of the last probe (0 = no response).")
+    for site in results:
+        name = site.get("name")
+        up.add(not site.get("error") and site.get("status") == site.get("expected"), site=name)
+        status.add(site.get("status") or 0, site=name)
+        if fresh and isinstance(site.get("duration"), (int, float)):
+            exporter.probe_latency.observe(float(site["duration"]), site=name)
+    return [up, status]
+
+
+def collect_autoscale(exporter: "Exporter") -> List[MetricFamily]:
+    last = MetricFamily(
+        "saltgoat_autoscale_last_scaled_timestamp_seconds", "Unix time of the last autoscale per target."
+    )
+    for target, path in AUTOSCALE_FILES.items():
+        meta = resource_alert.load_runtime_json(path).get("__meta__")
+        if not isinstance(meta, dict):
+            continue
+        for scope, entry in sorted(meta.items()):
+            if isinstance(entry, dict):
+                last.add(entry.get("last_scaled_at"), target=target, scope=scope)
+    families = [last]
+    payload = exporter.payload()
+    if payload:
+        actions = (payload.get("autoscale") or {}).get("actions") or []
+        families.append(
+            MetricFamily("saltgoat_autoscale_pending_actions", "Autoscale actions queued by the latest evaluation.").add(
+                len(actions)
+            )
+        )
+    return families
+
+
+def collect_notifications(exporter: "Exporter") -> List[MetricFamily]:
+    pending = MetricFamily("saltgoat_notification_queue_pending", "Queued notifications awaiting retry.")
+    dead = MetricFamily("saltgoat_notification_queue_dead", "Notifications that exhausted their retries.")
+    due = MetricFamily("saltgoat_notification_queue_due", "Pending notifications whose backoff has elapsed.")
+    if not (notification.QUEUE_DIR / notification_store.DB_NAME).exists():
+        return [pending.add(0), dead.add(0), due.add(0)]
+    with notification_store.QueueStore(notification.QUEUE_DIR) as store:
+        counts = store.counts()
+    for destination, count in sorted(counts["by_destination"].items()):
+        pending.add(count, destination=destination)
+    for destination, count in sorted(counts["dead_by_destination"].items()):
+        dead.add(count, destination=destination)
+    due.add(counts["due"])
+    return [pending, dead, due]
+
+
+COLLECTORS: Dict[str, Collector] = {
+    "host": collect_host,
+    "services": collect_services,
+    "php_fpm": collect_php_fpm,
+    "mysql": collect_mysql,
+    "valkey": collect_valkey,
+    "opensearch": collect_opensearch,
+    "sites": collect_sites,
+    "autoscale": collect_autoscale,
+    "notifications": collect_notifications,
+}
+
+
+class Exporter:
+    """Run collectors with per-collector TTL caching and failure isolation."""
+
+    def __init__(
+        self,
+        collectors: Optional[Dict[str, Collector]] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        socket_path: Optional[Path] = None,
+    ) -> None:
+        self.collectors = dict(COLLECTORS if collectors is None else collectors)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.socket_path = socket_path
+        self.probe_latency = Histogram(
+            "saltgoat_site_probe_duration_seconds", "Storefront probe latency observed by the exporter."
+        )
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._snapshot: Tuple[float, Optional[Dict[str, Any]]] = (-SNAPSHOT_TTL, None)
+        self._observed: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """Latest fresh snapshot of the resident resource_alert daemon, if any."""
+        fetched_at, snapshot = self._snapshot
+        now = time.monotonic()
+        if now - fetched_at >= SNAPSHOT_TTL:
+            snapshot = monitor_daemon.fetch_snapshot(self.socket_path, timeout=0.5)
+            if snapshot and time.time() - float(snapshot["generated_at"]) > resource_alert.snapshot_max_age(snapshot):
+                snapshot = None
+            self._snapshot = (now, snapshot)
+        return snapshot
+
+    def payload(self) -> Dict[str, Any]:
+        snapshot = self.snapshot()
+        payload = snapshot.get("payload") if snapshot else None
+        return payload if isinstance(payload, dict) else {}
+
+    def section(self, key: str, loader: Callable[[], Any]) -> Any:
+        payload = self.payload()
+        return payload.get(key) if payload else loader()
+
+    def observe_snapshot(self, name: str) -> bool:
+        """True the first time ``name`` sees the current snapshot."""
+        snapshot = self.snapshot() or {}
+        generated = snapshot.get("generated_at")
+        if self._observed.get(name) == generated:
+            return False
+        self._observed[name] = generated
+        return True
+
+    def families(self) -> List[MetricFamily]:
+        with self._lock:
+            families: List[MetricFamily] = []
+            duration = MetricFamily("saltgoat_exporter_collector_duration_seconds", "Time the collector last took.")
+            success = MetricFamily("saltgoat_exporter_collector_success", "1 when the collector last succeeded.")
+            age = MetricFamily("saltgoat_exporter_collector_age_seconds", "Age of the cached collector result.")
+            for name, func in self.collectors.items():
+                now = time.monotonic()
+                entry = self._cache.get(name)
+                if entry is None or now - entry["at"] >= self.ttls.get(name, 0.0):
+                    start = time.monotonic()
+                    try:
+                        entry = {"families": func(self), "ok": True}
+                    except Exception as exc:  # noqa: BLE001 - 单个采集器失败不影响其余指标
+                        print(f"[WARN] collector {name} failed: {exc}", file=sys.stderr)
+                        entry = {"families": [], "ok": False}
+                    entry.update(at=now, duration=time.monotonic() - start)
+                    self._cache[name] = entry
+                families.extend(entry["families"])
+                duration.add(entry["duration"], collector=name)
+                success.add(entry["ok"], collector=name)
+                age.add(round(now - entry["at"], 3), collector=name)
+            families.append(self.probe_latency.family())
+            snapshot = self._snapshot[1]
+            families.append(
+                MetricFamily("saltgoat_exporter_daemon_snapshot", "1 when data came from the resident daemon.").add(
+                    snapshot is not None
+                )
+            )
+            families.extend([duration, success, age])
+            return families
+
+    def render(self) -> str:
+        return render(self.families())
+
+
+def make_server(exporter: Exporter, listen: str) -> ThreadingHTTPServer:
+    host, _, port = listen.rpartition(":")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = exporter.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def textfile_loop(exporter: Exporter, path: Path, interval: float, stop: threading.Event) -> None:
+    while True:
+        try:
+            write_textfile(path, exporter.render())
+        except OSError as exc:
+            print(f"[WARN] Failed to write {path}: {exc}", file=sys.stderr)
+        if interval <= 0 or stop.wait(interval):
+            return
+
+
+def parse_ttls(values: Optional[List[str]]) -> Dict[str, float]:
+    ttls: Dict[str, float] = {}
+    for value in values or []:
+        name, _, seconds = value.partition("=")
+        try:
+            ttls[name.strip()] = float(seconds)
+        except ValueError:
+            raise SystemExit(f"invalid --ttl {value!r}, expected name=seconds")
+    return ttls
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SaltGoat Prometheus exporter")
+    parser.add_argument("--serve", action="store_true", help="serve /metrics over HTTP")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN, help=f"HTTP listen address (default: {DEFAULT_LISTEN})")
+    parser.add_argument("--textfile", type=Path, help="write node_exporter textfile atomically")
+    parser.add_argument("--interval", type=float, default=0.0, help="rewrite the textfile every N seconds")
+    parser.add_argument("--ttl", action="append", metavar="NAME=SECONDS", help="override a collector TTL")
+    parser.add_argument("--socket", type=Path, help="resource_alert daemon snapshot socket")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    exporter = Exporter(ttls=parse_ttls(args.ttl), socket_path=args.socket)
+    if not args.serve:
+        if args.textfile:
+            textfile_loop(exporter, args.textfile, args.interval, threading.Event())
+        else:
+            sys.stdout.write(exporter.render())
+        return 0
+    server = make_server(exporter, args.listen)
+    stop = threading.Event()
+    if args.textfile:
+        interval = args.interval or min(exporter.ttls.values())
+        threading.Thread(
+            target=textfile_loop, args=(exporter, args.textfile, interval, stop), name="textfile", daemon=True
+        ).start()
+    print(f"saltgoat exporter listening on http://{args.listen}/metrics", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
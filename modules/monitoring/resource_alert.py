@@ -13,18 +13,17 @@ import math
 import os
 import re
 import shutil
+import signal
 import socket
-import ssl
 import subprocess
 import sys
+import threading
 import time
-import urllib.error
-import urllib.parse
-import urllib.request
 from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from argparse import ArgumentParser
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from datetime import datetime, timezone
 
 HOSTNAME = socket.getfqdn()
@@ -32,9 +31,21 @@ REPO_ROOT = Path(__file__).resolve().parents[2]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 from modules.lib import notification as notif  # type: ignore
-from modules.lib import swap_helper  # type: ignore
 from modules.lib import logging_utils
 from modules.lib import config_loader
+from modules.lib import fastcgi_status
+from modules.lib import fpm_capacity
+from modules.lib import http_probe
+from modules.lib import metrics_history
+from modules.lib import monitor_daemon
+from modules.lib import opensearch_stats
+from modules.lib import systemd_units
+from modules.lib import valkey_client
+
+try:
+    import pymysql  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    pymysql = None  # type: ignore
 
 ALERT_LOG = logging_utils.alerts_log_path()
 LOGGER_SCRIPT = Path("/opt/saltgoat-reactor/logger.py")
@@ -48,11 +59,76 @@ DEFAULT_THRESHOLDS = {
 }
 FPM_NOTICE_RATIO = 0.8
 FPM_WARNING_RATIO = 0.9
+FPM_STATUS_TIMEOUT = float(os.environ.get("SALTGOAT_FPM_STATUS_TIMEOUT", "3"))
+FPM_STATUS_FIELDS = (
+    "active_processes",
+    "idle_processes",
+    "total_processes",
+    "listen_queue",
+    "max_listen_queue",
+    "listen_queue_len",
+    "max_children_reached",
+    "slow_requests",
+)
+# 两次采样之间按增量判断的累计计数器；启动时间相差超过 FPM_RESTART_SLACK 秒视为重启过
+FPM_COUNTER_FIELDS = ("max_children_reached", "slow_requests")
+FPM_RESTART_SLACK = 5.0
 MYSQL_NOTICE_RATIO = 0.8
 MYSQL_WARNING_RATIO = 0.9
 MYSQL_CRITICAL_RATIO = 0.95
+MYSQL_HIT_RATIO_NOTICE = 0.95
+MYSQL_HISTORY_LIST_WARNING = 1_000_000
+MYSQL_SOCKET = os.environ.get("SALTGOAT_MYSQL_SOCKET", "/var/run/mysqld/mysqld.sock")
+MYSQL_DEFAULTS_FILE = "/root/.my.cnf"
+MYSQL_STATUS_FIELDS = [
+    "Threads_connected",
+    "Threads_running",
+    "Max_used_connections",
+    "Uptime",
+    "Innodb_buffer_pool_read_requests",
+    "Innodb_buffer_pool_reads",
+    "Innodb_row_lock_waits",
+    "Innodb_row_lock_current_waits",
+    "Innodb_row_lock_time_avg",
+    "Aborted_connects",
+    "Connection_errors_max_connections",
+    "Slow_queries",
+    "Innodb_buffer_pool_bytes_data",
+]
+MYSQL_VARIABLE_FIELDS = ["max_connections", "innodb_buffer_pool_size"]
+MYSQL_EXTRA_FIELDS = [name.lower() for name in MYSQL_STATUS_FIELDS[4:] + MYSQL_VARIABLE_FIELDS[1:]]
+MYSQL_METRICS_SQL = (
+    "SHOW GLOBAL STATUS WHERE Variable_name IN ({status});"
+    "SHOW GLOBAL VARIABLES WHERE Variable_name IN ({variables});"
+    "SELECT NAME, COUNT FROM information_schema.INNODB_METRICS WHERE NAME = 'trx_rseg_history_len';"
+).format(
+    status=", ".join(f"'{name}'" for name in MYSQL_STATUS_FIELDS),
+    variables=", ".join(f"'{name}'" for name in MYSQL_VARIABLE_FIELDS),
+)
 VALKEY_WARNING_RATIO = 0.85
 VALKEY_CRITICAL_RATIO = 0.93
+VALKEY_HIT_RATIO_NOTICE = 0.8
+VALKEY_HIT_RATIO_MIN_LOOKUPS = 1000
+VALKEY_EVICTION_WARNING_RATE = 1.0
+VALKEY_INFO_FIELDS = (
+    "used_memory",
+    "used_memory_peak",
+    "maxmemory",
+    "maxmemory_human",
+    "maxmemory_policy",
+    "mem_fragmentation_ratio",
+    "connected_clients",
+    "blocked_clients",
+    "instantaneous_ops_per_sec",
+    "keyspace_hits",
+    "keyspace_misses",
+    "evicted_keys",
+    "expired_keys",
+    "total_commands_processed",
+    "uptime_in_seconds",
+)
+# 两次采样之间按增量计算的累计计数器
+VALKEY_RATE_COUNTERS = ("evicted_keys", "expired_keys", "total_commands_processed")
 OPENSEARCH_WARNING_HEAP = 75.0
 OPENSEARCH_CRITICAL_HEAP = 85.0
 OPENSEARCH_COMFORT_HEAP = 55.0
@@ -61,7 +137,11 @@ RUNTIME_DIR = Path("/etc/saltgoat/runtime")
 PHP_AUTOSCALE_FILE = RUNTIME_DIR / "php-fpm-pools.json"
 MYSQL_AUTOSCALE_FILE = RUNTIME_DIR / "mysql-autotune.json"
 VALKEY_AUTOSCALE_FILE = RUNTIME_DIR / "valkey-autotune.json"
+VALKEY_DB_MAP_FILE = RUNTIME_DIR / "valkey-databases.json"
 OPENSEARCH_AUTOSCALE_FILE = RUNTIME_DIR / "opensearch-autotune.json"
+OPENSEARCH_SAMPLE_FILE = RUNTIME_DIR / "opensearch-sample.json"
+VALKEY_SAMPLE_FILE = RUNTIME_DIR / "valkey-sample.json"
+FPM_STATUS_SAMPLE_FILE = RUNTIME_DIR / "php-fpm-status.json"
 VALKEY_CONFIG = Path("/etc/valkey/valkey.conf")
 OPENSEARCH_CONFIG = Path("/etc/opensearch/opensearch.yml")
 DEFAULT_OPENSEARCH_URL = os.environ.get("OPENSEARCH_URL", "http://127.0.0.1:9200").rstrip("/")
@@ -70,6 +150,11 @@ OPENSEARCH_STATS_URL = os.environ.get(
     f"{DEFAULT_OPENSEARCH_URL or 'http://127.0.0.1:9200'}/_cluster/stats?human=false",
 )
 OPENSEARCH_REQUEST_TIMEOUT = int(os.environ.get("OPENSEARCH_TIMEOUT", "10"))
+# Magento 目录索引（<prefix>_product_<store>_vN / <prefix>_category_<store>_vN）
+OPENSEARCH_CATALOG_INDICES = os.environ.get("OPENSEARCH_CATALOG_INDICES", opensearch_stats.CATALOG_INDEX_PATTERN)
+OPENSEARCH_EVICTION_RATE = 10.0
+OPENSEARCH_SEARCH_LATENCY_NOTICE_MS = 500.0
+OPENSEARCH_GC_RATIO_WARNING = 0.1
 OPENSEARCH_CACHE_RULES = {
     "index_buffer_size": {"min": 10, "max": 45, "step": 5, "default": 20},
     "fielddata_cache_size": {"min": 10, "max": 45, "step": 5, "default": 20},
@@ -80,6 +165,8 @@ AUTOSCALE_MIN_INTERVAL = 300  # seconds
 PHP_AUTOSCALE_MAX = 240
 PHP_AUTOSCALE_STEP_RATIO = 0.25
 PHP_AUTOSCALE_MIN_STEP = 2
+PHP_CAPACITY_MIN_CHILDREN = 4
+PHP_SCALE_DOWN_SAMPLES = 3
 MYSQL_AUTOSCALE_MAX = 800
 MYSQL_AUTOSCALE_STEP_RATIO = 0.2
 MYSQL_AUTOSCALE_MIN_STEP = 20
@@ -87,12 +174,49 @@ VALKEY_AUTOSCALE_STEP_RATIO = 0.2
 VALKEY_AUTOSCALE_MIN_STEP_MB = 256
 VALKEY_AUTOSCALE_MAX_RATIO = 0.75
 SERVICE_HEAL_COOLDOWN = 300
+SITE_PROBE_WORKERS = int(os.environ.get("SALTGOAT_SITE_PROBE_WORKERS", "8"))
+SITE_SWEEP_DEADLINE = float(os.environ.get("SALTGOAT_SITE_SWEEP_DEADLINE", "60"))
 RECENT_IDS_LIMIT = 200
 DEFAULT_SWAP_AUTOHEAL_SERVICES = ["php8.3-fpm"]
 SWAP_ENSURE_MIN_BYTES = int(os.environ.get("SALTGOAT_SWAP_MIN_BYTES", str(8 * 1024**3)))
 SWAP_DEFAULT_FILE = Path(os.environ.get("SALTGOAT_SWAPFILE", "/swapfile"))
 
-_SERVICE_CACHE: Dict[str, bool] = {}
+DAEMON_TICK = float(os.environ.get("SALTGOAT_MONITOR_TICK", "15"))
+DAEMON_ALERT_INTERVAL = float(os.environ.get("SALTGOAT_MONITOR_ALERT_INTERVAL", "300"))
+# register_collector 未指定 interval 时使用的刷新间隔（秒），未列出的采集器每个 tick 都执行
+DEFAULT_COLLECTOR_INTERVALS = {
+    "services": 30.0,
+    "php_fpm": 15.0,
+    "mysql": 30.0,
+    "valkey": 30.0,
+    "opensearch": 60.0,
+    "sites": 60.0,
+}
+# 单个采集器的等待上限（秒）；超时的采集器在后台继续运行，不阻塞其余检查
+DEFAULT_COLLECTOR_TIMEOUTS = {
+    "services": 10.0,
+    "php_fpm": 10.0,
+    "mysql": 15.0,
+    "valkey": 10.0,
+    "opensearch": OPENSEARCH_REQUEST_TIMEOUT + 5.0,
+    "sites": SITE_SWEEP_DEADLINE + 5.0,
+}
+CONFIG_WATCH_PATHS = [
+    REPO_ROOT / "salt" / "pillar",
+    Path("/srv/pillar"),
+    PHP_FPM_POOL_DIR,
+    Path("/etc/systemd/system"),
+]
+SEVERITY_ORDER = {"INFO": 0, "NOTICE": 1, "WARNING": 2, "CRITICAL": 3}
+DISK_PATHS = [Path("/"), Path("/var/lib/mysql"), Path("/home")]
+CORE_SERVICES = ["nginx", "php8.3-fpm", "mysql", "valkey", "rabbitmq", "salt-minion", "varnish"]
+
+_CONFIG_CACHE: Dict[str, Any] = {}
+_COLLECTOR_CACHE: Dict[str, Tuple[float, Any]] = {}
+# 常驻进程生效的刷新间隔：采集器注册的 interval 叠加 Pillar 覆盖；单次运行时为空，每次都重新采集
+_COLLECTOR_INTERVALS: Dict[str, float] = {}
+_COLLECTOR_TIMEOUTS: Dict[str, float] = {}
+_COLLECTOR_RUNNING: Dict[str, Future] = {}
 
 
 def shell_exists(path: Path) -> bool:
@@ -198,6 +322,9 @@ def human_bytes(value: float) -> str:
 
 
 def auto_expand_swap(details: List[str]) -> None:
+    # 只有自愈路径需要 swap_helper（dataclasses 导入较重），按需加载
+    from modules.lib import swap_helper  # type: ignore
+
     try:
         result = swap_helper.ensure_swap_capacity(
             min_size=SWAP_ENSURE_MIN_BYTES,
@@ -216,43 +343,13 @@ def auto_expand_swap(details: List[str]) -> None:
 
 
 def service_exists(name: str) -> bool:
-    if name in _SERVICE_CACHE:
-        return _SERVICE_CACHE[name]
-    try:
-        proc = subprocess.run(
-            ["systemctl", "show", f"{name}.service", "--property", "LoadState"],
-            check=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        exists = proc.returncode == 0 and "not-found" not in proc.stdout
-    except FileNotFoundError:
-        exists = False
-    _SERVICE_CACHE[name] = exists
-    return exists
-
-
-def service_status(services: Iterable[str]) -> Dict[str, bool]:
-    result: Dict[str, bool] = {}
-    for svc in services:
-        if not service_exists(svc):
-            continue
-        try:
-            proc = subprocess.run(
-                ["systemctl", "is-active", "--quiet", svc],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            if proc.returncode == 4 and proc.stderr and "could not be found" in proc.stderr.lower():
-                continue
-            result[svc] = proc.returncode == 0
-        except FileNotFoundError:
-            continue
-    return result
+    return systemd_units.unit_state(name).exists
 
 
+def service_status(services: Iterable[str], refresh: bool = False) -> Dict[str, bool]:
+    """Return active flags for the services that exist, using one systemctl call."""
+    states = systemd_units.query(services, refresh=refresh)
+    return {svc: state.active for svc, state in states.items() if state.exists}
 
 
 def ensure_runtime_dir() -> None:
@@ -301,6 +398,22 @@ def recently_scaled(meta: Dict[str, Any], min_interval: int = AUTOSCALE_MIN_INTE
     return False
 
 
+def cached_config(key: str, loader: Any) -> Any:
+    """Load a configuration value once per process (or until reload_config)."""
+    if key not in _CONFIG_CACHE:
+        _CONFIG_CACHE[key] = loader()
+    return _CONFIG_CACHE[key]
+
+
+def reload_config() -> None:
+    """Drop cached pillar, pool and unit data so the next evaluation re-reads it."""
+    _CONFIG_CACHE.clear()
+    systemd_units.clear_cache()
+    _COLLECTOR_CACHE.clear()
+    config_loader.reset_caller()
+    notif.load_config(reload=True)
+
+
 def php_fpm_pool_configs(pool_dir: Path = PHP_FPM_POOL_DIR) -> Dict[str, Dict[str, Any]]:
     configs: Dict[str, Dict[str, Any]] = {}
     if not shell_exists(pool_dir):
@@ -333,6 +446,8 @@ def php_fpm_pool_configs(pool_dir: Path = PHP_FPM_POOL_DIR) -> Dict[str, Dict[st
                         pool_data["pm"] = value
                     elif key == "listen":
                         pool_data["listen"] = value
+                    elif key == "pm.status_path":
+                        pool_data["status_path"] = value
                     elif key.startswith("php_admin_value[") and key.endswith("]"):
                         inner = key[len("php_admin_value[") : -1]
                         admin = pool_data.setdefault("php_admin_value", {})
@@ -378,6 +493,8 @@ def php_fpm_pool_configs_from_file(path: Path) -> Dict[str, Dict[str, Any]]:
                     data["pm"] = value
                 elif key == "listen":
                     data["listen"] = value
+                elif key == "pm.status_path":
+                    data["status_path"] = value
                 elif key.startswith("php_admin_value[") and key.endswith("]"):
                     inner = key[len("php_admin_value[") : -1]
                     admin = data.setdefault("php_admin_value", {})
@@ -389,127 +506,194 @@ def php_fpm_pool_configs_from_file(path: Path) -> Dict[str, Dict[str, Any]]:
     return {}
 
 
-def php_fpm_children_by_pool() -> Dict[str, int]:
+def php_fpm_workers_by_pool() -> Dict[str, List[int]]:
     try:
         output = subprocess.check_output(
-            ["ps", "-o", "cmd=", "-C", "php-fpm8.3"],
+            ["ps", "-o", "pid=,cmd=", "-C", "php-fpm8.3"],
             text=True,
             stderr=subprocess.DEVNULL,
         )
     except (subprocess.CalledProcessError, FileNotFoundError):
         return {}
-    counts: Dict[str, int] = defaultdict(int)
+    workers: Dict[str, List[int]] = defaultdict(list)
     for line in output.splitlines():
         if "php-fpm: pool" not in line or "master process" in line:
             continue
-        pool = line.split("php-fpm: pool", 1)[-1].strip()
-        if pool:
-            counts[pool] += 1
-    return dict(counts)
+        pid, _, cmd = line.strip().partition(" ")
+        pool = cmd.split("php-fpm: pool", 1)[-1].strip()
+        if pool and pid.isdigit():
+            workers[pool].append(int(pid))
+    return dict(workers)
 
 
-def collect_mysql_metrics() -> Optional[Dict[str, Any]]:
-    def _run(query: str) -> Optional[int]:
+def php_fpm_children_by_pool() -> Dict[str, int]:
+    return {pool: len(pids) for pool, pids in php_fpm_workers_by_pool().items()}
+
+
+def _mysql_rows_to_metrics(rows: Iterable[Tuple[Any, ...]]) -> Optional[Dict[str, Any]]:
+    values: Dict[str, str] = {}
+    for row in rows:
+        if len(row) >= 2 and row[0] is not None:
+            values[str(row[0]).lower()] = str(row[1])
+
+    def _int(name: str) -> Optional[int]:
         try:
-            output = subprocess.check_output(
-                ["mysql", "-Nse", query],
-                text=True,
-                stderr=subprocess.DEVNULL,
-            )
-        except (subprocess.CalledProcessError, FileNotFoundError):
+            return int(float(values[name]))
+        except (KeyError, ValueError):
             return None
-        for line in output.splitlines():
-            parts = line.strip().split()
-            if len(parts) == 2:
-                try:
-                    return int(float(parts[1]))
-                except ValueError:
-                    continue
-        return None
 
-    max_connections = _run("SHOW VARIABLES LIKE 'max_connections';")
-    threads_connected = _run("SHOW GLOBAL STATUS LIKE 'Threads_connected';")
-    threads_running = _run("SHOW GLOBAL STATUS LIKE 'Threads_running';")
-    max_used = _run("SHOW GLOBAL STATUS LIKE 'Max_used_connections';")
-    uptime = _run("SHOW GLOBAL STATUS LIKE 'Uptime';")
+    max_connections = _int("max_connections")
+    threads_connected = _int("threads_connected")
     if max_connections is None or threads_connected is None:
         return None
-    return {
+    metrics: Dict[str, Any] = {
         "max_connections": max_connections,
         "threads_connected": threads_connected,
-        "threads_running": threads_running,
-        "max_used_connections": max_used,
-        "uptime": uptime,
+        "threads_running": _int("threads_running"),
+        "max_used_connections": _int("max_used_connections"),
+        "uptime": _int("uptime"),
     }
+    for name in MYSQL_EXTRA_FIELDS:
+        value = _int(name)
+        if value is not None:
+            metrics[name] = value
+    read_requests = metrics.get("innodb_buffer_pool_read_requests")
+    disk_reads = metrics.get("innodb_buffer_pool_reads")
+    if read_requests:
+        metrics["buffer_pool_hit_ratio"] = round(1 - (disk_reads or 0) / read_requests, 6)
+    history = _int("trx_rseg_history_len")
+    if history is not None:
+        metrics["history_list_length"] = history
+    return metrics
 
 
-def collect_valkey_metrics() -> Optional[Dict[str, Any]]:
-    cli = shutil.which("valkey-cli") or shutil.which("redis-cli")
-    if not cli:
-        return None
-    password: Optional[str] = None
-    if shell_exists(VALKEY_CONFIG):
+def collect_mysql_metrics() -> Optional[Dict[str, Any]]:
+    """Fetch status/variables/InnoDB figures over a single connection.
+
+    Prefers PyMySQL on the local socket; otherwise runs the whole batch in one
+    ``mysql`` invocation instead of one fork per variable.
+    """
+    if pymysql is not None:
         try:
-            for line in VALKEY_CONFIG.read_text(encoding="utf-8").splitlines():
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                if line.lower().startswith("requirepass"):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        password = parts[1]
-                    break
-        except (OSError, UnicodeDecodeError):
-            password = None
-    base_cmd = [cli, "INFO", "memory"]
-    auth_cmd = [cli, "-a", password, "INFO", "memory"] if password else None
+            conn = pymysql.connect(
+                unix_socket=MYSQL_SOCKET,
+                read_default_file=MYSQL_DEFAULTS_FILE if shell_exists(Path(MYSQL_DEFAULTS_FILE)) else None,
+                connect_timeout=5,
+                client_flag=pymysql.constants.CLIENT.MULTI_STATEMENTS,
+            )
+        except Exception:
+            conn = None
+        if conn is not None:
+            rows: List[Tuple[Any, ...]] = []
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(MYSQL_METRICS_SQL)
+                    while True:
+                        rows.extend(cursor.fetchall())
+                        if not cursor.nextset():
+                            break
+            except Exception:
+                pass
+            finally:
+                conn.close()
+            metrics = _mysql_rows_to_metrics(rows)
+            if metrics:
+                return metrics
     try:
+        # --force 保证 INNODB_METRICS 无权限时前两段结果仍然输出
         output = subprocess.check_output(
-            base_cmd,
+            ["mysql", "--force", "-Nse", MYSQL_METRICS_SQL],
             text=True,
             stderr=subprocess.DEVNULL,
         )
+    except subprocess.CalledProcessError as exc:
+        output = exc.output or ""
     except FileNotFoundError:
         return None
-    except subprocess.CalledProcessError:
-        output = ""
-    if "NOAUTH" in output and password and auth_cmd:
-        try:
-            output = subprocess.check_output(
-                auth_cmd,
-                text=True,
-                stderr=subprocess.DEVNULL,
-            )
-        except subprocess.CalledProcessError:
-            return None
-    if not output:
+    return _mysql_rows_to_metrics(line.split("\t") for line in output.splitlines())
+
+
+def valkey_db_roles() -> Dict[str, str]:
+    """Label logical DBs (``db10`` -> ``site1:cache``).
+
+    ``valkey-setup`` records each site's assignment in ``VALKEY_DB_MAP_FILE``
+    (its pillar is passed inline to ``state.apply`` and never reaches the
+    daemon); ``saltgoat:monitor:valkey:databases`` overrides individual labels.
+    """
+    recorded = load_runtime_json(VALKEY_DB_MAP_FILE)
+    roles: Dict[str, str] = {}
+    if isinstance(recorded, dict):
+        roles.update({str(db): str(label) for db, label in recorded.items() if str(db).startswith("db")})
+    overrides = config_loader.pillar_get("saltgoat:monitor:valkey:databases", {})
+    if isinstance(overrides, dict):
+        roles.update({"db" + str(db).removeprefix("db"): str(label) for db, label in overrides.items()})
+    return roles
+
+
+def valkey_rates(info: Dict[str, Any], previous: Dict[str, Any], now: float) -> Dict[str, Any]:
+    """Hit ratio and per-second counters since ``previous`` (empty on the first sample)."""
+    if not isinstance(previous.get("at"), (int, float)):
+        return {}
+    elapsed = now - previous["at"]
+    # 重启后计数器归零，丢弃这一轮增量
+    if elapsed <= 0 or (info.get("uptime_in_seconds") or 0) < (previous.get("uptime_in_seconds") or 0):
+        return {}
+
+    def delta(key: str) -> Optional[int]:
+        current, before = info.get(key), previous.get(key)
+        if isinstance(current, int) and isinstance(before, int) and current >= before:
+            return current - before
         return None
-    metrics: Dict[str, Any] = {}
-    for raw in output.splitlines():
-        if ":" not in raw:
-            continue
-        key, value = raw.split(":", 1)
-        key = key.strip()
-        value = value.strip()
-        if not key:
-            continue
-        if key in {"used_memory", "used_memory_peak", "maxmemory"}:
-            try:
-                metrics[key] = int(value)
-            except ValueError:
-                continue
-        elif key in {"maxmemory_human"}:
-            metrics[key] = value
-        elif key == "mem_fragmentation_ratio":
-            try:
-                metrics[key] = float(value)
-            except ValueError:
-                continue
-    if "used_memory" not in metrics:
+
+    rates: Dict[str, Any] = {"interval_seconds": round(elapsed, 1)}
+    hits, misses = delta("keyspace_hits"), delta("keyspace_misses")
+    if hits is not None and misses is not None:
+        rates["lookups"] = hits + misses
+        if hits + misses:
+            rates["hit_ratio"] = round(hits / (hits + misses), 4)
+    for key, name in (
+        ("evicted_keys", "evictions_per_sec"),
+        ("expired_keys", "expired_per_sec"),
+        ("total_commands_processed", "ops_per_sec"),
+    ):
+        value = delta(key)
+        if value is not None:
+            rates[name] = round(value / elapsed, 2)
+            if key == "expired_keys":
+                rates["expired"] = value
+    return rates
+
+
+def collect_valkey_metrics() -> Optional[Dict[str, Any]]:
+    """Sample ``INFO all`` over one authenticated RESP connection."""
+    settings = valkey_client.server_settings(VALKEY_CONFIG)
+    address = valkey_client.settings_address(settings)
+    try:
+        info = valkey_client.fetch_info(address, settings.get("password"))
+    except (valkey_client.ValkeyError, ValueError):
+        return None
+    if "used_memory" not in info:
         return None
-    metrics["cli"] = cli
-    if password:
-        metrics["password"] = password
+    metrics: Dict[str, Any] = {key: info[key] for key in VALKEY_INFO_FIELDS if key in info}
+    # 上一次的计数器落盘，cron 单次运行也能算出速率
+    now = time.time()
+    metrics.update(valkey_rates(info, load_runtime_json(VALKEY_SAMPLE_FILE), now))
+    try:
+        save_runtime_json(
+            VALKEY_SAMPLE_FILE,
+            {"at": now, **{key: info.get(key) for key in VALKEY_RATE_COUNTERS + ("keyspace_hits", "keyspace_misses", "uptime_in_seconds")}},
+        )
+    except OSError:
+        pass
+    roles = cached_config("valkey_db_roles", valkey_db_roles)
+    databases: Dict[str, Any] = {}
+    for key, value in info.items():
+        if key.startswith("db") and isinstance(value, dict):
+            entry = {name: value[name] for name in ("keys", "expires", "avg_ttl") if name in value}
+            if key in roles:
+                entry["role"] = roles[key]
+            databases[key] = entry
+    metrics["databases"] = databases
     return metrics
 
 
@@ -552,22 +736,28 @@ def current_opensearch_cache_settings() -> Dict[str, int]:
 
 
 def collect_opensearch_metrics() -> Optional[Dict[str, Any]]:
+    """Cluster, node and catalog-index stats from three requests on one connection.
+
+    Counter rates are computed against the previous sample persisted in
+    ``OPENSEARCH_SAMPLE_FILE`` so one-shot runs (cron) get rates too.
+    """
     if not shell_exists(OPENSEARCH_CONFIG):
         return None
-    req = urllib.request.Request(
-        OPENSEARCH_STATS_URL,
-        headers={"User-Agent": "SaltGoatResource/1.0"},
-    )
+    base_url, stats_path = opensearch_stats.split_stats_url(OPENSEARCH_STATS_URL)
+    prefix = stats_path.split("/_cluster/stats", 1)[0] if "/_cluster/stats" in stats_path else ""
     try:
-        with urllib.request.urlopen(req, timeout=OPENSEARCH_REQUEST_TIMEOUT) as resp:
-            raw = resp.read()
-    except (urllib.error.URLError, TimeoutError, ConnectionError, ValueError):
+        stats, nodes_stats, index_stats = opensearch_stats.fetch_json(
+            base_url,
+            [
+                stats_path,
+                prefix + opensearch_stats.NODES_STATS_PATH,
+                prefix + opensearch_stats.index_stats_path(OPENSEARCH_CATALOG_INDICES),
+            ],
+            OPENSEARCH_REQUEST_TIMEOUT,
+        )
+    except opensearch_stats.OpenSearchError:
         return None
-    if not raw:
-        return None
-    try:
-        stats = json.loads(raw.decode("utf-8"))
-    except json.JSONDecodeError:
+    if not stats:
         return None
     nodes = stats.get("nodes", {})
     jvm_mem = nodes.get("jvm", {}).get("mem", {})
@@ -586,6 +776,23 @@ def collect_opensearch_metrics() -> Optional[Dict[str, Any]]:
         "segments_memory_bytes": indices.get("segments", {}).get("memory_in_bytes"),
         "docs_count": indices.get("docs", {}).get("count"),
     }
+    now = time.time()
+    previous = load_runtime_json(OPENSEARCH_SAMPLE_FILE)
+    elapsed = now - previous.get("at", now) if isinstance(previous.get("at"), (int, float)) else 0.0
+    sample: Dict[str, Any] = {"at": now}
+    if nodes_stats:
+        summary = opensearch_stats.summarize_nodes(nodes_stats)
+        metrics["thread_pools"] = summary["thread_pools"]
+        metrics["rates"] = opensearch_stats.rates(summary["counters"], previous.get("counters") or {}, elapsed)
+        sample["counters"] = summary["counters"]
+    if index_stats:
+        catalog = opensearch_stats.summarize_indices(index_stats)
+        metrics["catalog_indices"] = opensearch_stats.index_rates(catalog, previous.get("indices") or {}, elapsed)
+        sample["indices"] = catalog
+    try:
+        save_runtime_json(OPENSEARCH_SAMPLE_FILE, sample)
+    except OSError:
+        pass
     return metrics
 
 
@@ -600,11 +807,17 @@ def autoscale_opensearch(metrics: Dict[str, Any], auto_ctx: Dict[str, Any]) -> N
     caches = current_opensearch_cache_settings()
     if not caches:
         return
+    rates = metrics.get("rates") or {}
+    evictions = sum(rates.get(f"{name}_evictions_per_sec", 0) for name in ("query_cache", "fielddata"))
+    rejections = sum(rates.get(f"{name}_rejected_per_sec", 0) for name in opensearch_stats.THREAD_POOLS)
     direction: Optional[str] = None
+    reason = f"heap {heap_percent:.1f}%"
     if heap_percent >= OPENSEARCH_CRITICAL_HEAP:
         direction = "decrease"
-    elif heap_percent <= OPENSEARCH_COMFORT_HEAP:
+    elif evictions >= OPENSEARCH_EVICTION_RATE and heap_percent <= OPENSEARCH_COMFORT_HEAP and not rejections:
+        # 缓存频繁驱逐且 heap 仍有余量时才扩大缓存；出现拒绝说明瓶颈在线程池而不是缓存
         direction = "increase"
+        reason += f", {evictions:.1f} cache evictions/s"
     if not direction:
         return
     data = load_runtime_json(OPENSEARCH_AUTOSCALE_FILE)
@@ -631,25 +844,13 @@ def autoscale_opensearch(metrics: Dict[str, Any], auto_ctx: Dict[str, Any]) -> N
     old_fmt = ", ".join(f"{k} {caches[k]}%" for k in ("index_buffer_size", "fielddata_cache_size", "queries_cache_size"))
     new_fmt = ", ".join(f"{k} {new_caches[k]}%" for k in ("index_buffer_size", "fielddata_cache_size", "queries_cache_size"))
     auto_ctx["actions"].append(
-        f"Adjusted OpenSearch caches ({old_fmt} -> {new_fmt}) after heap {heap_percent:.1f}%."
+        f"Adjusted OpenSearch caches ({old_fmt} -> {new_fmt}) after {reason}."
     )
     auto_ctx.setdefault("states", set()).add("optional.magento-optimization")
     auto_ctx.setdefault("services", set()).add("opensearch")
 
 
-def autoscale_php_pool(pool_name: str, config: Dict[str, Any], auto_ctx: Dict[str, Any]) -> None:
-    max_children = config.get("max_children")
-    if not isinstance(max_children, int) or max_children <= 0:
-        return
-    data = load_runtime_json(PHP_AUTOSCALE_FILE)
-    meta = runtime_meta_scope(data, pool_name)
-    if recently_scaled(meta):
-        return
-    new_max = max_children + max(int(math.ceil(max_children * PHP_AUTOSCALE_STEP_RATIO)), PHP_AUTOSCALE_MIN_STEP)
-    if new_max > PHP_AUTOSCALE_MAX:
-        new_max = PHP_AUTOSCALE_MAX
-    if new_max <= max_children:
-        return
+def php_pool_runtime_settings(config: Dict[str, Any], new_max: int) -> Dict[str, int]:
     new_start = max(4, min(new_max, max(config.get("start_servers", new_max // 2), new_max // 2)))
     new_min_spare = max(3, min(new_max, max(config.get("min_spare_servers", new_max // 3), new_max // 3)))
     new_max_spare = min(
@@ -660,12 +861,36 @@ def autoscale_php_pool(pool_name: str, config: Dict[str, Any], auto_ctx: Dict[st
             new_max // 2 + 2,
         ),
     )
-    data[pool_name] = {
+    return {
         "max_children": new_max,
-        "start_servers": new_start,
-        "min_spare_servers": new_min_spare,
+        "start_servers": min(new_start, new_max),
+        "min_spare_servers": min(new_min_spare, new_max),
         "max_spare_servers": new_max_spare,
     }
+
+
+def autoscale_php_pool(
+    pool_name: str,
+    config: Dict[str, Any],
+    auto_ctx: Dict[str, Any],
+    safe_max: Optional[int] = None,
+) -> None:
+    max_children = config.get("max_children")
+    if not isinstance(max_children, int) or max_children <= 0:
+        return
+    data = load_runtime_json(PHP_AUTOSCALE_FILE)
+    meta = runtime_meta_scope(data, pool_name)
+    if recently_scaled(meta):
+        return
+    new_max = max_children + max(int(math.ceil(max_children * PHP_AUTOSCALE_STEP_RATIO)), PHP_AUTOSCALE_MIN_STEP)
+    if new_max > PHP_AUTOSCALE_MAX:
+        new_max = PHP_AUTOSCALE_MAX
+    # 内存规划给出的上限优先：内存放不下的 worker 只会把主机推进 swap
+    if safe_max is not None and new_max > safe_max:
+        new_max = safe_max
+    if new_max <= max_children:
+        return
+    data[pool_name] = php_pool_runtime_settings(config, new_max)
     meta["last_scaled_at"] = time.time()
     save_runtime_json(PHP_AUTOSCALE_FILE, data)
     auto_ctx["actions"].append(
@@ -674,6 +899,65 @@ def autoscale_php_pool(pool_name: str, config: Dict[str, Any], auto_ctx: Dict[st
     auto_ctx["states"].add("core.php")
 
 
+def scale_down_php_pool(pool_name: str, config: Dict[str, Any], safe_max: int, auto_ctx: Dict[str, Any]) -> bool:
+    """Lower ``max_children`` to what memory can hold; returns True when a change was queued.
+
+    Only acts after ``PHP_SCALE_DOWN_SAMPLES`` consecutive over-capacity
+    samples, using the most generous limit seen during that streak.
+    """
+    max_children = config.get("max_children")
+    if not isinstance(max_children, int) or max_children <= safe_max:
+        return False
+    data = load_runtime_json(PHP_AUTOSCALE_FILE)
+    meta = runtime_meta_scope(data, pool_name)
+    # 单次采样可能碰上 reindex worker 或备份占用 page cache 的瞬时峰值，连续超限才缩容
+    streak = int(meta.get("over_capacity_samples", 0)) + 1
+    safe_max = max(safe_max, int(meta.get("over_capacity_safe_max", 0)))
+    if streak < PHP_SCALE_DOWN_SAMPLES or recently_scaled(meta):
+        meta["over_capacity_samples"] = streak
+        meta["over_capacity_safe_max"] = safe_max
+        save_runtime_json(PHP_AUTOSCALE_FILE, data)
+        return False
+    meta.pop("over_capacity_samples", None)
+    meta.pop("over_capacity_safe_max", None)
+    if max_children <= safe_max:
+        save_runtime_json(PHP_AUTOSCALE_FILE, data)
+        return False
+    data[pool_name] = php_pool_runtime_settings(config, safe_max)
+    meta["last_scaled_at"] = time.time()
+    meta["last_direction"] = "down"
+    save_runtime_json(PHP_AUTOSCALE_FILE, data)
+    auto_ctx["actions"].append(
+        f"Scaled down PHP-FPM pool {pool_name}: max_children {max_children} -> {safe_max} (memory capacity)."
+    )
+    auto_ctx["states"].add("core.php")
+    return True
+
+
+def reset_php_scale_down(pool_name: str) -> None:
+    """Forget an over-capacity streak once the pool fits in memory again."""
+    data = load_runtime_json(PHP_AUTOSCALE_FILE)
+    meta = (data.get("__meta__") or {}).get(pool_name)
+    if not isinstance(meta, dict) or "over_capacity_samples" not in meta:
+        return
+    meta.pop("over_capacity_samples", None)
+    meta.pop("over_capacity_safe_max", None)
+    save_runtime_json(PHP_AUTOSCALE_FILE, data)
+
+
+def mysql_contention_reason(metrics: Dict[str, Any]) -> Optional[str]:
+    """Explain when connection pressure comes from InnoDB contention, not capacity."""
+    lock_waits = metrics.get("innodb_row_lock_current_waits")
+    running = metrics.get("threads_running")
+    if isinstance(lock_waits, int) and isinstance(running, int) and running > 0:
+        if lock_waits * 2 >= running:
+            return f"{lock_waits}/{running} running threads waiting on row locks"
+    history = metrics.get("history_list_length")
+    if isinstance(history, int) and history >= MYSQL_HISTORY_LIST_WARNING:
+        return f"InnoDB history list length {history}"
+    return None
+
+
 def autoscale_mysql(metrics: Dict[str, Any], auto_ctx: Dict[str, Any]) -> None:
     max_connections = metrics.get("max_connections")
     threads_connected = metrics.get("threads_connected")
@@ -713,15 +997,23 @@ def autoscale_mysql(metrics: Dict[str, Any], auto_ctx: Dict[str, Any]) -> None:
 
 
 def autoscale_valkey(metrics: Dict[str, Any], auto_ctx: Dict[str, Any]) -> None:
+    """Grow maxmemory when Valkey is evicting keys (the cache is too small for the working set).
+
+    Without an eviction rate (first sample, or after a restart) fall back to
+    the used/maxmemory ratio.
+    """
     maxmemory = metrics.get("maxmemory")
     used_memory = metrics.get("used_memory")
-    cli = metrics.get("cli")
+    evictions = metrics.get("evictions_per_sec")
     if not isinstance(maxmemory, int) or maxmemory <= 0:
         return
-    if not isinstance(used_memory, int) or used_memory <= 0:
-        return
-    ratio = used_memory / maxmemory if maxmemory else 0
-    if ratio < VALKEY_CRITICAL_RATIO:
+    if isinstance(evictions, (int, float)):
+        if evictions < VALKEY_EVICTION_WARNING_RATE:
+            return
+        reason = f"after {evictions:.1f} evictions/s"
+    elif isinstance(used_memory, int) and used_memory / maxmemory >= VALKEY_CRITICAL_RATIO:
+        reason = f"at {used_memory / maxmemory * 100:.1f}% of maxmemory"
+    else:
         return
     total_mem = read_meminfo().get("MemTotal", 0) * 1024
     hard_cap = int(total_mem * VALKEY_AUTOSCALE_MAX_RATIO)
@@ -745,26 +1037,23 @@ def autoscale_valkey(metrics: Dict[str, Any], auto_ctx: Dict[str, Any]) -> None:
     meta["last_scaled_at"] = time.time()
     save_runtime_json(VALKEY_AUTOSCALE_FILE, data)
     auto_ctx["actions"].append(
-        f"Autoscaled Valkey maxmemory {maxmemory // (1024 * 1024)}mb -> {new_value_mb}mb."
+        f"Autoscaled Valkey maxmemory {maxmemory // (1024 * 1024)}mb -> {new_value_mb}mb {reason}."
     )
     states = auto_ctx.get("states")
     if isinstance(states, set):
         states.add("optional.magento-optimization")
-    if isinstance(cli, str):
-        password = metrics.get("password")
-        try:
-            cmd = [cli]
-            if password:
-                cmd += ["-a", password]
-            cmd += ["CONFIG", "SET", "maxmemory", f"{new_value_mb}mb"]
-            subprocess.run(
-                cmd,
-                check=False,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-        except Exception:
-            pass
+    settings = valkey_client.server_settings(VALKEY_CONFIG)
+    try:
+        valkey_client.run_command(
+            valkey_client.settings_address(settings),
+            settings.get("password"),
+            "CONFIG",
+            "SET",
+            "maxmemory",
+            f"{new_value_mb}mb",
+        )
+    except (valkey_client.ValkeyError, ValueError):
+        pass
 
 
 def apply_states(states: Iterable[str]) -> Dict[str, bool]:
@@ -868,31 +1157,6 @@ def normalize_services(value: Any) -> List[str]:
     return []
 
 
-def tls_days_until_expiry(url: str, timeout: float) -> Tuple[Optional[float], Optional[str]]:
-    parsed = urllib.parse.urlparse(url)
-    if parsed.scheme.lower() != "https":
-        return None, None
-    host = parsed.hostname
-    if not host:
-        return None, "invalid host"
-    port = parsed.port or 443
-    context = ssl.create_default_context()
-    try:
-        with socket.create_connection((host, port), timeout=timeout) as sock:
-            with context.wrap_socket(sock, server_hostname=host) as ssock:
-                cert = ssock.getpeercert()
-    except Exception as exc:  # noqa: BLE001
-        return None, f"TLS handshake failed: {exc}"
-    if not cert or "notAfter" not in cert:
-        return None, "certificate missing expiry"
-    try:
-        expiry = datetime.strptime(cert["notAfter"], "%b %d %H:%M:%S %Y %Z").replace(tzinfo=timezone.utc)
-    except ValueError:
-        return None, "unable to parse certificate expiry"
-    days_left = (expiry - datetime.now(timezone.utc)).total_seconds() / 86400
-    return days_left, None
-
-
 def load_service_heal_map() -> Dict[str, float]:
     try:
         data = json.loads((RUNTIME_DIR / "service-heal.json").read_text(encoding="utf-8"))
@@ -934,61 +1198,65 @@ def _sites_in_command(command: str) -> Set[str]:
 
 
 def load_site_checks() -> List[Dict[str, Any]]:
-    sites = config_loader.pillar_get("saltgoat:monitor:sites", [])
+    sites = cached_config("sites", lambda: config_loader.pillar_get("saltgoat:monitor:sites", []))
     if isinstance(sites, list):
         return [site for site in sites if isinstance(site, dict) and site.get("url")]
     return []
 
 
+def site_probe_targets(sites: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turn ``saltgoat:monitor:sites`` entries into ``http_probe.probe_many`` targets."""
+    targets: List[Dict[str, Any]] = []
+    for site in sites:
+        url = str(site.get("url", ""))
+        if not url:
+            continue
+        targets.append(
+            {
+                "site": site,
+                "url": url,
+                "timeout": float(site.get("timeout", 5.0) or 5.0),
+                "expect": int(site.get("expect", 200) or 200),
+                "headers": site.get("headers") if isinstance(site.get("headers"), dict) else {},
+                "retries": max(1, int(site.get("retries", 1) or 1)),
+            }
+        )
+    return targets
+
+
+def probe_sites(sites: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Probe every configured site concurrently (``sites`` collector)."""
+    targets = site_probe_targets(sites)
+    probes = http_probe.probe_many(targets, workers=SITE_PROBE_WORKERS, deadline=SITE_SWEEP_DEADLINE)
+    return {"targets": targets, "probes": probes}
+
+
+def assess_sites(data: Optional[Dict[str, Any]], ctx: Assessment) -> List[Dict[str, Any]]:
+    if not data:
+        return []
+    return check_sites(data["targets"], data["probes"], ctx.details, ctx.auto_ctx, ctx.bump)
+
+
 def check_sites(
-    sites: List[Dict[str, Any]],
+    targets: List[Dict[str, Any]],
+    probes: List[Dict[str, Any]],
     details: List[str],
     auto_ctx: Dict[str, Any],
     bump: Any,
 ) -> List[Dict[str, Any]]:
     results: List[Dict[str, Any]] = []
-    for site in sites:
-        url = str(site.get("url", ""))
-        if not url:
-            continue
+    # 探测结果按配置顺序回放，保证告警/自愈顺序与串行版本一致
+    for target, probe in zip(targets, probes):
+        site = target["site"]
+        url = target["url"]
         name = str(site.get("name") or url)
-        timeout = float(site.get("timeout", 5.0) or 5.0)
-        expected = int(site.get("expect", 200) or 200)
-        headers = site.get("headers") if isinstance(site.get("headers"), dict) else {}
-        retries = max(1, int(site.get("retries", 1) or 1))
-        success_attempt: Optional[int] = None
-        status: Optional[int] = None
-        body_snippet = ""
-        error_msg: Optional[str] = None
-        duration = 0.0
-
-        for attempt in range(1, retries + 1):
-            req = urllib.request.Request(url, headers={"User-Agent": "SaltGoatHealth/1.0", **headers})
-            start = time.time()
-            status = None
-            body_snippet = ""
-            error_msg = None
-            try:
-                with urllib.request.urlopen(req, timeout=timeout) as resp:
-                    status = resp.getcode()
-                    try:
-                        body_snippet = resp.read(256).decode("utf-8", errors="ignore")
-                    except Exception:
-                        body_snippet = ""
-            except urllib.error.HTTPError as exc:
-                status = exc.code
-                try:
-                    body_snippet = exc.read(256).decode("utf-8", errors="ignore")
-                except Exception:
-                    body_snippet = ""
-            except Exception as exc:
-                error_msg = str(exc)
-            duration = time.time() - start
-            if error_msg is None and status == expected:
-                success_attempt = attempt
-                break
-            if attempt < retries:
-                time.sleep(min(2.0, timeout / 2))
+        expected = target["expect"]
+        retries = target["retries"]
+        success_attempt: Optional[int] = probe.get("success_attempt")
+        status: Optional[int] = probe.get("status")
+        body_snippet = probe.get("body") or ""
+        error_msg: Optional[str] = probe.get("error")
+        duration = float(probe.get("duration") or 0.0)
 
         site_result = {
             "name": name,
@@ -1012,7 +1280,8 @@ def check_sites(
 
         tls_warn = int(site.get("tls_warn_days", 14) or 14)
         tls_crit = int(site.get("tls_critical_days", 7) or 7)
-        tls_days, tls_error = tls_days_until_expiry(url, timeout)
+        tls_days = probe.get("tls_days")
+        tls_error = probe.get("tls_error")
         if tls_days is not None:
             site_result["tls_days_remaining"] = round(tls_days, 2)
             if tls_days < 0:
@@ -1065,6 +1334,8 @@ def check_sites(
             bump("WARNING", f"Site {name}")
 
     return results
+
+
 def hostname() -> str:
     return HOSTNAME or run_cmd(["hostname"]) or "localhost"
 
@@ -1214,6 +1485,10 @@ def format_html_block(title: str, pairs: List[Tuple[str, str]]) -> Tuple[str, st
 
 
 def get_threshold_overrides() -> Dict[str, Any]:
+    return cached_config("thresholds", _load_threshold_overrides)
+
+
+def _load_threshold_overrides() -> Dict[str, Any]:
     overrides = config_loader.pillar_get("saltgoat:monitor:thresholds", {})
     if not overrides:
         overrides = config_loader.pillar_get("monitor_thresholds", {})
@@ -1221,6 +1496,10 @@ def get_threshold_overrides() -> Dict[str, Any]:
 
 
 def get_swap_autoheal_services() -> List[str]:
+    return list(cached_config("swap_autoheal", _load_swap_autoheal_services))
+
+
+def _load_swap_autoheal_services() -> List[str]:
     keys = [
         "saltgoat:monitor:swap:autoheal_services",
         "monitor_swap_autoheal_services",
@@ -1232,115 +1511,308 @@ def get_swap_autoheal_services() -> List[str]:
     return list(DEFAULT_SWAP_AUTOHEAL_SERVICES)
 
 
-def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
-    cpu_count = os.cpu_count() or 1
-    load1, load5, load15 = get_load()
-    thresholds = load_thresholds(cpu_count)
+def history_metrics(payload: Dict[str, Any]) -> Dict[str, float]:
+    """Flatten an evaluation payload into numeric series for metrics_history."""
+    metrics: Dict[str, Any] = {
+        "load.1m": payload["load"]["1m"],
+        "load.5m": payload["load"]["5m"],
+        "load.15m": payload["load"]["15m"],
+        "memory.percent": payload["memory"],
+        "swap.percent": payload["swap"]["percent"],
+    }
+    for mount, percent in payload.get("disks", {}).items():
+        metrics[f"disk.{mount}.percent"] = percent
+    fpm = payload.get("php_fpm") or {}
+    metrics["php_fpm.children_total"] = fpm.get("children_total")
+    for pool, entry in (fpm.get("pools") or {}).items():
+        metrics[f"php_fpm.{pool}.children"] = entry.get("children")
+        metrics[f"php_fpm.{pool}.utilization"] = entry.get("utilization")
+    mysql = payload.get("mysql") or {}
+    metrics["mysql.threads_connected"] = mysql.get("threads_connected")
+    metrics["mysql.threads_running"] = mysql.get("threads_running")
+    metrics["mysql.utilization"] = mysql.get("utilization")
+    metrics["mysql.buffer_pool_hit_ratio"] = mysql.get("buffer_pool_hit_ratio")
+    metrics["mysql.history_list_length"] = mysql.get("history_list_length")
+    valkey = payload.get("valkey") or {}
+    metrics["valkey.used_memory"] = valkey.get("used_memory")
+    metrics["valkey.utilization"] = valkey.get("utilization")
+    opensearch = payload.get("opensearch") or {}
+    metrics["opensearch.heap_used_percent"] = opensearch.get("heap_used_percent")
+    for site in payload.get("sites") or []:
+        metrics[f"site.{site.get('name')}.duration"] = site.get("duration")
+        metrics[f"site.{site.get('name')}.up"] = 0 if site.get("error") or site.get("status") != site.get("expected") else 1
+    return {key: value for key, value in metrics.items() if isinstance(value, (int, float))}
+
+
+def record_history(payload: Dict[str, Any]) -> None:
+    try:
+        metrics_history.record(history_metrics(payload))
+    except Exception:
+        # 历史库写入失败不影响告警主流程
+        pass
 
-    severity = "INFO"
-    details: List[str] = []
-    triggers: List[str] = []
-    auto_ctx: Dict[str, Any] = {"actions": [], "states": set(), "services": set()}
 
-    def bump(level: str, reason: str) -> None:
-        nonlocal severity
-        order = {"INFO": 0, "NOTICE": 1, "WARNING": 2, "CRITICAL": 3}
-        if order[level] > order[severity]:
-            severity = level
-        if reason not in triggers:
-            triggers.append(reason)
+class Assessment:
+    """Severity, details and queued actions accumulated by one evaluation."""
+
+    def __init__(self) -> None:
+        self.severity = "INFO"
+        self.details: List[str] = []
+        self.triggers: List[str] = []
+        self.auto_ctx: Dict[str, Any] = {"actions": [], "states": set(), "services": set()}
+        # 本轮全部采集器的原始结果，供需要跨采集器数据的评估使用
+        self.collected: Dict[str, Any] = {}
+
+    def bump(self, level: str, reason: str) -> None:
+        if SEVERITY_ORDER[level] > SEVERITY_ORDER[self.severity]:
+            self.severity = level
+        if reason not in self.triggers:
+            self.triggers.append(reason)
+
+
+class Collector:
+    """A pluggable collector.
+
+    ``prepare`` (optional) runs in the evaluating thread and resolves
+    configuration; ``collect`` runs in a worker thread with the prepared value;
+    ``assess`` turns the collected value (``None`` on failure) into alerts and
+    returns the payload section stored under ``name``. ``interval`` is how
+    long the daemon reuses a result before collecting again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        collect: Callable[..., Any],
+        assess: Callable[[Any, Assessment], Any],
+        timeout: float,
+        prepare: Optional[Callable[[], Any]] = None,
+        interval: float = 0.0,
+    ) -> None:
+        self.name = name
+        self.collect = collect
+        self.assess = assess
+        self.timeout = timeout
+        self.prepare = prepare
+        self.interval = interval
+
+
+COLLECTORS: Dict[str, Collector] = {}
+
+
+def register_collector(
+    name: str,
+    collect: Callable[..., Any],
+    assess: Callable[[Any, Assessment], Any],
+    *,
+    timeout: Optional[float] = None,
+    prepare: Optional[Callable[[], Any]] = None,
+    interval: Optional[float] = None,
+) -> Collector:
+    """Register (or replace) a collector; evaluate() assesses them in registration order."""
+    collector = Collector(
+        name,
+        collect,
+        assess,
+        timeout or DEFAULT_COLLECTOR_TIMEOUTS.get(name, 10.0),
+        prepare,
+        DEFAULT_COLLECTOR_INTERVALS.get(name, 0.0) if interval is None else interval,
+    )
+    COLLECTORS[name] = collector
+    return collector
 
-    # Load check
-    load_line = f"Load average: 1m={load1:.2f} 5m={load5:.2f} 15m={load15:.2f} (cores={cpu_count})"
-    details.append(load_line)
-    if load1 >= thresholds["crit_1m"] or load5 >= thresholds["crit_5m"] or load15 >= thresholds["crit_15m"]:
-        bump("CRITICAL", "Load")
-        details.append(
-            "Load critical: "
-            f"1m threshold {thresholds['crit_1m']:.2f}, "
-            f"5m threshold {thresholds['crit_5m']:.2f}, "
-            f"15m threshold {thresholds['crit_15m']:.2f}"
-        )
-    elif load1 >= thresholds["warn_1m"] or load5 >= thresholds["warn_5m"] or load15 >= thresholds["warn_15m"]:
-        bump("WARNING", "Load")
-        details.append(
-            "Load warning: "
-            f"1m threshold {thresholds['warn_1m']:.2f}, "
-            f"5m threshold {thresholds['warn_5m']:.2f}, "
-            f"15m threshold {thresholds['warn_15m']:.2f}"
-        )
 
-    threshold_overrides = get_threshold_overrides()
+def _start_collector(name: str, func: Callable[..., Any], *args: Any) -> Future:
+    """Run ``func`` on its own daemon thread and return a Future for its result.
+
+    Daemon threads (instead of a ThreadPoolExecutor, whose workers are joined
+    at interpreter exit) let a one-shot run exit once the per-collector
+    timeout has passed, even if a collector is still stuck.
+    """
+    future: Future = Future()
+    future.set_running_or_notify_cancel()
+
+    def _run() -> None:
+        try:
+            result = func(*args)
+        except BaseException as exc:  # noqa: BLE001 - 交给调用方按采集器处理
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=_run, name=f"collector-{name}", daemon=True).start()
+    return future
+
+
+def _timed(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    start = time.monotonic()
+    return func(*args), time.monotonic() - start
+
+
+def _store_late_result(name: str, future: Future) -> None:
+    # 超时后在后台完成的结果写入缓存，下一个 tick 直接复用而不是重新采集
+    if future.cancelled() or future.exception() is not None:
+        return
+    if _COLLECTOR_INTERVALS.get(name, 0.0) > 0:
+        value, _duration = future.result()
+        _COLLECTOR_CACHE[name] = (time.monotonic(), value)
+
+
+def run_collectors(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Run due collectors concurrently and return ``name -> outcome``.
+
+    An outcome holds ``value``, ``status`` (ok/cached/busy/timeout/error) and
+    ``duration_ms``. Results are reused within the collector's daemon
+    interval; a collector that times out keeps running in the background and
+    is reported as ``busy`` (serving its last value) until it finishes, after
+    which its late result is cached for the next tick.
+    """
+    selected = [COLLECTORS[name] for name in (names or COLLECTORS) if name in COLLECTORS]
+    outcomes: Dict[str, Dict[str, Any]] = {}
+    pending: Dict[str, Tuple[Future, float]] = {}
+    for collector in selected:
+        name = collector.name
+        now = time.monotonic()
+        cached = _COLLECTOR_CACHE.get(name)
+        last_value = cached[1] if cached else None
+        if cached is not None and now - cached[0] < _COLLECTOR_INTERVALS.get(name, 0.0):
+            outcomes[name] = {"value": last_value, "status": "cached", "duration_ms": 0.0}
+            continue
+        running = _COLLECTOR_RUNNING.get(name)
+        if running is not None and not running.done():
+            outcomes[name] = {"value": last_value, "status": "busy", "duration_ms": 0.0, "error": "previous run still in progress"}
+            continue
+        try:
+            args = (collector.prepare(),) if collector.prepare else ()
+            future = _start_collector(name, _timed, collector.collect, *args)
+        except Exception as exc:  # noqa: BLE001 - 单个采集器失败不影响其余检查
+            outcomes[name] = {"value": None, "status": "error", "duration_ms": 0.0, "error": str(exc) or type(exc).__name__}
+            continue
+        _COLLECTOR_RUNNING[name] = future
+        pending[name] = (future, now)
+    for name, (future, started) in pending.items():
+        timeout = _COLLECTOR_TIMEOUTS.get(name, COLLECTORS[name].timeout)
+        cached = _COLLECTOR_CACHE.get(name)
+        try:
+            value, duration = future.result(timeout=max(0.0, timeout - (time.monotonic() - started)))
+        except FutureTimeout:
+            future.add_done_callback(lambda done, name=name: _store_late_result(name, done))
+            outcomes[name] = {
+                "value": cached[1] if cached else None,
+                "status": "timeout",
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                "error": f"no result within {timeout:g}s",
+            }
+            continue
+        except Exception as exc:  # noqa: BLE001
+            outcomes[name] = {
+                "value": None,
+                "status": "error",
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                "error": str(exc) or type(exc).__name__,
+            }
+            continue
+        if _COLLECTOR_INTERVALS.get(name, 0.0) > 0:
+            _COLLECTOR_CACHE[name] = (started, value)
+        outcomes[name] = {"value": value, "status": "ok", "duration_ms": round(duration * 1000, 1)}
+    return outcomes
+
+
+def collect_services() -> Dict[str, bool]:
+    # 一次 systemctl show 覆盖全部单元；varnish 未安装时自动跳过
+    return service_status(CORE_SERVICES, refresh=True)
+
+
+def collect_php_fpm(pool_configs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    # 通过各池 listen socket 直接读取 pm.status_path；未配置状态页的池不探测，直接用 ps 计数
+    targets = {
+        name: (config["listen"], config["status_path"])
+        for name, config in pool_configs.items()
+        if config.get("listen") and config.get("status_path")
+    }
+    workers = php_fpm_workers_by_pool()
     meminfo = read_meminfo()
+    status = fastcgi_status.fetch_many(targets, timeout=FPM_STATUS_TIMEOUT)
+    return {
+        "configs": pool_configs,
+        "children": {pool: len(pids) for pool, pids in workers.items()},
+        "status": status,
+        "deltas": fpm_counter_deltas(status, time.time()),
+        "pss": fpm_capacity.sample_pools(workers),
+        "mem_available": meminfo.get("MemAvailable", 0) * 1024,
+        "mem_total": meminfo.get("MemTotal", 0) * 1024,
+    }
 
-    # Memory
-    memory_thresholds = DEFAULT_THRESHOLDS["memory"] | threshold_overrides.get("memory", {})
-    mem_percent = memory_usage_percent(meminfo)
-    details.append(f"Memory used: {mem_percent:.1f}%")
-    mem_crit = float(memory_thresholds.get("critical", DEFAULT_THRESHOLDS["memory"]["critical"]))
-    mem_warn = float(memory_thresholds.get("warning", DEFAULT_THRESHOLDS["memory"]["warning"]))
-    mem_notice = float(memory_thresholds.get("notice", DEFAULT_THRESHOLDS["memory"]["notice"]))
-    if mem_percent >= mem_crit:
-        bump("CRITICAL", "Memory")
-        details.append(f"Memory critical: usage >= {mem_crit:.1f}%")
-    elif mem_percent >= mem_warn:
-        bump("WARNING", "Memory")
-        details.append(f"Memory warning: usage >= {mem_warn:.1f}%")
-    elif mem_percent >= mem_notice:
-        bump("NOTICE", "Memory")
-        details.append(f"Memory notice: usage >= {mem_notice:.1f}%")
 
-    # Swap
-    swap_thresholds = DEFAULT_THRESHOLDS["swap"] | threshold_overrides.get("swap", {})
-    swap_percent, swap_used_mb, swap_total_mb = swap_usage(meminfo)
-    swap_notice = float(swap_thresholds.get("notice", DEFAULT_THRESHOLDS["swap"]["notice"]))
-    swap_warn = float(swap_thresholds.get("warning", DEFAULT_THRESHOLDS["swap"]["warning"]))
-    swap_crit = float(swap_thresholds.get("critical", DEFAULT_THRESHOLDS["swap"]["critical"]))
-    if swap_total_mb > 0:
-        details.append(f"Swap used: {swap_used_mb}MiB/{swap_total_mb}MiB ({swap_percent:.1f}%)")
-        if swap_percent >= swap_crit:
-            bump("CRITICAL", "Swap usage")
-            details.append(f"Swap critical: usage >= {swap_crit:.1f}%")
-            heal_targets = get_swap_autoheal_services()
-            if heal_targets:
-                auto_ctx.setdefault("services", set()).update(heal_targets)
-                details.append(
-                    "AUTOHEAL: queued restart for high swap -> "
-                    + ", ".join(sorted(set(heal_targets)))
-                )
-            auto_expand_swap(details)
-        elif swap_percent >= swap_warn:
-            bump("WARNING", "Swap usage")
-            details.append(f"Swap warning: usage >= {swap_warn:.1f}%")
-        elif swap_percent >= swap_notice:
-            bump("NOTICE", "Swap usage")
-            details.append(f"Swap notice: usage >= {swap_notice:.1f}%")
-    else:
-        details.append("Swap disabled (SwapTotal=0).")
+def php_capacity_plan(data: Dict[str, Any], ctx: Assessment) -> Optional[Dict[str, Any]]:
+    """Memory-safe max_children per pool; None until worker PSS could be sampled."""
+    if not data.get("pss") or not data.get("mem_total"):
+        return None
+    weights = cached_config(
+        "php_pool_weights",
+        lambda: fpm_capacity.pool_weights(config_loader.pillar_get("magento_optimize:sites", {})),
+    )
+    # 其他采集器本轮的结果用于预留 MySQL/Valkey/OpenSearch 仍可增长的内存
+    reserved = fpm_capacity.reservations(
+        ctx.collected.get("mysql"),
+        ctx.collected.get("valkey"),
+        ctx.collected.get("opensearch"),
+    )
+    return fpm_capacity.plan(
+        data["configs"],
+        data["pss"],
+        weights,
+        data["mem_available"],
+        data["mem_total"],
+        reserved,
+        min_children=PHP_CAPACITY_MIN_CHILDREN,
+        max_children=PHP_AUTOSCALE_MAX,
+    )
 
-    # Disk
-    disk_thresholds = DEFAULT_THRESHOLDS["disk"] | threshold_overrides.get("disk", {})
-    disk_crit = float(disk_thresholds.get("critical", DEFAULT_THRESHOLDS["disk"]["critical"]))
-    disk_warn = float(disk_thresholds.get("warning", DEFAULT_THRESHOLDS["disk"]["warning"]))
-    disk_notice = float(disk_thresholds.get("notice", DEFAULT_THRESHOLDS["disk"]["notice"]))
-    disks = disk_usage([Path("/"), Path("/var/lib/mysql"), Path("/home")])
-    for mount, percent in disks.items():
-        details.append(f"Disk {mount}: {percent:.1f}% used")
-        if percent >= disk_crit:
-            bump("CRITICAL", f"Disk {mount}")
-            details.append(f"Disk critical: {mount} usage >= {disk_crit:.1f}%")
-        elif percent >= disk_warn:
-            bump("WARNING", f"Disk {mount}")
-            details.append(f"Disk warning: {mount} usage >= {disk_warn:.1f}%")
-        elif percent >= disk_notice:
-            bump("NOTICE", f"Disk {mount}")
-            details.append(f"Disk notice: {mount} usage >= {disk_notice:.1f}%")
 
-    # Services
-    core_services = ["nginx", "php8.3-fpm", "mysql", "valkey", "rabbitmq", "salt-minion"]
-    if service_exists("varnish"):
-        core_services.append("varnish")
-    services = service_status(core_services)
+def fpm_counter_deltas(statuses: Dict[str, Dict[str, Any]], now: float) -> Dict[str, Dict[str, int]]:
+    """Increase of cumulative status counters per pool since the previous sample.
+
+    The previous counters are kept in ``FPM_STATUS_SAMPLE_FILE`` together with
+    the pool start time so one-shot runs (cron) see the increase too.
+    """
+    previous = load_runtime_json(FPM_STATUS_SAMPLE_FILE)
+    sample: Dict[str, Any] = {}
+    deltas: Dict[str, Dict[str, int]] = {}
+    for pool_name, status in statuses.items():
+        if not isinstance(status, dict) or "error" in status:
+            continue
+        entry: Dict[str, Any] = {key: status[key] for key in FPM_COUNTER_FIELDS if isinstance(status.get(key), int)}
+        if isinstance(status.get("start_since"), int):
+            entry["started_at"] = now - status["start_since"]
+        sample[pool_name] = entry
+        before = previous.get(pool_name)
+        pool_deltas: Dict[str, int] = {}
+        for key, current in entry.items():
+            if key == "started_at":
+                continue
+            if not isinstance(before, dict):
+                pool_deltas[key] = 0
+                continue
+            last = before.get(key)
+            # FPM 重启（启动时间晚于上次记录）后计数器清零，此时整个当前值都是新增量
+            restarted = entry.get("started_at", 0) > before.get("started_at", 0) + FPM_RESTART_SLACK
+            if restarted or not isinstance(last, int) or current < last:
+                pool_deltas[key] = current
+            else:
+                pool_deltas[key] = current - last
+        deltas[pool_name] = pool_deltas
+    try:
+        save_runtime_json(FPM_STATUS_SAMPLE_FILE, sample)
+    except OSError:
+        pass
+    return deltas
+
+
+def assess_services(services: Optional[Dict[str, bool]], ctx: Assessment) -> Dict[str, bool]:
+    if services is None:
+        return {}
+    details, auto_ctx, bump = ctx.details, ctx.auto_ctx, ctx.bump
     failing = [svc for svc, ok in services.items() if not ok]
     if failing:
         bump("CRITICAL", "Services")
@@ -1352,16 +1824,50 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
         if heal_target in failing:
             auto_ctx.setdefault("services", set()).add(heal_target)
             details.append(f"AUTOHEAL: queued restart for {heal_target}")
+    return services
+
 
+def assess_php_fpm(data: Optional[Dict[str, Any]], ctx: Assessment) -> Dict[str, Any]:
+    details, auto_ctx, bump = ctx.details, ctx.auto_ctx, ctx.bump
     fpm_info: Dict[str, Any] = {"pools": {}}
-    pool_configs = php_fpm_pool_configs()
-    pool_children = php_fpm_children_by_pool()
+    if data is None:
+        return fpm_info
+    pool_configs = data["configs"]
+    pool_children = data["children"]
+    capacity = php_capacity_plan(data, ctx)
+    capacity_pools = capacity["pools"] if capacity else {}
+    if capacity:
+        fpm_info["capacity"] = capacity
     if pool_configs:
         total_children = 0
         for pool_name, config in sorted(pool_configs.items()):
             entry: Dict[str, Any] = {}
             max_children = config.get("max_children")
             current_children = pool_children.get(pool_name, 0)
+            in_use = current_children
+            safe_max = capacity_pools.get(pool_name, {}).get("safe_max_children")
+            if safe_max is not None:
+                entry["safe_max_children"] = safe_max
+                entry["worker_pss"] = capacity_pools[pool_name]["max_pss"]
+            saturation: List[str] = []
+            status = data.get("status", {}).get(pool_name)
+            if status and "error" not in status:
+                # 状态页的 active processes 才是真实占用；dynamic 模式下空闲的 spare 进程不计入
+                entry.update({key: status[key] for key in FPM_STATUS_FIELDS if key in status})
+                entry["source"] = "status"
+                current_children = status.get("total_processes", current_children)
+                in_use = status.get("active_processes", 0)
+                deltas = data.get("deltas", {}).get(pool_name, {})
+                if status.get("listen_queue"):
+                    saturation.append(f"listen queue {status['listen_queue']}")
+                if deltas.get("max_children_reached"):
+                    saturation.append(f"max children reached +{deltas['max_children_reached']}")
+                if deltas.get("slow_requests"):
+                    details.append(f"PHP-FPM pool '{pool_name}' logged {deltas['slow_requests']} new slow request(s).")
+            else:
+                entry["source"] = "ps"
+                if status:
+                    entry["status_error"] = status["error"]
             total_children += current_children
             entry["children"] = current_children
             if max_children is not None:
@@ -1378,22 +1884,23 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
                 if memory_limit:
                     entry["memory_limit"] = memory_limit
             if max_children:
-                usage = current_children / max_children if max_children else 0
+                usage = in_use / max_children if max_children else 0
                 entry["utilization"] = round(usage, 4)
-                if usage >= 1.0:
+                if usage >= 1.0 or saturation:
                     bump("CRITICAL", "PHP-FPM capacity")
                     details.append(
                         f"PHP-FPM pool '{pool_name}' saturated: "
-                        f"{current_children}/{max_children} workers in use."
+                        f"{in_use}/{max_children} workers in use"
+                        + (f" ({', '.join(saturation)})." if saturation else ".")
                     )
-                    autoscale_php_pool(pool_name, config, auto_ctx)
+                    autoscale_php_pool(pool_name, config, auto_ctx, safe_max)
                 elif usage >= FPM_WARNING_RATIO:
                     bump("WARNING", "PHP-FPM capacity")
                     details.append(
                         "PHP-FPM pool '{pool}' near capacity: "
                         "{current}/{max} workers ({ratio:.1f}%).".format(
                             pool=pool_name,
-                            current=current_children,
+                            current=in_use,
                             max=max_children,
                             ratio=usage * 100,
                         )
@@ -1404,11 +1911,20 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
                         "PHP-FPM pool '{pool}' warming up: "
                         "{current}/{max} workers ({ratio:.1f}%).".format(
                             pool=pool_name,
-                            current=current_children,
+                            current=in_use,
                             max=max_children,
                             ratio=usage * 100,
                         )
                     )
+            if safe_max is not None and isinstance(max_children, int) and max_children > safe_max:
+                bump("WARNING", "PHP-FPM memory")
+                details.append(
+                    f"PHP-FPM pool '{pool_name}' max_children {max_children} exceeds memory capacity "
+                    f"{safe_max} ({entry['worker_pss'] / 1024**2:.0f}MiB PSS per worker)."
+                )
+                scale_down_php_pool(pool_name, config, safe_max, auto_ctx)
+            elif safe_max is not None:
+                reset_php_scale_down(pool_name)
             fpm_info["pools"][pool_name] = entry
         extra_pools = {pool: cnt for pool, cnt in pool_children.items() if pool not in fpm_info["pools"]}
         for pool_name, count in extra_pools.items():
@@ -1421,9 +1937,12 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
         # 没有解析到配置但存在进程
         fpm_info["children_total"] = sum(pool_children.values())
         fpm_info["pools"] = {pool: {"children": count} for pool, count in pool_children.items()}
+    return fpm_info
 
+
+def assess_mysql(mysql_metrics: Optional[Dict[str, Any]], ctx: Assessment) -> Dict[str, Any]:
+    details, auto_ctx, bump = ctx.details, ctx.auto_ctx, ctx.bump
     mysql_info: Dict[str, Any] = {}
-    mysql_metrics = collect_mysql_metrics()
     if mysql_metrics:
         max_connections = mysql_metrics["max_connections"]
         threads_connected = mysql_metrics["threads_connected"]
@@ -1435,20 +1954,41 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
         )
         if ratio >= MYSQL_CRITICAL_RATIO:
             bump("CRITICAL", "MySQL connections")
-            details.append("MySQL connections saturated; attempting autoscale.")
-            autoscale_mysql(mysql_metrics, auto_ctx)
+            # 连接堆积源于锁等待/undo 积压时，继续放大 max_connections 只会加剧争用
+            contention = mysql_contention_reason(mysql_metrics)
+            if contention:
+                details.append(f"MySQL connections saturated by contention ({contention}); skipping autoscale.")
+            else:
+                details.append("MySQL connections saturated; attempting autoscale.")
+                autoscale_mysql(mysql_metrics, auto_ctx)
         elif ratio >= MYSQL_WARNING_RATIO:
             bump("WARNING", "MySQL connections")
         elif ratio >= MYSQL_NOTICE_RATIO:
             bump("NOTICE", "MySQL connections")
-
+        hit_ratio = mysql_metrics.get("buffer_pool_hit_ratio")
+        if isinstance(hit_ratio, float):
+            details.append(f"MySQL buffer pool hit ratio: {hit_ratio*100:.2f}%.")
+            uptime = mysql_metrics.get("uptime") or 0
+            if hit_ratio < MYSQL_HIT_RATIO_NOTICE and uptime >= 3600:
+                bump("NOTICE", "MySQL buffer pool")
+        lock_waits = mysql_metrics.get("innodb_row_lock_current_waits")
+        if lock_waits:
+            details.append(f"MySQL row lock waits: {lock_waits} current, {mysql_metrics.get('innodb_row_lock_waits', 0)} total.")
+        history = mysql_metrics.get("history_list_length")
+        if isinstance(history, int) and history >= MYSQL_HISTORY_LIST_WARNING:
+            bump("WARNING", "MySQL history list")
+            details.append(f"MySQL InnoDB history list length {history}; long-running transactions are blocking purge.")
+    return mysql_info
+
+
+def assess_valkey(valkey_metrics: Optional[Dict[str, Any]], ctx: Assessment) -> Dict[str, Any]:
+    details, auto_ctx, bump = ctx.details, ctx.auto_ctx, ctx.bump
     valkey_info: Dict[str, Any] = {}
-    valkey_metrics = collect_valkey_metrics()
     if valkey_metrics:
         used_memory = valkey_metrics.get("used_memory", 0)
         maxmemory = valkey_metrics.get("maxmemory", 0)
         ratio = used_memory / maxmemory if maxmemory else 0
-        valkey_info.update({k: v for k, v in valkey_metrics.items() if k != "cli"})
+        valkey_info.update(valkey_metrics)
         valkey_info["utilization"] = round(ratio, 4) if maxmemory else 0
         if maxmemory:
             details.append(
@@ -1460,13 +2000,32 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
             )
             if ratio >= VALKEY_CRITICAL_RATIO:
                 bump("CRITICAL", "Valkey memory")
-                details.append("Valkey memory near limit; attempting autoscale.")
-                autoscale_valkey(valkey_metrics, auto_ctx)
             elif ratio >= VALKEY_WARNING_RATIO:
                 bump("WARNING", "Valkey memory")
+        # 有驱逐速率时以它判断是否扩容（缓存写满本身是正常状态）；没有速率时退回 used/maxmemory
+        evictions = valkey_metrics.get("evictions_per_sec")
+        if isinstance(evictions, (int, float)):
+            if evictions >= VALKEY_EVICTION_WARNING_RATE:
+                bump("WARNING", "Valkey evictions")
+                details.append(f"Valkey evicting {evictions:.1f} keys/s; attempting autoscale.")
+                autoscale_valkey(valkey_metrics, auto_ctx)
+        elif maxmemory and ratio >= VALKEY_CRITICAL_RATIO:
+            details.append("Valkey memory near limit; attempting autoscale.")
+            autoscale_valkey(valkey_metrics, auto_ctx)
+        hit_ratio = valkey_metrics.get("hit_ratio")
+        if isinstance(hit_ratio, float) and valkey_metrics.get("lookups", 0) >= VALKEY_HIT_RATIO_MIN_LOOKUPS:
+            details.append(
+                f"Valkey keyspace hit ratio {hit_ratio * 100:.1f}% "
+                f"({valkey_metrics.get('ops_per_sec', 0):.0f} ops/s, {valkey_metrics.get('connected_clients', 0)} clients)."
+            )
+            if hit_ratio < VALKEY_HIT_RATIO_NOTICE:
+                bump("NOTICE", "Valkey hit ratio")
+    return valkey_info
 
+
+def assess_opensearch(opensearch_metrics: Optional[Dict[str, Any]], ctx: Assessment) -> Dict[str, Any]:
+    details, auto_ctx, bump = ctx.details, ctx.auto_ctx, ctx.bump
     opensearch_info: Dict[str, Any] = {}
-    opensearch_metrics = collect_opensearch_metrics()
     if opensearch_metrics:
         opensearch_info.update(opensearch_metrics)
         cache_settings = current_opensearch_cache_settings()
@@ -1488,16 +2047,161 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
                 autoscale_opensearch(opensearch_metrics, auto_ctx)
             elif heap_percent >= OPENSEARCH_WARNING_HEAP:
                 bump("WARNING", "OpenSearch heap")
-            elif heap_percent <= OPENSEARCH_COMFORT_HEAP:
-                details.append("OpenSearch heap comfortably low; evaluating cache expansion.")
+            else:
                 autoscale_opensearch(opensearch_metrics, auto_ctx)
+        rates = opensearch_metrics.get("rates") or {}
+        pools = opensearch_metrics.get("thread_pools") or {}
+        rejected = {
+            name: rates[f"{name}_rejected_per_sec"]
+            for name in opensearch_stats.THREAD_POOLS
+            if rates.get(f"{name}_rejected_per_sec")
+        }
+        if rejected:
+            bump("WARNING", "OpenSearch rejections")
+            details.append(
+                "OpenSearch thread pool rejections: "
+                + ", ".join(
+                    f"{name} {rate:.2f}/s (queue {pools.get(name, {}).get('queue', 0)})" for name, rate in rejected.items()
+                )
+            )
+        gc_ratio = rates.get("gc_old_time_ratio")
+        if isinstance(gc_ratio, float) and gc_ratio >= OPENSEARCH_GC_RATIO_WARNING:
+            bump("WARNING", "OpenSearch GC")
+            details.append(f"OpenSearch old-gen GC took {gc_ratio * 100:.1f}% of the last interval.")
+        latency = rates.get("search_query_latency_ms")
+        if isinstance(latency, float) and latency >= OPENSEARCH_SEARCH_LATENCY_NOTICE_MS:
+            bump("NOTICE", "OpenSearch search latency")
+            slow = [
+                f"{name} {entry['search_query_latency_ms']:.0f}ms"
+                for name, entry in (opensearch_metrics.get("catalog_indices") or {}).items()
+                if entry.get("search_query_latency_ms", 0) >= OPENSEARCH_SEARCH_LATENCY_NOTICE_MS
+            ]
+            details.append(
+                f"OpenSearch search latency {latency:.0f}ms per query"
+                + (f" (catalog: {', '.join(slow)})." if slow else ".")
+            )
+    return opensearch_info
 
-    site_payload: List[Dict[str, Any]] = []
-    sites_config = load_site_checks()
-    if sites_config:
-        site_results = check_sites(sites_config, details, auto_ctx, bump)
-        site_payload.extend(site_results)
 
+register_collector("services", collect_services, assess_services)
+register_collector(
+    "php_fpm",
+    collect_php_fpm,
+    assess_php_fpm,
+    prepare=lambda: cached_config("php_fpm_pools", php_fpm_pool_configs),
+)
+register_collector("mysql", collect_mysql_metrics, assess_mysql)
+register_collector("valkey", collect_valkey_metrics, assess_valkey)
+register_collector("opensearch", collect_opensearch_metrics, assess_opensearch)
+register_collector("sites", probe_sites, assess_sites, prepare=load_site_checks)
+
+
+def evaluate(record: bool = True) -> Tuple[str, List[str], Dict[str, Any], List[str], Dict[str, Any]]:
+    cpu_count = os.cpu_count() or 1
+    load1, load5, load15 = get_load()
+    thresholds = load_thresholds(cpu_count)
+
+    ctx = Assessment()
+    details, triggers, auto_ctx, bump = ctx.details, ctx.triggers, ctx.auto_ctx, ctx.bump
+
+    # Load check
+    load_line = f"Load average: 1m={load1:.2f} 5m={load5:.2f} 15m={load15:.2f} (cores={cpu_count})"
+    details.append(load_line)
+    if load1 >= thresholds["crit_1m"] or load5 >= thresholds["crit_5m"] or load15 >= thresholds["crit_15m"]:
+        bump("CRITICAL", "Load")
+        details.append(
+            "Load critical: "
+            f"1m threshold {thresholds['crit_1m']:.2f}, "
+            f"5m threshold {thresholds['crit_5m']:.2f}, "
+            f"15m threshold {thresholds['crit_15m']:.2f}"
+        )
+    elif load1 >= thresholds["warn_1m"] or load5 >= thresholds["warn_5m"] or load15 >= thresholds["warn_15m"]:
+        bump("WARNING", "Load")
+        details.append(
+            "Load warning: "
+            f"1m threshold {thresholds['warn_1m']:.2f}, "
+            f"5m threshold {thresholds['warn_5m']:.2f}, "
+            f"15m threshold {thresholds['warn_15m']:.2f}"
+        )
+
+    threshold_overrides = get_threshold_overrides()
+    meminfo = read_meminfo()
+
+    # Memory
+    memory_thresholds = DEFAULT_THRESHOLDS["memory"] | threshold_overrides.get("memory", {})
+    mem_percent = memory_usage_percent(meminfo)
+    details.append(f"Memory used: {mem_percent:.1f}%")
+    mem_crit = float(memory_thresholds.get("critical", DEFAULT_THRESHOLDS["memory"]["critical"]))
+    mem_warn = float(memory_thresholds.get("warning", DEFAULT_THRESHOLDS["memory"]["warning"]))
+    mem_notice = float(memory_thresholds.get("notice", DEFAULT_THRESHOLDS["memory"]["notice"]))
+    if mem_percent >= mem_crit:
+        bump("CRITICAL", "Memory")
+        details.append(f"Memory critical: usage >= {mem_crit:.1f}%")
+    elif mem_percent >= mem_warn:
+        bump("WARNING", "Memory")
+        details.append(f"Memory warning: usage >= {mem_warn:.1f}%")
+    elif mem_percent >= mem_notice:
+        bump("NOTICE", "Memory")
+        details.append(f"Memory notice: usage >= {mem_notice:.1f}%")
+
+    # Swap
+    swap_thresholds = DEFAULT_THRESHOLDS["swap"] | threshold_overrides.get("swap", {})
+    swap_percent, swap_used_mb, swap_total_mb = swap_usage(meminfo)
+    swap_notice = float(swap_thresholds.get("notice", DEFAULT_THRESHOLDS["swap"]["notice"]))
+    swap_warn = float(swap_thresholds.get("warning", DEFAULT_THRESHOLDS["swap"]["warning"]))
+    swap_crit = float(swap_thresholds.get("critical", DEFAULT_THRESHOLDS["swap"]["critical"]))
+    if swap_total_mb > 0:
+        details.append(f"Swap used: {swap_used_mb}MiB/{swap_total_mb}MiB ({swap_percent:.1f}%)")
+        if swap_percent >= swap_crit:
+            bump("CRITICAL", "Swap usage")
+            details.append(f"Swap critical: usage >= {swap_crit:.1f}%")
+            heal_targets = get_swap_autoheal_services()
+            if heal_targets:
+                auto_ctx.setdefault("services", set()).update(heal_targets)
+                details.append(
+                    "AUTOHEAL: queued restart for high swap -> "
+                    + ", ".join(sorted(set(heal_targets)))
+                )
+            auto_expand_swap(details)
+        elif swap_percent >= swap_warn:
+            bump("WARNING", "Swap usage")
+            details.append(f"Swap warning: usage >= {swap_warn:.1f}%")
+        elif swap_percent >= swap_notice:
+            bump("NOTICE", "Swap usage")
+            details.append(f"Swap notice: usage >= {swap_notice:.1f}%")
+    else:
+        details.append("Swap disabled (SwapTotal=0).")
+
+    # Disk
+    disk_thresholds = DEFAULT_THRESHOLDS["disk"] | threshold_overrides.get("disk", {})
+    disk_crit = float(disk_thresholds.get("critical", DEFAULT_THRESHOLDS["disk"]["critical"]))
+    disk_warn = float(disk_thresholds.get("warning", DEFAULT_THRESHOLDS["disk"]["warning"]))
+    disk_notice = float(disk_thresholds.get("notice", DEFAULT_THRESHOLDS["disk"]["notice"]))
+    disks = disk_usage(DISK_PATHS)
+    for mount, percent in disks.items():
+        details.append(f"Disk {mount}: {percent:.1f}% used")
+        if percent >= disk_crit:
+            bump("CRITICAL", f"Disk {mount}")
+            details.append(f"Disk critical: {mount} usage >= {disk_crit:.1f}%")
+        elif percent >= disk_warn:
+            bump("WARNING", f"Disk {mount}")
+            details.append(f"Disk warning: {mount} usage >= {disk_warn:.1f}%")
+        elif percent >= disk_notice:
+            bump("NOTICE", f"Disk {mount}")
+            details.append(f"Disk notice: {mount} usage >= {disk_notice:.1f}%")
+
+    # 采集器并发执行，单次评估耗时取决于最慢的采集器；评估按注册顺序进行，告警明细顺序保持稳定
+    outcomes = run_collectors()
+    ctx.collected = {name: outcome["value"] for name, outcome in outcomes.items()}
+    sections: Dict[str, Any] = {}
+    for name, collector in COLLECTORS.items():
+        outcome = outcomes[name]
+        if outcome.get("error"):
+            bump("NOTICE", f"Collector {name}")
+            details.append(f"Collector {name} {outcome['status']}: {outcome['error']}")
+        sections[name] = collector.assess(outcome["value"], ctx)
+
+    severity = ctx.severity
     payload = {
         "host": hostname(),
         "severity": severity,
@@ -1509,27 +2213,39 @@ def evaluate() -> Tuple[str, List[str], Dict[str, Any], List[str]]:
             "total_mb": swap_total_mb,
         },
         "disks": disks,
-        "services": services,
-        "php_fpm": fpm_info,
-        "mysql": mysql_info,
-        "valkey": valkey_info,
-        "opensearch": opensearch_info,
-        "sites": site_payload,
+        **sections,
+        "collectors": {name: {k: v for k, v in outcome.items() if k != "value"} for name, outcome in outcomes.items()},
         "thresholds": {
             "load": thresholds,
             "memory": {"notice": mem_notice, "warning": mem_warn, "critical": mem_crit},
             "swap": {"notice": swap_notice, "warning": swap_warn, "critical": swap_crit},
             "disk": {"notice": disk_notice, "warning": disk_warn, "critical": disk_crit},
             "php_fpm": {"notice_ratio": FPM_NOTICE_RATIO, "warning_ratio": FPM_WARNING_RATIO},
-            "mysql": {"notice_ratio": MYSQL_NOTICE_RATIO, "warning_ratio": MYSQL_WARNING_RATIO, "critical_ratio": MYSQL_CRITICAL_RATIO},
-            "valkey": {"warning_ratio": VALKEY_WARNING_RATIO, "critical_ratio": VALKEY_CRITICAL_RATIO},
+            "mysql": {
+                "notice_ratio": MYSQL_NOTICE_RATIO,
+                "warning_ratio": MYSQL_WARNING_RATIO,
+                "critical_ratio": MYSQL_CRITICAL_RATIO,
+                "hit_ratio_notice": MYSQL_HIT_RATIO_NOTICE,
+                "history_list_warning": MYSQL_HISTORY_LIST_WARNING,
+            },
+            "valkey": {
+                "warning_ratio": VALKEY_WARNING_RATIO,
+                "critical_ratio": VALKEY_CRITICAL_RATIO,
+                "eviction_warning_rate": VALKEY_EVICTION_WARNING_RATE,
+                "hit_ratio_notice": VALKEY_HIT_RATIO_NOTICE,
+            },
             "opensearch": {
                 "heap_warning_percent": OPENSEARCH_WARNING_HEAP,
                 "heap_critical_percent": OPENSEARCH_CRITICAL_HEAP,
+                "cache_evictions_per_sec": OPENSEARCH_EVICTION_RATE,
+                "search_latency_notice_ms": OPENSEARCH_SEARCH_LATENCY_NOTICE_MS,
+                "gc_old_ratio_warning": OPENSEARCH_GC_RATIO_WARNING,
             },
         },
         "autoscale": {"actions": list(auto_ctx["actions"])},
     }
+    if record:
+        record_history(payload)
     auto_ctx["states"] = sorted(auto_ctx["states"])
     auto_ctx["services"] = sorted(auto_ctx.get("services", []))
     return severity, details, payload, triggers, auto_ctx
@@ -1542,15 +2258,150 @@ def parse_args():
         choices=["INFO", "NOTICE", "WARNING", "CRITICAL"],
         help="测试用途：强制使用指定告警级别",
     )
+    parser.add_argument("--daemon", action="store_true", help="常驻运行，按采集器间隔持续巡检")
+    parser.add_argument(
+        "--standalone",
+        action="store_true",
+        help="即使常驻进程在运行也重新采集并发送告警",
+    )
+    parser.add_argument("--socket", type=Path, help="常驻进程 Unix socket 路径")
     return parser.parse_args()
 
 
-def main() -> None:
-    args = parse_args()
-    severity, details, payload, triggers, auto_ctx = evaluate()
-    if args.force_severity:
-        severity = args.force_severity
+def apply_daemon_settings() -> Tuple[float, float]:
+    """Load tick/alert intervals and collector intervals/timeouts from pillar ``saltgoat:monitor:daemon``."""
+    settings = cached_config("daemon", lambda: config_loader.pillar_get("saltgoat:monitor:daemon", {}))
+    if not isinstance(settings, dict):
+        settings = {}
+    intervals = {name: collector.interval for name, collector in COLLECTORS.items()}
+    overrides = settings.get("intervals")
+    if isinstance(overrides, dict):
+        for name, value in overrides.items():
+            try:
+                intervals[str(name)] = float(value)
+            except (TypeError, ValueError):
+                continue
+    _COLLECTOR_INTERVALS.clear()
+    _COLLECTOR_INTERVALS.update(intervals)
+    _COLLECTOR_TIMEOUTS.clear()
+    timeouts = settings.get("timeouts")
+    if isinstance(timeouts, dict):
+        for name, value in timeouts.items():
+            try:
+                _COLLECTOR_TIMEOUTS[str(name)] = float(value)
+            except (TypeError, ValueError):
+                continue
+    try:
+        tick = float(settings.get("tick", DAEMON_TICK))
+    except (TypeError, ValueError):
+        tick = DAEMON_TICK
+    try:
+        alert_interval = float(settings.get("alert_interval", DAEMON_ALERT_INTERVAL))
+    except (TypeError, ValueError):
+        alert_interval = DAEMON_ALERT_INTERVAL
+    return max(1.0, tick), max(tick, alert_interval)
+
 
+def snapshot_max_age(snapshot: Dict[str, Any]) -> float:
+    try:
+        tick = float(snapshot.get("tick", DAEMON_TICK))
+    except (TypeError, ValueError):
+        tick = DAEMON_TICK
+    return max(60.0, tick * 3)
+
+
+def print_snapshot(snapshot: Dict[str, Any]) -> None:
+    age = max(0.0, time.time() - float(snapshot.get("generated_at", time.time())))
+    severity = str(snapshot.get("severity", "INFO"))
+    payload = snapshot.get("payload") if isinstance(snapshot.get("payload"), dict) else {}
+    fields: List[Tuple[str, str]] = [
+        ("Host", str(payload.get("host", hostname()))),
+        ("Trigger", ", ".join(snapshot.get("triggers") or []) or "-"),
+        ("Age", f"{age:.0f}s (resident daemon)"),
+    ]
+    for detail in snapshot.get("details") or []:
+        if detail:
+            fields.append(("Detail", str(detail)))
+    plain_block, _ = format_html_block(f"{severity} RESOURCE STATUS", fields)
+    print(plain_block)
+
+
+def run_daemon(socket_path: Optional[Path] = None) -> None:
+    """Evaluate continuously, keeping config and collector results in memory.
+
+    Configuration is re-read only when inotify reports a change below
+    ``CONFIG_WATCH_PATHS`` or on SIGHUP. Alerts keep the cadence of the
+    former Salt Schedule job (``alert_interval``) unless severity escalates;
+    autoscale/autoheal actions are applied as soon as they are queued.
+    """
+    tick, alert_interval = apply_daemon_settings()
+    watcher = monitor_daemon.FileWatcher(CONFIG_WATCH_PATHS)
+    server = monitor_daemon.SnapshotServer(socket_path).start()
+    flags = {"reload": False, "stop": False}
+
+    def _on_signal(signum: int, _frame: Any) -> None:
+        flags["reload" if signum == signal.SIGHUP else "stop"] = True
+        watcher.wake()
+
+    signal.signal(signal.SIGHUP, _on_signal)
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+    print(
+        f"resource_alert daemon started (tick={tick:g}s, alert_interval={alert_interval:g}s, "
+        f"watch={'inotify' if watcher.uses_inotify else 'poll'}, socket={server.path})",
+        flush=True,
+    )
+    last_alert = 0.0
+    last_severity = "INFO"
+    try:
+        while not flags["stop"]:
+            started = time.monotonic()
+            alert_due = started - last_alert >= alert_interval
+            try:
+                severity, details, payload, triggers, auto_ctx = evaluate(record=alert_due)
+            except Exception as exc:  # pragma: no cover - keep the daemon alive
+                print(f"[ERROR] evaluation failed: {exc}", file=sys.stderr, flush=True)
+                watcher.wait(tick)
+                continue
+            server.update(
+                {
+                    "generated_at": time.time(),
+                    "tick": tick,
+                    "severity": severity,
+                    "triggers": triggers,
+                    "details": details,
+                    "payload": payload,
+                }
+            )
+            notify = alert_due or SEVERITY_ORDER[severity] > SEVERITY_ORDER[last_severity]
+            act(severity, details, payload, triggers, auto_ctx, notify=notify)
+            if notify:
+                last_alert = started
+            last_severity = severity
+            if auto_ctx.get("states"):
+                # state.apply 会改写池/服务配置，下一轮重新读取
+                reload_config()
+            remaining = tick - (time.monotonic() - started)
+            changed = watcher.wait(remaining) if remaining > 0 else False
+            if changed or flags["reload"]:
+                flags["reload"] = False
+                reload_config()
+                tick, alert_interval = apply_daemon_settings()
+                print("resource_alert daemon reloaded configuration", flush=True)
+    finally:
+        server.close()
+        watcher.close()
+
+
+def act(
+    severity: str,
+    details: List[str],
+    payload: Dict[str, Any],
+    triggers: List[str],
+    auto_ctx: Dict[str, Any],
+    notify: bool = True,
+) -> None:
+    """Apply queued autoscale/autoheal actions and, if ``notify``, send the alert."""
     auto_actions: List[str] = auto_ctx.get("actions", []) if isinstance(auto_ctx, dict) else []
     auto_states = auto_ctx.get("states", []) if isinstance(auto_ctx, dict) else []
     auto_services = auto_ctx.get("services", []) if isinstance(auto_ctx, dict) else []
@@ -1628,6 +2479,8 @@ def main() -> None:
                     details.append(f"AUTOSCALE: restart service {service} failed")
             save_service_heal_map(heal_map)
 
+    if not notify:
+        return
     host_value = payload.get("host", hostname())
     host_slug = host_value.replace(".", "-").lower()
     if severity in {"WARNING", "CRITICAL"}:
@@ -1657,5 +2510,22 @@ def main() -> None:
         print("Resources within normal range; no alert issued.")
 
 
+def main() -> None:
+    args = parse_args()
+    if args.daemon:
+        run_daemon(args.socket)
+        return
+    if not args.standalone and not args.force_severity:
+        # 常驻进程在运行时直接复用其最新结果，避免重复采集与重复告警
+        snapshot = monitor_daemon.fetch_snapshot(args.socket)
+        if snapshot and time.time() - float(snapshot["generated_at"]) <= snapshot_max_age(snapshot):
+            print_snapshot(snapshot)
+            return
+    severity, details, payload, triggers, auto_ctx = evaluate()
+    if args.force_severity:
+        severity = args.force_severity
+    act(severity, details, payload, triggers, auto_ctx)
+
+
 if __name__ == "__main__":
     main()
@@ -807,7 +807,7 @@ monitor_quick_check() {
     fi
 
     local output
-    if ! output=$(python3 "$RESOURCE_ALERT_SCRIPT" 2>&1); then
+    if ! output=$(saltgoat_py resource-alert 2>&1); then
         log_error "资源巡检脚本执行失败"
         echo "$output"
         return 1
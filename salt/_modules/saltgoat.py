@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import json
 import os
+import re
 import shlex
 import time
 from datetime import datetime
@@ -95,16 +96,6 @@ def _default_mysql_dump_job(site: str) -> Dict[str, Any]:
     }
 
 
-def _default_api_watch_job(site: str) -> Dict[str, Any]:
-    label = _site_label(site)
-    return {
-        "name": f"{label}-api-watch",
-        "cron": "*/5 * * * *",
-        "site": site,
-        "kinds": ["orders", "customers"],
-    }
-
-
 def _default_stats_jobs(site: str) -> List[Dict[str, Any]]:
     token = _site_token(site)
     checksum = sum(ord(char) for char in token)
@@ -200,10 +191,9 @@ def magento_schedule_install(site: str = "tank") -> Dict[str, Any]:
             command.append("--no-compress")
         dump_jobs[name] = " ".join(command)
 
+    # 未单独声明 api_watchers 的站点统一由 saltgoat_api_watch_all（--all-sites）轮询
     raw_api_watchers = config.get("api_watchers", []) or []
     api_watchers_config = [watcher for watcher in raw_api_watchers if isinstance(watcher, dict)]
-    if not any(_job_matches_site(watcher, site) for watcher in api_watchers_config):
-        api_watchers_config.append(_default_api_watch_job(site))
     api_watchers: Dict[str, str] = {}
     for watcher in api_watchers_config:
         name = watcher.get("name")
@@ -315,6 +305,7 @@ def magento_schedule_install(site: str = "tank") -> Dict[str, Any]:
     expected_commands.update(stats_jobs)
     expected_commands.update(restic_jobs)
     expected_commands["saltgoat_schedule_auto"] = "saltgoat magetools schedule auto"
+    expected_commands["saltgoat_api_watch_all"] = "saltgoat magetools api watch --all-sites"
     expected_commands["saltgoat_daily_summary"] = "saltgoat monitor report daily"
 
     state_result = __salt__["state.apply"](
@@ -368,6 +359,296 @@ def magento_schedule_install(site: str = "tank") -> Dict[str, Any]:
     return ret
 
 
+# 批量对账：与 optional/magento-schedule.sls 渲染出的 schedule.present 保持一致
+SCHEDULE_LOG_FILES = (
+    "/var/log/magento-cron.log",
+    "/var/log/magento-maintenance.log",
+    "/var/log/magento-health.log",
+)
+# Salt 以 args/kwargs 保存与执行任务，job_args/job_kwargs 只是 schedule.add 的入参
+SCHEDULE_MANAGED_KEYS = ("function", "args", "kwargs", "cron", "run_on_start", "maxrunning", "offline")
+
+
+def _sls_quote(value: Any) -> str:
+    text = str(value).replace("'", "'\\''")
+    return f"'{text}'"
+
+
+def _extra_args(extra: Any) -> str:
+    if not extra:
+        return ""
+    if isinstance(extra, (list, tuple, set)):
+        return "".join(f" {arg}" for arg in extra)
+    return f" {extra}"
+
+
+def _schedule_job(command: str, cron: str) -> Dict[str, Any]:
+    return {
+        "function": "cmd.run",
+        "args": [command],
+        "kwargs": {"shell": "/bin/bash"},
+        "cron": cron,
+        "run_on_start": False,
+        "maxrunning": 1,
+        "offline": True,
+        "enabled": True,
+        "jid_include": True,
+    }
+
+
+def _site_schedule_jobs(site: str, config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Schedule entries optional.magento-schedule would render for ``site``."""
+    token = _site_token(site)
+    maintenance_cmd = config.get("maintenance_command", "saltgoat magetools maintenance")
+    extra = config.get("maintenance_extra_args", "")
+    jobs: Dict[str, Dict[str, Any]] = {
+        f"magento_{token}_cron": _schedule_job(
+            f"cd /var/www/{site} && sudo -u www-data php bin/magento cron:run >> /var/log/magento-cron.log 2>&1",
+            "* * * * *",
+        ),
+    }
+    for period, cron, log in (
+        ("daily", "0 2 * * *", "magento-maintenance"),
+        ("weekly", "0 3 * * 0", "magento-maintenance"),
+        ("monthly", "0 4 1 * *", "magento-maintenance"),
+        ("health", "0 * * * *", "magento-health"),
+    ):
+        args = config.get(f"{period}_args", "")
+        command = f"{maintenance_cmd} {site} {period} {extra} {args} >> /var/log/{log}.log 2>&1"
+        jobs[f"magento_{token}_{period}"] = _schedule_job(command, cron)
+
+    def matching(key: str) -> List[Dict[str, Any]]:
+        items = config.get(key, []) or []
+        return [
+            job
+            for job in items
+            if isinstance(job, dict) and job.get("name") and _job_matches_site(job, site)
+        ]
+
+    dump_jobs = matching("mysql_dump_jobs") or [_default_mysql_dump_job(site)]
+    for job in dump_jobs:
+        command = "saltgoat magetools xtrabackup mysql dump"
+        if job.get("database"):
+            command += f" --database {_sls_quote(job['database'])}"
+        if job.get("backup_dir"):
+            command += f" --backup-dir {_sls_quote(job['backup_dir'])}"
+        if job.get("repo_owner"):
+            command += f" --repo-owner {_sls_quote(job['repo_owner'])}"
+        if job.get("no_compress"):
+            command += " --no-compress"
+        jobs[str(job["name"])] = _schedule_job(command, str(job.get("cron", "0 * * * *")))
+
+    for watcher in matching("api_watchers"):
+        kinds = watcher.get("kinds", ["orders", "customers"])
+        command = f"saltgoat magetools api watch --site {site}"
+        if kinds:
+            joined = ",".join(str(kind) for kind in kinds) if isinstance(kinds, (list, tuple, set)) else str(kinds)
+            command += f" --kinds {joined}"
+        jobs[str(watcher["name"])] = _schedule_job(command, str(watcher.get("cron", "*/5 * * * *")))
+
+    for job in matching("stats_jobs") or _default_stats_jobs(site):
+        command = f"saltgoat magetools stats --site {site} --period {job.get('period') or 'daily'}"
+        if job.get("page_size"):
+            command += f" --page-size {job['page_size']}"
+        if job.get("telegram_thread") is not None:
+            command += f" --telegram-thread {job['telegram_thread']}"
+        if job.get("no_telegram"):
+            command += " --no-telegram"
+        if job.get("quiet"):
+            command += " --quiet"
+        command += _extra_args(job.get("extra_args"))
+        jobs[str(job["name"])] = _schedule_job(command, str(job.get("cron", "0 6 * * *")))
+
+    for job in matching("restic_jobs"):
+        command = f"saltgoat magetools backup restic run --site {_sls_quote(job.get('site_override', site))}"
+        if job.get("repo"):
+            command += f" --backup-dir {_sls_quote(job['repo'])}"
+        paths = job.get("paths")
+        if isinstance(paths, (list, tuple, set)):
+            paths = ",".join(str(path) for path in paths)
+        if paths:
+            command += f" --paths {_sls_quote(paths)}"
+        tags = job.get("tags") or []
+        for tag in [tags] if isinstance(tags, str) else tags:
+            command += f" --tag {_sls_quote(tag)}"
+        command += _extra_args(job.get("extra_args"))
+        jobs[str(job["name"])] = _schedule_job(command, str(job.get("cron", "0 3 * * *")))
+    return jobs
+
+
+def _desired_schedule(sites: List[str], config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    desired: Dict[str, Dict[str, Any]] = {}
+    for site in sites:
+        desired.update(_site_schedule_jobs(site, config))
+    desired["saltgoat_schedule_auto"] = _schedule_job("saltgoat magetools schedule auto", "30 3 * * *")
+    desired["saltgoat_api_watch_all"] = _schedule_job(
+        "saltgoat magetools api watch --all-sites", str(config.get("api_watch_cron", "*/5 * * * *"))
+    )
+    desired["saltgoat_daily_summary"] = _schedule_job("saltgoat monitor report daily", "0 6 * * *")
+    return desired
+
+
+def _job_command(details: Dict[str, Any]) -> str:
+    args = details.get("args") or details.get("job_args")
+    if isinstance(args, list) and args:
+        return " ".join(str(item) for item in args)
+    if isinstance(args, str):
+        return args
+    return ""
+
+
+def _referenced_sites(command: str) -> set:
+    found = re.findall(r"--site\s+'?([\w\-]+)", command) + re.findall(r"/var/www/([\w\-]+)", command)
+    return set(found)
+
+
+def _job_is_stale(name: str, details: Dict[str, Any], sites: List[str], desired_commands: set) -> bool:
+    """True for SaltGoat-managed jobs that no longer belong to any desired entry."""
+    command = _job_command(details).strip()
+    tokens = {_site_token(site) for site in sites}
+    if name.startswith("magento_") and name.count("_") >= 2 and name.split("_", 2)[1] not in tokens:
+        return True
+    if command and command in desired_commands:
+        return True
+    referenced = _referenced_sites(command)
+    if not referenced:
+        return False
+    # SaltGoat 自身的站点命令（如旧的 <site>-api-watch）不在期望列表中即清理；
+    # 其他自定义任务只在引用的站点全部已不存在时清理
+    if command.startswith("saltgoat magetools ") and referenced & set(sites):
+        return True
+    return not referenced & set(sites)
+
+
+def _plan_schedule(
+    current: Dict[str, Any], desired: Dict[str, Dict[str, Any]], sites: List[str]
+) -> Dict[str, List[str]]:
+    plan: Dict[str, List[str]] = {"add": [], "update": [], "remove": [], "unchanged": []}
+    for name, job in sorted(desired.items()):
+        existing = current.get(name)
+        if not isinstance(existing, dict):
+            plan["add"].append(name)
+        elif any(existing.get(key) != job.get(key) for key in SCHEDULE_MANAGED_KEYS):
+            plan["update"].append(name)
+        else:
+            plan["unchanged"].append(name)
+    desired_commands = {_job_command(job).strip() for job in desired.values()}
+    for name, details in sorted(current.items()):
+        if name in desired or not isinstance(details, dict):
+            continue
+        if _job_is_stale(name, details, sites, desired_commands):
+            plan["remove"].append(name)
+    return plan
+
+
+def _schedule_call_kwargs(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate a stored schedule entry into ``schedule.add``/``schedule.modify`` arguments."""
+    kwargs = {key: value for key, value in job.items() if key not in ("args", "kwargs", "name")}
+    kwargs["job_args"] = job.get("args") or []
+    kwargs["job_kwargs"] = job.get("kwargs") or {}
+    return kwargs
+
+
+def _schedule_call_failed(result: Any) -> bool:
+    return isinstance(result, dict) and result.get("result") is False
+
+
+def _prepare_schedule_host(sites: List[str], config: Dict[str, Any]) -> None:
+    """File side effects of optional.magento-schedule (log files, legacy cron, restic repos)."""
+    for log_file in SCHEDULE_LOG_FILES:
+        if not os.path.exists(log_file):
+            Path(log_file).touch(mode=0o644)
+    legacy = ["/usr/local/bin/magento-maintenance-salt", "/etc/cron.d/magento-maintenance"]
+    legacy.extend(f"/etc/cron.d/magento-maintenance-{_site_token(site)}" for site in sites)
+    for path in legacy:
+        if os.path.exists(path):
+            os.remove(path)
+    for job in config.get("restic_jobs", []) or []:
+        if not isinstance(job, dict) or not str(job.get("repo", "")).startswith("/"):
+            continue
+        if not any(_job_matches_site(job, site) for site in sites):
+            continue
+        owner = job.get("repo_owner", config.get("repo_owner", "root"))
+        if not os.path.isdir(job["repo"]):
+            __salt__["file.mkdir"](job["repo"], user=owner, group=owner, mode="750")  # type: ignore[name-defined]  # noqa: F821
+
+
+def magento_schedule_reconcile(sites: Any = None, plan: bool = False) -> Dict[str, Any]:
+    """
+    Reconcile the Salt Schedule of every Magento site in one pass.
+
+    Computes the desired jobs for all ``sites`` (comma separated or list) from
+    pillar, diffs them against a single ``schedule.list`` snapshot and applies
+    the changes in memory through ``schedule.add``/``schedule.modify``/
+    ``schedule.delete`` (``persist=False``) followed by a single
+    ``schedule.save``. ``plan=True`` only reports the diff.
+    """
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    def mark(phase: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[phase] = round((now - since) * 1000.0, 1)
+        return now
+
+    if isinstance(sites, str):
+        site_list = [item.strip() for item in sites.split(",") if item.strip()]
+    else:
+        site_list = [str(item) for item in (sites or [])]
+    ret: Dict[str, Any] = {"sites": site_list, "plan": {}, "applied": False, "result": True, "comment": ""}
+
+    step = time.perf_counter()
+    config: Dict[str, Any] = __salt__["pillar.get"]("magento_schedule", {}) or {}  # type: ignore[name-defined]  # noqa: F821
+    desired = _desired_schedule(site_list, config)
+    step = mark("desired_ms", step)
+
+    current = _schedule_entries()
+    if not isinstance(current, dict):
+        ret.update(result=False, comment="Salt Schedule not available; please ensure salt-minion is installed and running.")
+        return ret
+    step = mark("list_ms", step)
+
+    changes = _plan_schedule(current, desired, site_list)
+    ret["plan"] = {key: value for key, value in changes.items() if key != "unchanged"}
+    ret["plan"]["unchanged"] = len(changes["unchanged"])
+    step = mark("plan_ms", step)
+    pending = changes["add"] or changes["update"] or changes["remove"]
+    if plan or not pending:
+        ret["comment"] = "plan only" if plan else "Salt Schedule already up to date."
+        ret["present"] = sorted(current)
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        ret["timings"] = timings
+        return ret
+
+    _prepare_schedule_host(site_list, config)
+    failed: List[str] = []
+    for name in changes["remove"]:
+        if _schedule_call_failed(__salt__["schedule.delete"](name, persist=False)):  # type: ignore[name-defined]  # noqa: F821
+            failed.append(name)
+    for action, names in (("schedule.add", changes["add"]), ("schedule.modify", changes["update"])):
+        for name in names:
+            result = __salt__[action](name, persist=False, **_schedule_call_kwargs(desired[name]))  # type: ignore[name-defined]  # noqa: F821
+            if _schedule_call_failed(result):
+                failed.append(name)
+    step = mark("apply_ms", step)
+
+    # 全部变更在内存中完成后只持久化一次 minion.d/_schedule.conf
+    save = __salt__["schedule.save"]()  # type: ignore[name-defined]  # noqa: F821
+    mark("save_ms", step)
+    if failed or _schedule_call_failed(save):
+        ret.update(result=False, comment=f"Salt Schedule update failed for: {', '.join(failed) or 'schedule.save'}")
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        ret["timings"] = timings
+        return ret
+
+    ret["applied"] = True
+    ret["present"] = sorted(set(current) - set(changes["remove"]) | set(desired))
+    ret["comment"] = "Salt Schedule reconciled with a single save."
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    ret["timings"] = timings
+    return ret
+
+
 def magento_schedule_uninstall(site: str = "tank") -> Dict[str, Any]:
     """
     Remove Magento maintenance schedule / cron entries.
@@ -519,6 +800,52 @@ def enable_beacons() -> Dict[str, Any]:
     }
 
 
+PILLAR_SNAPSHOT_PATH = "/etc/saltgoat/runtime/pillar-snapshot.json"
+# 与 modules/lib/pillar_snapshot.py 中的 EXPORT_KEYS / SNAPSHOT_VERSION 保持一致
+SNAPSHOT_KEYS = (
+    "saltgoat",
+    "notifications",
+    "telegram",
+    "telegram_topics",
+    "secrets",
+    "magento_schedule",
+    "monitor_thresholds",
+)
+SNAPSHOT_VERSION = 1
+
+
+def pillar_snapshot(path: str = PILLAR_SNAPSHOT_PATH) -> Dict[str, Any]:
+    """
+    Write the pillar subtrees SaltGoat scripts read to a root-only JSON snapshot,
+    so they can skip constructing salt.client.Caller on every run.
+    """
+    # 时间戳取在编译之前：编译期间改动的 pillar 文件仍会让快照判定为过期
+    generated = time.time()
+    # 重新编译 pillar；__pillar__ 是 minion 启动/刷新时的内存副本，修改 pillar 后不会更新
+    pillar = __salt__["pillar.items"]()  # type: ignore[name-defined]  # noqa: F821
+    document = {
+        "version": SNAPSHOT_VERSION,
+        "generated": generated,
+        "keys": list(SNAPSHOT_KEYS),
+        "pillar": {key: pillar[key] for key in SNAPSHOT_KEYS if key in pillar},
+    }
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(document, fh, ensure_ascii=False, separators=(",", ":"), default=str)
+        os.replace(str(tmp), str(target))
+    except Exception:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+    return {"path": str(target), "keys": sorted(document["pillar"].keys()), "generated": document["generated"]}
+
+
 AUTOMATION_DEFAULT_BASE = "/srv/saltgoat/automation"
 
 
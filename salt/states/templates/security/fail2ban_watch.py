@@ -3,19 +3,27 @@
 Fail2ban watcher with Telegram notifications.
 
 Scans all configured jails, prints a summary table, and notifies when new IPs are banned.
+Jail state is read over the fail2ban server socket in one connection (falling
+back to a single ``fail2ban-client banned``), or incrementally from
+``fail2ban.log`` with ``--source log``.
 """
 
 from __future__ import annotations
 
 import argparse
+import ast
 import json
 import os
+import pickle
+import re
+import shutil
 import socket
 import subprocess
 import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence
+from typing import Dict, List, Optional, Sequence, Tuple
 
 BASE_DIR = Path(__file__).resolve().parent
 LIB_CANDIDATES = [
@@ -59,63 +67,239 @@ if TELEGRAM_AVAILABLE:
         TELEGRAM_AVAILABLE = False
 
 
+SOCKET_PATH = Path("/var/run/fail2ban/fail2ban.sock")
+LOG_PATH = Path("/var/log/fail2ban.log")
+RESYNC_INTERVAL = 3600
+# 重同步时只读取日志末尾这么多字节来定位最后一个完整行
+LOG_TAIL_PROBE = 64 * 1024
+SOCKET_TIMEOUT = 5.0
+# fail2ban.protocol.CSPROTO
+F2B_END = b"<F2B_END_COMMAND>"
+F2B_CLOSE = b"<F2B_CLOSE_COMMAND>"
+LOG_EVENT_RE = re.compile(r"\[(?P<jail>[^\]]+)\]\s+(?P<action>Restore Ban|Ban|Unban)\s+(?P<ip>\S+)")
+
+
+class Fail2banSocket:
+    """Minimal fail2ban server socket client (the same pickle protocol fail2ban-client speaks).
+
+    One connection serves every command of a run, so collecting N jails costs
+    N small socket messages instead of N+1 fail2ban-client forks.
+    """
+
+    def __init__(self, path: Path = SOCKET_PATH, timeout: float = SOCKET_TIMEOUT) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(str(path))
+
+    def command(self, *args: str) -> object:
+        self.sock.sendall(pickle.dumps([str(arg) for arg in args], protocol=2) + F2B_END)
+        buffer = b""
+        while not buffer.endswith(F2B_END):
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("fail2ban closed the socket")
+            buffer += chunk
+        # socket 仅 root 可写，与 fail2ban-client 一样信任服务端 pickle
+        code, result = pickle.loads(buffer[: -len(F2B_END)])
+        if code != 0:
+            raise RuntimeError(f"fail2ban {' '.join(args)}: {result}")
+        return result
+
+    def close(self) -> None:
+        try:
+            self.sock.sendall(F2B_CLOSE + F2B_END)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def __enter__(self) -> "Fail2banSocket":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+
+def _pairs(items: object) -> Dict[str, object]:
+    return {str(key): value for key, value in items} if isinstance(items, (list, tuple)) else {}
+
+
+def _split_jails(value: object) -> List[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if str(item)]
+    return [item for item in str(value or "").replace(",", " ").split() if item]
+
+
+def collect_socket(path: Path = SOCKET_PATH) -> Dict[str, Dict[str, object]]:
+    stats: Dict[str, Dict[str, object]] = {}
+    with Fail2banSocket(path) as client:
+        jails = _split_jails(_pairs(client.command("status")).get("Jail list"))
+        for jail in jails:
+            actions = _pairs(_pairs(client.command("status", jail)).get("Actions"))
+            ips = [str(ip) for ip in actions.get("Banned IP list") or []]
+            stats[jail] = {
+                "currently": int(actions.get("Currently banned") or len(ips)),
+                "total": int(actions.get("Total banned") or 0),
+                "ips": ips,
+            }
+    return stats
+
+
 def run_client(args: Sequence[str]) -> str:
     cmd = ["fail2ban-client", *args]
     try:
         return subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode().strip()
-    except subprocess.CalledProcessError:
+    except (OSError, subprocess.CalledProcessError):
         return ""
 
 
-def parse_jails(status_output: str) -> List[str]:
-    for line in status_output.splitlines():
-        if "Jail list:" in line:
-            _, _, rest = line.partition("Jail list:")
-            items = [item.strip() for item in rest.replace(",", " ").split()]
-            return [item for item in items if item]
-    return []
-
-
-def parse_jail_status(jail: str) -> Dict[str, object]:
-    output = run_client(["status", jail])
-    currently = 0
-    total = 0
-    ips: List[str] = []
-    for line in output.splitlines():
-        clean = line.strip()
-        if "Currently banned" in clean:
-            try:
-                currently = int(clean.split(":")[-1].strip())
-            except ValueError:
-                pass
-        elif "Total banned" in clean:
-            try:
-                total = int(clean.split(":")[-1].strip())
-            except ValueError:
-                pass
-        elif clean.endswith("IP list:") or clean.endswith("Banned IP list:"):
+def collect_client() -> Dict[str, Dict[str, object]]:
+    """Fallback without socket access: a single ``fail2ban-client banned`` fork."""
+    output = run_client(["banned"])
+    try:
+        entries = ast.literal_eval(output) if output else []
+    except (ValueError, SyntaxError):
+        entries = []
+    stats: Dict[str, Dict[str, object]] = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
             continue
-        elif clean.startswith("- IP list:") or clean.startswith("`- IP list:"):
-            values = clean.split(":", 1)[-1]
-            ips = [ip.strip() for ip in values.replace(",", " ").split() if ip.strip()]
-        elif clean.startswith(("|  `- IP list:", "`- Banned IP list:")):
-            values = clean.split(":", 1)[-1]
-            ips = [ip.strip() for ip in values.replace(",", " ").split() if ip.strip()]
-    return {"currently": currently, "total": total, "ips": ips}
+        for jail, ips in entry.items():
+            ip_list = [str(ip) for ip in ips or []]
+            stats[str(jail)] = {"currently": len(ip_list), "total": None, "ips": ip_list}
+    return stats
+
+
+def collect(source: str, socket_path: Path) -> Optional[Dict[str, Dict[str, object]]]:
+    if source in {"auto", "socket"}:
+        try:
+            return collect_socket(socket_path)
+        except Exception as exc:
+            if source == "socket":
+                print(f"fail2ban socket unavailable: {exc}", file=sys.stderr)
+                return None
+    if shutil.which("fail2ban-client") is None:
+        return None
+    return collect_client()
+
+
+def tail_log(path: Path, cursor: Dict[str, object]) -> Tuple[List[Tuple[str, str, str]], Dict[str, object]]:
+    """Ban/Unban events appended to ``path`` since ``cursor`` (inode + byte offset)."""
+    try:
+        info = path.stat()
+    except OSError:
+        return [], cursor
+    offset = int(cursor.get("offset") or 0)
+    if cursor.get("inode") != info.st_ino or info.st_size < offset:
+        offset = 0  # logrotate 后从新文件开头读取
+    events: List[Tuple[str, str, str]] = []
+    with path.open("rb") as fh:
+        fh.seek(offset)
+        for raw in fh:
+            if not raw.endswith(b"\n"):
+                break  # 半行留到下次
+            offset += len(raw)
+            match = LOG_EVENT_RE.search(raw.decode("utf-8", "replace"))
+            if match:
+                action = "Ban" if match.group("action") == "Restore Ban" else match.group("action")
+                events.append((match.group("jail"), action, match.group("ip")))
+    return events, {"inode": info.st_ino, "offset": offset}
+
+
+def log_end_cursor(path: Path) -> Dict[str, object]:
+    """Cursor at the end of the last complete line of ``path``, without parsing the log."""
+    try:
+        info = path.stat()
+        with path.open("rb") as fh:
+            start = max(0, info.st_size - LOG_TAIL_PROBE)
+            fh.seek(start)
+            tail = fh.read(info.st_size - start)
+    except OSError:
+        return {"inode": None, "offset": 0}
+    newline = tail.rfind(b"\n")
+    # 末尾的半行留给下次 tail_log 读取
+    offset = start + newline + 1 if newline >= 0 else info.st_size
+    return {"inode": info.st_ino, "offset": offset}
+
+
+def apply_events(state: Dict[str, List[str]], events: Sequence[Tuple[str, str, str]]) -> Dict[str, Dict[str, object]]:
+    current = {jail: list(ips) for jail, ips in state.items()}
+    for jail, action, ip in events:
+        ips = current.setdefault(jail, [])
+        if action == "Ban" and ip not in ips:
+            ips.append(ip)
+        elif action == "Unban" and ip in ips:
+            ips.remove(ip)
+    return {jail: {"currently": len(ips), "total": None, "ips": ips} for jail, ips in current.items()}
 
 
 def load_state(path: Path) -> Dict[str, List[str]]:
     if not path_exists(path):
         return {}
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        data = json.loads(path.read_text(encoding="utf-8"))
     except Exception:
         return {}
+    return data if isinstance(data, dict) else {}
 
 
-def save_state(path: Path, data: Dict[str, List[str]]) -> None:
+def meta_path(state_path: Path) -> Path:
+    return state_path.with_name(state_path.stem + ".meta.json")
+
+
+def _write_atomic(path: Path, text: str) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def save_state(path: Path, data: Dict[str, List[str]]) -> bool:
+    """Write the jail -> IPs state only when it changed; returns True if written."""
+    text = json.dumps(data, indent=2, sort_keys=True)
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except OSError:
+        pass
+    _write_atomic(path, text)
+    return True
+
+
+def update_counters(meta: Dict[str, object], bans: Dict[str, int], now: float) -> Dict[str, Dict[str, object]]:
+    """Accumulate per-jail ban counters and the ban rate since the previous run."""
+    counters = meta.get("counters") if isinstance(meta.get("counters"), dict) else {}
+    meta["counters"] = counters
+    previous = meta.get("updated")
+    elapsed = max(1.0, now - float(previous or now))
+    for jail in set(counters) | set(bans):
+        entry = counters.setdefault(jail, {"bans": 0})
+        new = int(bans.get(jail, 0))
+        entry["bans"] = int(entry.get("bans", 0)) + new
+        entry["rate_per_min"] = round(new * 60.0 / elapsed, 3) if previous else 0.0
+    meta["updated"] = now
+    return counters
+
+
+def write_metrics(path: Path, stats: Dict[str, Dict[str, object]], counters: Dict[str, Dict[str, object]]) -> None:
+    lines = [
+        "# HELP saltgoat_fail2ban_banned Currently banned IPs per jail",
+        "# TYPE saltgoat_fail2ban_banned gauge",
+    ]
+    lines += [f'saltgoat_fail2ban_banned{{jail="{jail}"}} {len(data.get("ips") or [])}' for jail, data in sorted(stats.items())]
+    lines += [
+        "# HELP saltgoat_fail2ban_bans_total New bans observed by the watcher",
+        "# TYPE saltgoat_fail2ban_bans_total counter",
+    ]
+    lines += [f'saltgoat_fail2ban_bans_total{{jail="{jail}"}} {entry.get("bans", 0)}' for jail, entry in sorted(counters.items())]
+    lines += [
+        "# HELP saltgoat_fail2ban_ban_rate_per_minute New bans per minute over the last interval",
+        "# TYPE saltgoat_fail2ban_ban_rate_per_minute gauge",
+    ]
+    lines += [
+        f'saltgoat_fail2ban_ban_rate_per_minute{{jail="{jail}"}} {entry.get("rate_per_min", 0.0)}'
+        for jail, entry in sorted(counters.items())
+    ]
+    _write_atomic(path, "\n".join(lines) + "\n")
 
 
 def log_to_file(tag: str, payload: Dict[str, object]) -> None:
@@ -204,7 +388,7 @@ def notify_new_ban(jail: str, ip: str, stats: Dict[str, object]) -> None:
         ("Jail", jail),
         ("IP", ip),
         ("Currently", str(stats.get("currently", 0))),
-        ("Total", str(stats.get("total", 0))),
+        ("Total", "-" if stats.get("total") is None else str(stats.get("total"))),
         ("Time", timestamp),
     ]
     _, html = notif.format_pre_block("FAIL2BAN", jail.upper(), fields)
@@ -220,37 +404,72 @@ def notify_new_ban(jail: str, ip: str, stats: Dict[str, object]) -> None:
 def main() -> None:
     parser = argparse.ArgumentParser(description="Fail2ban watcher")
     parser.add_argument("--state", default=str(STATE_FILE), help="State file path")
+    parser.add_argument(
+        "--source",
+        choices=["auto", "socket", "client", "log"],
+        default="auto",
+        help="auto/socket: fail2ban server socket (fallback: one `fail2ban-client banned`); "
+        "log: tail fail2ban.log from the stored offset",
+    )
+    parser.add_argument("--socket", default=str(SOCKET_PATH), help="fail2ban server socket")
+    parser.add_argument("--log", default=str(LOG_PATH), help="fail2ban log (for --source log)")
+    parser.add_argument(
+        "--resync-interval",
+        type=int,
+        default=RESYNC_INTERVAL,
+        help="seconds between full socket resyncs in log mode (default: 3600)",
+    )
+    parser.add_argument("--metrics-file", default=None, help="write Prometheus textfile metrics here")
     args = parser.parse_args()
-    status = run_client(["status"])
-    if not status:
+
+    now = time.time()
+    state_path = Path(args.state)
+    prev_state = load_state(state_path)
+    meta = load_state(meta_path(state_path))
+    socket_path = Path(args.socket)
+
+    stats: Optional[Dict[str, Dict[str, object]]] = None
+    if args.source == "log":
+        cursor = meta.get("log") if isinstance(meta.get("log"), dict) else {}
+        last_sync = float(meta.get("synced") or 0)
+        if cursor and now - last_sync < args.resync_interval:
+            events, meta["log"] = tail_log(Path(args.log), cursor)
+            stats = apply_events(prev_state, events)
+        else:
+            # 首次运行或到达重同步周期：先记下日志末尾，再全量读取一次；
+            # 全量读取期间写入的事件会在下次 tail 时重放（Ban/Unban 可重复应用）
+            meta["log"] = log_end_cursor(Path(args.log))
+            stats = collect("auto", socket_path)
+            meta["synced"] = now
+    else:
+        stats = collect(args.source, socket_path)
+    if stats is None:
         print("fail2ban-client not available", file=sys.stderr)
         sys.exit(1)
 
-    jails = parse_jails(status)
-    if not jails:
+    new_bans: Dict[str, int] = {}
+    if stats:
+        print(f"{'Jail':<16} {'Current':<8} {'Total':<8} Banned IPs")
+        print("=" * 60)
+    else:
         print("No jails configured")
-        sys.exit(0)
-
-    prev_state = load_state(Path(args.state))
-    next_state: Dict[str, List[str]] = {}
-
-    print(f"{'Jail':<16} {'Current':<8} {'Total':<8} Banned IPs")
-    print("=" * 60)
-    for jail in jails:
-        stats = parse_jail_status(jail)
-        ips = stats.get("ips", [])
-        current = stats.get("currently", 0)
-        total = stats.get("total", 0)
+    for jail, jail_stats in sorted(stats.items()):
+        ips = list(jail_stats.get("ips") or [])
+        total = jail_stats.get("total")
         ip_list = ", ".join(ips) if ips else "-"
-        print(f"{jail:<16} {current:<8} {total:<8} {ip_list}")
+        print(f"{jail:<16} {jail_stats.get('currently', 0):<8} {'-' if total is None else total:<8} {ip_list}")
 
         old_ips = set(prev_state.get(jail, []))
         new_ips = [ip for ip in ips if ip not in old_ips]
         for ip in new_ips:
-            notify_new_ban(jail, ip, stats)
-        next_state[jail] = list(ips)
-
-    save_state(Path(args.state), next_state)
+            notify_new_ban(jail, ip, jail_stats)
+        new_bans[jail] = len(new_ips)
+
+    save_state(state_path, {jail: list(data.get("ips") or []) for jail, data in stats.items()})
+    counters = update_counters(meta, new_bans, now)
+    _write_atomic(meta_path(state_path), json.dumps(meta, sort_keys=True))
+    if args.metrics_file:
+        write_metrics(Path(args.metrics_file), stats, counters)
 
 
 if __name__ == "__main__":
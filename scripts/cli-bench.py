@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for SaltGoat's Python entry points.
+
+For each common CLI command this measures how long ``python3 -m modules.cli
+--import-only <helper>`` takes to start and load the helper:
+
+* cold: no bytecode cache (fresh ``PYTHONPYCACHEPREFIX`` per run), i.e. the
+  first invocation after a deploy;
+* warm: median of ``--runs`` invocations with the cache primed.
+
+Budgets apply to the warm overhead above a bare ``python3 -c pass`` so they
+hold across machines of different speed. ``--check`` exits with code 1 when a
+command exceeds its budget; ``scripts/verify.sh`` runs it so regressions show
+up in ``saltgoat verify``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# saltgoat 命令 -> (modules.cli 子命令, 预热后相对解释器基线的额外启动预算, 毫秒)
+COMMANDS: Dict[str, tuple] = {
+    "monitor quick-check": ("resource-alert", 250.0),
+    "doctor": ("doctor", 150.0),
+    "nginx list": ("nginx-pillar", 150.0),
+    "magetools schedule list": ("magento-schedule", 150.0),
+}
+
+
+def _time_once(argv: Sequence[str], env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        list(argv),
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    elapsed = (time.perf_counter() - start) * 1000.0
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} failed: {proc.stderr.strip()[-400:]}")
+    return elapsed
+
+
+def _env(**extra: str) -> Dict[str, str]:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(ROOT) + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env.update(extra)
+    return env
+
+
+def measure(argv: Sequence[str], runs: int) -> Dict[str, float]:
+    cold: List[float] = []
+    for _ in range(max(1, runs // 2)):
+        with tempfile.TemporaryDirectory(prefix="saltgoat-bench-") as prefix:
+            cold.append(_time_once(argv, _env(PYTHONPYCACHEPREFIX=prefix)))
+    env = _env()
+    _time_once(argv, env)  # 预热 __pycache__
+    warm = [_time_once(argv, env) for _ in range(runs)]
+    return {"cold_ms": round(statistics.median(cold), 1), "warm_ms": round(statistics.median(warm), 1)}
+
+
+def run_bench(runs: int, only: Optional[List[str]] = None) -> Dict[str, object]:
+    python = sys.executable
+    baseline = measure([python, "-c", "pass"], runs)
+    results: Dict[str, object] = {"python": python, "runs": runs, "baseline": baseline, "commands": {}}
+    for name, (helper, budget) in COMMANDS.items():
+        if only and name not in only:
+            continue
+        stats = measure([python, "-m", "modules.cli", "--import-only", helper], runs)
+        overhead = round(stats["warm_ms"] - baseline["warm_ms"], 1)
+        results["commands"][name] = dict(
+            stats,
+            helper=helper,
+            overhead_ms=overhead,
+            budget_ms=budget,
+            ok=overhead <= budget,
+        )
+    return results
+
+
+def render(results: Dict[str, object]) -> str:
+    baseline = results["baseline"]
+    lines = [
+        f"{'command':<26}{'cold ms':>10}{'warm ms':>10}{'overhead':>10}{'budget':>9}",
+        f"{'python3 -c pass':<26}{baseline['cold_ms']:>10}{baseline['warm_ms']:>10}{'-':>10}{'-':>9}",
+    ]
+    for name, stats in results["commands"].items():
+        flag = "" if stats["ok"] else "  << over budget"
+        lines.append(
+            f"{name:<26}{stats['cold_ms']:>10}{stats['warm_ms']:>10}{stats['overhead_ms']:>10}{stats['budget_ms']:>9}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure SaltGoat CLI startup latency")
+    parser.add_argument("--runs", type=int, default=5, help="warm runs per command (default: 5)")
+    parser.add_argument("--command", action="append", choices=sorted(COMMANDS), help="limit to a command (repeatable)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any command exceeds its budget")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        results = run_bench(args.runs, args.command)
+    except RuntimeError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        return 1
+    print(json.dumps(results, indent=2) if args.json else render(results))
+    if args.check and not all(stats["ok"] for stats in results["commands"].values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
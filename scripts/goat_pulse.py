@@ -6,10 +6,13 @@ from __future__ import annotations
 import argparse
 import contextlib
 import html
+import importlib
 import io
 import json
+import os
 import subprocess
 import sys
+import tempfile
 import time
 from datetime import datetime
 from pathlib import Path
@@ -20,6 +23,20 @@ if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 TELEGRAM_COMMON = Path("/opt/saltgoat-reactor/reactor_common.py")
 
+
+def _optional_module(name: str) -> Any:
+    """Import ``modules.lib.<name>``, or return None for helpers missing here."""
+    try:
+        return importlib.import_module(f"modules.lib.{name}")
+    except Exception:  # pragma: no cover - standalone copy without the repo modules
+        return None
+
+
+systemd_units = _optional_module("systemd_units")
+pillar_cache = _optional_module("pillar_cache")
+nginx_index = _optional_module("nginx_index")
+probe_engine = _optional_module("http_probe")
+
 SERVICES = [
     ("nginx", "nginx"),
     ("php8.3-fpm", "php8.3-fpm"),
@@ -33,6 +50,12 @@ SERVICES = [
 SITES = ["bank", "tank", "pwas"]
 PILLAR_NGINX = Path("salt/pillar/nginx.sls")
 FAIL2BAN_STATE = Path("/var/log/saltgoat/fail2ban-state.json")
+TREND_METRICS = ["load.1m", "memory.percent", "swap.percent"]
+PROBE_TIMEOUT = 10.0
+PROBE_RETRIES = 2
+PROBE_HEADERS = {"Cache-Control": "no-cache"}
+CACHE_HEADERS = ("x-magento-cache-debug", "x-cache", "x-varnish-cache")
+_PROBE_POOL: Optional[Any] = None
 
 
 def run(cmd: List[str], timeout: int = 10) -> Tuple[int, str, str]:
@@ -57,12 +80,19 @@ def service_status(unit: str) -> Tuple[str, str]:
     return state, enabled
 
 
+def _nginx_pillar() -> Dict[str, Any]:
+    if pillar_cache is not None:
+        # 每个站点、每次刷新都会调用：按 mtime 缓存，只在 nginx.sls 变化时重新解析
+        return pillar_cache.load_dict(PILLAR_NGINX, copy_result=False)
+    import yaml  # type: ignore
+
+    return yaml.safe_load(PILLAR_NGINX.read_text(encoding="utf-8")) or {}
+
+
 def site_target(site: str) -> str:
     if PILLAR_NGINX.exists():
         try:
-            import yaml  # type: ignore
-
-            data = yaml.safe_load(PILLAR_NGINX.read_text(encoding="utf-8")) or {}
+            data = _nginx_pillar()
             entry = ((data.get("nginx") or {}).get("sites") or {}).get(site, {})
             names = entry.get("server_name")
             if isinstance(names, list) and names:
@@ -71,15 +101,26 @@ def site_target(site: str) -> str:
                 return f"https://{names.strip()}"
         except Exception:
             pass
+    if nginx_index is not None:
+        try:
+            # 索引按配置 mtime 缓存，刷新循环中只做 stat
+            index = nginx_index.load()
+            info = index.site_info(index.by_file(site))
+            if info["server_names"]:
+                scheme = "https" if info["https"] else "http"
+                return f"{scheme}://{info['server_names'][0].lstrip('*.')}"
+        except Exception:
+            pass
     return f"https://{site}.magento.tattoogoat.com"
 
 
 def http_probe(url: str) -> Tuple[str, float, bool]:
+    """curl fallback for standalone copies without modules.lib.http_probe."""
     cmd = [
         "curl",
         "-sS",
         "-o",
-        "/tmp/goat-pulse.tmp",
+        "/dev/null",
         "-D",
         "-",
         "-w",
@@ -101,13 +142,42 @@ def http_probe(url: str) -> Tuple[str, float, bool]:
     status = metrics[0] if metrics else "000"
     duration = float(metrics[1]) if len(metrics) > 1 else 0.0
     varnish = "X-Varnish" in headers
-    try:
-        Path("/tmp/goat-pulse.tmp").unlink(missing_ok=True)  # type: ignore[arg-type]
-    except Exception:
-        pass
     return status, duration, varnish
 
 
+def _probe_pool() -> Any:
+    # 刷新循环之间复用 keep-alive 连接，只有第一次刷新需要握手
+    global _PROBE_POOL
+    if _PROBE_POOL is None:
+        _PROBE_POOL = probe_engine.ConnectionPool()
+    return _PROBE_POOL
+
+
+def close_probe_pool() -> None:
+    global _PROBE_POOL
+    if _PROBE_POOL is not None:
+        _PROBE_POOL.close()
+        _PROBE_POOL = None
+
+
+def site_entry(site: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a probe_engine result into a dashboard row."""
+    headers = result.get("headers") or {}
+    timings = result.get("timings") or {}
+    status = str(result["status"]) if result.get("status") is not None else "ERR"
+    cache = next((headers[name] for name in CACHE_HEADERS if headers.get(name)), "")
+    return {
+        "site": site,
+        "status": status,
+        "duration": timings.get("total", 0.0) if status != "ERR" else 0.0,
+        "connect": timings.get("connect"),
+        "ttfb": timings.get("ttfb"),
+        "varnish": "x-varnish" in headers,
+        "cache": cache.split(",")[0].strip().upper(),
+        "error": result.get("error"),
+    }
+
+
 def varnish_stats() -> Tuple[int, int, float]:
     code, stdout, _ = run(["varnishstat", "-1", "-f", "MAIN.cache_hit,MAIN.cache_miss"])
     hits = miss = 0
@@ -134,12 +204,49 @@ def fail2ban_summary() -> Tuple[int, Dict[str, List[str]]]:
     return currently, data
 
 
+def gather_trends() -> Dict[str, Dict[str, Any]]:
+    try:
+        from modules.lib import metrics_history
+
+        return metrics_history.summarize(TREND_METRICS, hours=24)
+    except Exception:
+        return {}
+
+
+def print_trends(trends: Dict[str, Dict[str, Any]]) -> None:
+    if not trends:
+        return
+    print("Trends (24h)")
+    print("-" * 50)
+    print(f"{'Metric':<20} {'Avg':<8} {'P95':<8} {'Max'}")
+    for metric in sorted(trends):
+        stats = trends[metric]
+        p95 = stats.get("p95")
+        p95_text = f"{p95:.2f}" if p95 is not None else "-"
+        print(f"{metric:<20} {stats['avg']:<8.2f} {p95_text:<8} {stats['max']:.2f}")
+    print()
+
+
 def clear_screen() -> None:
     print("\033[2J\033[H", end="")
 
 
 def gather_services() -> List[Dict[str, str]]:
     records = []
+    if systemd_units is not None:
+        # 一次 systemctl show 获取全部单元状态
+        states = systemd_units.query([unit for _, unit in SERVICES], refresh=True)
+        for label, unit in SERVICES:
+            unit_state = states[unit]
+            records.append(
+                {
+                    "label": label,
+                    "unit": unit,
+                    "state": "active" if unit_state.active else "inactive",
+                    "enabled": "enabled" if unit_state.enabled else "disabled",
+                }
+            )
+        return records
     for label, unit in SERVICES:
         state, enabled = service_status(unit)
         records.append({"label": label, "unit": unit, "state": state, "enabled": enabled})
@@ -156,25 +263,46 @@ def print_services(data: List[Dict[str, str]]) -> None:
 
 
 def gather_sites() -> List[Dict[str, Any]]:
-    info = []
-    for site in SITES:
-        url = site_target(site)
-        status, duration, varnish = http_probe(url)
-        info.append({"site": site, "status": status, "duration": duration, "varnish": varnish})
-    return info
+    targets = [(site, site_target(site)) for site in SITES]
+    if probe_engine is None:
+        info = []
+        for site, url in targets:
+            status, duration, varnish = http_probe(url)
+            info.append({"site": site, "status": status, "duration": duration, "varnish": varnish})
+        return info
+    # 所有站点并发探测，整轮耗时取决于最慢的单个站点；响应体只在内存中丢弃
+    results = probe_engine.probe_many(
+        (
+            {
+                "url": url,
+                "timeout": PROBE_TIMEOUT,
+                "retries": PROBE_RETRIES,
+                "expect": 200,
+                "headers": PROBE_HEADERS,
+                # 与 curl（不带 -L）一致：直接报告 301/302
+                "follow_redirects": False,
+            }
+            for _, url in targets
+        ),
+        workers=len(targets),
+        deadline=PROBE_TIMEOUT * PROBE_RETRIES + 2,
+        pool=_probe_pool(),
+    )
+    return [site_entry(site, result) for (site, _), result in zip(targets, results)]
 
 
 def print_sites(data: List[Dict[str, Any]]) -> None:
     print("Storefront Probes")
     print("-" * 50)
-    print(f"{'Site':<8} {'HTTP':<6} {'Time':<8} {'Via'}")
+    print(f"{'Site':<8} {'HTTP':<6} {'Time':<8} {'TTFB':<8} {'Via':<8} {'Cache'}")
     for entry in data:
         status = entry["status"]
         duration = entry["duration"]
         varnish = entry["varnish"]
         via = "Varnish" if varnish else "Origin"
         duration_ms = f"{duration:.2f}s" if duration else "-"
-        print(f"{entry['site']:<8} {status:<6} {duration_ms:<8} {via}")
+        ttfb = f"{entry['ttfb']:.2f}s" if entry.get("ttfb") else "-"
+        print(f"{entry['site']:<8} {status:<6} {duration_ms:<8} {ttfb:<8} {via:<8} {entry.get('cache') or '-'}")
     print()
 
 
@@ -219,13 +347,27 @@ def write_metrics(path: Path, services: List[Dict[str, str]], sites: List[Dict[s
             lines.append(f'saltgoat_site_http_status{{site="{entry["site"]}"}} {status_val}')
             lines.append(f'saltgoat_site_http_duration_seconds{{site="{entry["site"]}"}} {duration:.3f}')
             lines.append(f'saltgoat_site_varnish{{site="{entry["site"]}"}} {varnish}')
+            for phase in ("connect", "ttfb"):
+                if entry.get(phase) is not None:
+                    lines.append(f'saltgoat_site_http_{phase}_seconds{{site="{entry["site"]}"}} {entry[phase]:.3f}')
         hits, miss, ratio = varnish_data
         lines.append(f"saltgoat_varnish_hits {hits}")
         lines.append(f"saltgoat_varnish_miss {miss}")
         lines.append(f"saltgoat_varnish_hit_ratio_percent {ratio:.2f}")
         lines.append(f"saltgoat_fail2ban_banned_total {fail2ban_total}")
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        # 先写同目录临时文件再 rename，node_exporter 不会读到半截文件
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + "\n")
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            # 写入失败时清理临时文件，避免在 textfile 目录里越积越多
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
     except Exception as exc:
         print(f"[WARN] Failed to write metrics file {path}: {exc}", file=sys.stderr)
 
@@ -252,6 +394,7 @@ def loop(
             sites = gather_sites()
             varnish_data = varnish_stats()
             fail2ban_data = fail2ban_summary()
+            trends = gather_trends()
             if capture is not None:
                 buf = io.StringIO()
                 with contextlib.redirect_stdout(buf):
@@ -259,6 +402,7 @@ def loop(
                     print_sites(sites)
                     print_varnish(varnish_data)
                     print_fail2ban(fail2ban_data)
+                    print_trends(trends)
                 captured_output = buf.getvalue()
                 print(captured_output, end="")
             else:
@@ -266,15 +410,18 @@ def loop(
                 print_sites(sites)
                 print_varnish(varnish_data)
                 print_fail2ban(fail2ban_data)
+                print_trends(trends)
             if metrics_file:
                 write_metrics(metrics_file, services, sites, varnish_data, fail2ban_data[0])
         except KeyboardInterrupt:
+            close_probe_pool()
             break
         if capture is not None:
             if captured_output:
                 block.append(captured_output.rstrip("\n"))
             capture.append("\n".join(block))
         if once:
+            close_probe_pool()
             break
         time.sleep(interval)
 
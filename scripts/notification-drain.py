@@ -7,7 +7,7 @@ import json
 import socket
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
@@ -15,6 +15,7 @@ if str(REPO_ROOT) not in sys.path:
 
 from modules.lib import notification as notif  # type: ignore
 from modules.lib import notification_queue  # type: ignore
+from modules.lib import notification_store  # type: ignore
 
 
 def parse_args() -> argparse.Namespace:
@@ -32,7 +33,14 @@ def parse_args() -> argparse.Namespace:
         help="only drain selected destinations (repeatable)",
     )
     parser.add_argument("--max", type=int, default=0, help="maximum records to process (0 = all)")
-    parser.add_argument("--dry-run", action="store_true", help="simulate without deleting files")
+    parser.add_argument("--dry-run", action="store_true", help="simulate without touching the queue")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="concurrent replays per destination (default: 4)",
+    )
+    parser.add_argument("--requeue-dead", action="store_true", help="move dead-letter records back to pending first")
     parser.add_argument("--verbose", action="store_true", help="print every record result")
     parser.add_argument("--json-status", action="store_true", help="print JSON summary of remaining queue")
     parser.add_argument(
@@ -54,79 +62,61 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def load_record(path: Path) -> Optional[dict]:
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception as exc:
-        print(f"[SKIP] {path.name}: unable to parse JSON ({exc})", file=sys.stderr)
-        return None
-
-
 def main() -> int:
     args = parse_args()
     queue_dir = Path(args.queue_dir)
     if not queue_dir.exists():
         print(f"Queue directory {queue_dir} does not exist; nothing to do.")
         if args.json_status:
-            print(json.dumps(build_status([], queue_dir), ensure_ascii=False))
+            print(json.dumps(build_status(None, queue_dir), ensure_ascii=False))
         return 0
 
-    files: List[Path] = sorted(queue_dir.glob("*.json"))
-    if not files:
-        print("Queue is empty.")
+    with notification_store.QueueStore(queue_dir) as store:
+        if not args.dry_run:
+            imported = store.import_legacy()
+            if imported:
+                print(f"Imported {imported} legacy queue file(s).")
+            if args.requeue_dead:
+                print(f"Re-queued {store.requeue_dead()} dead-letter record(s).")
+
+        limit = args.max if args.max and args.max > 0 else None
+        destinations = sorted(set(args.destinations or []))
+
+        def report(record: dict, ok: bool, info: str) -> None:
+            if args.verbose or not ok:
+                prefix = "[OK]" if ok else ("[DEAD]" if record.get("status") == notification_store.DEAD else "[FAIL]")
+                print(f"{prefix} {record['id']}: {record.get('destination')} -> {info}")
+
+        processed, success = notification_queue.drain_store(
+            store,
+            destinations=destinations,
+            limit=limit,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            on_result=report,
+        )
+        if not processed:
+            print("Queue is empty." if not store.counts()["total"] else "No records due for retry.")
+        else:
+            print(f"Processed {processed} record(s); {'dry-run' if args.dry_run else success} succeeded.")
+        if not args.dry_run:
+            failures = processed - success
+            if failures:
+                print(f"{failures} record(s) still pending.")
+            if args.alert_threshold > 0:
+                maybe_send_alert(
+                    queue_dir=queue_dir,
+                    remaining=store.counts()["total"],
+                    processed=processed,
+                    delivered=success,
+                    limit=limit,
+                    destinations=destinations,
+                    tag=args.alert_tag,
+                    site=args.alert_site,
+                    threshold=args.alert_threshold,
+                )
         if args.json_status:
-            print(json.dumps(build_status([], queue_dir), ensure_ascii=False))
-        return 0
-
-    processed = success = 0
-    limit = args.max if args.max and args.max > 0 else None
-    destinations = set(args.destinations or [])
-
-    for path in files:
-        if limit is not None and processed >= limit:
-            break
-        record = load_record(path)
-        if not record:
-            continue
-        destination = record.get("destination")
-        if destinations and destination not in destinations:
-            continue
-        processed += 1
-        ok, info = notification_queue.retry_record(record, dry_run=args.dry_run)
-        prefix = "[OK]" if ok else "[FAIL]"
-        if args.verbose or not ok:
-            print(f"{prefix} {path.name}: {destination} -> {info}")
-        if ok:
-            if not args.dry_run:
-                try:
-                    path.unlink()
-                except FileNotFoundError:
-                    pass
-            success += 1
-        elif not args.dry_run:
-            notification_queue.update_record_metadata(path, record, info)
-
-    print(f"Processed {processed} record(s); {'dry-run' if args.dry_run else success} succeeded.")
-    remaining_files = files
-    if not args.dry_run:
-        failures = processed - success
-        if failures:
-            print(f"{failures} record(s) still pending.")
-        remaining_files = sorted(queue_dir.glob("*.json"))
-        if args.alert_threshold > 0:
-            maybe_send_alert(
-                queue_dir=queue_dir,
-                remaining=len(remaining_files),
-                processed=processed,
-                delivered=success,
-                limit=limit,
-                destinations=sorted(destinations),
-                tag=args.alert_tag,
-                site=args.alert_site,
-                threshold=args.alert_threshold,
-            )
-    if args.json_status:
-        print(json.dumps(build_status(remaining_files, queue_dir), ensure_ascii=False, indent=2))
+            print(json.dumps(build_status(store, queue_dir), ensure_ascii=False, indent=2))
     return 0
 
 
@@ -186,17 +176,10 @@ def maybe_send_alert(
         print("[ALERT] Telegram module unavailable; skipped.")
 
 
-def build_status(files: List[Path], queue_dir: Path) -> dict:
-    summary: Dict[str, Any] = {
-        "queue_dir": str(queue_dir),
-        "total": len(files),
-        "by_destination": {},
-    }
-    for path in files:
-        record = load_record(path)
-        destination = (record or {}).get("destination", "unknown")
-        summary["by_destination"].setdefault(destination, 0)
-        summary["by_destination"][destination] += 1
+def build_status(store: Optional[notification_store.QueueStore], queue_dir: Path) -> dict:
+    summary: Dict[str, Any] = {"queue_dir": str(queue_dir), "total": 0, "due": 0, "dead": 0, "by_destination": {}}
+    if store is not None:
+        summary.update(store.counts())
     return summary
 
 
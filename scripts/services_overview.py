@@ -10,6 +10,7 @@ import os
 import re
 import socket
 import subprocess
+import sys
 from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -20,6 +21,13 @@ except ImportError as exc:  # pragma: no cover
     raise SystemExit(f"[ERROR] PyYAML missing: {exc}")
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+try:
+    from modules.lib import pillar_cache
+except Exception:  # pragma: no cover - standalone copy without the repo modules
+    pillar_cache = None  # type: ignore
 PILLAR_DIR = REPO_ROOT / "salt" / "pillar"
 SECRET_DIR = PILLAR_DIR / "secret"
 UNIT_TEST = os.environ.get("SALTGOAT_UNIT_TEST") == "1"
@@ -62,6 +70,8 @@ def read_yaml(path: Path) -> Dict[str, Any]:
     if not path.exists():
         return {}
     try:
+        if pillar_cache is not None:
+            return pillar_cache.load_dict(path)
         with path.open(encoding="utf-8") as fh:
             data = yaml.safe_load(fh) or {}
             if isinstance(data, dict):
@@ -9,10 +9,11 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 PROJECT_ROOT="${SCRIPT_DIR}"
 PILLAR_FILE="${PROJECT_ROOT}/salt/pillar/nginx.sls"
 NGINX_CONTEXT="${PROJECT_ROOT}/modules/lib/nginx_context.py"
-NGINX_PILLAR_HELPER="${PROJECT_ROOT}/modules/lib/nginx_pillar.py"
 
 # shellcheck disable=SC1091
 source "${PROJECT_ROOT}/lib/logger.sh"
+# shellcheck disable=SC1091
+source "${PROJECT_ROOT}/lib/utils.sh"
 
 run_salt_call() {
     local -a cmd=(salt-call --local --retcode-passthrough "$@")
@@ -275,7 +276,7 @@ ensure_ssl_certificate() {
 }
 
 pillar_cli() {
-    python3 "$NGINX_PILLAR_HELPER" --pillar "$PILLAR_FILE" "$@"
+    saltgoat_py nginx-pillar --pillar "$PILLAR_FILE" "$@"
 }
 
 ensure_sites_exist() {
@@ -0,0 +1,102 @@
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import alerts_index
+
+
+def _line(ts: str, tag: str, payload: dict, label: str = "BACKUP") -> str:
+    return f"{ts} [{label}] tag={tag} payload={json.dumps(payload)}\n"
+
+
+class AlertsIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log = Path(self.tmp.name) / "alerts.log"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_incremental_refresh_and_rotation(self) -> None:
+        self.log.write_text(
+            _line("2025-01-01 00:00:00", "saltgoat/backup/restic/success", {"data": {"site": "bank"}})
+            + _line("2025-01-01 01:00:00", "saltgoat/monitor/resources/warning", {"severity": "WARNING"}, "RESOURCE"),
+            encoding="utf-8",
+        )
+        with alerts_index.AlertsIndex(self.log) as index:
+            self.assertEqual(index.refresh(), 2)
+            self.assertEqual(index.refresh(), 0)
+
+        # logrotate: alerts.log -> alerts.log.1.gz, new alerts.log
+        with gzip.open(self.log.with_name("alerts.log.1.gz"), "wb") as fh:
+            fh.write(self.log.read_bytes())
+        self.log.write_text(
+            _line("2025-01-02 00:00:00", "saltgoat/backup/restic/success", {"data": {"site": "tank"}})
+            + '{"timestamp": "2025-01-02T03:00:00Z", "label": "RESOURCE", "tag": "saltgoat/monitor/resources/critical", "payload": {}}\n'
+            + "2025-01-02 04:00:00 [BACKUP] tag=partial",
+            encoding="utf-8",
+        )
+        with alerts_index.AlertsIndex(self.log) as index:
+            self.assertEqual(index.refresh(), 2)
+            events = index.last_events("saltgoat/backup/restic/success", limit=5)
+            self.assertEqual([e["site"] for e in events], ["tank", "bank"])
+            monitor = index.last_events("saltgoat/monitor/", limit=5, prefix=True)
+            self.assertEqual(
+                [e["timestamp"] for e in monitor],
+                ["2025-01-02 03:00:00", "2025-01-01 01:00:00"],
+            )
+            self.assertEqual(index.last_events(limit=5, site="bank")[0]["payload"]["data"]["site"], "bank")
+
+        with self.log.open("a", encoding="utf-8") as fh:
+            fh.write(" payload={}\n")
+        self.assertEqual(alerts_index.last_events(limit=1, log_path=self.log)[0]["tag"], "partial")
+
+    def test_gz_segment_is_read_in_one_pass_per_page(self) -> None:
+        lines = "".join(
+            _line(f"2025-01-01 00:{minute:02d}:00", "saltgoat/backup/restic/success", {"data": {"site": f"s{minute}"}})
+            for minute in range(30)
+        )
+        with gzip.open(self.log.with_name("alerts.log.1.gz"), "wb") as fh:
+            fh.write(lines.encode("utf-8"))
+        self.log.write_text(_line("2025-01-02 00:00:00", "saltgoat/monitor/resources/warning", {}), encoding="utf-8")
+        with alerts_index.AlertsIndex(self.log) as index:
+            index.refresh()
+            with mock.patch.object(alerts_index, "_open", wraps=alerts_index._open) as opened:
+                events = index.last_events("saltgoat/backup/restic/success", limit=50)
+        self.assertEqual([f"s{minute}" for minute in reversed(range(30))], [e["site"] for e in events])
+        # 一页内同一 gz 段只打开、解压一次
+        self.assertEqual(1, opened.call_count)
+
+    def test_unreadable_segment_is_reported_not_treated_as_empty(self) -> None:
+        self.log.write_text(_line("2025-01-02 00:00:00", "saltgoat/monitor/resources/warning", {}), encoding="utf-8")
+        real_open = alerts_index._open
+
+        def deny(path, gz):
+            if path == self.log:
+                raise PermissionError(13, "Permission denied", str(path))
+            return real_open(path, gz)
+
+        with alerts_index.AlertsIndex(self.log) as index:
+            index.refresh()
+            self.assertEqual({}, index.errors)
+            with mock.patch.object(alerts_index, "_open", side_effect=deny):
+                index.refresh()
+            self.assertEqual({str(self.log): "Permission denied"}, index.errors)
+            # 暂时不可读的段不会被当作已删除而清掉索引
+            self.assertEqual(1, index.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0])
+
+    def test_segment_paths_orders_rotations_newest_first(self) -> None:
+        for name in ("alerts.log", "alerts.log.2.gz", "alerts.log.1", "alerts.log.idx", "alerts.log-20250102.gz", "alerts.log-20250101.gz"):
+            (Path(self.tmp.name) / name).write_text("", encoding="utf-8")
+        names = [p.name for p in alerts_index.segment_paths(self.log)]
+        self.assertEqual(
+            names,
+            ["alerts.log", "alerts.log-20250102.gz", "alerts.log-20250101.gz", "alerts.log.1", "alerts.log.2.gz"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import io
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+from modules import cli
+
+
+class CliDispatchTests(unittest.TestCase):
+    def test_commands_point_at_existing_scripts(self) -> None:
+        for name, target in cli.COMMANDS.items():
+            self.assertTrue((cli.REPO_ROOT / target).is_file(), name)
+
+    def test_unknown_command_returns_usage_error(self) -> None:
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            self.assertEqual(2, cli.main(["no-such-helper"]))
+        self.assertIn("unknown command", stderr.getvalue())
+
+    def test_run_script_behaves_like_direct_execution(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            script = Path(tmp) / "helper.py"
+            script.write_text(
+                "import sys\n"
+                "if __name__ == '__main__':\n"
+                "    print(sys.argv[1:], sys.path[0] == %r)\n" % tmp,
+                encoding="utf-8",
+            )
+            stdout = io.StringIO()
+            argv = list(sys.argv)
+            with mock.patch.object(sys, "path", list(sys.path)), redirect_stdout(stdout):
+                cli.run_script(script, ["list", "--json"])
+                cli.run_script(script, ["ignored"], run_name="__saltgoat_import__")
+            self.assertEqual("['list', '--json'] True\n", stdout.getvalue())
+            self.assertEqual(argv, sys.argv)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import monitor_daemon
+from modules.monitoring import exporter
+
+
+class RegistryTests(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self) -> None:
+        histogram = exporter.Histogram("probe_seconds", "Probe latency.", buckets=(0.1, 1.0))
+        histogram.observe(0.05, site="bank")
+        histogram.observe(0.5, site="bank")
+        text = exporter.render([histogram.family()])
+        self.assertIn("# TYPE probe_seconds histogram", text)
+        self.assertIn('probe_seconds_bucket{site="bank",le="0.1"} 1', text)
+        self.assertIn('probe_seconds_bucket{site="bank",le="1"} 2', text)
+        self.assertIn('probe_seconds_bucket{site="bank",le="+Inf"} 2', text)
+        self.assertIn('probe_seconds_sum{site="bank"} 0.55', text)
+
+    def test_collectors_are_cached_and_isolated(self) -> None:
+        calls = []
+
+        def good(_exp):
+            calls.append("good")
+            return [exporter.MetricFamily("saltgoat_good", 'Says "hi".').add(1, pool='a"b')]
+
+        def bad(_exp):
+            raise RuntimeError("boom")
+
+        exp = exporter.Exporter({"good": good, "bad": bad}, ttls={"good": 60, "bad": 0})
+        with mock.patch.object(monitor_daemon, "fetch_snapshot", return_value=None), mock.patch("sys.stderr"):
+            first = exp.render()
+            exp.render()
+        self.assertEqual(["good"], calls)
+        self.assertIn('saltgoat_good{pool="a\\"b"} 1', first)
+        self.assertIn('saltgoat_exporter_collector_success{collector="bad"} 0', first)
+        self.assertIn('saltgoat_exporter_collector_success{collector="good"} 1', first)
+
+    def test_write_textfile_replaces_atomically(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "textfile" / "saltgoat.prom"
+            exporter.write_textfile(target, "a 1\n")
+            exporter.write_textfile(target, "a 2\n")
+            self.assertEqual("a 2\n", target.read_text(encoding="utf-8"))
+            self.assertEqual(["saltgoat.prom"], [p.name for p in target.parent.iterdir()])
+
+
+class DaemonSnapshotTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.socket = Path(self.tmp.name) / "monitor.sock"
+        self.server = monitor_daemon.SnapshotServer(self.socket).start()
+        self.addCleanup(self.server.close)
+        self.server.update(
+            {
+                "generated_at": time.time(),
+                "tick": 15,
+                "payload": {
+                    "load": {"1m": 0.5, "5m": 0.4, "15m": 0.3},
+                    "memory": 42.0,
+                    "swap": {"percent": 10.0, "used_mb": 100, "total_mb": 1000},
+                    "disks": {"/": 55.5},
+                    "services": {"nginx": True, "mysql": False},
+                    "php_fpm": {"pools": {"magento-bank": {"children": 9, "max_children": 10, "utilization": 0.9}}},
+                    "mysql": {"max_connections": 200, "threads_connected": 50, "threads_running": 5},
+                    "valkey": {"used_memory": 512, "maxmemory": 1024, "password": "secret"},
+                    "opensearch": {"heap_used_percent": 61.0},
+                    "sites": [{"name": "bank", "status": 200, "expected": 200, "duration": 0.2}],
+                    "autoscale": {"actions": ["php pool bank +2"]},
+                },
+            }
+        )
+
+    def test_reuses_daemon_payload_without_collecting(self) -> None:
+        exp = exporter.Exporter(socket_path=self.socket, ttls={name: 0 for name in exporter.DEFAULT_TTLS})
+        collectors = ("collect_mysql_metrics", "collect_valkey_metrics", "collect_opensearch_metrics", "service_status")
+        patches = [mock.patch.object(exporter.resource_alert, name, side_effect=AssertionError(name)) for name in collectors]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with mock.patch.object(exporter.http_probe, "probe_many", side_effect=AssertionError("probe")):
+            text = exp.render()
+            text = exp.render()
+
+        self.assertIn('saltgoat_systemd_unit_active{unit="mysql"} 0', text)
+        self.assertIn('saltgoat_php_fpm_utilization_ratio{pool="magento-bank"} 0.9', text)
+        self.assertIn("saltgoat_mysql_threads_connected_ratio 0.25", text)
+        self.assertIn("saltgoat_mysql_threads_running_ratio 0.1", text)
+        self.assertIn("saltgoat_valkey_memory_utilization_ratio 0.5", text)
+        self.assertIn("saltgoat_swap_used_bytes 104857600", text)
+        self.assertIn("saltgoat_autoscale_pending_actions 1", text)
+        self.assertIn("saltgoat_exporter_daemon_snapshot 1", text)
+        self.assertNotIn("secret", text)
+        # 同一份快照只计入一次直方图
+        self.assertIn('saltgoat_site_probe_duration_seconds_count{site="bank"} 1', text)
+
+    def test_serves_metrics_over_http(self) -> None:
+        exp = exporter.Exporter({"host": exporter.collect_host}, socket_path=self.socket)
+        server = exporter.make_server(exp, "127.0.0.1:0")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+            body = resp.read().decode("utf-8")
+            self.assertTrue(resp.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('saltgoat_disk_used_percent{mount="/"} 55.5', body)
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other", timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import importlib.util
+import os
+import pickle
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+WATCH_PATH = REPO_ROOT / "modules" / "security" / "fail2ban_watch.py"
+# 部署时脚本目录下带 lib/notification.py，直接运行时位于 sys.path[0]
+sys.path.insert(0, str(WATCH_PATH.resolve().parent))
+spec = importlib.util.spec_from_file_location("fail2ban_watch", WATCH_PATH)
+fail2ban_watch = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(fail2ban_watch)
+
+
+class FakeFail2banServer(threading.Thread):
+    """Unix socket server answering the fail2ban pickle protocol."""
+
+    def __init__(self, path: Path, responses: dict) -> None:
+        super().__init__(daemon=True)
+        self.responses = responses
+        self.commands = []
+        self.connections = 0
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(path))
+        self.server.listen(1)
+
+    def run(self) -> None:
+        conn, _ = self.server.accept()
+        self.connections += 1
+        buffer = b""
+        with conn:
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                buffer += chunk
+                while fail2ban_watch.F2B_END in buffer:
+                    message, buffer = buffer.split(fail2ban_watch.F2B_END, 1)
+                    if message == fail2ban_watch.F2B_CLOSE:
+                        return
+                    command = pickle.loads(message)
+                    self.commands.append(command)
+                    reply = (0, self.responses[tuple(command)])
+                    conn.sendall(pickle.dumps(reply, protocol=2) + fail2ban_watch.F2B_END)
+
+
+class Fail2banWatchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def test_collect_socket_reads_all_jails_over_one_connection(self) -> None:
+        sock_path = self.tmp / "f2b.sock"
+        server = FakeFail2banServer(
+            sock_path,
+            {
+                ("status",): [("Number of jail", 2), ("Jail list", "sshd, nginx-botsearch")],
+                ("status", "sshd"): [
+                    ("Filter", [("Currently failed", 1)]),
+                    ("Actions", [("Currently banned", 2), ("Total banned", 9), ("Banned IP list", ["1.1.1.1", "2.2.2.2"])]),
+                ],
+                ("status", "nginx-botsearch"): [
+                    ("Actions", [("Currently banned", 0), ("Total banned", 4), ("Banned IP list", [])]),
+                ],
+            },
+        )
+        server.start()
+        stats = fail2ban_watch.collect_socket(sock_path)
+        server.join(timeout=5)
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.commands), 3)
+        self.assertEqual(stats["sshd"], {"currently": 2, "total": 9, "ips": ["1.1.1.1", "2.2.2.2"]})
+        self.assertEqual(stats["nginx-botsearch"]["total"], 4)
+
+    def test_collect_client_parses_single_banned_query(self) -> None:
+        original = fail2ban_watch.run_client
+        calls = []
+
+        def fake_run_client(args):
+            calls.append(list(args))
+            return "[{'sshd': ['1.1.1.1']}, {'recidive': []}]"
+
+        fail2ban_watch.run_client = fake_run_client
+        try:
+            stats = fail2ban_watch.collect_client()
+        finally:
+            fail2ban_watch.run_client = original
+        self.assertEqual(calls, [["banned"]])
+        self.assertEqual(stats["sshd"]["ips"], ["1.1.1.1"])
+        self.assertIsNone(stats["sshd"]["total"])
+        self.assertEqual(stats["recidive"]["currently"], 0)
+
+    def test_tail_log_reads_only_new_lines_and_handles_rotation(self) -> None:
+        log = self.tmp / "fail2ban.log"
+        log.write_text(
+            "2024-01-01 fail2ban.actions [1]: NOTICE  [sshd] Ban 1.1.1.1\n"
+            "2024-01-01 fail2ban.actions [1]: NOTICE  [sshd] Restore Ban 2.2.2.2\n"
+            "2024-01-01 fail2ban.actions [1]: NOTICE  [sshd] Unban 3.3",
+            encoding="utf-8",
+        )
+        events, cursor = fail2ban_watch.tail_log(log, {})
+        self.assertEqual(events, [("sshd", "Ban", "1.1.1.1"), ("sshd", "Ban", "2.2.2.2")])
+
+        with log.open("a", encoding="utf-8") as fh:
+            fh.write(".3.3\n")
+        events, cursor = fail2ban_watch.tail_log(log, cursor)
+        self.assertEqual(events, [("sshd", "Unban", "3.3.3.3")])
+        events, cursor = fail2ban_watch.tail_log(log, cursor)
+        self.assertEqual(events, [])
+
+        log.unlink()
+        log.write_text("x fail2ban.actions NOTICE  [nginx] Ban 4.4.4.4\n", encoding="utf-8")
+        events, _ = fail2ban_watch.tail_log(log, dict(cursor, inode=-1))
+        self.assertEqual(events, [("nginx", "Ban", "4.4.4.4")])
+
+        stats = fail2ban_watch.apply_events({"sshd": ["1.1.1.1"]}, [("sshd", "Unban", "1.1.1.1"), ("nginx", "Ban", "4.4.4.4")])
+        self.assertEqual(stats["sshd"]["ips"], [])
+        self.assertEqual(stats["nginx"]["currently"], 1)
+
+    def test_log_end_cursor_skips_to_last_complete_line(self) -> None:
+        log = self.tmp / "fail2ban.log"
+        log.write_text(
+            "2024-01-01 fail2ban.actions [1]: NOTICE  [sshd] Ban 1.1.1.1\n"
+            "2024-01-01 fail2ban.actions [1]: NOTICE  [sshd] Ban 5.5",
+            encoding="utf-8",
+        )
+        cursor = fail2ban_watch.log_end_cursor(log)
+        self.assertEqual(log.stat().st_ino, cursor["inode"])
+        with log.open("a", encoding="utf-8") as fh:
+            fh.write(".5.5\n")
+        events, _ = fail2ban_watch.tail_log(log, cursor)
+        self.assertEqual(events, [("sshd", "Ban", "5.5.5.5")])
+        self.assertEqual({"inode": None, "offset": 0}, fail2ban_watch.log_end_cursor(self.tmp / "missing.log"))
+
+    def test_save_state_skips_unchanged_content(self) -> None:
+        state = self.tmp / "state.json"
+        self.assertTrue(fail2ban_watch.save_state(state, {"sshd": ["1.1.1.1"]}))
+        os.utime(state, (1, 1))
+        self.assertFalse(fail2ban_watch.save_state(state, {"sshd": ["1.1.1.1"]}))
+        self.assertEqual(state.stat().st_mtime, 1)
+        self.assertEqual(fail2ban_watch.load_state(state), {"sshd": ["1.1.1.1"]})
+
+    def test_counters_and_metrics(self) -> None:
+        meta: dict = {}
+        fail2ban_watch.update_counters(meta, {"sshd": 2}, 1000.0)
+        counters = fail2ban_watch.update_counters(meta, {"sshd": 3}, 1060.0)
+        self.assertEqual(counters["sshd"], {"bans": 5, "rate_per_min": 3.0})
+
+        metrics = self.tmp / "fail2ban.prom"
+        fail2ban_watch.write_metrics(metrics, {"sshd": {"ips": ["1.1.1.1"]}}, counters)
+        content = metrics.read_text(encoding="utf-8")
+        self.assertIn('saltgoat_fail2ban_banned{jail="sshd"} 1', content)
+        self.assertIn('saltgoat_fail2ban_bans_total{jail="sshd"} 5', content)
+        self.assertIn('saltgoat_fail2ban_ban_rate_per_minute{jail="sshd"} 3.0', content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from modules.lib import fastcgi_status
+
+STATUS = {
+    "pool": "magento-bank",
+    "process manager": "dynamic",
+    "start since": 3600,
+    "accepted conn": 1200,
+    "listen queue": 3,
+    "max listen queue": 7,
+    "listen queue len": 511,
+    "idle processes": 2,
+    "active processes": 10,
+    "total processes": 12,
+    "max active processes": 12,
+    "max children reached": 4,
+    "slow requests": 1,
+}
+
+
+def read_params(data: bytes) -> dict:
+    params = {}
+    offset = 0
+    while offset < len(data):
+        lengths = []
+        for _ in range(2):
+            if data[offset] < 128:
+                lengths.append(data[offset])
+                offset += 1
+            else:
+                lengths.append(struct.unpack("!I", data[offset : offset + 4])[0] & 0x7FFFFFFF)
+                offset += 4
+        name = data[offset : offset + lengths[0]].decode()
+        offset += lengths[0]
+        params[name] = data[offset : offset + lengths[1]].decode()
+        offset += lengths[1]
+    return params
+
+
+class FakeFPM:
+    """Single-request FastCGI responder that serves a JSON status page."""
+
+    def __init__(self, path: Path, status_code: int = 200) -> None:
+        self.path = path
+        self.status_code = status_code
+        self.params: dict = {}
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(path))
+        self.server.listen(4)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                self.handle(conn)
+
+    def handle(self, conn: socket.socket) -> None:
+        params = b""
+        while True:
+            header = fastcgi_status._read_exact(conn, 8)
+            _version, kind, _rid, length, padding = fastcgi_status.HEADER.unpack(header)
+            content = fastcgi_status._read_exact(conn, length + padding)[:length] if length + padding else b""
+            if kind == fastcgi_status.FCGI_PARAMS:
+                params += content
+            if kind == fastcgi_status.FCGI_STDIN and not length:
+                break
+        self.params = read_params(params)
+        body = json.dumps(STATUS).encode()
+        head = b"Content-type: application/json\r\n"
+        if self.status_code != 200:
+            head = f"Status: {self.status_code} Forbidden\r\n".encode() + head
+            body = b"Access denied."
+        response = head + b"\r\n" + body
+        # 分两段 STDOUT 发送，并带 padding，覆盖记录拼接逻辑
+        middle = len(response) // 2
+        for chunk in (response[:middle], response[middle:]):
+            conn.sendall(fastcgi_status.HEADER.pack(1, fastcgi_status.FCGI_STDOUT, 1, len(chunk), 3) + chunk + b"\0\0\0")
+        conn.sendall(fastcgi_status._record(fastcgi_status.FCGI_END_REQUEST, b"\0" * 8))
+
+    def close(self) -> None:
+        self.server.close()
+
+
+class FastCGIStatusTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.sock = Path(self.tmp.name) / "php-fpm.sock"
+
+    def test_fetches_status_page_over_unix_socket(self) -> None:
+        fpm = FakeFPM(self.sock)
+        self.addCleanup(fpm.close)
+        status = fastcgi_status.fetch_status(str(self.sock), "/fpm-status")
+        self.assertEqual("/fpm-status", fpm.params["SCRIPT_NAME"])
+        self.assertEqual("json", fpm.params["QUERY_STRING"])
+        self.assertEqual(10, status["active_processes"])
+        self.assertEqual(2, status["idle_processes"])
+        self.assertEqual(3, status["listen_queue"])
+        self.assertEqual(4, status["max_children_reached"])
+        self.assertEqual(1, status["slow_requests"])
+
+    def test_failures_are_reported_per_pool(self) -> None:
+        fpm = FakeFPM(self.sock, status_code=403)
+        self.addCleanup(fpm.close)
+        results = fastcgi_status.fetch_many(
+            {
+                "bank": (str(self.sock), "/status"),
+                "gone": (str(Path(self.tmp.name) / "missing.sock"), None),
+            },
+            timeout=1,
+        )
+        self.assertIn("HTTP 403", results["bank"]["error"])
+        self.assertIn("missing.sock", results["gone"]["error"])
+
+    def test_parse_listen_addresses(self) -> None:
+        self.assertEqual((socket.AF_UNIX, "/run/php/a.sock"), fastcgi_status.parse_listen("/run/php/a.sock"))
+        self.assertEqual((socket.AF_INET, ("127.0.0.1", 9000)), fastcgi_status.parse_listen("9000"))
+        self.assertEqual((socket.AF_INET, ("127.0.0.1", 9001)), fastcgi_status.parse_listen("0.0.0.0:9001"))
+        self.assertEqual((socket.AF_INET6, ("::1", 9002)), fastcgi_status.parse_listen("[::1]:9002"))
+        with self.assertRaises(fastcgi_status.FastCGIError):
+            fastcgi_status.parse_listen("bogus")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import fpm_capacity
+from modules.monitoring import resource_alert
+
+MIB = 1024 * 1024
+GIB = 1024 * MIB
+
+
+class FpmCapacityTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.proc = Path(self.tmp.name) / "proc"
+
+    def write_pss(self, pid: int, kib: int) -> None:
+        path = self.proc / str(pid)
+        path.mkdir(parents=True)
+        (path / "smaps_rollup").write_text(
+            f"55d0c0000000-7ffd00000000 ---p 00000000 00:00 0 [rollup]\nRss: {kib * 2} kB\nPss: {kib} kB\n",
+            encoding="utf-8",
+        )
+
+    def test_samples_pss_per_pool(self) -> None:
+        self.write_pss(10, 100 * 1024)
+        self.write_pss(11, 300 * 1024)
+        samples = fpm_capacity.sample_pools({"bank": [10, 11, 12]}, proc_root=self.proc)
+        self.assertEqual(
+            {"workers": 3, "sampled": 2, "avg_pss": 200 * MIB, "max_pss": 300 * MIB, "total_pss": 600 * MIB},
+            samples["bank"],
+        )
+        self.assertIsNone(fpm_capacity.read_pss(12, self.proc))
+
+    def test_plan_splits_budget_by_weight(self) -> None:
+        samples = {
+            "magento-bank": {"workers": 10, "sampled": 10, "avg_pss": 100 * MIB, "max_pss": 128 * MIB, "total_pss": 1000 * MIB},
+            "magento-tank": {"workers": 4, "sampled": 4, "avg_pss": 100 * MIB, "max_pss": 512 * MIB, "total_pss": 400 * MIB},
+        }
+        weights = fpm_capacity.pool_weights(
+            {"bank": {"php_pool": {"weight": 3}}, "tank": {"php_pool": {"pool_name": "magento-tank"}}}
+        )
+        self.assertEqual({"magento-bank": 3, "magento-tank": 1}, weights)
+        reserved = fpm_capacity.reservations(
+            {"innodb_buffer_pool_size": 4 * GIB, "innodb_buffer_pool_bytes_data": 3 * GIB},
+            {"maxmemory": GIB, "used_memory": GIB + 1},
+            {"heap_max_in_bytes": 2 * GIB, "heap_used_in_bytes": GIB},
+        )
+        self.assertEqual({"mysql": GIB, "valkey": 0, "opensearch": GIB}, reserved)
+        result = fpm_capacity.plan(
+            ["magento-bank", "magento-tank", "magento-idle"],
+            samples,
+            weights,
+            mem_available=6 * GIB - 1400 * MIB,
+            mem_total=16 * GIB,
+            reserved=reserved,
+        )
+        # 6GiB（含现有 PHP PSS）- 2GiB 预留 - 819MiB headroom，按 3:1:1 分配
+        budget = 4 * GIB - int(16 * GIB * fpm_capacity.HEADROOM_RATIO)
+        self.assertEqual(budget, result["budget"])
+        self.assertEqual(budget * 3 // 5 // (128 * MIB), result["pools"]["magento-bank"]["safe_max_children"])
+        self.assertEqual(fpm_capacity.MIN_CHILDREN, result["pools"]["magento-tank"]["safe_max_children"])
+        self.assertNotIn("safe_max_children", result["pools"]["magento-idle"])
+
+
+class PhpFpmScaleDownTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.runtime = Path(self.tmp.name) / "php-fpm-pools.json"
+        patches = [
+            mock.patch.object(resource_alert, "PHP_AUTOSCALE_FILE", self.runtime),
+            mock.patch.object(resource_alert, "RUNTIME_DIR", Path(self.tmp.name)),
+            mock.patch.dict(resource_alert._CONFIG_CACHE, {"php_pool_weights": {}}, clear=True),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assess(self, max_children: int, active: int, max_pss: int = 256 * MIB) -> resource_alert.Assessment:
+        ctx = resource_alert.Assessment()
+        ctx.collected = {"valkey": {"maxmemory": 2 * GIB, "used_memory": GIB}}
+        data = {
+            "configs": {"magento-bank": {"max_children": max_children, "listen": "/run/php/bank.sock"}},
+            "children": {"magento-bank": active},
+            "status": {"magento-bank": {"active_processes": active, "total_processes": active, "listen_queue": 0}},
+            "pss": {
+                "magento-bank": {"workers": active, "sampled": active, "avg_pss": 200 * MIB, "max_pss": max_pss, "total_pss": 2000 * MIB}
+            },
+            "mem_available": 2 * GIB + 48 * MIB,
+            "mem_total": 8 * GIB,
+        }
+        info = resource_alert.assess_php_fpm(data, ctx)
+        self.assertIn("capacity", info)
+        return ctx
+
+    def test_scales_down_pool_that_memory_cannot_hold(self) -> None:
+        # 预算 = 2096MiB + 2000MiB(现有 PSS) - 1GiB(Valkey) - 512MiB = 2560MiB -> 10 个 256MiB worker
+        # 第一次采样遇到 512MiB 的峰值（上限 5），之后两次为 256MiB：连续超限后按期间最宽松的上限缩容
+        for max_pss in (512 * MIB, 256 * MIB):
+            ctx = self.assess(max_children=40, active=10, max_pss=max_pss)
+            self.assertEqual(["PHP-FPM memory"], ctx.triggers)
+            self.assertEqual([], ctx.auto_ctx["actions"])
+        ctx = self.assess(max_children=40, active=10)
+        self.assertEqual("WARNING", ctx.severity)
+        self.assertEqual(["PHP-FPM memory"], ctx.triggers)
+        runtime = json.loads(self.runtime.read_text(encoding="utf-8"))
+        self.assertEqual(10, runtime["magento-bank"]["max_children"])
+        self.assertLessEqual(runtime["magento-bank"]["max_spare_servers"], 10)
+        self.assertEqual("down", runtime["__meta__"]["magento-bank"]["last_direction"])
+        self.assertIn("Scaled down PHP-FPM pool magento-bank: max_children 40 -> 10", ctx.auto_ctx["actions"][0])
+
+    def test_transient_spike_does_not_scale_down(self) -> None:
+        self.assess(max_children=40, active=10, max_pss=512 * MIB)
+        # 峰值过去后池子放得下，连续计数清零
+        self.assess(max_children=40, active=10, max_pss=64 * MIB)
+        for _ in range(resource_alert.PHP_SCALE_DOWN_SAMPLES - 1):
+            ctx = self.assess(max_children=40, active=10)
+            self.assertEqual([], ctx.auto_ctx["actions"])
+        runtime = json.loads(self.runtime.read_text(encoding="utf-8"))
+        self.assertNotIn("magento-bank", runtime)
+
+    def test_scale_up_is_capped_by_memory(self) -> None:
+        ctx = self.assess(max_children=8, active=8)
+        self.assertEqual("CRITICAL", ctx.severity)
+        runtime = json.loads(self.runtime.read_text(encoding="utf-8"))
+        self.assertEqual(10, runtime["magento-bank"]["max_children"])
+
+
+if __name__ == "__main__":
+    unittest.main()
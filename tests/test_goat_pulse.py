@@ -3,8 +3,12 @@ import importlib.util
 import io
 import os
 import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from unittest import mock
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -16,6 +20,23 @@ assert spec.loader is not None
 spec.loader.exec_module(goat_pulse)
 
 
+class _SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802
+        time.sleep(0.3)
+        body = b"x" * 4096
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Varnish", "1234")
+        self.send_header("X-Magento-Cache-Debug", "HIT")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
 class GoatPulseTests(unittest.TestCase):
     def test_write_metrics_generates_expected_lines(self) -> None:
         services = [
@@ -34,6 +55,13 @@ class GoatPulseTests(unittest.TestCase):
         self.assertIn("saltgoat_varnish_hit_ratio_percent 66.60", content)
         self.assertIn("saltgoat_fail2ban_banned_total 3", content)
 
+    def test_write_metrics_failure_removes_temp_file(self) -> None:
+        metrics_dir = Path(tempfile.mkdtemp())
+        with mock.patch.object(goat_pulse.os, "replace", side_effect=OSError("read-only")), contextlib.redirect_stderr(io.StringIO()) as err:
+            goat_pulse.write_metrics(metrics_dir / "goat.prom", [], [], (0, 0, 0.0), 0)
+        self.assertIn("Failed to write metrics file", err.getvalue())
+        self.assertEqual([], list(metrics_dir.iterdir()))
+
     def test_loop_plain_mode_has_no_ansi(self) -> None:
         original_services = goat_pulse.gather_services
         original_sites = goat_pulse.gather_sites
@@ -63,6 +91,33 @@ class GoatPulseTests(unittest.TestCase):
         self.assertIn("Goat Pulse @", output)
         self.assertNotIn("\033[", output)
 
+    def test_gather_sites_probes_concurrently_in_process(self) -> None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(goat_pulse.close_probe_pool)
+        original = (goat_pulse.SITES, goat_pulse.site_target, goat_pulse.run)
+        goat_pulse.SITES = ["bank", "tank", "pwas"]
+        goat_pulse.site_target = lambda site: f"http://127.0.0.1:{server.server_port}/{site}"
+        goat_pulse.run = lambda *args, **kwargs: self.fail("curl should not be used")
+        try:
+            start = time.monotonic()
+            sites = goat_pulse.gather_sites()
+            elapsed = time.monotonic() - start
+        finally:
+            goat_pulse.SITES, goat_pulse.site_target, goat_pulse.run = original
+
+        self.assertLess(elapsed, 0.8)
+        self.assertEqual(["bank", "tank", "pwas"], [entry["site"] for entry in sites])
+        for entry in sites:
+            self.assertEqual("200", entry["status"])
+            self.assertTrue(entry["varnish"])
+            self.assertEqual("HIT", entry["cache"])
+            self.assertGreaterEqual(entry["ttfb"], 0.3)
+            self.assertIsNotNone(entry["connect"])
+        self.assertIsNotNone(goat_pulse._PROBE_POOL)
+
 
 if __name__ == "__main__":
     unittest.main()
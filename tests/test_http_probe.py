@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.lib import http_probe
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    requests = []
+
+    def log_message(self, *_args) -> None:  # pragma: no cover - silence test output
+        return None
+
+    def do_GET(self) -> None:  # noqa: N802
+        _Handler.connections.add(self.client_address)
+        _Handler.requests.append(self.path)
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/ok")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/slow":
+            time.sleep(1.5)
+        status = {"/down": 503, "/missing": 404}.get(self.path, 200)
+        body = b"x" * 1000 if status == 200 else b"down"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Varnish", "1234")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HttpProbeTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        _Handler.connections = set()
+        _Handler.requests = []
+
+    def test_probe_follows_redirect_and_trims_body(self) -> None:
+        result = http_probe.probe(f"{self.base}/redirect", timeout=2)
+        self.assertEqual(result["status"], 200)
+        self.assertIsNone(result["error"])
+        self.assertEqual(len(result["body"]), http_probe.BODY_SNIPPET_BYTES)
+        self.assertEqual(result["headers"].get("x-varnish"), "1234")
+        self.assertEqual(result["success_attempt"], 1)
+        self.assertNotIn("tls_days", result)
+
+    def test_retries_reuse_keepalive_connection(self) -> None:
+        result = http_probe.probe(f"{self.base}/down", timeout=2, retries=3)
+        self.assertEqual(result["status"], 503)
+        self.assertNotIn("success_attempt", result)
+        self.assertEqual(len(_Handler.connections), 1)
+
+    def test_redirects_can_be_reported_without_following(self) -> None:
+        result = http_probe.probe(f"{self.base}/redirect", timeout=2, retries=3, follow_redirects=False)
+        self.assertEqual(result["status"], 302)
+        self.assertEqual(_Handler.requests, ["/redirect"])
+
+    def test_client_errors_are_not_retried(self) -> None:
+        result = http_probe.probe(f"{self.base}/missing", timeout=2, retries=3)
+        self.assertEqual(result["status"], 404)
+        self.assertEqual(_Handler.requests, ["/missing"])
+
+    def test_probe_many_preserves_order_and_honours_deadline(self) -> None:
+        targets = [
+            {"url": f"{self.base}/slow", "timeout": 5},
+            {"url": f"{self.base}/ok", "timeout": 5},
+            {"url": "http://127.0.0.1:1/refused", "timeout": 1},
+        ]
+        start = time.monotonic()
+        results = http_probe.probe_many(targets, workers=3, deadline=0.5)
+        self.assertLess(time.monotonic() - start, 3.0)
+        self.assertEqual([item["url"] for item in results], [t["url"] for t in targets])
+        self.assertIsNotNone(results[0]["error"])
+        self.assertEqual(results[1]["status"], 200)
+        self.assertIsNotNone(results[2]["error"])
+
+    def test_checkin_after_close_closes_connection(self) -> None:
+        pool = http_probe.ConnectionPool()
+        origin = ("http", "127.0.0.1", self.server.server_address[1])
+        conn, reused = pool.checkout(origin, 1.0)
+        self.assertFalse(reused)
+        conn.connect()
+        pool.close()
+        # 截止时间后被放弃的线程归还连接：不能再进入已关闭的池
+        pool.checkin(origin, conn)
+        self.assertIsNone(conn.sock)
+        self.assertFalse(pool.checkout(origin, 1.0)[1])
+
+    def test_cert_days_remaining_parses_expiry(self) -> None:
+        days, error = http_probe.cert_days_remaining({"notAfter": "Jan  1 00:00:00 2100 GMT"})
+        self.assertIsNone(error)
+        self.assertGreater(days, 0)
+        self.assertEqual(http_probe.cert_days_remaining({})[1], "certificate missing expiry")
+
+
+if __name__ == "__main__":
+    unittest.main()
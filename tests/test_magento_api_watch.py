@@ -3,12 +3,16 @@
 Lightweight tests for modules/magetools/magento_api_watch.py.
 """
 
+import json
 import os
 import sys
 import tempfile
+import threading
 import unittest
 import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from unittest import mock
 
 # 启用测试模式，跳过 root / Salt 依赖
 os.environ.setdefault("MAGENTO_WATCHER_TEST_MODE", "1")
@@ -134,5 +138,152 @@ class MagentoApiWatchTests(unittest.TestCase):
         self.assertEqual([], watcher_mod.CALLER.events)
 
 
+class PaginationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.events = []
+        patches = [
+            mock.patch.object(watcher_mod, "STATE_ROOT", Path(self.tempdir.name)),
+            mock.patch.object(watcher_mod, "telegram_broadcast", lambda *args, **kwargs: None),
+            mock.patch.object(watcher_mod, "LOG", lambda *_args, **_kwargs: None),
+            mock.patch.object(watcher_mod, "emit_event", lambda tag, data: self.events.append(data["entity_id"])),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tempdir.cleanup)
+
+    @staticmethod
+    def _fake_orders(ids, page_size, calls):
+        lock = threading.Lock()
+
+        def fake_request(path, params):
+            after = int(params["searchCriteria[filter_groups][0][filters][0][value]"])
+            page = int(params["searchCriteria[current_page]"])
+            with lock:
+                calls.append((after, page, params.get("fields")))
+            pending = [num for num in ids if num > after]
+            chunk = pending[(page - 1) * page_size : page * page_size]
+            return {"items": [{"entity_id": num} for num in chunk], "total_count": len(pending)}
+
+        return fake_request
+
+    def test_pages_are_prefetched_and_processed_in_order(self) -> None:
+        watcher = watcher_mod.MagentoWatcher("bank", "https://example.com", "token", ["orders"], page_size=2)
+        watcher._save_last_id("orders", 100)
+        calls = []
+        watcher._request = self._fake_orders(list(range(101, 108)), 2, calls)  # type: ignore[assignment]
+        watcher.process_orders()
+
+        self.assertEqual(list(range(101, 108)), self.events)
+        self.assertEqual([1, 2, 3, 4], sorted(page for _after, page, _fields in calls))
+        self.assertTrue(all(fields == watcher_mod.ORDER_FIELDS for _after, _page, fields in calls))
+        self.assertEqual(107, watcher._load_last_id("orders"))
+
+    def test_truncated_run_resumes_from_checkpoint(self) -> None:
+        watcher = watcher_mod.MagentoWatcher(
+            "bank", "https://example.com", "token", ["orders"], page_size=2, max_pages=2
+        )
+        watcher._save_last_id("orders", 100)
+        calls = []
+        watcher._request = self._fake_orders(list(range(101, 107)), 2, calls)  # type: ignore[assignment]
+
+        watcher.process_orders()
+        self.assertEqual([101, 102, 103, 104], self.events)
+        self.assertEqual(104, watcher._load_last_id("orders"))
+
+        watcher.process_orders()
+        self.assertEqual(list(range(101, 107)), self.events)
+        self.assertEqual(106, watcher._load_last_id("orders"))
+
+    def test_page_limit_warning_only_when_more_pages_exist(self) -> None:
+        for ids, warned in ((list(range(101, 105)), False), (list(range(101, 107)), True)):
+            watcher = watcher_mod.MagentoWatcher(
+                "bank", "https://example.com", "token", ["orders"], page_size=2, max_pages=2
+            )
+            watcher._save_last_id("orders", 100)
+            watcher._request = self._fake_orders(ids, 2, [])  # type: ignore[assignment]
+            logs = []
+            with mock.patch.object(watcher_mod, "LOG", logs.append):
+                watcher.process_orders()
+            self.assertEqual(warned, any("页阈值" in line for line in logs), ids)
+
+    def test_requests_reuse_keep_alive_connection(self) -> None:
+        connections = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                connections.append(self.client_address)
+
+            def do_GET(self) -> None:  # noqa: N802
+                body = json.dumps({"items": [], "path": self.path}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args) -> None:
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            watcher = watcher_mod.MagentoWatcher(
+                "bank", f"http://127.0.0.1:{server.server_address[1]}", "token", ["orders"]
+            )
+            first = watcher._request("/rest/V1/orders", {"searchCriteria[current_page]": 1})
+            second = watcher._request("/rest/V1/orders", {"searchCriteria[current_page]": 2})
+            watcher.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn("current_page%5D=1", first["path"])
+        self.assertIn("current_page%5D=2", second["path"])
+        self.assertEqual(1, len(connections))
+
+
+class AllSitesTests(unittest.TestCase):
+    def test_discover_sites_skips_dedicated_watchers(self) -> None:
+        pillar = {
+            "secrets:magento_api": {"bank": {"base_url": "https://bank"}, "tank": {"base_url": "https://tank"}},
+            "magento_schedule:api_watchers": [{"name": "tank-api-orders", "site": "tank"}],
+        }
+        with mock.patch.object(watcher_mod, "pillar_get", lambda path, default="": pillar.get(path, default)), mock.patch.object(
+            watcher_mod, "load_local_secrets", return_value={"duck": {"base_url": "https://duck"}}
+        ):
+            self.assertEqual(["bank", "duck"], watcher_mod.discover_sites())
+
+    def test_failing_site_does_not_block_others(self) -> None:
+        ran = []
+
+        class FakeWatcher:
+            def __init__(self, site):
+                self.site = site
+                self.deadline = None
+
+            def run(self):
+                if self.site == "broken":
+                    raise RuntimeError("boom")
+                ran.append((self.site, self.deadline is not None))
+
+        def fake_build(site, args, kinds, deadline=None):
+            if site == "nocreds":
+                raise ValueError("missing token")
+            return FakeWatcher(site)
+
+        args = watcher_mod.argparse.Namespace(site_timeout=30)
+        with mock.patch.object(watcher_mod, "discover_sites", return_value=["bank", "broken", "nocreds", "tank"]), mock.patch.object(
+            watcher_mod, "build_watcher", fake_build
+        ), mock.patch.object(watcher_mod, "LOG", lambda *_args, **_kwargs: None):
+            code = watcher_mod.run_all_sites(args, ["orders"])
+        self.assertEqual(1, code)
+        self.assertEqual([("bank", True), ("tank", True)], sorted(ran))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,212 @@
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "salt" / "_modules" / "saltgoat.py"
+
+spec = importlib.util.spec_from_file_location("saltgoat_exec_module", MODULE_PATH)
+saltgoat = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(saltgoat)
+
+
+class FakeSalt(dict):
+    """In-memory Salt schedule: ``add``/``modify`` store args/kwargs as salt.modules.schedule does."""
+
+    def __init__(self, schedule_file: Path, config: dict) -> None:
+        super().__init__()
+        self.schedule_file = schedule_file
+        self.calls = []
+        self.schedule = {}
+        self["pillar.get"] = lambda key, default=None: config if key == "magento_schedule" else default
+        self["schedule.list"] = self._list
+        self["schedule.add"] = self._add
+        self["schedule.modify"] = self._modify
+        self["schedule.delete"] = self._delete
+        self["schedule.save"] = self._save
+        self["file.mkdir"] = lambda *args, **kwargs: self.calls.append(("mkdir", args))
+
+    def load(self) -> None:
+        data = yaml.safe_load(self.schedule_file.read_text(encoding="utf-8")) if self.schedule_file.exists() else {}
+        self.schedule = dict((data or {}).get("schedule") or {})
+
+    def _list(self, return_yaml=True):
+        self.calls.append("list")
+        return {"schedule": dict(self.schedule)}
+
+    @staticmethod
+    def _item(name, kwargs):
+        item = {"name": name}
+        for key, value in kwargs.items():
+            if key == "persist":
+                continue
+            item[{"job_args": "args", "job_kwargs": "kwargs"}.get(key, key)] = value
+        return item
+
+    def _add(self, name, **kwargs):
+        self.calls.append(("add", name, kwargs.get("persist")))
+        if name in self.schedule:
+            return {"result": False, "comment": f"Job {name} already exists in schedule."}
+        self.schedule[name] = self._item(name, kwargs)
+        return {"result": True}
+
+    def _modify(self, name, **kwargs):
+        self.calls.append(("modify", name, kwargs.get("persist")))
+        self.schedule[name] = self._item(name, kwargs)
+        return {"result": True}
+
+    def _delete(self, name, persist=True):
+        self.calls.append(("delete", name, persist))
+        self.schedule.pop(name, None)
+        return {"result": True}
+
+    def _save(self):
+        self.calls.append("save")
+        self.schedule_file.write_text(yaml.safe_dump({"schedule": self.schedule}), encoding="utf-8")
+        return {"result": True}
+
+
+class MagentoScheduleReconcileTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.conf_dir = Path(self.tmp.name)
+        self.schedule_file = self.conf_dir / "minion.d" / "_schedule.conf"
+        self.schedule_file.parent.mkdir()
+        self.config = {"api_watchers": [{"name": "tank-api-orders", "site": "tank", "cron": "*/2 * * * *"}]}
+        self.salt = FakeSalt(self.schedule_file, self.config)
+        patches = [
+            mock.patch.object(saltgoat, "__salt__", self.salt, create=True),
+            mock.patch.object(saltgoat, "__opts__", {"conf_dir": str(self.conf_dir)}, create=True),
+            mock.patch.object(saltgoat, "_prepare_schedule_host", lambda sites, config: None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_schedule(self, jobs: dict) -> None:
+        self.schedule_file.write_text(yaml.safe_dump({"schedule": jobs}), encoding="utf-8")
+        self.salt.load()
+
+    def test_desired_jobs_match_state_rendering(self) -> None:
+        desired = saltgoat._desired_schedule(["tank"], self.config)
+        self.assertEqual(
+            ["saltgoat magetools api watch --site tank --kinds orders,customers"],
+            desired["tank-api-orders"]["args"],
+        )
+        self.assertEqual("*/2 * * * *", desired["tank-api-orders"]["cron"])
+        self.assertIn("magento_tank_cron", desired)
+        self.assertIn("tankmage-dump-hourly", desired)
+        self.assertTrue(desired["tank-stats-weekly"]["args"][0].endswith("--period weekly --no-telegram"))
+
+    def test_plan_does_not_write(self) -> None:
+        result = saltgoat.magento_schedule_reconcile("bank,tank", plan=True)
+        self.assertTrue(result["result"])
+        self.assertIn("magento_bank_cron", result["plan"]["add"])
+        self.assertFalse(self.schedule_file.exists())
+        self.assertEqual(["list"], self.salt.calls)
+        self.assertIn("total_ms", result["timings"])
+
+    def test_applies_all_sites_with_one_save(self) -> None:
+        self.write_schedule(
+            {
+                "saltgoat_pillar_snapshot": {"function": "saltgoat.pillar_snapshot", "minutes": 15},
+                "magento_old_cron": {"function": "cmd.run", "args": ["cd /var/www/old && php bin/magento cron:run"]},
+                "old-api-watch": {"function": "cmd.run", "args": ["saltgoat magetools api watch --site old"]},
+            }
+        )
+        result = saltgoat.magento_schedule_reconcile("bank,tank")
+        self.assertTrue(result["applied"])
+        self.assertEqual("list", self.salt.calls[0])
+        self.assertEqual("save", self.salt.calls[-1])
+        self.assertEqual(1, self.salt.calls.count("save"))
+        self.assertTrue(all(call[2] is False for call in self.salt.calls[1:-1]))
+        self.assertEqual(["magento_old_cron", "old-api-watch"], result["plan"]["remove"])
+        for phase in ("desired_ms", "list_ms", "plan_ms", "apply_ms", "save_ms", "total_ms"):
+            self.assertIn(phase, result["timings"])
+
+        written = yaml.safe_load(self.schedule_file.read_text(encoding="utf-8"))["schedule"]
+        self.assertIn("saltgoat_pillar_snapshot", written)
+        self.assertNotIn("magento_old_cron", written)
+        self.assertIn("tank-api-orders", written)
+        # 磁盘上的条目必须是 Salt 调度器执行的 args/kwargs 结构
+        cron = written["magento_bank_cron"]
+        self.assertEqual("cmd.run", cron["function"])
+        self.assertEqual(
+            ["cd /var/www/bank && sudo -u www-data php bin/magento cron:run >> /var/log/magento-cron.log 2>&1"],
+            cron["args"],
+        )
+        self.assertEqual({"shell": "/bin/bash"}, cron["kwargs"])
+        self.assertEqual("magento_bank_cron", cron["name"])
+        self.assertNotIn("job_args", cron)
+        self.assertNotIn("job_kwargs", cron)
+
+        self.salt.calls.clear()
+        again = saltgoat.magento_schedule_reconcile("bank,tank")
+        self.assertFalse(again["applied"])
+        self.assertEqual(["list"], self.salt.calls)
+        self.assertEqual([], again["plan"]["add"] + again["plan"]["update"] + again["plan"]["remove"])
+
+    def test_correctly_stored_job_is_unchanged(self) -> None:
+        self.write_schedule(
+            {
+                "magento_bank_cron": {
+                    "name": "magento_bank_cron",
+                    "function": "cmd.run",
+                    "args": ["cd /var/www/bank && sudo -u www-data php bin/magento cron:run >> /var/log/magento-cron.log 2>&1"],
+                    "kwargs": {"shell": "/bin/bash"},
+                    "cron": "* * * * *",
+                    "run_on_start": False,
+                    "maxrunning": 1,
+                    "offline": True,
+                    "enabled": True,
+                    "jid_include": True,
+                }
+            }
+        )
+        result = saltgoat.magento_schedule_reconcile("bank", plan=True)
+        self.assertNotIn("magento_bank_cron", result["plan"]["add"] + result["plan"]["update"])
+
+    def test_custom_job_on_live_site_survives(self) -> None:
+        self.write_schedule(
+            {
+                "bank-offsite-rsync": {
+                    "function": "cmd.run",
+                    "args": ["rsync -a /var/www/bank/pub/media/ backup:/srv/bank-media/"],
+                },
+                "gone-offsite-rsync": {
+                    "function": "cmd.run",
+                    "args": ["rsync -a /var/www/gone/pub/media/ backup:/srv/gone-media/"],
+                },
+            }
+        )
+        result = saltgoat.magento_schedule_reconcile("bank,tank")
+        self.assertEqual(["gone-offsite-rsync"], result["plan"]["remove"])
+        written = yaml.safe_load(self.schedule_file.read_text(encoding="utf-8"))["schedule"]
+        self.assertIn("bank-offsite-rsync", written)
+        self.assertNotIn("gone-offsite-rsync", written)
+
+    def test_legacy_site_api_watch_job_is_removed(self) -> None:
+        # bank 没有 api_watchers 条目，由 saltgoat_api_watch_all 轮询；旧的逐站点任务会重复轮询
+        self.write_schedule(
+            {
+                "bank-api-watch": {
+                    "function": "cmd.run",
+                    "args": ["saltgoat magetools api watch --site bank"],
+                },
+            }
+        )
+        result = saltgoat.magento_schedule_reconcile("bank,tank")
+        self.assertEqual(["bank-api-watch"], result["plan"]["remove"])
+        written = yaml.safe_load(self.schedule_file.read_text(encoding="utf-8"))["schedule"]
+        self.assertNotIn("bank-api-watch", written)
+        self.assertIn("tank-api-orders", written)
+
+
+if __name__ == "__main__":
+    unittest.main()
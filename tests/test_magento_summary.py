@@ -85,6 +85,43 @@ class MagentoSummaryTests(unittest.TestCase):
             "from/to filters should be populated independently",
         )
 
+    def test_fetch_entities_streams_pages_with_field_selection(self) -> None:
+        start, end, _ = summary.period_range("monthly")
+        watcher = watcher_mod.MagentoWatcher("demo", "https://example.com", "tok", ["orders"], page_size=2)
+        orders = [{"entity_id": num, "grand_total": "10.5", "order_currency_code": "USD"} for num in range(1, 8)]
+        pages = []
+
+        def fake_request(path, params):
+            page = int(params["searchCriteria[currentPage]"])
+            pages.append((page, params.get("fields")))
+            return {"items": orders[(page - 1) * 2 : page * 2], "total_count": len(orders)}
+
+        watcher._request = fake_request  # type: ignore[assignment]
+        stream = summary.fetch_entities(
+            watcher, "/rest/V1/orders", "entity_id", start, end, fields=summary.ORDER_SUMMARY_FIELDS
+        )
+        self.assertNotIsInstance(stream, list)
+        count, totals = summary.summarise_orders(stream)
+
+        self.assertEqual(7, count)
+        self.assertAlmostEqual(73.5, totals["USD"])
+        self.assertEqual([1, 2, 3, 4], sorted(page for page, _fields in pages))
+        self.assertTrue(all(fields == summary.ORDER_SUMMARY_FIELDS for _page, fields in pages))
+
+    def test_count_entities_reads_total_count(self) -> None:
+        start, end, _ = summary.period_range("weekly")
+        watcher = watcher_mod.MagentoWatcher("demo", "https://example.com", "tok", ["orders"])
+        captured = []
+
+        def fake_request(path, params):
+            captured.append(params)
+            return {"total_count": 42}
+
+        watcher._request = fake_request  # type: ignore[assignment]
+        self.assertEqual(42, summary.count_entities(watcher, "/rest/V1/customers/search", "id", start, end))
+        self.assertEqual(1, len(captured))
+        self.assertEqual(1, captured[0]["searchCriteria[pageSize]"])
+
 
 if __name__ == "__main__":
     unittest.main()
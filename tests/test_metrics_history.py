@@ -0,0 +1,52 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from modules.lib import metrics_history
+
+
+class MetricsHistoryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Path(self.tmp.name) / "history.sqlite"
+
+    def tearDown(self) -> None:
+        metrics_history.close_all()
+        self.tmp.cleanup()
+
+    def test_record_and_summarize_percentiles(self) -> None:
+        now = time.time()
+        for offset, value in enumerate(range(1, 11)):
+            stored = metrics_history.record(
+                {"load.1m": float(value), "flag": True, "bogus": "text"},
+                ts=now - 600 + offset * 60,
+                path=self.db,
+            )
+            self.assertEqual(stored, 2)
+        summary = metrics_history.summarize(["load.1m"], hours=1, path=self.db)
+        stats = summary["load.1m"]
+        self.assertEqual(stats["count"], 10)
+        self.assertEqual(stats["min"], 1.0)
+        self.assertEqual(stats["max"], 10.0)
+        self.assertEqual(stats["last"], 10.0)
+        self.assertAlmostEqual(stats["p50"], 5.5)
+        self.assertAlmostEqual(stats["p95"], 9.55)
+
+    def test_long_windows_use_rollups_and_prune_raw(self) -> None:
+        now = time.time()
+        metrics_history.record({"memory.percent": 40.0}, ts=now - 5 * 86400, path=self.db)
+        metrics_history.record({"memory.percent": 60.0}, ts=now, path=self.db)
+        self.assertEqual(len(metrics_history.series("memory.percent", 0, path=self.db)), 1)
+        summary = metrics_history.summarize(["memory.percent"], hours=7 * 24, path=self.db)
+        self.assertEqual(summary["memory.percent"]["count"], 2)
+        self.assertAlmostEqual(summary["memory.percent"]["avg"], 50.0)
+        self.assertNotIn("p95", summary["memory.percent"])
+
+    def test_format_summary(self) -> None:
+        lines = metrics_history.format_summary({"swap.percent": {"avg": 1.0, "max": 2.0, "p95": 1.9, "count": 3}})
+        self.assertEqual(lines, ["swap.percent: avg=1.00 p95=1.90 max=2.00 (n=3)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
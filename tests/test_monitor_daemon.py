@@ -0,0 +1,71 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import monitor_daemon
+
+
+class SnapshotSocketTests(unittest.TestCase):
+    def test_round_trip_and_staleness(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "monitor.sock"
+            server = monitor_daemon.SnapshotServer(path).start()
+            try:
+                self.assertIsNone(monitor_daemon.fetch_snapshot(path))
+                server.update({"generated_at": time.time(), "severity": "WARNING", "details": ["Load warning"]})
+                snapshot = monitor_daemon.fetch_snapshot(path)
+                self.assertEqual(snapshot["severity"], "WARNING")
+                server.update({"generated_at": time.time() - 600, "severity": "INFO"})
+                self.assertIsNone(monitor_daemon.fetch_snapshot(path, max_age=60))
+            finally:
+                server.close()
+            self.assertFalse(path.exists())
+            self.assertIsNone(monitor_daemon.fetch_snapshot(path))
+
+
+class FileWatcherTests(unittest.TestCase):
+    def _assert_detects_change(self, watcher: monitor_daemon.FileWatcher, target: Path) -> None:
+        self.assertFalse(watcher.wait(0.05))
+        timer = threading.Timer(0.1, lambda: target.write_text("pm.max_children = 20\n", encoding="utf-8"))
+        timer.start()
+        try:
+            self.assertTrue(watcher.wait(8))
+        finally:
+            timer.cancel()
+
+    def test_inotify_reports_relevant_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "secret").mkdir()
+            watcher = monitor_daemon.FileWatcher([root, root / "missing"])
+            try:
+                if not watcher.uses_inotify:
+                    self.skipTest("inotify unavailable")
+                (root / "notes.txt").write_text("ignored", encoding="utf-8")
+                self.assertFalse(watcher.wait(0.2))
+                self._assert_detects_change(watcher, root / "secret" / "pool.conf")
+            finally:
+                watcher.close()
+
+    @mock.patch.object(monitor_daemon, "POLL_INTERVAL", 0.1)
+    def test_polling_fallback_and_wake(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            with mock.patch.object(monitor_daemon, "_load_libc", return_value=None):
+                watcher = monitor_daemon.FileWatcher([root])
+            try:
+                self.assertFalse(watcher.uses_inotify)
+                self._assert_detects_change(watcher, root / "monitoring.sls")
+                threading.Timer(0.1, watcher.wake).start()
+                start = time.monotonic()
+                self.assertFalse(watcher.wait(5))
+                self.assertLess(time.monotonic() - start, 4)
+            finally:
+                watcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import nginx_index
+
+
+class NginxIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = Path(self.tmp.name)
+        self.env = mock.patch.dict(os.environ, {"SALTGOAT_NGINX_INDEX_CACHE": str(self.base / "cache")})
+        self.env.start()
+        nginx_index.clear()
+        self.available = self.base / "sites-available"
+        self.enabled = self.base / "sites-enabled"
+        self.snippets = self.base / "snippets"
+        for directory in (self.available, self.enabled, self.snippets):
+            directory.mkdir()
+        (self.snippets / "listen-ssl.conf").write_text("listen 443 ssl http2;\n", encoding="utf-8")
+        self.write_site(
+            "bank",
+            f"""
+            upstream fastcgi_backend {{
+                server unix:/run/php/php8.3-fpm-magento-bank.sock;
+            }}
+            server {{
+                listen 80;
+                server_name bank.example.com www.bank.example.com;
+                return 301 https://$host$request_uri;
+            }}
+            server {{
+                include {self.snippets}/*.conf;
+                server_name bank.example.com;  # primary
+                set $MAGE_ROOT /var/www/bank;
+                root $MAGE_ROOT/pub;
+                location ~ \\.php$ {{
+                    fastcgi_pass fastcgi_backend;
+                }}
+            }}
+            """,
+        )
+        self.write_site(
+            "tank",
+            """
+            server {
+                listen 80;
+                server_name _ tank.example.com;
+                root /var/www/tank/current/pub;
+            }
+            """,
+        )
+
+    def tearDown(self) -> None:
+        nginx_index.clear()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def write_site(self, name: str, content: str) -> None:
+        (self.available / name).write_text(textwrap.dedent(content), encoding="utf-8")
+        link = self.enabled / name
+        if not link.exists():
+            link.symlink_to(self.available / name)
+
+    def test_indexes_server_blocks_once_and_follows_includes(self) -> None:
+        index = nginx_index.load([self.enabled, self.available])
+        self.assertEqual(3, len(index.servers))
+        bank = [server for server in index.by_root("/var/www/bank") if server["roots"]]
+        self.assertEqual(1, len(bank))
+        self.assertEqual(str(self.enabled / "bank"), bank[0]["file"])
+        self.assertTrue(bank[0]["https"])
+        self.assertEqual(["unix:/run/php/php8.3-fpm-magento-bank.sock"], bank[0]["fastcgi"])
+        self.assertEqual("/var/www/bank", bank[0]["mage_root"])
+        info = index.site_info(index.by_file("bank"))
+        self.assertEqual(["bank.example.com", "www.bank.example.com"], info["server_names"])
+        self.assertTrue(info["https"])
+        tank = index.by_root("/var/www/tank/current/")
+        self.assertEqual(["tank.example.com"], tank[0]["server_names"])
+        self.assertFalse(index.site_info(tank)["https"])
+        self.assertEqual(["bank"], [server["name"] for server in index.by_mage_root("/var/www/bank")])
+
+    def test_reuses_index_until_a_config_changes(self) -> None:
+        dirs = [self.enabled, self.available]
+        first = nginx_index.load(dirs)
+        self.assertIs(first, nginx_index.load(dirs))
+
+        nginx_index.clear()
+        with mock.patch.object(nginx_index, "build", side_effect=AssertionError("rebuilt")):
+            persisted = nginx_index.load(dirs)
+        self.assertEqual(first.servers, persisted.servers)
+
+        (self.snippets / "listen-ssl.conf").write_text("listen 8443 ssl;\nserver_name extra.example.com;\n", encoding="utf-8")
+        changed = nginx_index.load(dirs)
+        self.assertIn("extra.example.com", changed.site_info(changed.by_file("bank"))["server_names"])
+
+        self.write_site("shop", "server { server_name shop.example.com; root /var/www/shop; }\n")
+        added = nginx_index.load(dirs)
+        self.assertEqual(["shop.example.com"], added.by_root("/var/www/shop")[0]["server_names"])
+
+
+if __name__ == "__main__":
+    unittest.main()
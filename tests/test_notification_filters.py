@@ -1,4 +1,5 @@
 import unittest
+import urllib.request
 
 from modules.lib import notification
 
@@ -56,7 +57,7 @@ class NotificationFilterTests(unittest.TestCase):
 class NotificationWebhookTests(unittest.TestCase):
     def setUp(self) -> None:
         self.prev_pillar = notification.pillar_get
-        self.prev_urlopen = notification.urllib.request.urlopen
+        self.prev_urlopen = urllib.request.urlopen
 
         def fake_pillar(path: str, default=None):
             if path == "notifications":
@@ -93,11 +94,11 @@ class NotificationWebhookTests(unittest.TestCase):
             )
             return DummyResponse()
 
-        notification.urllib.request.urlopen = fake_urlopen
+        urllib.request.urlopen = fake_urlopen
 
     def tearDown(self) -> None:
         notification.pillar_get = self.prev_pillar
-        notification.urllib.request.urlopen = self.prev_urlopen
+        urllib.request.urlopen = self.prev_urlopen
         notification._CACHE = None
 
     def test_dispatch_webhooks_posts_json(self) -> None:
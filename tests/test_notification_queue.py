@@ -7,6 +7,7 @@ from unittest import mock
 from modules.lib import notification
 from modules.lib import backup_notify
 from modules.lib import notification_queue
+from modules.lib import notification_store
 
 
 class NotificationQueueTestCase(unittest.TestCase):
@@ -16,19 +17,22 @@ class NotificationQueueTestCase(unittest.TestCase):
             original_dir = notification.QUEUE_DIR
             try:
                 notification.QUEUE_DIR = queue_dir
-                notification.queue_failure(
-                    "telegram",
-                    "saltgoat/test",
-                    {"message": "hello"},
-                    error="timeout",
-                    context={"chat_id": "123"},
-                )
+                for _ in range(2):
+                    notification.queue_failure(
+                        "telegram",
+                        "saltgoat/test",
+                        {"message": "hello"},
+                        error="timeout",
+                        context={"chat_id": "123"},
+                    )
             finally:
                 notification.QUEUE_DIR = original_dir
 
-            files = list(queue_dir.glob("*.json"))
-            self.assertEqual(len(files), 1)
-            data = json.loads(files[0].read_text(encoding="utf-8"))
+            with notification_store.QueueStore(queue_dir) as store:
+                records = store.records()
+            self.assertEqual(len(records), 2)
+            self.assertNotEqual(records[0]["id"], records[1]["id"])
+            data = records[0]
             self.assertEqual(data["destination"], "telegram")
             self.assertEqual(data["tag"], "saltgoat/test")
             self.assertEqual(data["payload"]["message"], "hello")
@@ -58,9 +62,10 @@ class NotificationQueueTestCase(unittest.TestCase):
                     "<b>html</b>",
                     {"foo": "bar"},
                 )
-                files = list(Path(tmp).glob("*.json"))
-                self.assertEqual(len(files), 1)
-                payload = json.loads(files[0].read_text(encoding="utf-8"))
+                with notification_store.QueueStore(Path(tmp)) as store:
+                    records = store.records()
+                self.assertEqual(len(records), 1)
+                payload = records[0]
                 self.assertEqual(payload["destination"], "webhook")
                 self.assertEqual(payload["tag"], "saltgoat/test")
                 self.assertEqual(payload["payload"]["payload"]["foo"], "bar")
@@ -108,9 +113,10 @@ class NotificationQueueTestCase(unittest.TestCase):
                 "bank",
             )
 
-            files = list(notification_queue_dir.glob("*.json"))
-            self.assertEqual(len(files), 1)
-            data = json.loads(files[0].read_text(encoding="utf-8"))
+            with notification_store.QueueStore(notification_queue_dir) as store:
+                records = store.records()
+            self.assertEqual(len(records), 1)
+            data = records[0]
             self.assertEqual(data["destination"], "telegram")
             self.assertEqual(data["tag"], "saltgoat/backup/mysql_dump/bank")
             self.assertEqual(data["payload"]["site"], "bank")
@@ -166,5 +172,55 @@ class NotificationRetryTestCase(unittest.TestCase):
             self.assertEqual(stored["last_error"], "timeout")
 
 
+class NotificationStoreTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = notification_store.QueueStore(Path(self.tmp.name))
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_fail_applies_backoff_then_dead_letters(self) -> None:
+        record_id = self.store.enqueue({"destination": "webhook", "payload": {}}, now=1000.0)
+        self.assertEqual(notification_store.PENDING, self.store.fail(record_id, "timeout", now=1000.0))
+        self.assertEqual([], self.store.due(now=1000.0 + notification_store.backoff(1) - 1))
+        self.assertEqual(1, len(self.store.due(now=1000.0 + notification_store.backoff(1))))
+        for _ in range(notification_store.MAX_ATTEMPTS - 1):
+            status = self.store.fail(record_id, "timeout", now=1000.0)
+        self.assertEqual(notification_store.DEAD, status)
+        counts = self.store.counts(now=10**9)
+        self.assertEqual(0, counts["total"])
+        self.assertEqual({"webhook": 1}, counts["dead_by_destination"])
+        self.assertEqual(1, self.store.requeue_dead())
+        self.assertEqual(1, self.store.counts()["due"])
+
+    def test_import_legacy_moves_json_files(self) -> None:
+        legacy = Path(self.tmp.name) / "1700000000_1.json"
+        legacy.write_text(json.dumps({"destination": "telegram", "tag": "saltgoat/test", "attempts": 3}), encoding="utf-8")
+        self.assertEqual(1, self.store.import_legacy())
+        self.assertFalse(legacy.exists())
+        record = self.store.records()[0]
+        self.assertEqual("saltgoat/test", record["tag"])
+        self.assertEqual(3, record["attempts"])
+
+    def test_drain_store_acks_success_and_backs_off_failures(self) -> None:
+        ok_id = self.store.enqueue({"destination": "webhook", "payload": {"n": 1}})
+        bad_id = self.store.enqueue({"destination": "telegram", "payload": {"n": 2}})
+
+        def fake_retry(record, dry_run=False):
+            return (True, "sent") if record["destination"] == "webhook" else (False, "telegram down")
+
+        with mock.patch.object(notification_queue, "retry_record", side_effect=fake_retry):
+            processed, success = notification_queue.drain_store(self.store, workers=2)
+        self.assertEqual((2, 1), (processed, success))
+        remaining = self.store.records()
+        self.assertEqual([bad_id], [record["id"] for record in remaining])
+        self.assertNotIn(ok_id, [record["id"] for record in remaining])
+        self.assertEqual(1, remaining[0]["attempts"])
+        self.assertEqual("telegram down", remaining[0]["last_error"])
+        self.assertEqual([], self.store.due())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,178 @@
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import opensearch_stats
+from modules.monitoring import resource_alert
+
+
+def node_stats(rejected, gc_old_ms, query_total, query_ms, evictions):
+    return {
+        "nodes": {
+            "n1": {
+                "thread_pool": {
+                    "search": {"queue": 40, "active": 7, "rejected": rejected, "completed": 1000},
+                    "write": {"queue": 0, "active": 1, "rejected": 0, "completed": 500},
+                },
+                "jvm": {"gc": {"collectors": {"old": {"collection_time_in_millis": gc_old_ms, "collection_count": 3}}}},
+                "indices": {
+                    "search": {"query_total": query_total, "query_time_in_millis": query_ms},
+                    "indexing": {"index_total": 10, "index_time_in_millis": 20},
+                    "query_cache": {"evictions": evictions},
+                    "fielddata": {"evictions": 0},
+                },
+            }
+        }
+    }
+
+
+def index_stats(query_total, query_ms):
+    return {
+        "indices": {
+            "magento2_product_1_v3": {
+                "total": {
+                    "docs": {"count": 5000},
+                    "store": {"size_in_bytes": 1048576},
+                    "search": {"query_total": query_total, "query_time_in_millis": query_ms},
+                }
+            }
+        }
+    }
+
+
+class FakeOpenSearch(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    responses: dict = {}
+    paths: list = []
+    connections: set = set()
+
+    def do_GET(self):  # noqa: N802
+        type(self).paths.append(self.path)
+        type(self).connections.add(self.client_address)
+        route = self.path.split("?", 1)[0]
+        key = next((name for name in ("_cluster/stats", "_nodes/stats", "/_stats/") if name in route), None)
+        body = json.dumps(self.responses.get(key, {})).encode()
+        self.send_response(200 if key else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenSearchCollectorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        base = Path(self.tmp.name)
+        config = base / "opensearch.yml"
+        config.write_text("cluster.name: magento\n", encoding="utf-8")
+        FakeOpenSearch.paths = []
+        FakeOpenSearch.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenSearch)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        port = self.server.server_address[1]
+        patches = [
+            mock.patch.object(resource_alert, "OPENSEARCH_CONFIG", config),
+            mock.patch.object(resource_alert, "OPENSEARCH_STATS_URL", f"http://127.0.0.1:{port}/_cluster/stats?human=false"),
+            mock.patch.object(resource_alert, "OPENSEARCH_SAMPLE_FILE", base / "opensearch-sample.json"),
+            mock.patch.object(resource_alert, "OPENSEARCH_AUTOSCALE_FILE", base / "opensearch-autotune.json"),
+            mock.patch.object(resource_alert, "RUNTIME_DIR", base),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sample(self, at, **values):
+        FakeOpenSearch.responses = {
+            "_cluster/stats": {
+                "status": "green",
+                "nodes": {"count": 1, "jvm": {"mem": {"heap_used_percent": 40, "heap_max_in_bytes": 2 * 1024**3}}},
+                "indices": {},
+            },
+            "_nodes/stats": node_stats(values["rejected"], values["gc_old_ms"], values["queries"], values["query_ms"], values["evictions"]),
+            "/_stats/": index_stats(values["queries"], values["query_ms"]),
+        }
+        with mock.patch.object(resource_alert.time, "time", return_value=at):
+            return resource_alert.collect_opensearch_metrics()
+
+    def test_collects_node_and_catalog_stats_with_rates(self) -> None:
+        first = self.sample(1000.0, rejected=5, gc_old_ms=100, queries=100, query_ms=1000, evictions=0)
+        self.assertEqual(3, len(FakeOpenSearch.paths))
+        self.assertEqual(1, len(FakeOpenSearch.connections))
+        self.assertTrue(FakeOpenSearch.paths[2].startswith("/*_product_*,*_category_*/_stats/"))
+        self.assertEqual(40, first["thread_pools"]["search"]["queue"])
+        self.assertEqual({}, first["rates"])
+        self.assertEqual({"docs": 5000, "store_bytes": 1048576}, first["catalog_indices"]["magento2_product_1_v3"])
+
+        second = self.sample(1010.0, rejected=25, gc_old_ms=2100, queries=200, query_ms=61000, evictions=500)
+        rates = second["rates"]
+        self.assertEqual(2.0, rates["search_rejected_per_sec"])
+        self.assertEqual(0.2, rates["gc_old_time_ratio"])
+        self.assertEqual(600.0, rates["search_query_latency_ms"])
+        self.assertEqual(50.0, rates["query_cache_evictions_per_sec"])
+        self.assertEqual(600.0, second["catalog_indices"]["magento2_product_1_v3"]["search_query_latency_ms"])
+
+        ctx = resource_alert.Assessment()
+        with mock.patch.object(resource_alert, "autoscale_opensearch") as autoscale:
+            resource_alert.assess_opensearch(second, ctx)
+        self.assertEqual(["OpenSearch rejections", "OpenSearch GC", "OpenSearch search latency"], ctx.triggers)
+        self.assertIn("search 2.00/s (queue 40)", "\n".join(ctx.details))
+        self.assertIn("catalog: magento2_product_1_v3 600ms", "\n".join(ctx.details))
+        autoscale.assert_called_once()
+
+    def test_counter_reset_yields_no_rate(self) -> None:
+        # 节点重启后计数器归零，不产生负速率
+        current = {"search_rejected": 2, "gc_old_time_ms": 50, "query_total": 10, "query_time_ms": 30}
+        previous = {"search_rejected": 40, "gc_old_time_ms": 9000, "query_total": 500, "query_time_ms": 8000}
+        self.assertEqual({}, opensearch_stats.rates(current, previous, 10.0))
+        self.assertEqual(
+            "/*_product_*,*_category_*/_stats/docs,store,search,indexing,query_cache,request_cache?level=indices&human=false",
+            opensearch_stats.index_stats_path(),
+        )
+
+    def test_unreachable_cluster_returns_none(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertIsNone(resource_alert.collect_opensearch_metrics())
+
+
+class OpenSearchAutoscaleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        base = Path(self.tmp.name)
+        patches = [
+            mock.patch.object(resource_alert, "OPENSEARCH_AUTOSCALE_FILE", base / "opensearch-autotune.json"),
+            mock.patch.object(resource_alert, "OPENSEARCH_CONFIG", base / "missing.yml"),
+            mock.patch.object(resource_alert, "RUNTIME_DIR", base),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def autoscale(self, heap, rates):
+        ctx = resource_alert.Assessment()
+        resource_alert.autoscale_opensearch({"heap_used_percent": heap, "rates": rates}, ctx.auto_ctx)
+        return ctx.auto_ctx["actions"]
+
+    def test_low_heap_alone_does_not_grow_caches(self) -> None:
+        self.assertEqual([], self.autoscale(30.0, {}))
+
+    def test_evictions_grow_caches_unless_pools_reject(self) -> None:
+        self.assertEqual([], self.autoscale(30.0, {"query_cache_evictions_per_sec": 50.0, "search_rejected_per_sec": 1.0}))
+        actions = self.autoscale(30.0, {"query_cache_evictions_per_sec": 50.0})
+        self.assertIn("50.0 cache evictions/s", actions[0])
+        self.assertIn("queries_cache_size 10% -> ", actions[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import pillar_cache
+
+
+class PillarCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.env = mock.patch.dict(os.environ, {"SALTGOAT_PILLAR_CACHE_DIR": str(self.root / "snapshots")})
+        self.env.start()
+        pillar_cache.clear()
+        self.path = self.root / "nginx.sls"
+        self.path.write_text("nginx:\n  sites:\n    bank:\n      server_name: bank.example.com\n", encoding="utf-8")
+
+    def tearDown(self) -> None:
+        pillar_cache.clear()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_memoizes_until_file_changes(self) -> None:
+        with mock.patch.object(pillar_cache, "safe_load", wraps=pillar_cache.safe_load) as parser:
+            first = pillar_cache.load_dict(self.path)
+            pillar_cache.load_dict(self.path)
+            self.assertEqual(1, parser.call_count)
+            self.path.write_text("nginx:\n  sites: {}\n", encoding="utf-8")
+            second = pillar_cache.load_dict(self.path)
+            self.assertEqual(2, parser.call_count)
+        self.assertEqual("bank.example.com", first["nginx"]["sites"]["bank"]["server_name"])
+        self.assertEqual({}, second["nginx"]["sites"])
+
+    def test_snapshot_survives_new_process(self) -> None:
+        pillar_cache.load_dict(self.path)
+        pillar_cache.clear()
+        with mock.patch.object(pillar_cache, "safe_load", side_effect=AssertionError("parsed again")):
+            data = pillar_cache.load_dict(self.path)
+        self.assertIn("bank", data["nginx"]["sites"])
+
+    def test_results_are_copies_by_default(self) -> None:
+        data = pillar_cache.load_dict(self.path)
+        data["nginx"]["sites"].clear()
+        self.assertIn("bank", pillar_cache.load_dict(self.path)["nginx"]["sites"])
+
+    def test_missing_and_non_mapping_files(self) -> None:
+        self.assertIsNone(pillar_cache.load(self.root / "missing.sls"))
+        listing = self.root / "list.sls"
+        listing.write_text("- a\n- b\n", encoding="utf-8")
+        self.assertEqual({}, pillar_cache.load_dict(listing))
+        self.assertEqual(["a", "b"], pillar_cache.load(listing))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import importlib.util
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import config_loader
+from modules.lib import pillar_snapshot
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+spec = importlib.util.spec_from_file_location("saltgoat_exec_module", REPO_ROOT / "salt" / "_modules" / "saltgoat.py")
+saltgoat = importlib.util.module_from_spec(spec)
+assert spec.loader is not None
+spec.loader.exec_module(saltgoat)
+
+
+class PillarSnapshotTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "pillar-snapshot.json"
+        self.env = mock.patch.dict(
+            os.environ,
+            {"SALTGOAT_PILLAR_SNAPSHOT": str(self.path), "SALTGOAT_PILLAR_SNAPSHOT_MAX_AGE": "600"},
+        )
+        self.env.start()
+        # 仓库内 pillar 文件的 mtime 不应影响测试
+        self.pillar_root = mock.patch.object(pillar_snapshot, "PILLAR_ROOT", Path(self.tmp.name) / "pillar")
+        self.pillar_root.start()
+
+    def tearDown(self) -> None:
+        self.pillar_root.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_write_is_private_and_compact(self) -> None:
+        pillar_snapshot.write({"saltgoat": {"monitor": {"sites": []}}, "unrelated": {"x": 1}})
+        self.assertEqual(0o600, self.path.stat().st_mode & 0o777)
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        self.assertNotIn("unrelated", data["pillar"])
+        self.assertNotIn("\n", self.path.read_text(encoding="utf-8"))
+
+    def test_lookup_serves_exported_keys(self) -> None:
+        pillar_snapshot.write({"saltgoat": {"monitor": {"daemon": {"interval": 30}}}})
+        self.assertEqual(30, pillar_snapshot.lookup("saltgoat:monitor:daemon:interval"))
+        # 已导出的子树中不存在的键视为权威结果，直接返回默认值
+        self.assertEqual({}, pillar_snapshot.lookup("saltgoat:monitor:thresholds", {}))
+        self.assertEqual("dflt", pillar_snapshot.lookup("monitor_thresholds", "dflt"))
+        self.assertIs(pillar_snapshot.MISSING, pillar_snapshot.lookup("mysql:root_password"))
+
+    def test_stale_snapshot_falls_back(self) -> None:
+        pillar_snapshot.write({"saltgoat": {"a": 1}})
+        self.assertIsNotNone(pillar_snapshot.load())
+        self.assertIsNone(pillar_snapshot.load(now=time.time() + 601))
+        pillar_dir = Path(self.tmp.name) / "pillar"
+        pillar_dir.mkdir()
+        (pillar_dir / "monitoring.sls").write_text("saltgoat: {}\n", encoding="utf-8")
+        future = time.time() + 5
+        os.utime(pillar_dir / "monitoring.sls", (future, future))
+        self.assertIs(pillar_snapshot.MISSING, pillar_snapshot.lookup("saltgoat:a"))
+
+    def test_config_loader_skips_caller_when_snapshot_fresh(self) -> None:
+        pillar_snapshot.write({"saltgoat": {"monitor": {"sites": [{"name": "bank"}]}}})
+        with mock.patch.object(config_loader, "_get_caller", side_effect=AssertionError("Caller used")):
+            self.assertEqual([{"name": "bank"}], config_loader.pillar_get("saltgoat:monitor:sites", []))
+
+    def test_exec_module_snapshots_freshly_compiled_pillar(self) -> None:
+        # minion 内存中的 __pillar__ 可能早于最近一次 pillar 修改，必须以 pillar.items 重新编译
+        fresh = {"telegram": {"chat_id": "new"}, "unrelated": {"x": 1}}
+        with mock.patch.object(saltgoat, "__salt__", {"pillar.items": lambda: fresh}, create=True), mock.patch.object(
+            saltgoat, "__pillar__", {"telegram": {"chat_id": "old"}}, create=True
+        ):
+            result = saltgoat.pillar_snapshot(str(self.path))
+        self.assertEqual(["telegram"], result["keys"])
+        self.assertEqual("new", pillar_snapshot.lookup("telegram:chat_id"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import importlib.util
+import threading
+import unittest
+from importlib.machinery import SourceFileLoader
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+TEMPLATE = ROOT / "salt" / "states" / "templates" / "reactor_common.py.jinja"
+
+
+def _load_reactor_common():
+    loader = SourceFileLoader("reactor_common_under_test", str(TEMPLATE))
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+class FakeTelegram:
+    def __init__(self, responses=None):
+        self.calls = []
+        self.responses = list(responses or [])
+        self.lock = threading.Lock()
+
+    def __call__(self, token, method, params, timeout=None):
+        with self.lock:
+            self.calls.append(dict(params))
+            if self.responses:
+                return self.responses.pop(0)
+        return 200, {"ok": True}
+
+
+class BroadcastTelegramTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reactor = _load_reactor_common()
+        self.reactor.TELEGRAM_CHAT_INTERVAL = 0.0
+        self.reactor.TELEGRAM_GROUP_INTERVAL = 0.0
+        self.reactor.TELEGRAM_GLOBAL_INTERVAL = 0.0
+        self.reactor.TELEGRAM_COALESCE_WINDOW = 0.2
+        self.profiles = [
+            {"name": "ops", "token": "T", "targets": [{"chat_id": "-100"}, {"chat_id": "200"}], "topics": {}}
+        ]
+
+    def test_messages_for_same_chat_are_coalesced(self) -> None:
+        fake = FakeTelegram()
+        with mock.patch.object(self.reactor, "_telegram_call", fake):
+            self.assertEqual(self.reactor.broadcast_telegram("first", self.profiles, tag="a"), [])
+            self.reactor.broadcast_telegram("second", self.profiles, tag="b")
+            self.reactor.flush_telegram(5)
+        self.assertEqual(len(fake.calls), 2)
+        self.assertEqual({call["chat_id"] for call in fake.calls}, {"-100", "200"})
+        for call in fake.calls:
+            self.assertEqual(call["text"], "first\n\nsecond")
+
+    def test_retry_after_is_honoured(self) -> None:
+        fake = FakeTelegram([(429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 0.05}})])
+        with mock.patch.object(self.reactor, "_telegram_call", fake):
+            failures = self.reactor.broadcast_telegram("hello", self.profiles[:1], tag="a", wait=True)
+        self.assertEqual(failures, [])
+        self.assertEqual(len(fake.calls), 3)
+
+    def test_unrecoverable_send_is_queued(self) -> None:
+        fake = FakeTelegram([(400, {"ok": False, "description": "chat not found"})] * 2)
+        queued = []
+        with mock.patch.object(self.reactor, "_telegram_call", fake), mock.patch.object(
+            self.reactor, "_queue_telegram_failure", lambda entry, batch, error: queued.append((entry, batch["chat"], error))
+        ):
+            failures = self.reactor.broadcast_telegram("hello", self.profiles, tag="saltgoat/test", wait=True)
+        self.assertEqual(len(failures), 2)
+        self.assertEqual(len(queued), 2)
+        self.assertEqual(queued[0][0]["tag"], "saltgoat/test")
+        self.assertEqual(queued[0][2], "chat not found")
+
+    def test_long_batches_are_split_at_message_boundaries(self) -> None:
+        entries = [{"message": "x" * 3000, "tag": "a"}, {"message": "y" * 3000, "tag": "b"}, {"message": "z", "tag": "c"}]
+        chunks = self.reactor._chunk_entries(entries)
+        self.assertEqual([[item["tag"] for item in chunk] for chunk in chunks], [["a"], ["b", "c"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,303 @@
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.monitoring import resource_alert
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+def slow(value, delay):
+    def collect():
+        time.sleep(delay)
+        return value
+
+    return collect
+
+
+def record_assess(value, ctx):
+    ctx.details.append(f"assessed {value}")
+    return value
+
+
+class CollectorRegistryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        patches = [
+            mock.patch.dict(resource_alert.COLLECTORS, clear=True),
+            mock.patch.dict(resource_alert._COLLECTOR_CACHE, clear=True),
+            mock.patch.dict(resource_alert._COLLECTOR_INTERVALS, clear=True),
+            mock.patch.dict(resource_alert._COLLECTOR_TIMEOUTS, clear=True),
+            mock.patch.dict(resource_alert._COLLECTOR_RUNNING, clear=True),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_collectors_run_concurrently(self) -> None:
+        for name in ("a", "b", "c"):
+            resource_alert.register_collector(name, slow(name, 0.3), record_assess, timeout=5)
+        start = time.monotonic()
+        outcomes = resource_alert.run_collectors()
+        elapsed = time.monotonic() - start
+        self.assertLess(elapsed, 0.8)
+        self.assertEqual({"a": "a", "b": "b", "c": "c"}, {name: out["value"] for name, out in outcomes.items()})
+        self.assertEqual({"ok"}, {out["status"] for out in outcomes.values()})
+
+    def test_timeout_and_error_are_isolated(self) -> None:
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def hang():
+            release.wait(5)
+            return "late"
+
+        def boom():
+            raise RuntimeError("boom")
+
+        resource_alert.register_collector("hang", hang, record_assess, timeout=0.2)
+        resource_alert.register_collector("boom", boom, record_assess)
+        resource_alert.register_collector("fine", slow("ok", 0), record_assess)
+        outcomes = resource_alert.run_collectors()
+        self.assertEqual("timeout", outcomes["hang"]["status"])
+        self.assertIsNone(outcomes["hang"]["value"])
+        self.assertEqual("error", outcomes["boom"]["status"])
+        self.assertEqual("boom", outcomes["boom"]["error"])
+        self.assertEqual("ok", outcomes["fine"]["value"])
+
+        # 上一次仍未结束的采集器不会被重复提交
+        again = resource_alert.run_collectors(["hang"])
+        self.assertEqual("busy", again["hang"]["status"])
+
+    def test_one_shot_run_exits_despite_stuck_collector(self) -> None:
+        # 超时的采集器不能拖住 cron 单次运行的解释器退出
+        script = (
+            "import time\n"
+            "from modules.monitoring import resource_alert\n"
+            "resource_alert.COLLECTORS.clear()\n"
+            "resource_alert.register_collector('stuck', lambda: time.sleep(60), lambda value, ctx: value, timeout=0.2)\n"
+            "print(resource_alert.run_collectors()['stuck']['status'])\n"
+        )
+        start = time.monotonic()
+        proc = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, timeout=30)
+        self.assertEqual(0, proc.returncode, proc.stderr)
+        self.assertEqual("timeout", proc.stdout.strip())
+        self.assertLess(time.monotonic() - start, 15)
+
+    def test_results_are_reused_within_interval_and_prepare_runs_inline(self) -> None:
+        calls = []
+        resource_alert._COLLECTOR_INTERVALS["pools"] = 60
+        resource_alert.register_collector(
+            "pools",
+            lambda prepared: calls.append(prepared) or prepared,
+            record_assess,
+            prepare=lambda: threading.current_thread().name,
+        )
+        first = resource_alert.run_collectors()
+        second = resource_alert.run_collectors()
+        self.assertEqual([threading.current_thread().name], calls)
+        self.assertEqual("cached", second["pools"]["status"])
+        self.assertEqual(first["pools"]["value"], second["pools"]["value"])
+
+    def test_daemon_intervals_come_from_registry_and_pillar(self) -> None:
+        resource_alert.register_collector("fast", slow(1, 0), record_assess)
+        resource_alert.register_collector("slowpoke", slow(2, 0), record_assess, interval=120)
+        resource_alert.register_collector("mysql", slow(3, 0), record_assess)
+        with mock.patch.dict(resource_alert._CONFIG_CACHE, {"daemon": {"intervals": {"slowpoke": 45}}}):
+            resource_alert.apply_daemon_settings()
+        self.assertEqual(120, resource_alert.COLLECTORS["slowpoke"].interval)
+        self.assertEqual({"fast": 0.0, "slowpoke": 45.0, "mysql": 30.0}, dict(resource_alert._COLLECTOR_INTERVALS))
+
+    def test_late_result_is_cached_for_next_tick(self) -> None:
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def hang():
+            calls.append(1)
+            release.wait(5)
+            return "late"
+
+        resource_alert.register_collector("hang", hang, record_assess, timeout=0.1, interval=60)
+        resource_alert._COLLECTOR_INTERVALS["hang"] = 60
+        self.assertEqual("timeout", resource_alert.run_collectors()["hang"]["status"])
+        release.set()
+        resource_alert._COLLECTOR_RUNNING["hang"].result(timeout=2)
+        # done-callback 在工作线程中执行，等它写入缓存
+        deadline = time.monotonic() + 2
+        while "hang" not in resource_alert._COLLECTOR_CACHE and time.monotonic() < deadline:
+            time.sleep(0.01)
+        outcome = resource_alert.run_collectors()["hang"]
+        self.assertEqual("cached", outcome["status"])
+        self.assertEqual("late", outcome["value"])
+        self.assertEqual(1, len(calls))
+
+    def test_evaluate_assesses_registered_collectors(self) -> None:
+        def assess_queue(value, ctx):
+            if value["depth"] > 10:
+                ctx.bump("WARNING", "Queue depth")
+                ctx.details.append(f"Queue depth {value['depth']}")
+            return value
+
+        def hang():
+            time.sleep(1)
+
+        resource_alert.register_collector("queue", lambda: {"depth": 42}, assess_queue)
+        resource_alert.register_collector("stuck", hang, lambda value, ctx: value, timeout=0.1)
+        meminfo = {"MemTotal": 1000, "MemAvailable": 800, "SwapTotal": 0, "SwapFree": 0}
+        with mock.patch.multiple(
+            resource_alert,
+            get_load=mock.Mock(return_value=(0.1, 0.1, 0.1)),
+            load_thresholds=mock.Mock(
+                return_value={
+                    key: 100.0
+                    for key in ("warn_1m", "warn_5m", "warn_15m", "crit_1m", "crit_5m", "crit_15m")
+                }
+            ),
+            get_threshold_overrides=mock.Mock(return_value={}),
+            read_meminfo=mock.Mock(return_value=meminfo),
+            disk_usage=mock.Mock(return_value={}),
+        ):
+            severity, details, payload, triggers, _ctx = resource_alert.evaluate(record=False)
+
+        self.assertEqual("WARNING", severity)
+        self.assertEqual(["Queue depth", "Collector stuck"], triggers)
+        self.assertIn("Queue depth 42", details)
+        self.assertEqual({"depth": 42}, payload["queue"])
+        self.assertIsNone(payload["stuck"])
+        self.assertEqual("timeout", payload["collectors"]["stuck"]["status"])
+        self.assertNotIn("value", payload["collectors"]["queue"])
+
+
+class PhpFpmStatusAssessTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patches = [
+            mock.patch.object(resource_alert, "FPM_STATUS_SAMPLE_FILE", Path(self.tmp.name) / "php-fpm-status.json"),
+            mock.patch.object(resource_alert, "RUNTIME_DIR", Path(self.tmp.name)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.config = {"bank": {"max_children": 20, "listen": "/run/php/bank.sock", "status_path": "/status"}}
+        self.now = 1000.0
+
+    def assess(self, status):
+        ctx = resource_alert.Assessment()
+        # 每次调用模拟一次独立的 cron 运行：上次的计数器只能从运行时文件读取
+        deltas = resource_alert.fpm_counter_deltas({"bank": status}, self.now)
+        self.now += 300
+        data = {"configs": self.config, "children": {"bank": 20}, "status": {"bank": status}, "deltas": deltas}
+        with mock.patch.object(resource_alert, "autoscale_php_pool") as autoscale:
+            info = resource_alert.assess_php_fpm(data, ctx)
+        return ctx, info["pools"]["bank"], autoscale
+
+    def test_idle_spares_do_not_count_as_in_use(self) -> None:
+        status = {"active_processes": 4, "idle_processes": 16, "total_processes": 20, "listen_queue": 0, "max_children_reached": 0}
+        ctx, entry, autoscale = self.assess(status)
+        self.assertEqual("INFO", ctx.severity)
+        self.assertEqual(0.2, entry["utilization"])
+        self.assertEqual("status", entry["source"])
+        autoscale.assert_not_called()
+
+    def test_listen_queue_and_max_children_reached_trigger_autoscale(self) -> None:
+        base = {"active_processes": 12, "idle_processes": 0, "total_processes": 12, "start_since": 100}
+        self.assess(dict(base, listen_queue=0, max_children_reached=2))
+        ctx, entry, autoscale = self.assess(dict(base, start_since=400, listen_queue=0, max_children_reached=3))
+        self.assertEqual("CRITICAL", ctx.severity)
+        self.assertIn("max children reached +1", ctx.details[0])
+        autoscale.assert_called_once()
+
+        ctx, entry, autoscale = self.assess(dict(base, start_since=700, listen_queue=5, max_children_reached=3))
+        self.assertIn("listen queue 5", ctx.details[0])
+        autoscale.assert_called_once()
+
+        # 两次采样之间 FPM 重启过：即使 start_since 比上次大，当前计数仍全部是新增量
+        ctx, entry, autoscale = self.assess(dict(base, start_since=900, listen_queue=0, max_children_reached=1))
+        self.assertIn("max children reached +1", ctx.details[0])
+
+    def test_falls_back_to_process_count_without_status(self) -> None:
+        ctx, entry, autoscale = self.assess({"error": "connection refused"})
+        self.assertEqual("ps", entry["source"])
+        self.assertEqual(1.0, entry["utilization"])
+        autoscale.assert_called_once()
+
+    def test_pools_without_status_path_are_not_probed(self) -> None:
+        configs = {
+            "bank": {"listen": "/run/php/bank.sock", "status_path": "/fpm-status"},
+            "tank": {"listen": "/run/php/tank.sock"},
+        }
+        with mock.patch.object(resource_alert.fastcgi_status, "fetch_many", return_value={}) as fetch, mock.patch.object(
+            resource_alert, "php_fpm_workers_by_pool", return_value={}
+        ), mock.patch.object(resource_alert, "read_meminfo", return_value={}), mock.patch.object(
+            resource_alert.fpm_capacity, "sample_pools", return_value={}
+        ):
+            resource_alert.collect_php_fpm(configs)
+        self.assertEqual({"bank": ("/run/php/bank.sock", "/fpm-status")}, fetch.call_args[0][0])
+
+
+class MysqlMetricsTests(unittest.TestCase):
+    ROWS = [
+        ("Threads_connected", "96"),
+        ("Threads_running", "10"),
+        ("Max_used_connections", "98"),
+        ("Uptime", "7200"),
+        ("Innodb_buffer_pool_read_requests", "100000"),
+        ("Innodb_buffer_pool_reads", "10000"),
+        ("Innodb_row_lock_current_waits", "1"),
+        ("Slow_queries", "7"),
+        ("max_connections", "100"),
+        ("innodb_buffer_pool_size", "1073741824"),
+        ("trx_rseg_history_len", "1200"),
+    ]
+
+    def test_rows_are_parsed_from_both_clients(self) -> None:
+        metrics = resource_alert._mysql_rows_to_metrics(self.ROWS)
+        self.assertEqual(100, metrics["max_connections"])
+        self.assertEqual(96, metrics["threads_connected"])
+        self.assertEqual(7, metrics["slow_queries"])
+        self.assertEqual(1073741824, metrics["innodb_buffer_pool_size"])
+        self.assertEqual(0.9, metrics["buffer_pool_hit_ratio"])
+        self.assertEqual(1200, metrics["history_list_length"])
+        # mysql -Nse 输出按制表符切分，结果应与 PyMySQL 行一致
+        cli = resource_alert._mysql_rows_to_metrics(line.split("\t") for line in ("\n".join(f"{k}\t{v}" for k, v in self.ROWS)).splitlines())
+        self.assertEqual(metrics, cli)
+        self.assertIsNone(resource_alert._mysql_rows_to_metrics([("Threads_connected", "5")]))
+
+    def test_contention_reason(self) -> None:
+        self.assertIsNone(resource_alert.mysql_contention_reason({"threads_running": 10, "innodb_row_lock_current_waits": 1}))
+        self.assertEqual(
+            "6/10 running threads waiting on row locks",
+            resource_alert.mysql_contention_reason({"threads_running": 10, "innodb_row_lock_current_waits": 6}),
+        )
+        self.assertEqual(
+            "InnoDB history list length 2000000",
+            resource_alert.mysql_contention_reason({"history_list_length": 2_000_000}),
+        )
+
+    def assess(self, **overrides):
+        metrics = resource_alert._mysql_rows_to_metrics(self.ROWS)
+        metrics.update(overrides)
+        ctx = resource_alert.Assessment()
+        with mock.patch.object(resource_alert, "autoscale_mysql") as autoscale:
+            resource_alert.assess_mysql(metrics, ctx)
+        return ctx, autoscale
+
+    def test_saturation_autoscales_unless_contended(self) -> None:
+        ctx, autoscale = self.assess()
+        self.assertEqual("CRITICAL", ctx.severity)
+        self.assertIn("MySQL buffer pool", ctx.triggers)
+        autoscale.assert_called_once()
+
+        ctx, autoscale = self.assess(innodb_row_lock_current_waits=8, history_list_length=2_000_000)
+        self.assertEqual(["MySQL connections", "MySQL buffer pool", "MySQL history list"], ctx.triggers)
+        self.assertIn("skipping autoscale", "\n".join(ctx.details))
+        autoscale.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
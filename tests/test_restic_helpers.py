@@ -1,35 +1,55 @@
 #!/usr/bin/env python3
+import json
 import os
 import subprocess
 import tempfile
 from pathlib import Path
 import unittest
 
+from modules.lib import restic_helpers
+
 REPO_ROOT = Path(__file__).resolve().parents[1]
 SCRIPT = REPO_ROOT / "modules" / "lib" / "restic_helpers.py"
 
+FAKE_RESTIC = """#!/usr/bin/env python3
+import json, os, sys
+args = [arg for arg in sys.argv[1:] if arg != "--no-lock"]
+state = json.load(open(os.environ["FAKE_RESTIC_STATE"]))
+with open(os.environ["FAKE_RESTIC_STATE"] + ".log", "a") as fh:
+    fh.write(" ".join(args) + " " + os.environ.get("RESTIC_PASSWORD", "") + "\\n")
+if args == ["list", "snapshots"]:
+    print("\\n".join(state))
+elif args[:2] == ["cat", "snapshot"]:
+    print(json.dumps({"time": state[args[2]]}))
+elif args == ["snapshots", "--json"]:
+    print(json.dumps([{"id": k, "time": v} for k, v in state.items()]))
+elif args[:2] == ["stats", "--json"]:
+    print(json.dumps({"total_size": 3 * 1024 ** 3}))
+"""
+
+
+def run_cli(*args, env=None):
+    base_env = os.environ.copy()
+    if env:
+        base_env.update(env)
+    result = subprocess.run(
+        ["python3", str(SCRIPT), *args],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        env=base_env,
+        check=True,
+    )
+    return result.stdout.strip()
 
-class ResticHelpersCLITests(unittest.TestCase):
-    def run_cli(self, *args, env=None):
-        base_env = os.environ.copy()
-        if env:
-            base_env.update(env)
-        result = subprocess.run(
-            ["python3", str(SCRIPT), *args],
-            cwd=REPO_ROOT,
-            capture_output=True,
-            text=True,
-            env=base_env,
-            check=True,
-        )
-        return result.stdout.strip()
 
+class ResticHelpersCLITests(unittest.TestCase):
     def test_random_secret_length(self):
-        out = self.run_cli("random-secret")
+        out = run_cli("random-secret")
         self.assertEqual(len(out), 24)
 
     def test_normalize_path(self):
-        out = self.run_cli("normalize-path", "./modules/lib")
+        out = run_cli("normalize-path", "./modules/lib")
         self.assertTrue(out.endswith("modules/lib"))
 
     def test_summarize_sites_skip_restic(self):
@@ -43,7 +63,7 @@ class ResticHelpersCLITests(unittest.TestCase):
                     "SERVICE_NAME=saltgoat-restic-bank.service",
                 ])
             )
-            out = self.run_cli(
+            out = run_cli(
                 "summarize-sites",
                 "--metadata-dir",
                 tmpdir,
@@ -52,6 +72,84 @@ class ResticHelpersCLITests(unittest.TestCase):
             )
             self.assertIn("bank", out)
 
+    def test_unit_timestamp_fits_last_run_column(self):
+        self.assertEqual("2026-10-17 17:08:58", restic_helpers._format_unit_timestamp("Sat 2026-10-17 17:08:58 UTC"))
+        self.assertIsNone(restic_helpers._format_unit_timestamp("n/a"))
+        self.assertIsNone(restic_helpers._format_unit_timestamp(""))
+
+
+class ResticSummaryCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        base = Path(self.tmp.name)
+        self.meta = base / "sites.d"
+        self.meta.mkdir()
+        self.restic = base / "restic"
+        self.restic.write_text(FAKE_RESTIC)
+        self.restic.chmod(0o755)
+        self.state = base / "state.json"
+        self.log = Path(str(self.state) + ".log")
+        (base / "restic.env").write_text('export RESTIC_PASSWORD="s3cret"\n')
+        for site in ("bank", "tank"):
+            (self.meta / f"{site}.env").write_text(
+                f"SITE={site}\nREPO=/srv/restic/{site}\nENV_FILE={base / 'restic.env'}\n"
+            )
+        self.env = {
+            "SALTGOAT_UNIT_TEST": "1",
+            "SALTGOAT_RESTIC_CACHE_DIR": str(base / "cache"),
+            "FAKE_RESTIC_STATE": str(self.state),
+        }
+
+    def summarize(self, *extra):
+        out = run_cli(
+            "summarize-sites", "--metadata-dir", str(self.meta),
+            "--restic-bin", str(self.restic), "--json", *extra, env=self.env,
+        )
+        return {row["site"]: row for row in json.loads(out)}
+
+    def calls(self):
+        lines = self.log.read_text().splitlines() if self.log.exists() else []
+        self.log.unlink(missing_ok=True)
+        return lines
+
+    def test_refreshes_only_new_snapshots(self):
+        self.state.write_text(json.dumps({"a1": "2024-01-01T00:00:00Z", "b2": "2024-01-02T00:00:00Z"}))
+        rows = self.summarize()
+        self.assertEqual(2, rows["bank"]["snapshot_count"])
+        self.assertEqual("b2", rows["bank"]["latest_id"])
+        self.assertEqual(3 * 1024 ** 3, rows["tank"]["size_bytes"])
+        first = self.calls()
+        self.assertTrue(all(line.endswith("s3cret") for line in first))
+        self.assertEqual(2, sum(line.startswith("stats") for line in first))
+
+        self.summarize()
+        self.assertEqual(["list snapshots s3cret"] * 2, self.calls())
+
+        self.state.write_text(json.dumps({"b2": "2024-01-02T00:00:00Z", "c3": "2024-01-03T00:00:00Z"}))
+        rows = self.summarize()
+        self.assertEqual(2, rows["bank"]["snapshot_count"])
+        self.assertEqual("2024-01-03T00:00:00Z", rows["bank"]["latest_time"])
+        self.assertEqual(
+            sorted(["list snapshots s3cret", "cat snapshot c3 s3cret", "stats --json c3 s3cret"] * 2),
+            sorted(self.calls()),
+        )
+
+        cached = self.summarize("--cached")
+        self.assertEqual("c3", cached["tank"]["latest_id"])
+        self.assertEqual([], self.calls())
+
+    def test_unreadable_env_file_is_a_site_error(self):
+        self.state.write_text(json.dumps({"a1": "2024-01-01T00:00:00Z"}))
+        # 以目录代替 env 文件：读取时抛出 OSError（root 下权限位不生效）
+        broken = Path(self.tmp.name) / "broken.env"
+        broken.mkdir()
+        (self.meta / "tank.env").write_text(f"SITE=tank\nREPO=/srv/restic/tank\nENV_FILE={broken}\n")
+        rows = self.summarize()
+        self.assertIsNone(rows["bank"]["error"])
+        self.assertEqual(1, rows["bank"]["snapshot_count"])
+        self.assertTrue(rows["tank"]["error"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,80 @@
+import subprocess
+import unittest
+from unittest import mock
+
+from modules.lib import systemd_units
+
+SHOW_OUTPUT = """Id=nginx.service
+LoadState=loaded
+ActiveState=active
+SubState=running
+MainPID=812
+NRestarts=2
+ExecMainStatus=0
+ExecMainStartTimestamp=Fri 2025-11-07 03:00:01 UTC
+UnitFileState=enabled
+
+Id=varnish.service
+LoadState=not-found
+ActiveState=inactive
+SubState=dead
+MainPID=0
+NRestarts=0
+ExecMainStatus=0
+ExecMainStartTimestamp=
+UnitFileState=
+"""
+
+
+def _completed(stdout: str) -> subprocess.CompletedProcess:
+    return subprocess.CompletedProcess(args=[], returncode=0, stdout=stdout, stderr="")
+
+
+class SystemdUnitsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        systemd_units.clear_cache()
+        self.addCleanup(systemd_units.clear_cache)
+
+    def test_single_call_parses_every_unit(self) -> None:
+        with mock.patch.object(systemd_units.subprocess, "run", return_value=_completed(SHOW_OUTPUT)) as run:
+            states = systemd_units.query(["nginx", "varnish.service"])
+        run.assert_called_once()
+        cmd = run.call_args[0][0]
+        self.assertEqual(cmd[-2:], ["nginx.service", "varnish.service"])
+        nginx = states["nginx"]
+        self.assertTrue(nginx.exists and nginx.active and nginx.enabled)
+        self.assertEqual(nginx.main_pid, 812)
+        self.assertEqual(nginx.restarts, 2)
+        self.assertEqual(nginx.exec_main_start, "2025-11-07 03:00:01")
+        self.assertFalse(states["varnish.service"].exists)
+
+    def test_cache_and_refresh(self) -> None:
+        with mock.patch.object(systemd_units.subprocess, "run", return_value=_completed(SHOW_OUTPUT)) as run:
+            systemd_units.query(["nginx", "varnish"])
+            self.assertTrue(systemd_units.unit_state("nginx").active)
+            self.assertEqual(run.call_count, 1)
+            systemd_units.query(["nginx", "varnish"], refresh=True)
+            self.assertEqual(run.call_count, 2)
+
+    def test_blocks_are_matched_by_id(self) -> None:
+        # 一个单元没有输出块时，其余单元仍按 Id 解析，不会整体变为未知
+        output = SHOW_OUTPUT.replace("Id=nginx.service", "Id=php8.3-fpm.service").replace("ActiveState=active", "ActiveState=failed")
+        with mock.patch.object(systemd_units.subprocess, "run", return_value=_completed(output)):
+            states = systemd_units.query(["php8.3-fpm", "bad@name", "varnish"])
+        self.assertTrue(states["php8.3-fpm"].exists)
+        self.assertEqual("failed", states["php8.3-fpm"].active_state)
+        self.assertEqual("", states["bad@name"].load_state)
+        self.assertFalse(states["varnish"].exists)
+
+    def test_mismatched_output_is_unknown(self) -> None:
+        with mock.patch.object(
+            systemd_units.subprocess, "run", return_value=_completed("System has not been booted with systemd\n")
+        ):
+            state = systemd_units.unit_state("nginx")
+        self.assertEqual(state.load_state, "")
+        self.assertFalse(state.exists)
+        self.assertFalse(state.active)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import json
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules.lib import valkey_client
+from modules.monitoring import resource_alert
+
+INFO = """# Server
+redis_version:7.2.4
+uptime_in_seconds:{uptime}
+
+# Clients
+connected_clients:12
+
+# Memory
+used_memory:{used}
+maxmemory:1073741824
+maxmemory_policy:allkeys-lru
+mem_fragmentation_ratio:1.12
+
+# Stats
+total_commands_processed:{commands}
+instantaneous_ops_per_sec:250
+keyspace_hits:{hits}
+keyspace_misses:{misses}
+evicted_keys:{evicted}
+expired_keys:{expired}
+
+# Keyspace
+db10:keys=1200,expires=1100,avg_ttl=86400
+db12:keys=300,expires=300,avg_ttl=1200
+"""
+
+
+class FakeValkey:
+    """Answers pipelined RESP commands on a unix socket, requiring AUTH first."""
+
+    def __init__(self, path: Path, password: str) -> None:
+        self.password = password
+        self.info = ""
+        self.commands = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(path))
+        self.server.listen(4)
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn, conn.makefile("rb") as reader:
+                authed = False
+                while True:
+                    header = reader.readline()
+                    if not header:
+                        break
+                    args = []
+                    for _ in range(int(header[1:])):
+                        length = int(reader.readline()[1:])
+                        args.append(reader.read(length + 2)[:-2].decode())
+                    self.commands.append(args)
+                    if args[0] == "AUTH":
+                        authed = args[1] == self.password
+                        conn.sendall(b"+OK\r\n" if authed else b"-WRONGPASS invalid password\r\n")
+                    elif not authed:
+                        conn.sendall(b"-NOAUTH Authentication required.\r\n")
+                    elif args[0] == "INFO":
+                        data = self.info.encode()
+                        conn.sendall(b"$%d\r\n%s\r\n" % (len(data), data))
+                    else:
+                        conn.sendall(b"+OK\r\n")
+
+    def close(self) -> None:
+        self.server.close()
+
+
+class ValkeyCollectorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        base = Path(self.tmp.name)
+        self.sock = base / "valkey.sock"
+        self.conf = base / "valkey.conf"
+        self.conf.write_text(
+            f"bind 127.0.0.1 -::1\nport 6379\nunixsocket {self.sock}\nrequirepass s3cret\n",
+            encoding="utf-8",
+        )
+        self.server = FakeValkey(self.sock, "s3cret")
+        self.addCleanup(self.server.close)
+        patches = [
+            mock.patch.object(resource_alert, "VALKEY_CONFIG", self.conf),
+            mock.patch.object(resource_alert, "VALKEY_SAMPLE_FILE", base / "valkey-sample.json"),
+            mock.patch.object(resource_alert, "RUNTIME_DIR", base),
+            mock.patch.dict(resource_alert._CONFIG_CACHE, {"valkey_db_roles": {"db10": "bank:cache", "db12": "bank:session"}}),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sample(self, **counters):
+        values = dict(uptime=100, used=512 * 1024 * 1024, commands=1000, hits=900, misses=100, evicted=0, expired=10)
+        values.update(counters)
+        self.server.info = INFO.format(**values)
+        return resource_alert.collect_valkey_metrics()
+
+    def test_settings_prefer_unix_socket(self) -> None:
+        settings = valkey_client.server_settings(self.conf)
+        self.assertEqual("s3cret", settings["password"])
+        self.assertEqual(str(self.sock), valkey_client.settings_address(settings))
+        settings["unixsocket"] = None
+        self.assertEqual(("127.0.0.1", 6379), valkey_client.settings_address(settings))
+
+    def test_collects_full_info_in_one_authenticated_round_trip(self) -> None:
+        with mock.patch.object(resource_alert.time, "time", return_value=1000.0):
+            first = self.sample()
+        self.assertEqual([["AUTH", "s3cret"], ["INFO", "all"]], self.server.commands)
+        self.assertEqual(12, first["connected_clients"])
+        self.assertEqual("allkeys-lru", first["maxmemory_policy"])
+        self.assertNotIn("hit_ratio", first)
+        self.assertNotIn("password", json.dumps(first))
+        self.assertEqual({"keys": 300, "expires": 300, "avg_ttl": 1200, "role": "bank:session"}, first["databases"]["db12"])
+
+        with mock.patch.object(resource_alert.time, "time", return_value=1010.0):
+            second = self.sample(uptime=110, commands=3000, hits=1700, misses=300, evicted=50, expired=30)
+        self.assertEqual(0.8, second["hit_ratio"])
+        self.assertEqual(1000, second["lookups"])
+        self.assertEqual(5.0, second["evictions_per_sec"])
+        self.assertEqual(20, second["expired"])
+        self.assertEqual(200.0, second["ops_per_sec"])
+        # 上一次的计数器保存在运行时目录，下一次 cron 运行从文件读取
+        saved = json.loads((Path(self.tmp.name) / "valkey-sample.json").read_text(encoding="utf-8"))
+        self.assertEqual({"at": 1010.0, "keyspace_hits": 1700, "evicted_keys": 50}, {key: saved[key] for key in ("at", "keyspace_hits", "evicted_keys")})
+
+        # 重启后计数器归零，不产生负增量
+        with mock.patch.object(resource_alert.time, "time", return_value=1020.0):
+            restarted = self.sample(uptime=5, commands=10, hits=1, misses=1)
+        self.assertNotIn("evictions_per_sec", restarted)
+
+    def test_db_roles_come_from_recorded_map_and_pillar(self) -> None:
+        db_map = Path(self.tmp.name) / "valkey-databases.json"
+        db_map.write_text(json.dumps({"db10": "bank:cache", "db11": "bank:page_cache"}), encoding="utf-8")
+        with mock.patch.object(resource_alert, "VALKEY_DB_MAP_FILE", db_map), mock.patch.object(
+            resource_alert.config_loader, "pillar_get", return_value={11: "bank:fpc", "db20": "tank:session"}
+        ):
+            roles = resource_alert.valkey_db_roles()
+        self.assertEqual({"db10": "bank:cache", "db11": "bank:fpc", "db20": "tank:session"}, roles)
+
+    def test_wrong_password_is_not_retried_on_command_line(self) -> None:
+        self.conf.write_text(f"unixsocket {self.sock}\nrequirepass nope\n", encoding="utf-8")
+        self.assertIsNone(self.sample())
+
+    def test_evictions_drive_autoscale(self) -> None:
+        runtime = Path(self.tmp.name) / "valkey-autotune.json"
+        metrics = {"used_memory": 200 * 1024 * 1024, "maxmemory": 1024**3, "evictions_per_sec": 12.0}
+        ctx = resource_alert.Assessment()
+        with mock.patch.object(resource_alert, "VALKEY_AUTOSCALE_FILE", runtime), mock.patch.object(
+            resource_alert, "RUNTIME_DIR", Path(self.tmp.name)
+        ), mock.patch.object(resource_alert, "read_meminfo", return_value={"MemTotal": 16 * 1024 * 1024}):
+            resource_alert.assess_valkey(metrics, ctx)
+        self.assertEqual(["Valkey evictions"], ctx.triggers)
+        self.assertEqual({"maxmemory": "1280mb"}, json.loads(runtime.read_text(encoding="utf-8"))["valkey"])
+        self.assertIn(["CONFIG", "SET", "maxmemory", "1280mb"], self.server.commands)
+
+        # 内存接近上限但没有驱逐时只告警，不扩容
+        ctx = resource_alert.Assessment()
+        with mock.patch.object(resource_alert, "autoscale_valkey") as autoscale:
+            resource_alert.assess_valkey({"used_memory": 990 * 1024 * 1024, "maxmemory": 1024**3, "evictions_per_sec": 0.0}, ctx)
+        self.assertEqual("CRITICAL", ctx.severity)
+        autoscale.assert_not_called()
+
+    def test_memory_ratio_drives_autoscale_without_rates(self) -> None:
+        runtime = Path(self.tmp.name) / "valkey-autotune.json"
+        ctx = resource_alert.Assessment()
+        with mock.patch.object(resource_alert, "VALKEY_AUTOSCALE_FILE", runtime), mock.patch.object(
+            resource_alert, "read_meminfo", return_value={"MemTotal": 16 * 1024 * 1024}
+        ):
+            resource_alert.assess_valkey({"used_memory": 990 * 1024 * 1024, "maxmemory": 1024**3}, ctx)
+        self.assertEqual("CRITICAL", ctx.severity)
+        self.assertEqual({"maxmemory": "1280mb"}, json.loads(runtime.read_text(encoding="utf-8"))["valkey"])
+        self.assertIn("of maxmemory", ctx.auto_ctx["actions"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()